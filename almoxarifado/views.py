@@ -16,11 +16,11 @@ from django.contrib.contenttypes.models import ContentType
 from common.models import AuditTrail
 from common.audit import log_event
 from common.audit_simple import record
+from common import csv_export
 from django.core.paginator import Paginator
 from django.db.models import Q
 from django.utils import timezone
-from django.http import HttpResponse, JsonResponse
-import csv
+from django.http import JsonResponse
 
 
 @login_required
@@ -396,24 +396,22 @@ def _filter_cautelas_queryset(request):
 
 @login_required
 def cautelas_export_csv(request):
-    qs = _filter_cautelas_queryset(request).select_related('usuario')[:5000]
-    resp = HttpResponse(content_type='text/csv; charset=utf-8')
-    resp['Content-Disposition'] = 'attachment; filename="cautelas.csv"'
-    w = csv.writer(resp)
-    w.writerow(['id', 'usuario', 'tipo', 'status', 'criada', 'prev_devolucao', 'aprovada', 'retirada', 'devolucao'])
-    for c in qs:
-        w.writerow([
-            c.id,
-            getattr(c.usuario, 'username', ''),
-            c.get_tipo_display() if hasattr(c, 'get_tipo_display') else c.tipo,
-            c.status,
-            c.created_at.strftime('%Y-%m-%d %H:%M') if c.created_at else '',
-            c.data_hora_prevista_devolucao.strftime('%Y-%m-%d %H:%M') if c.data_hora_prevista_devolucao else '',
-            c.aprovada_em.strftime('%Y-%m-%d %H:%M') if c.aprovada_em else '',
-            c.data_hora_retirada.strftime('%Y-%m-%d %H:%M') if c.data_hora_retirada else '',
-            c.data_hora_devolucao.strftime('%Y-%m-%d %H:%M') if c.data_hora_devolucao else '',
-        ])
-    return resp
+    tipos = dict(Cautela.TIPO_CHOICES)
+
+    def _fmt(dt):
+        return dt.strftime('%Y-%m-%d %H:%M') if dt else ''
+
+    linhas = (
+        [pk, username or '', tipos.get(tipo, tipo), status, _fmt(criada), _fmt(prev), _fmt(aprovada), _fmt(retirada), _fmt(devolucao)]
+        for pk, username, tipo, status, criada, prev, aprovada, retirada, devolucao in _filter_cautelas_queryset(request).values_list(
+            'id', 'usuario__username', 'tipo', 'status', 'created_at', 'data_hora_prevista_devolucao',
+            'aprovada_em', 'data_hora_retirada', 'data_hora_devolucao',
+        ).iterator(chunk_size=csv_export.LOTE)
+    )
+    return csv_export.resposta_csv(
+        request, 'cautelas',
+        ['id', 'usuario', 'tipo', 'status', 'criada', 'prev_devolucao', 'aprovada', 'retirada', 'devolucao'], linhas,
+    )
 
 
 @login_required
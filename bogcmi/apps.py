@@ -1,2 +1,7 @@
 from django.apps import AppConfig
-class BogcmiConfig(AppConfig): name='bogcmi'
+class BogcmiConfig(AppConfig):
+    name='bogcmi'
+
+    def ready(self):
+        # Invalidação do cache de PDFs do BO
+        from . import signals  # noqa: F401
@@ -1,8 +1,11 @@
+from datetime import datetime, time, timedelta
+
 import django_filters as df
 from django import forms
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from .models import BO
+from django.utils import timezone
+from .models import BO, Envolvido
 
 User = get_user_model()
 
@@ -13,10 +16,11 @@ STATUS_CHOICES = (
 )
 
 class BOFilter(df.FilterSet):
-    emissao_de = df.DateFilter(field_name='emissao', lookup_expr='date__gte', label='Emissão ≥', widget=forms.DateInput(attrs={'type':'date'}))
-    emissao_ate = df.DateFilter(field_name='emissao', lookup_expr='date__lte', label='Emissão ≤', widget=forms.DateInput(attrs={'type':'date'}))
+    # Datas comparadas com limites de data/hora (índice de emissão); emissao__date converte linha a linha
+    emissao_de = df.DateFilter(method='filter_emissao_de', label='Emissão ≥', widget=forms.DateInput(attrs={'type':'date'}))
+    emissao_ate = df.DateFilter(method='filter_emissao_ate', label='Emissão ≤', widget=forms.DateInput(attrs={'type':'date'}))
     natureza = df.CharFilter(field_name='natureza', lookup_expr='icontains', label='Natureza contém', widget=forms.TextInput(attrs={'placeholder':'Trecho...'}))
-    cod_natureza = df.CharFilter(field_name='cod_natureza', lookup_expr='iexact', label='Código de Ocorrência')
+    cod_natureza = df.CharFilter(method='filter_cod_natureza', label='Código de Ocorrência')
     # Busca por número do BO: corresponde precisamente ao número anterior ao hífen (ex.: "2" → "2-2025").
     # Aceita entradas como "2/2025" ou "2-2025" para match exato no campo completo.
     numero = df.CharFilter(method='filter_numero_exato', label='Número', widget=forms.TextInput(attrs={'placeholder':'Ex: 2 ou 2/2025'}))
@@ -30,15 +34,53 @@ class BOFilter(df.FilterSet):
         method='filter_flagrante'
     )
 
+    def filter_emissao_de(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(emissao__gte=timezone.make_aware(datetime.combine(value, time.min)))
+
+    def filter_emissao_ate(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(emissao__lt=timezone.make_aware(datetime.combine(value + timedelta(days=1), time.min)))
+
+    def filter_cod_natureza(self, queryset, name, value):
+        """Código sem diferenciar maiúsculas/minúsculas.
+
+        ``iexact`` não usa o índice (cod_natureza, emissao); compara-se com as grafias
+        possíveis (como digitado, em maiúsculas/minúsculas e as siglas cadastradas) que
+        existem nos BOs. Com uma grafia só (o usual) o filtro vira igualdade e o índice
+        já entrega a página na ordem de emissão, sem ordenar todos os BOs do código.
+        Se nenhuma dessas grafias existe (ex.: ``Ab01`` gravado, ``AB01`` digitado),
+        volta ao ``iexact`` para não perder BOs com caixa mista.
+        """
+        v = (value or '').strip()
+        if not v:
+            return queryset
+        grafias = {v, v.upper(), v.lower()}
+        try:
+            from taloes.models import CodigoOcorrencia
+            grafias.update(CodigoOcorrencia.objects.filter(sigla__iexact=v).values_list('sigla', flat=True))
+        except Exception:
+            pass
+        existentes = list(
+            BO.objects.filter(cod_natureza__in=grafias).order_by().values_list('cod_natureza', flat=True).distinct()
+        )
+        if len(existentes) == 1:
+            return queryset.filter(cod_natureza=existentes[0])
+        if not existentes:
+            return queryset.filter(cod_natureza__iexact=v)
+        return queryset.filter(cod_natureza__in=existentes)
+
     def filter_envolvido(self, queryset, name, value):
         if not value:
             return queryset
-        # Busca por nome, cpf ou vulgo nos Envolvidos relacionados ao BO
-        return queryset.filter(
-            Q(envolvidos_bo__nome__icontains=value) |
-            Q(envolvidos_bo__cpf__icontains=value) |
-            Q(envolvidos_bo__vulgo__icontains=value)
-        ).distinct()
+        # Busca por nome, cpf ou vulgo nos Envolvidos relacionados ao BO (subconsulta: sem DISTINCT na lista)
+        return queryset.filter(pk__in=Envolvido.objects.filter(
+            Q(nome__icontains=value) |
+            Q(cpf__icontains=value) |
+            Q(vulgo__icontains=value)
+        ).values('bo_id'))
 
     def filter_flagrante(self, queryset, name, value):
         if not value:
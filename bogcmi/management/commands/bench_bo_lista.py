@@ -0,0 +1,132 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from bogcmi.filters import BOFilter
+from bogcmi.models import BO
+from common import keyset
+
+POR_PAGINA = 15
+
+
+def _legado(params):
+    """Filtros e ordem da lista antes da paginação por cursor (``__date``, ``iexact``)."""
+    qs = BO.objects.select_related('viatura', 'encarregado', 'motorista', 'cecom', 'auxiliar1', 'auxiliar2')
+    if params.get('status'):
+        qs = qs.filter(status=params['status'])
+    if params.get('encarregado'):
+        qs = qs.filter(encarregado_id=params['encarregado'])
+    if params.get('cod_natureza'):
+        qs = qs.filter(cod_natureza__iexact=params['cod_natureza'])
+    if params.get('emissao_de'):
+        qs = qs.filter(emissao__date__gte=params['emissao_de'])
+    if params.get('emissao_ate'):
+        qs = qs.filter(emissao__date__lte=params['emissao_ate'])
+    # -id só para comparar as mesmas linhas nos empates de emissão (a view ordenava só por -emissao)
+    return qs.order_by('-emissao', '-id')
+
+
+class Command(BaseCommand):
+    help = ("Compara a lista de BOs (bo_list/bo_table) paginada por cursor (common.keyset) com a paginação "
+            "anterior (Paginator: COUNT + OFFSET): tempo e consultas por página, em várias profundidades e "
+            "combinações de filtro, sobre BOs de um ano fictício. Os BOs de teste são apagados ao final.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bos', type=int, default=500000)
+        parser.add_argument('--ano', type=int, default=9970, help='Ano fictício da emissão dos BOs de teste.')
+        parser.add_argument('--repeticoes', type=int, default=3)
+
+    def handle(self, *args, **options):
+        ano, n = options['ano'], max(1, options['bos'])
+        if BO.objects.filter(numero__endswith=f'-{ano}').exists():
+            raise CommandError(f"Já existem BOs de {ano}; escolha outro --ano.")
+        marca = f"bench-bo-lista-{int(time.time())}"
+        User = get_user_model()
+        usuarios = [User.objects.create(username=f"{marca}-{i}") for i in range(30)]
+        try:
+            self._popular(ano, n, usuarios)
+            self._comparar(ano, usuarios, options['repeticoes'])
+        finally:
+            BO.objects.filter(numero__endswith=f'-{ano}')._raw_delete(BO.objects.db)  # sem registros relacionados
+            User.objects.filter(username__startswith=marca).delete()
+
+    def _popular(self, ano, n, usuarios):
+        rnd = random.Random(n)
+        inicio = timezone.make_aware(datetime(ano, 1, 1))
+        codigos = [f"C-{i:02d}" for i in range(20)]
+        t0 = time.perf_counter()
+        lote = []
+        for i in range(n):
+            lote.append(BO(
+                numero=f"{i + 1}-{ano}", emissao=inicio + timedelta(seconds=rnd.randrange(365 * 86400)),
+                natureza='Bench', cod_natureza=rnd.choice(codigos), encarregado=rnd.choice(usuarios),
+                status=rnd.choices(['FINALIZADO', 'EDICAO', 'ARQUIVADO'], [80, 15, 5])[0],
+            ))
+            if len(lote) == 5000:
+                BO.objects.bulk_create(lote)
+                lote = []
+        BO.objects.bulk_create(lote)
+        self.stdout.write(f"{n} BOs criados em {time.perf_counter() - t0:.1f} s ({connection.vendor})")
+
+    def _medir(self, func, repeticoes):
+        melhor, resultado, consultas = None, None, 0
+        for _ in range(repeticoes):
+            connection.queries_log.clear()  # a carga estoura o limite do log e zeraria a contagem
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                resultado = func()
+                dt = time.perf_counter() - t0
+            consultas = len(ctx)
+            melhor = dt if melhor is None else min(melhor, dt)
+        return melhor, consultas, resultado
+
+    def _comparar(self, ano, usuarios, repeticoes):
+        cenarios = [
+            ('sem filtro', {}),
+            ('status', {'status': 'FINALIZADO'}),
+            ('encarregado+status', {'encarregado': str(usuarios[0].pk), 'status': 'FINALIZADO'}),
+            ('código', {'cod_natureza': 'c-07'}),
+            ('código+período', {'cod_natureza': 'C-07', 'emissao_de': f'{ano}-03-01', 'emissao_ate': f'{ano}-03-31'}),
+            ('período', {'emissao_de': f'{ano}-06-01', 'emissao_ate': f'{ano}-06-30'}),
+        ]
+        for rotulo, params in cenarios:
+            legado = _legado(params)
+            base = BO.objects.select_related('viatura', 'encarregado', 'motorista', 'cecom', 'auxiliar1', 'auxiliar2')
+            novo = BOFilter(_qd(params), queryset=base).qs
+            for pagina in (1, 100, 1000, 10000):
+                offset = (pagina - 1) * POR_PAGINA
+                anterior = next(iter(legado[offset - 1:offset]), None) if offset else None
+                if offset and anterior is None:
+                    break  # menos páginas que essa profundidade
+                cursor = keyset._codificar([anterior.emissao, anterior.id]) if anterior else None
+
+                def _anterior():
+                    page = Paginator(legado, POR_PAGINA).get_page(pagina)
+                    return [b.id for b in page], page.paginator.count
+
+                def _atual():
+                    page = keyset.paginar(novo, POR_PAGINA, apos=cursor, ordem=('-emissao', '-id'))
+                    return [b.id for b in page.object_list], keyset.contar(novo)['valor']
+
+                t_leg, q_leg, (ids_leg, total) = self._medir(_anterior, repeticoes)
+                t_novo, q_novo, (ids_novo, estimado) = self._medir(_atual, repeticoes)
+                self.stdout.write(
+                    f"{rotulo:20s} página {pagina:5d} ({total:6d} BOs): anterior {t_leg * 1000:7.1f} ms / {q_leg} consultas, "
+                    f"atual {t_novo * 1000:6.1f} ms / {q_novo} consultas (total exibido {estimado})")
+                if ids_leg != ids_novo:
+                    raise CommandError(f"Páginas diferentes em '{rotulo}', página {pagina}")
+        self.stdout.write(self.style.SUCCESS("Mesmas linhas da paginação anterior em todas as páginas medidas."))
+
+
+def _qd(params):
+    qd = QueryDict(mutable=True)
+    qd.update(params)
+    return qd
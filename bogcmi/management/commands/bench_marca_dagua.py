@@ -0,0 +1,80 @@
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from reportlab.lib.colors import Color
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from bogcmi import marca_dagua
+
+
+def _pdf_teste(paginas: int) -> bytes:
+    """PDF sintético com texto denso em cada página (aproxima um BO real)."""
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    for p in range(paginas):
+        c.setFont('Helvetica', 9)
+        for linha in range(70):
+            c.drawString(40, 800 - linha * 11, f"BO teste página {p + 1} linha {linha + 1} " + "x" * 80)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def _legado(pdf_bytes: bytes) -> bytes:
+    """Implementação anterior de _aplicar_marca_dagua_pdf (sem prints), para comparação."""
+    from pypdf import PdfReader, PdfWriter
+    reader = PdfReader(BytesIO(pdf_bytes))
+    writer = PdfWriter()
+    wm_buf = BytesIO()
+    c = canvas.Canvas(wm_buf, pagesize=A4)
+    width, height = A4
+    c.setFont("Helvetica-Bold", 72)
+    c.setFillColor(Color(0.8, 0.8, 0.8, alpha=0.4))
+    c.saveState()
+    c.translate(width / 2, height / 2)
+    c.rotate(45)
+    text = "APENAS CONSULTIVO"
+    c.drawString(-c.stringWidth(text, "Helvetica-Bold", 72) / 2, 0, text)
+    c.restoreState()
+    c.save()
+    wm_buf.seek(0)
+    wm_page = PdfReader(wm_buf).pages[0]
+    for page in reader.pages:
+        page.merge_page(wm_page)
+        writer.add_page(page)
+    out = BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Benchmark da marca d'água APENAS CONSULTIVO: implementação anterior (merge_page) x XObject pré-compilado."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paginas', default='1,10,50', help='Lista de tamanhos (páginas) separados por vírgula.')
+        parser.add_argument('--repeticoes', type=int, default=5)
+
+    def handle(self, *args, **options):
+        tamanhos = [int(x) for x in str(options['paginas']).split(',') if x.strip()]
+        rep = max(1, options['repeticoes'])
+        # aquece o overlay do processo (custo único, fora da medição)
+        marca_dagua.aplicar_bytes(_pdf_teste(1))
+        self.stdout.write(f"{'páginas':>8} {'legado ms':>10} {'novo ms':>10} {'ganho':>7} {'bytes legado':>13} {'bytes novo':>11}")
+        for n in tamanhos:
+            pdf = _pdf_teste(n)
+            t_leg = []
+            t_novo = []
+            for _ in range(rep):
+                t0 = time.perf_counter()
+                out_leg = _legado(pdf)
+                t_leg.append(time.perf_counter() - t0)
+                t0 = time.perf_counter()
+                out_novo, _info = marca_dagua.aplicar_bytes(pdf)
+                t_novo.append(time.perf_counter() - t0)
+            leg = min(t_leg) * 1000
+            novo = min(t_novo) * 1000
+            self.stdout.write(
+                f"{n:>8} {leg:>10.1f} {novo:>10.1f} {leg / novo if novo else 0:>6.1f}x {len(out_leg):>13} {len(out_novo):>11}"
+            )
@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, OperationalError, close_old_connections, connection, transaction
+
+from bogcmi.models import BO, NumeroBOLivre, SequenciaBO
+from bogcmi.services import proximo_numero_bo
+
+
+def _legado(ano):
+    """Algoritmo anterior: lê todos os números do ano e procura a menor lacuna."""
+    usados = set()
+    for num in BO.objects.filter(numero__endswith=f'-{ano}').values_list('numero', flat=True):
+        parte = num.split('-')[0]
+        if parte.isdigit():
+            usados.add(int(parte))
+    candidato = 1
+    while candidato in usados:
+        candidato += 1
+    return f"{candidato}-{ano}"
+
+
+class Command(BaseCommand):
+    help = ("Teste de estresse de bogcmi.services.proximo_numero_bo: finalizações simultâneas (threads com "
+            "conexões próprias) e exclusões no meio, em um ano fictício; falha se houver número duplicado "
+            "ou lacuna perdida. Os BOs de teste são apagados ao final.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--por-thread', type=int, default=40)
+        parser.add_argument('--exclusao', type=float, default=0.2, help='Fração de BOs excluídos durante o teste.')
+        parser.add_argument('--populacao', type=int, default=5000,
+                            help='BOs no ano para comparar o tempo por número com o algoritmo anterior.')
+        parser.add_argument('--ano', type=int, default=9990, help='Ano fictício usado pelo teste.')
+
+    def handle(self, *args, **options):
+        ano = options['ano']
+        if BO.objects.filter(numero__endswith=f'-{ano}').exists() or BO.objects.filter(numero__endswith=f'-{ano + 1}').exists():
+            raise CommandError(f"Já existem BOs de {ano}/{ano + 1}; escolha outro --ano.")
+        User = get_user_model()
+        usuario = User.objects.create(username=f"bench-numero-bo-{int(time.time())}")
+        try:
+            self._estresse(ano, usuario, options)
+            if options['populacao']:
+                self._tempo(ano + 1, usuario, options['populacao'])
+        finally:
+            self._limpar((ano, ano + 1), usuario)
+
+    def _estresse(self, ano, usuario, options):
+        n_threads, por_thread = max(1, options['threads']), max(1, options['por_thread'])
+        erros, bloqueios, entregues = [], Counter(), []
+        lock = threading.Lock()
+        inicio = threading.Barrier(n_threads)
+
+        def trabalhador(semente):
+            rnd = random.Random(semente)
+            meus = []
+            try:
+                inicio.wait()
+                feitos = 0
+                while feitos < por_thread:
+                    try:
+                        # Como em bo_finalizar/sync_offline_bos: número e gravação na mesma transação
+                        with transaction.atomic():
+                            bo = BO.objects.create(encarregado=usuario, status='FINALIZADO', natureza='BENCH',
+                                                   numero=proximo_numero_bo(ano))
+                        meus.append(bo.pk)
+                        with lock:
+                            entregues.append(bo.numero)
+                        feitos += 1
+                        if meus and rnd.random() < options['exclusao']:
+                            BO.objects.filter(pk=meus.pop(rnd.randrange(len(meus)))).delete()
+                    except OperationalError as e:  # SQLite: lock não obtido dentro do timeout
+                        with lock:
+                            bloqueios[str(e)] += 1
+                        time.sleep(rnd.random() / 20)
+            except IntegrityError as e:
+                with lock:
+                    erros.append(f"número duplicado: {e}")
+            except Exception as e:
+                with lock:
+                    erros.append(repr(e))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(n_threads)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        dt = time.perf_counter() - t0
+        close_old_connections()
+
+        total = n_threads * por_thread
+        self.stdout.write(f"{n_threads} threads x {por_thread} finalizações ({connection.vendor}): "
+                          f"{dt:.2f} s, {total / dt:.0f} números/s")
+        if bloqueios:
+            self.stdout.write(f"  tentativas repetidas por lock: {sum(bloqueios.values())}")
+        if erros:
+            raise CommandError("Falhas: " + "; ".join(erros[:5]))
+
+        # Invariantes: números vivos distintos; vivos + lacunas = 1..sequência, sem sobreposição
+        vivos = [int(n.split('-')[0]) for n in BO.objects.filter(numero__endswith=f'-{ano}').values_list('numero', flat=True)]
+        livres = list(NumeroBOLivre.objects.filter(ano=ano).values_list('valor', flat=True))
+        maior = SequenciaBO.objects.get(ano=ano).valor
+        repetidos = [n for n, c in Counter(vivos).items() if c > 1]
+        if repetidos:
+            raise CommandError(f"Números duplicados: {repetidos[:10]}")
+        if set(vivos) & set(livres) or sorted(set(vivos) | set(livres)) != list(range(1, maior + 1)):
+            raise CommandError("Sequência inconsistente: lacuna perdida ou número livre em uso.")
+        self.stdout.write(f"  {len(entregues)} números entregues, {len(vivos)} BOs restantes, "
+                          f"{len(livres)} lacunas para reutilizar, maior {maior}")
+        self.stdout.write(self.style.SUCCESS("Sem duplicatas; lacunas consistentes."))
+
+    def _tempo(self, ano, usuario, populacao):
+        BO.objects.bulk_create([
+            BO(encarregado=usuario, status='FINALIZADO', natureza='BENCH', numero=f"{i}-{ano}")
+            for i in range(1, populacao + 1) if i % 97  # algumas lacunas
+        ], batch_size=1000)
+        reps = 20
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            _legado(ano)
+        t_leg = (time.perf_counter() - t0) / reps
+        with transaction.atomic():
+            proximo_numero_bo(ano)  # inicializa a sequência do ano (uma vez)
+            t0 = time.perf_counter()
+            for _ in range(reps):
+                proximo_numero_bo(ano)
+            t_novo = (time.perf_counter() - t0) / reps
+            transaction.set_rollback(True)
+        self.stdout.write(f"{populacao} BOs no ano: anterior {t_leg * 1000:.2f} ms/número, "
+                          f"atual {t_novo * 1000:.2f} ms/número")
+
+    def _limpar(self, anos, usuario):
+        for ano in anos:
+            SequenciaBO.objects.filter(ano=ano).delete()  # antes dos BOs: as exclusões não geram lacunas
+            BO.objects.filter(numero__endswith=f'-{ano}').delete()
+            NumeroBOLivre.objects.filter(ano=ano).delete()
+        BO.objects.filter(encarregado=usuario).delete()
+        usuario.delete()
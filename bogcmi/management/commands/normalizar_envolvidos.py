@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bogcmi.models import Envolvido, _normalize_cpf, _normalize_nome
+
+
+class Command(BaseCommand):
+    help = ("Preenche Envolvido.cpf_normalizado e Envolvido.nome_busca (busca por CPF/nome) nos registros "
+            "gravados antes dessas colunas; o save() mantém os novos. Pode ser executado de novo a qualquer momento.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        lote = max(100, options['lote'])
+        ultimo_id, lidos, alterados = 0, 0, 0
+        while True:
+            linhas = list(
+                Envolvido.objects.filter(id__gt=ultimo_id).order_by('id')
+                .values_list('id', 'cpf', 'nome', 'cpf_normalizado', 'nome_busca')[:lote]
+            )
+            if not linhas:
+                break
+            mudar = []
+            for pk, cpf, nome, cpf_norm, nome_busca in linhas:
+                novo_cpf, novo_nome = _normalize_cpf(cpf), _normalize_nome(nome)
+                if (novo_cpf, novo_nome) != (cpf_norm, nome_busca):
+                    mudar.append(Envolvido(id=pk, cpf_normalizado=novo_cpf, nome_busca=novo_nome))
+            if mudar:
+                with transaction.atomic():
+                    Envolvido.objects.bulk_update(mudar, ['cpf_normalizado', 'nome_busca'], batch_size=500)
+            lidos += len(linhas)
+            alterados += len(mudar)
+            ultimo_id = linhas[-1][0]
+        self.stdout.write(self.style.SUCCESS(f"{lidos} envolvido(s) lido(s), {alterados} atualizado(s)."))
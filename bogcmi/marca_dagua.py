@@ -0,0 +1,142 @@
+"""Marca d'água "APENAS CONSULTIVO" aplicada como Form XObject.
+
+O desenho (ReportLab) é gerado uma única vez por processo para cada tamanho de
+página e guardado como conteúdo bruto + recursos. Em cada documento:
+
+- o XObject é registrado uma vez no PDF de saída e referenciado por todas as
+  páginas (``q … Q q /GcmMarcaN Do Q``), sem decodificar/reescrever o conteúdo
+  original de cada página como fazia ``merge_page``;
+- a origem pode ser um arquivo aberto (leitura sob demanda pelo PdfReader) e o
+  resultado é escrito direto no arquivo de destino.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from io import BytesIO
+from typing import BinaryIO, Union
+
+from reportlab.lib.colors import Color
+from reportlab.pdfgen import canvas
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+except ImportError:  # pragma: no cover - ambiente antigo só com PyPDF2
+    from PyPDF2 import PdfReader, PdfWriter
+    from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+
+TEXTO = "APENAS CONSULTIVO"
+FONTE = "Helvetica-Bold"
+TAMANHO_FONTE = 72
+
+_overlays: dict[tuple, "_Overlay"] = {}
+_lock = threading.Lock()
+
+
+class _Overlay:
+    """Conteúdo e recursos do desenho para um tamanho de página."""
+
+    def __init__(self, largura: float, altura: float):
+        buf = BytesIO()
+        c = canvas.Canvas(buf, pagesize=(largura, altura))
+        c.setFont(FONTE, TAMANHO_FONTE)
+        c.setFillColor(Color(0.8, 0.8, 0.8, alpha=0.4))
+        c.saveState()
+        c.translate(largura / 2, altura / 2)
+        c.rotate(45)
+        c.drawString(-c.stringWidth(TEXTO, FONTE, TAMANHO_FONTE) / 2, 0, TEXTO)
+        c.restoreState()
+        c.save()
+        pagina = PdfReader(BytesIO(buf.getvalue())).pages[0]
+        self.largura = largura
+        self.altura = altura
+        self.conteudo = pagina.get_contents().get_data()
+        self.recursos = pagina['/Resources'].get_object()
+
+    def para_writer(self, writer):
+        """Cria o Form XObject dentro do PDF de saída e retorna a referência indireta."""
+        form = DecodedStreamObject()
+        form.set_data(self.conteudo)
+        form.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): ArrayObject([FloatObject(0), FloatObject(0), FloatObject(self.largura), FloatObject(self.altura)]),
+            NameObject('/Resources'): self.recursos.clone(writer),
+        })
+        return writer._add_object(form)
+
+
+def _overlay(largura: float, altura: float) -> _Overlay:
+    chave = (round(largura, 1), round(altura, 1))
+    ov = _overlays.get(chave)
+    if ov is None:
+        with _lock:
+            ov = _overlays.get(chave)
+            if ov is None:
+                ov = _overlays[chave] = _Overlay(*chave)
+    return ov
+
+
+def _stream(writer, data: bytes):
+    s = DecodedStreamObject()
+    s.set_data(data)
+    return writer._add_object(s)
+
+
+def aplicar(origem: Union[bytes, BinaryIO], destino: BinaryIO) -> dict:
+    """Aplica a marca d'água de `origem` (bytes ou arquivo) gravando em `destino`.
+
+    Retorna {'paginas': int, 'segundos': float}.
+    """
+    t0 = time.perf_counter()
+    reader = PdfReader(BytesIO(origem) if isinstance(origem, (bytes, bytearray)) else origem)
+    writer = PdfWriter()
+    abre = _stream(writer, b"q\n")
+    # por tamanho/origem de página: (nome do recurso, ref do XObject, ref do fechamento)
+    por_tamanho: dict[tuple, tuple] = {}
+    paginas = 0
+    for page in reader.pages:
+        writer.add_page(page)
+        nova = writer.pages[-1]
+        box = nova.mediabox
+        x0, y0 = float(box.left), float(box.bottom)
+        chave = (round(float(box.width), 1), round(float(box.height), 1), x0, y0)
+        if chave not in por_tamanho:
+            nome = f"/GcmMarca{len(por_tamanho)}"
+            ref = _overlay(chave[0], chave[1]).para_writer(writer)
+            fecha = _stream(writer, f"\nQ q 1 0 0 1 {x0:g} {y0:g} cm {nome} Do Q\n".encode())
+            por_tamanho[chave] = (nome, ref, fecha)
+        nome, ref, fecha = por_tamanho[chave]
+
+        if '/Resources' in nova:
+            recursos = nova['/Resources'].get_object()
+        else:
+            recursos = DictionaryObject()
+            nova[NameObject('/Resources')] = recursos
+        if '/XObject' in recursos:
+            xobjs = recursos['/XObject'].get_object()
+        else:
+            xobjs = DictionaryObject()
+            recursos[NameObject('/XObject')] = xobjs
+        xobjs[NameObject(nome)] = ref
+
+        conteudo = nova.get('/Contents')
+        if conteudo is None:
+            originais = []
+        else:
+            obj = conteudo.get_object()
+            if isinstance(obj, ArrayObject):
+                originais = list(obj)
+            else:
+                originais = [conteudo if hasattr(conteudo, 'idnum') else writer._add_object(obj)]
+        nova[NameObject('/Contents')] = ArrayObject([abre, *originais, fecha])
+        paginas += 1
+    writer.write(destino)
+    return {'paginas': paginas, 'segundos': round(time.perf_counter() - t0, 4)}
+
+
+def aplicar_bytes(pdf_bytes: bytes) -> tuple[bytes, dict]:
+    out = BytesIO()
+    info = aplicar(pdf_bytes, out)
+    return out.getvalue(), info
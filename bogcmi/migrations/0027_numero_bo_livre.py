@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:56
+
+from django.db import migrations, models
+
+
+def reconstruir_sequencias(apps, schema_editor):
+    """Inicializa SequenciaBO (maior número) e as lacunas de cada ano a partir dos BOs existentes."""
+    BO = apps.get_model('bogcmi', 'BO')
+    SequenciaBO = apps.get_model('bogcmi', 'SequenciaBO')
+    NumeroBOLivre = apps.get_model('bogcmi', 'NumeroBOLivre')
+    usados = {}
+    for numero in BO.objects.exclude(numero='').values_list('numero', flat=True).iterator():
+        n, _, ano = (numero or '').partition('-')
+        if n.isdigit() and ano.isdigit():
+            usados.setdefault(int(ano), set()).add(int(n))
+    for ano, nums in usados.items():
+        maior = max(nums)
+        SequenciaBO.objects.update_or_create(ano=ano, defaults={'valor': maior})
+        NumeroBOLivre.objects.bulk_create(
+            [NumeroBOLivre(ano=ano, valor=v) for v in range(1, maior) if v not in nums], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bogcmi', '0026_cadastroenvolvido_envolvido_cadastro'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumeroBOLivre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.IntegerField()),
+                ('valor', models.IntegerField()),
+            ],
+            options={
+                'unique_together': {('ano', 'valor')},
+            },
+        ),
+        migrations.RunPython(reconstruir_sequencias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bogcmi', '0027_numero_bo_livre'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='envolvido',
+            name='cpf_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='envolvido',
+            name='nome_busca',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=120),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+def preencher_bairro_normalizado(apps, schema_editor):
+    """Preenche ``bairro_normalizado`` dos BOs existentes, em blocos por id."""
+    from bogcmi.models import _normalize_nome
+    BO = apps.get_model('bogcmi', 'BO')
+    ultimo = 0
+    while True:
+        bloco = list(BO.objects.filter(id__gt=ultimo).order_by('id').only('id', 'bairro')[:2000])
+        if not bloco:
+            break
+        for bo in bloco:
+            bo.bairro_normalizado = _normalize_nome(bo.bairro)
+        BO.objects.bulk_update([bo for bo in bloco if bo.bairro_normalizado], ['bairro_normalizado'], batch_size=500)
+        ultimo = bloco[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bogcmi', '0028_envolvido_busca'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bo',
+            name='bairro_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=120),
+        ),
+        migrations.RunPython(preencher_bairro_normalizado, migrations.RunPython.noop),
+    ]
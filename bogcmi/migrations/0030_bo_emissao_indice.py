@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bogcmi', '0029_bo_bairro_normalizado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bo',
+            name='emissao',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
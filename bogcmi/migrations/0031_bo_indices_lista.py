@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bogcmi', '0030_bo_emissao_indice'),
+        ('taloes', '0015_criado_em_indices'),
+        ('viaturas', '0005_avariaresolvidalog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bo',
+            index=models.Index(fields=['status', 'emissao'], name='bogcmi_bo_status_8bd31d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bo',
+            index=models.Index(fields=['encarregado', 'status'], name='bogcmi_bo_encarre_4ccfd5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bo',
+            index=models.Index(fields=['cod_natureza', 'emissao'], name='bogcmi_bo_cod_nat_6ed69d_idx'),
+        ),
+    ]
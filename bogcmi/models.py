@@ -1,3 +1,5 @@
+import unicodedata
+
 from django.db import models
 
 class Anexo(models.Model):
@@ -15,6 +17,14 @@ def _normalize_cpf(cpf: str) -> str:
     except Exception:
         return ''
 
+def _normalize_nome(nome: str) -> str:
+    """Maiúsculas, sem acentos e com espaços simples (busca por prefixo do nome)."""
+    try:
+        sem_acento = unicodedata.normalize('NFKD', nome or '').encode('ascii', 'ignore').decode('ascii')
+        return ' '.join(sem_acento.upper().split())
+    except Exception:
+        return ''
+
 class CadastroEnvolvido(models.Model):
     """Cadastro persistente de pessoas envolvidas, indexado por CPF.
 
@@ -100,6 +110,18 @@ class Envolvido(models.Model):
     dados_adicionais = models.TextField(blank=True)
     providencia = models.CharField(max_length=60, blank=True)
     assinatura = models.ImageField(upload_to='assinaturas/', blank=True, null=True)
+    # Colunas de busca (mantidas no save; `manage.py normalizar_envolvidos` preenche as antigas)
+    cpf_normalizado = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+    nome_busca = models.CharField(max_length=120, blank=True, db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.cpf_normalizado = _normalize_cpf(self.cpf)
+        self.nome_busca = _normalize_nome(self.nome)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'cpf', 'nome'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'cpf_normalizado', 'nome_busca'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.nome} ({self.cpf})"
 from django.db import models
@@ -111,13 +133,20 @@ User = get_user_model()
 
 class SequenciaBO(models.Model):
     ano = models.IntegerField()
-    valor = models.IntegerField(default=0)
+    valor = models.IntegerField(default=0)  # maior número já atribuído no ano
     class Meta: unique_together = ('ano',)
     def __str__(self): return f'{self.ano}:{self.valor}'
 
+class NumeroBOLivre(models.Model):
+    """Número de BO liberado (BO excluído) abaixo de SequenciaBO.valor; reutilizado antes de avançar a sequência."""
+    ano = models.IntegerField()
+    valor = models.IntegerField()
+    class Meta: unique_together = ('ano', 'valor')
+    def __str__(self): return f'{self.valor}-{self.ano}'
+
 class BO(TimeStamped):
     numero = models.CharField(max_length=30, unique=True, blank=True)
-    emissao = models.DateTimeField(default=timezone.now)
+    emissao = models.DateTimeField(default=timezone.now, db_index=True)
     natureza = models.CharField(max_length=120)
     cod_natureza = models.CharField(max_length=20, blank=True)
     # Identificador local (offline) para permitir sincronização posterior.
@@ -169,6 +198,24 @@ class BO(TimeStamped):
     validacao_token = models.CharField(max_length=40, blank=True, help_text="Token público para validação do documento")
     validacao_hash = models.CharField(max_length=64, blank=True, help_text="Hash interno para integridade")
     talao = models.ForeignKey('taloes.Talao', null=True, blank=True, on_delete=models.SET_NULL, related_name='bos', help_text='Talão de origem (se criado a partir de um talão).')
+    # Bairro sem acentos/caixa/espaços extras para agrupar nas estatísticas (mantido no save)
+    bairro_normalizado = models.CharField(max_length=120, blank=True, editable=False)
+
+    class Meta:
+        # Combinações de filtro da lista de BOs (views_core.bo_list), que pagina por (emissao, id)
+        indexes = [
+            models.Index(fields=["status", "emissao"]),
+            models.Index(fields=["encarregado", "status"]),
+            models.Index(fields=["cod_natureza", "emissao"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.bairro_normalizado = _normalize_nome(self.bairro)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'bairro' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'bairro_normalizado'}
+        super().save(*args, **kwargs)
+
 class Apreensao(models.Model):
     descricao = models.CharField(max_length=255)
     unidade_medida = models.CharField(max_length=50)
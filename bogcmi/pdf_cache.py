@@ -0,0 +1,201 @@
+"""Cache em disco dos PDFs gerados a partir de `BO.documento_html`.
+
+Os arquivos ficam em ``BO_PDF_CACHE_DIR/bo_<pk>/`` com nome derivado do conteúdo:
+
+    <sha(documento_html)>_<sha(opções do renderizador)>[-consultivo].pdf
+
+- a variante "consultivo" (marca d'água APENAS CONSULTIVO) tem arquivo próprio;
+- editar o BO muda o hash do HTML: o signal de `BO` apaga os arquivos antigos;
+- o tamanho total é limitado por ``BO_PDF_CACHE_MAX_BYTES`` (LRU pelo mtime,
+  que é atualizado a cada acerto);
+- contadores de acerto/falha ficam em ``metricas()``.
+
+O diretório NÃO deve ficar sob MEDIA_ROOT (o nginx serve /media/ sem login).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+from django.conf import settings
+
+from common import pdf_pool
+
+# Incrementar quando o desenho da marca d'água mudar (invalida só a variante consultiva)
+MARCA_DAGUA_VERSAO = '1'
+
+VARIANTE_COMPLETO = 'completo'
+VARIANTE_CONSULTIVO = 'consultivo'
+
+_lock = threading.Lock()
+_contadores = {'hits': 0, 'misses': 0, 'gravados': 0, 'removidos_lru': 0, 'invalidados': 0}
+
+
+def _inc(chave: str, n: int = 1):
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + n
+
+
+def _diretorio() -> str:
+    return str(getattr(settings, 'BO_PDF_CACHE_DIR', '') or os.path.join(settings.BASE_DIR, 'cache', 'bo_pdf'))
+
+
+def _limite_bytes() -> int:
+    return int(getattr(settings, 'BO_PDF_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+def hash_html(documento_html: str) -> str:
+    return hashlib.sha256((documento_html or '').encode('utf-8', errors='ignore')).hexdigest()[:32]
+
+
+def chave(bo, base_url: str = '') -> str:
+    """Chave de conteúdo: HTML do BO + opções do renderizador (perfil wkhtmltopdf e base_url)."""
+    opcoes = json.dumps({'wk': pdf_pool.PERFIS_WKHTMLTOPDF['bo'], 'base_url': base_url}, sort_keys=True)
+    return f"{hash_html(bo.documento_html)}_{hashlib.sha256(opcoes.encode()).hexdigest()[:12]}"
+
+
+def _nome(chave_: str, variante: str) -> str:
+    if variante == VARIANTE_CONSULTIVO:
+        return f"{chave_}-consultivo{MARCA_DAGUA_VERSAO}.pdf"
+    return f"{chave_}.pdf"
+
+
+def _caminho(bo_id: int, chave_: str, variante: str) -> str:
+    return os.path.join(_diretorio(), f"bo_{bo_id}", _nome(chave_, variante))
+
+
+def obter(bo, chave_: str, variante: str = VARIANTE_COMPLETO) -> Optional[str]:
+    """Retorna o caminho do PDF em cache (e o marca como usado) ou None."""
+    path = _caminho(bo.pk, chave_, variante)
+    try:
+        os.utime(path, None)
+    except OSError:
+        _inc('misses')
+        return None
+    _inc('hits')
+    return path
+
+
+def ler(bo, chave_: str, variante: str = VARIANTE_COMPLETO) -> Optional[bytes]:
+    path = obter(bo, chave_, variante)
+    if not path:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def guardar(bo, chave_: str, variante: str, data: bytes) -> Optional[str]:
+    """Grava o PDF de forma atômica e aplica a política LRU. Falhas não interrompem o fluxo."""
+    if not data:
+        return None
+    return guardar_com(bo, chave_, variante, lambda f: f.write(data))
+
+
+def guardar_com(bo, chave_: str, variante: str, escrever) -> Optional[str]:
+    """Como `guardar`, mas `escrever(f)` grava direto no arquivo (sem montar bytes em memória).
+
+    Exceções de `escrever` são propagadas (o arquivo temporário é descartado).
+    """
+    path = _caminho(bo.pk, chave_, variante)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    except OSError:
+        return None
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            escrever(f)
+        os.replace(tmp, path)
+    except OSError:
+        _descartar(tmp)
+        return None
+    except Exception:
+        _descartar(tmp)
+        raise
+    _inc('gravados')
+    _evict()
+    return path
+
+
+def _descartar(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _arquivos():
+    raiz = _diretorio()
+    if not os.path.isdir(raiz):
+        return []
+    itens = []
+    for sub in os.scandir(raiz):
+        if not sub.is_dir():
+            continue
+        for ent in os.scandir(sub.path):
+            if ent.is_file() and ent.name.endswith('.pdf'):
+                try:
+                    st = ent.stat()
+                except OSError:
+                    continue  # removido em paralelo
+                itens.append((st.st_mtime, st.st_size, ent.path))
+    return itens
+
+
+def _evict():
+    limite = _limite_bytes()
+    with _lock:
+        itens = _arquivos()
+        total = sum(i[1] for i in itens)
+        if total <= limite:
+            return
+        for _mtime, size, path in sorted(itens):
+            try:
+                os.remove(path)
+                total -= size
+                _contadores['removidos_lru'] += 1
+            except OSError:
+                pass
+            if total <= limite:
+                break
+
+
+def invalidar_bo(bo_id: int, documento_html: Optional[str] = None):
+    """Remove PDFs do BO gerados de outro HTML (todos, se documento_html=None)."""
+    pasta = os.path.join(_diretorio(), f"bo_{bo_id}")
+    if not os.path.isdir(pasta):
+        return
+    if documento_html is None:
+        shutil.rmtree(pasta, ignore_errors=True)
+        _inc('invalidados')
+        return
+    manter_hash = hash_html(documento_html)
+    for ent in os.scandir(pasta):
+        if ent.is_file() and not ent.name.startswith(manter_hash + '_'):
+            try:
+                os.remove(ent.path)
+                _inc('invalidados')
+            except OSError:
+                pass
+
+
+def metricas() -> dict:
+    itens = _arquivos()
+    with _lock:
+        dados = dict(_contadores)
+    total = dados['hits'] + dados['misses']
+    dados.update({
+        'arquivos': len(itens),
+        'bytes': sum(i[1] for i in itens),
+        'limite_bytes': _limite_bytes(),
+        'taxa_acerto': round(dados['hits'] / total, 3) if total else 0.0,
+    })
+    return dados
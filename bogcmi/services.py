@@ -1,48 +1,93 @@
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.utils import timezone
-from .models import SequenciaBO, BO
+from .models import SequenciaBO, NumeroBOLivre, BO
 
-def proximo_numero_bo():
+def _numero_ano(numero) -> tuple[int, int] | None:
+    """'N-YYYY' -> (N, YYYY); None se fora do formato."""
+    n, _, ano = (numero or '').partition('-')
+    if n.isdigit() and ano.isdigit():
+        return int(n), int(ano)
+    return None
+
+
+def _inicializar(ano: int):
+    """Cria a sequência do ano a partir dos BOs existentes (uma vez por ano).
+
+    Ano novo normalmente não tem BOs; a varredura só pesa se a sequência tiver sido apagada.
+    """
+    usados = set()
+    for num in BO.objects.filter(numero__endswith=f'-{ano}').values_list('numero', flat=True):
+        r = _numero_ano(num)
+        if r and r[1] == ano:
+            usados.add(r[0])
+    maior = max(usados) if usados else 0
+    try:
+        with transaction.atomic():
+            SequenciaBO.objects.create(ano=ano, valor=maior)
+    except IntegrityError:
+        return  # criada por outra transação
+    NumeroBOLivre.objects.bulk_create(
+        [NumeroBOLivre(ano=ano, valor=v) for v in range(1, maior) if v not in usados],
+        batch_size=1000, ignore_conflicts=True)
+
+
+def proximo_numero_bo(ano: int | None = None):
     """Retorna o próximo número de BO para o ano corrente no formato 'N-YYYY'.
 
-    Nova lógica:
-      - Reutiliza lacunas (gaps). Se existir uma sequência 1,2,4, devolve 3.
-      - Se não existir nenhum BO no ano, devolve 1-YYYY.
-      - Mantém registro em SequenciaBO apenas como referência do maior já utilizado
-        (atualiza para o max vigente após atribuir a lacuna).
-    Justificativa: permitir que, ao apagar o único BO (ex: 1-2025), o próximo volte a ser 1-2025.
-    Obs.: Em cenários de alta concorrência, duas criações simultâneas poderiam tentar a mesma lacuna.
-          Para mitigar, usamos transação + select_for_update na linha da sequência; em SQLite é
-          suficiente na maioria dos casos. Em Postgres, poderíamos também usar um advisory lock
-          ou "FOR UPDATE" sobre consulta dos BOs, mas aqui mantemos simples.
+    - Reutiliza primeiro o menor número liberado (NumeroBOLivre, preenchida quando um BO
+      é excluído): ao apagar o único BO (ex.: 1-2025), o próximo volta a ser 1-2025.
+    - Sem lacunas, avança SequenciaBO.valor (maior número atribuído no ano).
+
+    Custo constante (consultas por índice, sem ler os números do ano). A primeira
+    instrução é um UPDATE na linha da sequência: no SQLite isso toma o lock de escrita
+    do banco (esperando o timeout se outro processo estiver gravando) antes de qualquer
+    leitura; no PostgreSQL trava a linha até o fim da transação. Chamadas simultâneas
+    ficam em fila e nunca devolvem o mesmo número. Chame dentro da mesma transação que
+    grava o BO para que uma falha ao salvar devolva também o número.
     """
-    ano = timezone.now().year
+    return reservar_numeros_bo(1, ano)[0]
+
+
+def reservar_numeros_bo(quantidade: int, ano: int | None = None) -> list[str]:
+    """Reserva ``quantidade`` números de uma vez (sincronização em lote), na ordem de `proximo_numero_bo`."""
+    if quantidade <= 0:
+        return []
+    ano = ano or timezone.now().year
     with transaction.atomic():
-        # Lock/garante existência do registro de sequência
-        seq, _ = SequenciaBO.objects.select_for_update().get_or_create(ano=ano)
-
-        # Coleta todos os números existentes daquele ano
-        existentes = BO.objects.filter(numero__endswith=f'-{ano}')\
-            .values_list('numero', flat=True)
-        usados = set()
-        for num in existentes:
-            # Formato esperado X-YYYY
-            try:
-                parte = num.split('-')[0]
-                if parte.isdigit():
-                    usados.add(int(parte))
-            except Exception:
-                continue
-
-        # Encontra menor inteiro positivo não utilizado
-        candidato = 1
-        while candidato in usados:
-            candidato += 1
-
-        # Atualiza o valor máximo registrado (não quebrando possível relatório que usa SequenciaBO)
-        max_util = max(usados | {candidato}) if usados else candidato
-        if seq.valor != max_util:
-            seq.valor = max_util
+        if not SequenciaBO.objects.filter(ano=ano).update(valor=F('valor')):
+            _inicializar(ano)
+        seq = SequenciaBO.objects.select_for_update().get(ano=ano)
+        numeros: list[str] = []
+        while len(numeros) < quantidade:
+            livres = list(NumeroBOLivre.objects.filter(ano=ano).order_by('valor')
+                          .values_list('id', 'valor')[:quantidade - len(numeros)])
+            if not livres:
+                break
+            NumeroBOLivre.objects.filter(id__in=[i for i, _ in livres]).delete()
+            numeros += _disponiveis([f"{v}-{ano}" for _, v in livres])
+        valor_inicial = seq.valor
+        while len(numeros) < quantidade:
+            falta = quantidade - len(numeros)
+            candidatos = [f"{v}-{ano}" for v in range(seq.valor + 1, seq.valor + falta + 1)]
+            seq.valor += falta
+            numeros += _disponiveis(candidatos)
+        if seq.valor != valor_inicial:
             seq.save(update_fields=['valor'])
+        return numeros
+
+
+def _disponiveis(candidatos: list[str]) -> list[str]:
+    """Descarta números já usados por BOs (digitados manualmente), em uma consulta pelo índice único."""
+    em_uso = set(BO.objects.filter(numero__in=candidatos).values_list('numero', flat=True))
+    return [n for n in candidatos if n not in em_uso]
+
 
-        return f"{candidato}-{ano}"
+def liberar_numero_bo(numero):
+    """Devolve o número de um BO excluído para reutilização (chamado no post_delete do BO)."""
+    r = _numero_ano(numero)
+    if not r:
+        return
+    n, ano = r
+    if SequenciaBO.objects.filter(ano=ano, valor__gte=n).exists():
+        NumeroBOLivre.objects.bulk_create([NumeroBOLivre(ano=ano, valor=n)], ignore_conflicts=True)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import pdf_cache
+from .services import liberar_numero_bo
+from .models import BO
+
+
+@receiver(post_save, sender=BO)
+def invalidar_pdf_cache_bo(sender, instance: BO, **kwargs):
+    """Descarta PDFs em cache gerados de uma versão anterior do documento do BO."""
+    try:
+        pdf_cache.invalidar_bo(instance.pk, instance.documento_html or '')
+    except Exception:
+        pass
+
+
+@receiver(post_delete, sender=BO)
+def remover_pdf_cache_bo(sender, instance: BO, **kwargs):
+    try:
+        pdf_cache.invalidar_bo(instance.pk)
+    except Exception:
+        pass
+
+
+@receiver(post_delete, sender=BO)
+def liberar_numero(sender, instance: BO, **kwargs):
+    """O número do BO excluído volta para a fila de reutilização (bogcmi.services.proximo_numero_bo)."""
+    try:
+        liberar_numero_bo(instance.numero)
+    except Exception:
+        pass
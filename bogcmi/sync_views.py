@@ -1,20 +1,147 @@
 import json
 import uuid
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
 from django.http import JsonResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-from .models import BO
-from .services import proximo_numero_bo
-from common.audit_simple import record
+from .models import BO, _normalize_nome
+from .services import reservar_numeros_bo
+from common.audit_simple import record_many
+
+CAMPOS_PERMITIDOS = {
+    'natureza', 'cod_natureza', 'solicitante', 'endereco', 'bairro', 'cidade', 'uf', 'numero_endereco', 'rua', 'referencia',
+    'km_inicio', 'km_final', 'horario_inicial', 'horario_final', 'duracao', 'numero_bopc', 'numero_tco', 'autoridade_policial',
+    'escrivao', 'algemas', 'grande_vulto', 'local_finalizacao', 'flagrante', 'providencias', 'viatura_id', 'motorista_id',
+    'auxiliar1_id', 'auxiliar2_id', 'cecom_id'
+}
+# Campos gravados pelo próprio sync (além dos recebidos em `dados`)
+CAMPOS_SYNC = ['status', 'numero', 'finalizado_em', 'synced_at', 'offline', 'encarregado', 'updated_at']
+
+
+_CAMPOS_BO = {n for f in BO._meta.concrete_fields for n in (f.name, f.attname)}
+_FKS_SYNC = [f for f in BO._meta.concrete_fields if f.is_relation and f.attname in CAMPOS_PERMITIDOS]
+
+
+def _aplicar_campos(bo, dados) -> set:
+    """Aplica em memória os campos permitidos de ``dados``; devolve os nomes alterados."""
+    alterados = set()
+    for k, v in dados.items():
+        if k not in CAMPOS_PERMITIDOS or k not in _CAMPOS_BO:
+            continue
+        if k in {'km_inicio', 'km_final'}:
+            try:
+                v = int(v) if str(v).strip() not in ('', 'None', 'null') else None
+            except (ValueError, TypeError):
+                v = None
+        elif k in {'horario_inicial', 'horario_final'}:
+            if not v:
+                v = None
+            else:
+                try:
+                    from datetime import time
+                    hh, mm = str(v).split(':', 1)
+                    v = time(int(hh), int(mm))
+                except Exception:
+                    v = None
+        elif k.endswith('_id'):
+            try:
+                v = int(v) if str(v).strip() not in ('', 'None', 'null') else None
+            except (ValueError, TypeError):
+                v = None
+        setattr(bo, k, v)
+        alterados.add(k)
+
+    if (not getattr(bo, 'cod_natureza', None)) and getattr(bo, 'natureza', None) and ' - ' in bo.natureza:
+        bo.cod_natureza = bo.natureza.split(' - ', 1)[0].strip()
+        alterados.add('cod_natureza')
+    if 'bairro' in alterados:  # bulk_create/bulk_update não passam pelo BO.save
+        bo.bairro_normalizado = _normalize_nome(bo.bairro)
+        alterados.add('bairro_normalizado')
+    return alterados
+
+
+def _versao(bo) -> str | None:
+    return bo.updated_at.isoformat() if getattr(bo, 'updated_at', None) else None
+
+
+def _ler_versao(valor):
+    try:
+        dt = parse_datetime(str(valor or ''))
+    except ValueError:
+        return None
+    if dt is not None and timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def _gravar_alterados(bos, campos):
+    """Campos com o mesmo valor em todos os BOs (status, synced_at…) vão num único UPDATE;
+    só os que variam passam pelo ``bulk_update`` (um CASE por campo e linha)."""
+    iguais, variam = {}, []
+    for nome in sorted(campos):
+        attname = BO._meta.get_field(nome).attname
+        valores = {getattr(bo, attname) for bo in bos}
+        if len(valores) == 1:
+            iguais[attname] = valores.pop()
+        else:
+            variam.append(nome)
+    if iguais:
+        BO.objects.filter(pk__in=[bo.pk for bo in bos]).update(**iguais)
+    if variam:
+        BO.objects.bulk_update(bos, variam, batch_size=200)
+
+
+def _referencias_invalidas(bos) -> dict:
+    """``{id(bo): campo}`` dos BOs que apontam para registros inexistentes (uma consulta por campo).
+
+    As FKs só são verificadas no COMMIT (DEFERRABLE): sem isso um item inválido
+    derrubaria o lote inteiro.
+    """
+    invalidos = {}
+    for f in _FKS_SYNC:
+        ids = {getattr(bo, f.attname) for bo in bos} - {None}
+        if not ids:
+            continue
+        validos = set(f.related_model._base_manager.filter(pk__in=ids).values_list('pk', flat=True))
+        for bo in bos:
+            if getattr(bo, f.attname) not in validos | {None}:
+                invalidos.setdefault(id(bo), f.name)
+    return invalidos
+
+
+def _gravar(novos, alterados, campos):
+    # BOs novos recebem número já na criação (como no fluxo online; `numero` é único)
+    sem_numero = [bo for bo in novos + alterados
+                  if not bo.numero and (bo.pk is None or bo.status == 'FINALIZADO')]
+    for bo, numero in zip(sem_numero, reservar_numeros_bo(len(sem_numero))):
+        bo.numero = numero
+    if novos:
+        BO.objects.bulk_create(novos, batch_size=200)
+    if alterados:
+        _gravar_alterados(alterados, campos)
+
 
 @csrf_exempt
 @login_required
 def sync_offline_bos(request):  # noqa: C901
-    """Endpoint isolado para sincronização de BOs offline.
+    """Sincronização em lote dos BOs offline.
+
+    Payload: ``{"bos": [{"client_uuid", "bo_id"?, "status"?, "dados": {...}, "versao"?}]}``.
 
-    Ver documentação original em views.py. Este arquivo foi criado para contornar
-    erro intermitente de IndentationError possivelmente ligado a corrupção de bytecode.
+    - ``dados`` pode ser parcial (delta): só os campos enviados são alterados;
+    - ``versao`` é o ``versao`` devolvido no último sync/carregamento do BO
+      (``updated_at``); se o BO mudou no servidor desde então, o item não é aplicado e
+      volta com ``conflito: true`` e a versão atual (reenviar com ela sobrescreve);
+    - os BOs referenciados são lidos em uma consulta; criações e alterações são
+      gravadas em uma transação (``bulk_create``/``bulk_update``), os números dos BOs
+      novos/finalizados são reservados em lote e o Log Simplificado é gravado com
+      um único INSERT;
+    - um item que não pode ser gravado (FK inexistente, número/UUID já usado) volta com
+      ``erro`` e os demais são gravados: se o lote falhar, cada item vai no seu savepoint.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Método não permitido'}, status=405)
@@ -24,93 +151,126 @@ def sync_offline_bos(request):  # noqa: C901
     except Exception as exc:
         return JsonResponse({'error': 'JSON inválido', 'detail': str(exc)}, status=400)
 
-    bos_in = payload.get('bos') or []
-    resultados = []
-
-    campos_permitidos = {
-        'natureza', 'cod_natureza', 'solicitante', 'endereco', 'bairro', 'cidade', 'uf', 'numero_endereco', 'rua', 'referencia',
-        'km_inicio', 'km_final', 'horario_inicial', 'horario_final', 'duracao', 'numero_bopc', 'numero_tco', 'autoridade_policial',
-        'escrivao', 'algemas', 'grande_vulto', 'local_finalizacao', 'flagrante', 'providencias', 'viatura_id', 'motorista_id',
-        'auxiliar1_id', 'auxiliar2_id', 'cecom_id'
-    }
-
-    for item in bos_in:
-        c_uuid = (item.get('client_uuid') or '').strip() or str(uuid.uuid4())
+    itens = []
+    for item in payload.get('bos') or []:
+        if not isinstance(item, dict):
+            continue
         dados = item.get('dados') or {}
-        status_in = (item.get('status') or dados.get('status') or 'EDICAO').upper()
         bo_id = item.get('bo_id') or dados.get('bo_id')
-        criado = False
+        try:
+            bo_id = int(bo_id) if bo_id not in (None, '') else None
+        except (ValueError, TypeError):
+            bo_id = None
+        c_uuid = (item.get('client_uuid') or '').strip()
+        try:
+            c_uuid = str(uuid.UUID(c_uuid)) if c_uuid else str(uuid.uuid4())
+        except ValueError:
+            c_uuid = str(uuid.uuid4())
+        itens.append({
+            'c_uuid': c_uuid,
+            'bo_id': bo_id,
+            'dados': dados,
+            'status': (item.get('status') or dados.get('status') or 'EDICAO').upper(),
+            'versao': _ler_versao(item.get('versao')),
+        })
 
-        bo = BO.objects.filter(id=bo_id).first() if bo_id else None
-        if not bo:
-            bo = BO.objects.filter(client_uuid=c_uuid).first()
-        if not bo:
-            bo = BO(client_uuid=c_uuid, offline=True)
-            # encarregado será atribuído abaixo se possível
+    # Uma consulta para todos os BOs referenciados (por id ou client_uuid)
+    ids = {it['bo_id'] for it in itens if it['bo_id']}
+    uuids = {it['c_uuid'] for it in itens}
+    existentes = list(BO.objects.filter(Q(id__in=ids) | Q(client_uuid__in=uuids))) if itens else []
+    por_id = {bo.id: bo for bo in existentes}
+    por_uuid = {str(bo.client_uuid): bo for bo in existentes if bo.client_uuid}
+
+    agora = timezone.now()
+    novos, alterados, campos = {}, {}, set()
+    resultados, eventos = [], []
+    for it in itens:
+        bo = por_id.get(it['bo_id']) or por_uuid.get(it['c_uuid'])
+        criado = False
+        if bo is None:
+            bo = BO(client_uuid=it['c_uuid'], offline=True, encarregado=request.user)
+            por_uuid[it['c_uuid']] = bo
+            novos[it['c_uuid']] = bo
             criado = True
+        elif it['versao'] and bo.pk and bo.pk not in alterados and it['versao'] != bo.updated_at:
+            resultados.append({'client_uuid': it['c_uuid'], 'bo_id': bo.id, 'numero': bo.numero,
+                               'status': bo.status, 'criado': False, 'updated': False,
+                               'conflito': True, 'versao': _versao(bo)})
+            continue
 
-        if hasattr(request, 'user') and request.user.is_authenticated and not bo.encarregado_id:
+        if not bo.encarregado_id:
             bo.encarregado = request.user
 
         if criado or bo.status == 'EDICAO':
-            for k, v in dados.items():
-                if k not in campos_permitidos:
-                    continue
-                if k in {'km_inicio', 'km_final'}:
-                    try:
-                        v_norm = int(v) if str(v).strip() not in ('', 'None', 'null') else None
-                    except (ValueError, TypeError):
-                        v_norm = None
-                    setattr(bo, k, v_norm)
-                    continue
-                if k in {'horario_inicial', 'horario_final'}:
-                    if not v:
-                        setattr(bo, k, None)
-                    else:
-                        try:
-                            from datetime import time
-                            hh, mm = str(v).split(':', 1)
-                            setattr(bo, k, time(int(hh), int(mm)))
-                        except Exception:
-                            setattr(bo, k, None)
-                    continue
-                if k.endswith('_id'):
-                    try:
-                        v_id = int(v) if str(v).strip() not in ('', 'None', 'null') else None
-                    except (ValueError, TypeError):
-                        v_id = None
-                    setattr(bo, k, v_id)
-                    continue
-                setattr(bo, k, v)
-
-        if (not getattr(bo, 'cod_natureza', None)) and getattr(bo, 'natureza', None) and ' - ' in bo.natureza:
-            bo.cod_natureza = bo.natureza.split(' - ', 1)[0].strip()
-
-        if status_in == 'FINALIZADO':
+            campos |= _aplicar_campos(bo, it['dados'])
+
+        if it['status'] == 'FINALIZADO':
             bo.status = 'FINALIZADO'
-            if not bo.numero:
-                bo.numero = proximo_numero_bo()
-            bo.finalizado_em = bo.finalizado_em or timezone.now()
+            bo.finalizado_em = bo.finalizado_em or agora
         else:
             bo.status = 'EDICAO'
-
-        bo.synced_at = timezone.now()
+        bo.synced_at = agora
+        bo.updated_at = agora
         bo.offline = (bo.status != 'FINALIZADO')
-        bo.save()
+        if bo.pk:
+            alterados[bo.pk] = bo
 
-        # Log simplificado
         if criado:
-            record(request, event="BO_CRIADO", obj=bo, message=f"BO criado (UUID: {c_uuid})", app="bogcmi")
-        if status_in == 'FINALIZADO':
-            record(request, event="BO_FINALIZADO", obj=bo, message=f"BO #{bo.numero} finalizado", app="bogcmi")
-
-        resultados.append({
-            'client_uuid': c_uuid,
-            'bo_id': bo.id,
-            'numero': bo.numero,
-            'status': bo.status,
-            'criado': criado,
-            'updated': not criado
-        })
+            eventos.append({'event': 'BO_CRIADO', 'obj': bo, 'message': f"BO criado (UUID: {it['c_uuid']})", 'app': 'bogcmi'})
+        if it['status'] == 'FINALIZADO':
+            eventos.append({'event': 'BO_FINALIZADO', 'obj': bo, 'app': 'bogcmi'})
+        resultados.append({'client_uuid': it['c_uuid'], 'bo': bo, 'criado': criado})
+
+    erros = {k: f"Referência inválida: {campo}" for k, campo in
+             _referencias_invalidas(list(novos.values()) + list(alterados.values())).items()}
+    novos = {u: bo for u, bo in novos.items() if id(bo) not in erros}
+    alterados = {pk: bo for pk, bo in alterados.items() if id(bo) not in erros}
+    campos |= set(CAMPOS_SYNC)
+    numeros = {id(bo): bo.numero for bo in list(novos.values()) + list(alterados.values())}
+    ids_novos = {id(bo) for bo in novos.values()}
+
+    def _desfazer(bo):
+        bo.numero = numeros[id(bo)]
+        if id(bo) in ids_novos:
+            bo.pk, bo._state.adding = None, True
+
+    try:
+        with transaction.atomic():
+            _gravar(list(novos.values()), list(alterados.values()), campos)
+    except IntegrityError:
+        # Lote desfeito: item a item, cada um no seu savepoint
+        for bo in list(novos.values()) + list(alterados.values()):
+            _desfazer(bo)
+        with transaction.atomic():
+            for bo in list(novos.values()) + list(alterados.values()):
+                novo = id(bo) in ids_novos
+                try:
+                    with transaction.atomic():
+                        _gravar([bo] if novo else [], [] if novo else [bo], campos)
+                except IntegrityError as exc:
+                    _desfazer(bo)
+                    erros[id(bo)] = f"Não foi possível gravar o BO: {exc}"
+        novos = {u: bo for u, bo in novos.items() if id(bo) not in erros}
+        alterados = {pk: bo for pk, bo in alterados.items() if id(bo) not in erros}
+
+    # bulk_* não dispara post_save: invalidação do cache de PDFs e dos badges
+    for criados, bos in ((True, novos.values()), (False, alterados.values())):
+        for bo in bos:
+            post_save.send(sender=BO, instance=bo, created=criados, update_fields=None, raw=False, using=bo._state.db)
+
+    eventos = [ev for ev in eventos if id(ev['obj']) not in erros]
+    for ev in eventos:
+        if ev['event'] == 'BO_FINALIZADO':
+            ev['message'] = f"BO #{ev['obj'].numero} finalizado"
+    record_many(request, eventos)
 
-    return JsonResponse({'results': resultados, 'count': len(resultados)})
\ No newline at end of file
+    saida = []
+    for r in resultados:
+        bo = r.pop('bo', None)
+        if bo is not None and id(bo) in erros:
+            r.update({'bo_id': bo.id, 'criado': False, 'updated': False, 'erro': erros[id(bo)]})
+        elif bo is not None:
+            r.update({'bo_id': bo.id, 'numero': bo.numero, 'status': bo.status,
+                      'updated': not r['criado'], 'versao': _versao(bo)})
+        saida.append(r)
+    return JsonResponse({'results': saida, 'count': len(saida)})
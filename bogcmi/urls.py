@@ -61,4 +61,5 @@ urlpatterns = [
     path('<int:pk>/debug-marca/', views_debug.debug_marca_dagua, name='debug_marca_dagua'),
     # API
     path('api/envolvido-por-cpf/', views.api_cadastro_envolvido_lookup, name='api_envolvido_por_cpf'),
+    path('api/envolvidos/sugestoes/', views.api_envolvidos_sugestoes, name='api_envolvidos_sugestoes'),
 ]
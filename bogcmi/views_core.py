@@ -14,8 +14,9 @@ import hashlib
 import secrets
 
 from django.core.files.base import ContentFile
-from django.core.paginator import Paginator
-from django.http import HttpResponse, JsonResponse, HttpResponseForbidden
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, HttpResponseForbidden, FileResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse
@@ -32,10 +33,13 @@ from .forms import (
 from .filters import BOFilter
 from .models import (
     BO, Envolvido, Anexo, Apreensao, AnexoApreensao,
-    VeiculoEnvolvido, AnexoVeiculo, EquipeApoio, CadastroEnvolvido
+    VeiculoEnvolvido, AnexoVeiculo, EquipeApoio, CadastroEnvolvido,
+    _normalize_cpf, _normalize_nome,
 )
 from .services import proximo_numero_bo
+from . import pdf_cache, marca_dagua
 from common.models import DocumentoAssinavel
+from common import pdf_pool
 from django.conf import settings  # garantir disponível para logger
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
@@ -108,116 +112,31 @@ def _aplicar_marca_dagua_pdf(pdf_bytes):
     Returns:
         bytes: PDF com marca d'água aplicada
     """
-    from io import BytesIO
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.colors import Color
-    
-    print(f"[MARCA] Iniciando marca d'água em PDF de {len(pdf_bytes)} bytes")
-    _log_bo_pdf(f"[MARCA] Iniciando marca d'água em PDF de {len(pdf_bytes)} bytes")
-    
-    # Importar pypdf
-    try:
-        from pypdf import PdfReader, PdfWriter
-        print("[MARCA] Usando pypdf")
-    except ImportError:
-        try:
-            from PyPDF2 import PdfReader, PdfWriter
-            print("[MARCA] Usando PyPDF2")
-        except ImportError as e:
-            print(f"[MARCA] ERRO: Nenhuma biblioteca disponível! {e}")
-            _log_bo_pdf(f"[MARCA] ERRO: Nenhuma biblioteca disponível! {e}")
-            return pdf_bytes
-    
-    # Ler PDF original
-    pdf_reader = PdfReader(BytesIO(pdf_bytes))
-    pdf_writer = PdfWriter()
-    
-    # Criar marca d'água
-    watermark_buffer = BytesIO()
-    watermark_canvas = canvas.Canvas(watermark_buffer, pagesize=A4)
-    width, height = A4
-    
-    # Configurar fonte e cor
-    watermark_canvas.setFont("Helvetica-Bold", 72)
-    watermark_canvas.setFillColor(Color(0.8, 0.8, 0.8, alpha=0.4))
-    
-    # Rotacionar e desenhar texto diagonal
-    watermark_canvas.saveState()
-    watermark_canvas.translate(width/2, height/2)
-    watermark_canvas.rotate(45)
-    
-    text = "APENAS CONSULTIVO"
-    text_width = watermark_canvas.stringWidth(text, "Helvetica-Bold", 72)
-    watermark_canvas.drawString(-text_width/2, 0, text)
-    
-    watermark_canvas.restoreState()
-    watermark_canvas.save()
-    
-    print(f"[MARCA] Marca d'água criada com sucesso")
-    
-    # Ler marca d'água
-    watermark_buffer.seek(0)
-    watermark_pdf = PdfReader(watermark_buffer)
-    watermark_page = watermark_pdf.pages[0]
-    
-    # Aplicar marca d'água em cada página
-    page_count = len(pdf_reader.pages)
-    print(f"[MARCA] Aplicando marca d'água em {page_count} páginas")
-    
-    for i, page in enumerate(pdf_reader.pages):
-        page.merge_page(watermark_page)
-        pdf_writer.add_page(page)
-        print(f"[MARCA] ✅ Página {i+1}/{page_count} com marca")
-    
-    # Gerar PDF final
-    output_buffer = BytesIO()
-    pdf_writer.write(output_buffer)
-    output_buffer.seek(0)
-    result = output_buffer.getvalue()
-    
-    print(f"[MARCA] ✅ PDF finalizado: {len(result)} bytes (original: {len(pdf_bytes)}, diferença: +{len(result) - len(pdf_bytes)})")
-    _log_bo_pdf(f"[MARCA] ✅ PDF finalizado: {len(result)} bytes (original: {len(pdf_bytes)}, diferença: +{len(result) - len(pdf_bytes)})")
-    
-    return result
+    out = BytesIO()
+    _aplicar_marca_dagua_arquivo(pdf_bytes, out)
+    return out.getvalue()
+
+
+def _aplicar_marca_dagua_arquivo(origem, destino):
+    """Versão sem cópia em memória: lê de `origem` (bytes ou arquivo) e grava em `destino`."""
+    info = marca_dagua.aplicar(origem, destino)
+    _log_bo_pdf(f"[MARCA] {info['paginas']} página(s) em {info['segundos'] * 1000:.1f} ms")
+    return info
 
 
 def _find_wkhtmltopdf_path():
-    """Tenta encontrar o binário wkhtmltopdf em vários locais conhecidos.
-    Retorna caminho ou None.
-    """
-    # 1) Settings
-    path_cfg = getattr(settings, 'WKHTMLTOPDF_CMD', '') or ''
-    if path_cfg and os.path.exists(path_cfg):
-        return path_cfg
-    # 2) Caminhos comuns Windows
-    common_paths = [
-        r"C:\\Program Files\\wkhtmltopdf\\bin\\wkhtmltopdf.exe",
-        r"C:\\Program Files (x86)\\wkhtmltopdf\\bin\\wkhtmltopdf.exe",
-    ]
-    for p in common_paths:
-        if os.path.exists(p):
-            return p
-    # 3) PATH
-    try:
-        import shutil
-        found = shutil.which('wkhtmltopdf')
-        if found:
-            return found
-    except Exception:
-        pass
-    return None
+    """Caminho do wkhtmltopdf (detectado uma vez por processo em common.pdf_pool)."""
+    return pdf_pool.caminho_wkhtmltopdf()
 
 
 def _gerar_pdf_bo_bytes(bo, request):
     """Gera PDF idêntico ao HTML final armazenado em bo.documento_html.
 
-    Ordem de tentativas:
-      1. wkhtmltopdf (pdfkit) – melhor fidelidade (renderização web real)
-      2. WeasyPrint
+    A conversão é enviada ao pool persistente (common.pdf_pool), que tenta:
+      1. wkhtmltopdf – melhor fidelidade (renderização web real)
+      2. WeasyPrint (se não desabilitado)
       3. xhtml2pdf (pisa)
-      4. Subprocess (tenta novamente 1 e 2 dentro do venv)
-    Lança Exception se todas falharem.
+    Lança Exception se todas falharem ou se a fila do pool estiver cheia.
     """
     if not bo.documento_html:
         raise ValueError("BO sem documento_html para geração de PDF")
@@ -260,143 +179,19 @@ def _gerar_pdf_bo_bytes(bo, request):
     if '<head' in html_body.lower() and '<base ' not in html_body.lower():
         html_body = re.sub(r'<head(.*?)>', lambda m: f"<head{m.group(1)}><base href='{base_url}'>", html_body, count=1, flags=re.I)
 
-    # 1) wkhtmltopdf (pdfkit + fallback direto)
-    wk_bin_detected = _find_wkhtmltopdf_path()
-    if wk_bin_detected:
-        # Log versão do binário
-        try:
-            ver_proc = subprocess.run([wk_bin_detected, '-V'], capture_output=True, text=True, timeout=10)
-            _log_bo_pdf(f"Detectado wkhtmltopdf: {wk_bin_detected} version={ver_proc.stdout.strip() or ver_proc.stderr.strip()}")
-        except Exception as e_ver:
-            _log_bo_pdf(f"Falha ao obter versão wkhtmltopdf: {e_ver}")
-        # pdfkit primeiro
-        try:
-            import pdfkit  # type: ignore
-            options = {
-                'enable-local-file-access': '',
-                'encoding': 'UTF-8',
-                'page-size': 'A4',
-                'margin-top': '10mm', 'margin-bottom': '12mm', 'margin-left': '10mm', 'margin-right': '10mm',
-                # Evitar alterações de mídia; seguir estilos padrão
-                # 'print-media-type': '',
-                # Deixar smart shrinking habilitado para melhor ajuste do layout existente
-                # 'disable-smart-shrinking': '',
-                'zoom': '1.0',
-                'dpi': '96',
-                'load-error-handling': 'ignore',
-                # Remover viewport/minimum-font-size para não forçar escalas
-                # 'viewport-size': '1280x1024',
-                # 'minimum-font-size': '12',
-            }
-            config = pdfkit.configuration(wkhtmltopdf=wk_bin_detected)
-            pdf_bytes = pdfkit.from_string(html_body, False, options=options, configuration=config)
-            if pdf_bytes:
-                _log_bo_pdf(f"pdfkit OK ({len(pdf_bytes)} bytes)")
-                return pdf_bytes
-        except Exception as e_pdfkit:
-            _log_bo_pdf(f"pdfkit falhou usando {wk_bin_detected}: {e_pdfkit}")
-        # Execução direta
-        try:
-            with tempfile.TemporaryDirectory() as td:
-                html_f = os.path.join(td, 'doc.html'); pdf_f = os.path.join(td, 'out.pdf')
-                with open(html_f,'w',encoding='utf-8') as f: f.write(html_body)
-                cmd = [
-                    wk_bin_detected,
-                    '--enable-local-file-access',
-                    '--encoding', 'utf-8',
-                    '--page-size','A4',
-                    '--margin-top','10mm','--margin-bottom','12mm','--margin-left','10mm','--margin-right','10mm',
-                    '--zoom','1.0',
-                    '--dpi','96',
-                    '--load-error-handling','ignore',
-                    # sem viewport/minimum-font-size para manter o layout original do BO
-                    html_f, pdf_f
-                ]
-                # Timeout reduzido para 60s em produção; se travar/demorar muito, aborta e tenta fallback
-                proc = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-                if proc.returncode == 0 and os.path.exists(pdf_f):
-                    with open(pdf_f,'rb') as pf: pdf_bytes = pf.read()
-                    if pdf_bytes:
-                        _log_bo_pdf(f"wkhtmltopdf direto OK ({len(pdf_bytes)} bytes)")
-                        return pdf_bytes
-                stderr_tail = (proc.stderr or '')[-300:]
-                stdout_tail = (proc.stdout or '')[-120:]
-                _log_bo_pdf(f"wkhtmltopdf direto falhou rc={proc.returncode} stderr={stderr_tail} stdout={stdout_tail}")
-        except subprocess.TimeoutExpired:
-            _log_bo_pdf(f"wkhtmltopdf direto TIMEOUT (60s) - PDF muito complexo ou sistema lento")
-        except Exception as e_dir:
-            _log_bo_pdf(f"wkhtmltopdf direto exception: {e_dir}")
-    else:
-        _log_bo_pdf("wkhtmltopdf não encontrado (configure WKHTMLTOPDF_CMD ou instale o binário)")
-
-    # 2) WeasyPrint (pula se desabilitado)
-    if not getattr(settings, 'PDF_DISABLE_WEASYPRINT', False):
-        try:
-            from weasyprint import HTML  # type: ignore
-            return HTML(string=html_body, base_url=base_url).write_pdf()
-        except Exception as e_wp:
-            _log_bo_pdf(f"WeasyPrint falhou: {e_wp}")
-    else:
-        _log_bo_pdf("WeasyPrint desabilitado por configuração (PDF_DISABLE_WEASYPRINT)")
-
-    # 3) xhtml2pdf
-    try:
-        from xhtml2pdf import pisa  # type: ignore
-        result = BytesIO()
-        status = pisa.CreatePDF(html_body, dest=result, encoding='utf-8')
-        if status.err:
-            raise RuntimeError(status.err)
-        return result.getvalue()
-    except Exception as e_pisa:
-        _log_bo_pdf(f"xhtml2pdf falhou: {e_pisa}")
-
-    # 4) Subprocess (pdfkit ou weasyprint no venv)
+    # Renderização no pool persistente (wkhtmltopdf -> WeasyPrint -> xhtml2pdf)
     try:
-        from django.conf import settings as _s
-        base_dir = getattr(_s, 'BASE_DIR', os.getcwd())
-        # Detectar Python do venv em Windows e Linux
-        candidates = [
-            # Windows venvs
-            os.path.join(base_dir, '.venv', 'Scripts', 'python.exe'),
-            os.path.join(base_dir, 'venv', 'Scripts', 'python.exe'),
-            # Linux/macOS venvs
-            os.path.join(base_dir, '.venv', 'bin', 'python'),
-            os.path.join(base_dir, 'venv', 'bin', 'python'),
-        ]
-        venv_python = next((p for p in candidates if os.path.exists(p)), None)
-        if not venv_python:
-            # Tentar localizar via variável de ambiente VIRTUAL_ENV
-            venv_env = os.environ.get('VIRTUAL_ENV')
-            if venv_env:
-                cand2 = [
-                    os.path.join(venv_env, 'Scripts', 'python.exe'),
-                    os.path.join(venv_env, 'bin', 'python'),
-                ]
-                venv_python = next((p for p in cand2 if os.path.exists(p)), None)
-            if not venv_python:
-                raise RuntimeError(f"python venv não encontrado; candidates={candidates} VIRTUAL_ENV={venv_env or ''}")
-        with tempfile.TemporaryDirectory() as td:
-            html_f = os.path.join(td, 'doc.html')
-            pdf_f = os.path.join(td, 'out.pdf')
-            with open(html_f,'w',encoding='utf-8') as f: f.write(html_body)
-            # Passar explicitamente caminho do wkhtmltopdf se detectado para dentro do subprocess
-            wk_path = _find_wkhtmltopdf_path() or ''
-            script = (
-                "import sys,os; html,pdf,wk=sys.argv[1:4]; data=open(html,encoding='utf-8').read(); ok=False;\n"
-                "# Tentativa pdfkit com caminho explícito\n"
-                "try:\n import pdfkit; cfg = pdfkit.configuration(wkhtmltopdf=wk or None); pdfkit.from_string(data,pdf,configuration=cfg); ok=True\nexcept Exception as e: pass\n"
-                "if not ok:\n try:\n  import weasyprint; weasyprint.HTML(string=data).write_pdf(pdf); ok=True\n except Exception as e: pass\n"
-                "sys.exit(0 if ok else 2)"
-            )
-            script_path = os.path.join(td,'gen.py')
-            with open(script_path,'w',encoding='utf-8') as sf: sf.write(script)
-            proc = subprocess.run([venv_python, script_path, html_f, pdf_f, wk_path], capture_output=True, text=True, timeout=90)
-            if proc.returncode != 0 or not os.path.exists(pdf_f):
-                raise RuntimeError(f"subprocess rc={proc.returncode} err={proc.stderr[-180:]} out={proc.stdout[-80:]} wkhtmltopdf={wk_path or 'NA'} venv_python={venv_python}")
-            with open(pdf_f,'rb') as pdfd: return pdfd.read()
-    except Exception as e_sub:
-        _log_bo_pdf(f"Subprocess falhou: {e_sub}")
-        raise RuntimeError(f"Falha total geração PDF: {e_sub}")
+        pdf_bytes, motor, erros = pdf_pool.get_pool().renderizar(html_body, base_url=base_url, perfil='bo')
+    except pdf_pool.PdfPoolOcupado as e_fila:
+        _log_bo_pdf(f"Pool de PDF ocupado: {e_fila}")
+        raise
+    except Exception as e_pool:
+        _log_bo_pdf(f"Falha total geração PDF: {e_pool}")
+        raise RuntimeError(f"Falha total geração PDF: {e_pool}")
+    for err in erros:
+        _log_bo_pdf(f"Motor falhou: {err}")
+    _log_bo_pdf(f"{motor} OK ({len(pdf_bytes)} bytes)")
+    return pdf_bytes
 
 def _log_bo_pdf(msg: str):
     """Escreve log de debug da geração de PDF (ignora falhas silenciosamente)."""
@@ -486,23 +281,29 @@ def servir_documento_assinado(request, doc_id):
         return HttpResponse('Documento não encontrado.', status=404)
     
     try:
-        # Ler bytes do PDF
-        arquivo.seek(0)
-        pdf_bytes = arquivo.read()
+        arquivo.open('rb')
         
         # Aplicar marca d'água se for integrante mas não comando/moises
         if e_integrante and not pode_ver_completo:
             _log_bo_pdf(f"Aplicando marca d'água no documento assinado para user {request.user.username}")
-            pdf_bytes = _aplicar_marca_dagua_pdf(pdf_bytes)
+            # Lê o original direto do storage e grava o resultado em arquivo temporário
+            saida = tempfile.TemporaryFile()
+            try:
+                with arquivo:
+                    _aplicar_marca_dagua_arquivo(arquivo, saida)
+                saida.seek(0)
+            except Exception:
+                saida.close()
+                raise
             filename_suffix = '_CONSULTIVO'
         else:
             _log_bo_pdf(f"Documento assinado sem marca d'água para user {request.user.username}")
+            saida = arquivo
             filename_suffix = ''
         
         # Retornar PDF
-        response = HttpResponse(pdf_bytes, content_type='application/pdf')
         filename = f"BO_{bo.numero or bo.pk}_ASSINADO{filename_suffix}.pdf"
-        response['Content-Disposition'] = f'inline; filename="{filename}"'
+        response = FileResponse(saida, content_type='application/pdf', filename=filename)
         response['Cache-Control'] = 'no-store'
         return response
         
@@ -531,21 +332,53 @@ def baixar_documento_bo_pdf(request, pk):
     
     if not bo.documento_html:
         return HttpResponse('Documento não gerado.', content_type='text/plain', status=404)
+    consultivo = e_integrante and not pode_ver_completo
+    variante = pdf_cache.VARIANTE_CONSULTIVO if consultivo else pdf_cache.VARIANTE_COMPLETO
+    filename_suffix = '_CONSULTIVO' if consultivo else ''
+    chave_cache = pdf_cache.chave(bo, request.build_absolute_uri('/'))
     try:
-        pdf_bytes = _gerar_pdf_bo_bytes(bo, request)
+        # PDF já gerado para este mesmo HTML/variante: servir direto do disco
+        cache_path = pdf_cache.obter(bo, chave_cache, variante)
+        if cache_path:
+            _log_bo_pdf(f"Cache PDF BO#{pk} ({variante}) HIT")
+            resp = FileResponse(open(cache_path, 'rb'), content_type='application/pdf', as_attachment=True,
+                                filename=f"BO_{bo.numero or bo.pk}{filename_suffix}.pdf")
+            resp['Cache-Control'] = 'no-store'
+            return resp
+
+        completo_path = pdf_cache.obter(bo, chave_cache) if consultivo else None
+        pdf_bytes = None
+        if completo_path is None:
+            pdf_bytes = _gerar_pdf_bo_bytes(bo, request)
+            completo_path = pdf_cache.guardar(bo, chave_cache, pdf_cache.VARIANTE_COMPLETO, pdf_bytes)
         
         # Aplicar marca d'água se for integrante mas não comando/moises
-        if e_integrante and not pode_ver_completo:
+        if consultivo:
             _log_bo_pdf(f"Aplicando marca d'água para user {request.user.username}")
+            if completo_path:
+                # arquivo completo -> arquivo consultivo, sem carregar os dois PDFs em memória
+                with open(completo_path, 'rb') as origem:
+                    cache_path = pdf_cache.guardar_com(bo, chave_cache, variante, lambda f: _aplicar_marca_dagua_arquivo(origem, f))
+                if cache_path:
+                    resp = FileResponse(open(cache_path, 'rb'), content_type='application/pdf', as_attachment=True,
+                                        filename=f"BO_{bo.numero or bo.pk}{filename_suffix}.pdf")
+                    resp['Cache-Control'] = 'no-store'
+                    return resp
+                if pdf_bytes is None:
+                    with open(completo_path, 'rb') as f:
+                        pdf_bytes = f.read()
             pdf_bytes = _aplicar_marca_dagua_pdf(pdf_bytes)
         else:
             _log_bo_pdf(f"Sem marca d'água para user {request.user.username} (comando/moises)")
         
         resp = HttpResponse(pdf_bytes, content_type='application/pdf')
-        filename_suffix = '_CONSULTIVO' if (e_integrante and not pode_ver_completo) else ''
         resp['Content-Disposition'] = f"attachment; filename=BO_{bo.numero or bo.pk}{filename_suffix}.pdf"
         resp['Cache-Control'] = 'no-store'
         return resp
+    except pdf_pool.PdfPoolOcupado:
+        resp = HttpResponse('Servidor gerando muitos PDFs no momento. Tente novamente em alguns segundos.', content_type='text/plain', status=503)
+        resp['Retry-After'] = '5'
+        return resp
     except Exception as e:
         # fallback mínimo (texto plano dentro de PDF simples) só para não ficar sem nada
         try:
@@ -748,27 +581,22 @@ def api_cadastro_envolvido_lookup(request):
         return JsonResponse({'found': False, 'error': 'CPF ausente'}, status=400)
     # 1) Tenta no cadastro persistente
     cad = CadastroEnvolvido.objects.filter(cpf_normalizado=cpf_norm).first()
-    # 2) Fallback: último Envolvido com mesmo CPF (formatações diferentes)
+    # 2) Fallback: último Envolvido com mesmo CPF em todo o histórico (índice em cpf_normalizado)
     if not cad:
-        env = Envolvido.objects.filter(cpf__regex=r"\d").order_by('-id')
-        for e in env[:200]:  # varredura limitada
-            try:
-                if ''.join([c for c in (e.cpf or '') if c.isdigit()]) == cpf_norm:
-                    cad = CadastroEnvolvido(
-                        cpf=e.cpf, cpf_normalizado=cpf_norm, nome=e.nome,
-                        nome_social=e.nome_social, telefone=e.telefone, cep=e.cep,
-                        endereco=e.endereco, numero=e.numero, ponto_referencia=e.ponto_referencia,
-                        bairro=e.bairro, uf=e.uf, cidade=e.cidade, data_nascimento=e.data_nascimento,
-                        estado_civil=e.estado_civil, pais_natural=e.pais_natural, uf_natural=e.uf_natural,
-                        cidade_natural=e.cidade_natural, rg=e.rg, outro_documento=e.outro_documento,
-                        cnh=e.cnh, categoria_cnh=e.categoria_cnh, data_validacao_cnh=e.data_validacao_cnh,
-                        cutis=e.cutis, genero=e.genero, profissao=e.profissao, trabalho=e.trabalho,
-                        vulgo=e.vulgo, nome_pai=e.nome_pai, nome_mae=e.nome_mae, sinais=e.sinais,
-                        dados_adicionais=e.dados_adicionais,
-                    )
-                    break
-            except Exception:
-                continue
+        e = Envolvido.objects.filter(cpf_normalizado=cpf_norm).order_by('-id').first()
+        if e:
+            cad = CadastroEnvolvido(
+                cpf=e.cpf, cpf_normalizado=cpf_norm, nome=e.nome,
+                nome_social=e.nome_social, telefone=e.telefone, cep=e.cep,
+                endereco=e.endereco, numero=e.numero, ponto_referencia=e.ponto_referencia,
+                bairro=e.bairro, uf=e.uf, cidade=e.cidade, data_nascimento=e.data_nascimento,
+                estado_civil=e.estado_civil, pais_natural=e.pais_natural, uf_natural=e.uf_natural,
+                cidade_natural=e.cidade_natural, rg=e.rg, outro_documento=e.outro_documento,
+                cnh=e.cnh, categoria_cnh=e.categoria_cnh, data_validacao_cnh=e.data_validacao_cnh,
+                cutis=e.cutis, genero=e.genero, profissao=e.profissao, trabalho=e.trabalho,
+                vulgo=e.vulgo, nome_pai=e.nome_pai, nome_mae=e.nome_mae, sinais=e.sinais,
+                dados_adicionais=e.dados_adicionais,
+            )
     if not cad:
         return JsonResponse({'found': False})
     def _fmt_date(d):
@@ -811,6 +639,52 @@ def api_cadastro_envolvido_lookup(request):
     }
     return JsonResponse(payload)
 
+@login_required
+def api_envolvidos_sugestoes(request):
+    """Autocompletar do formulário de envolvido: prefixo de CPF (só dígitos) ou de nome.
+
+    Prefixo vira intervalo (``>= p`` e ``< p + sentinela``) nas colunas normalizadas,
+    que usa o índice em qualquer banco (LIKE 'p%' não usa no SQLite).
+    """
+    q = (request.GET.get('q') or '').strip()
+    limite = 10
+    campos = ('id', 'nome', 'cpf', 'cpf_normalizado', 'nome_busca', 'data_nascimento', 'nome_mae')
+    digitos = _normalize_cpf(q)
+    if digitos and not any(c.isalpha() for c in q):
+        if len(digitos) < 3:
+            return JsonResponse({'results': []})
+        # ':' é o caractere seguinte a '9'
+        linhas = list(
+            Envolvido.objects.filter(cpf_normalizado__gte=digitos, cpf_normalizado__lt=digitos + ':')
+            .order_by('cpf_normalizado', '-id').values(*campos)[:limite * 5]
+        )
+        chave = 'cpf_normalizado'
+    else:
+        nome = _normalize_nome(q)
+        if len(nome) < 3:
+            return JsonResponse({'results': []})
+        linhas = list(
+            Envolvido.objects.filter(nome_busca__gte=nome, nome_busca__lt=nome + '\uffff')
+            .order_by('nome_busca', '-id').values(*campos)[:limite * 5]
+        )
+        chave = 'nome_busca'
+    vistos, resultados = set(), []
+    for r in linhas:
+        # Uma sugestão por pessoa (o registro mais recente)
+        pessoa = r['cpf_normalizado'] or (r[chave], r['data_nascimento'])
+        if pessoa in vistos:
+            continue
+        vistos.add(pessoa)
+        resultados.append({
+            'nome': r['nome'],
+            'cpf': r['cpf'],
+            'data_nascimento': r['data_nascimento'].strftime('%Y-%m-%d') if r['data_nascimento'] else '',
+            'nome_mae': r['nome_mae'],
+        })
+        if len(resultados) >= limite:
+            break
+    return JsonResponse({'results': resultados})
+
 @login_required
 def envolvido_list(request):
     bo_id = request.GET.get('bo')
@@ -842,8 +716,10 @@ def novo_layout(request):
             talao_obj = Talao.objects.filter(pk=talao_param).first()
         except Exception:
             talao_obj = None
-        numero = proximo_numero_bo()
-        bo = BO.objects.create(encarregado=request.user, status='EDICAO', numero=numero, emissao=timezone.now(), talao=talao_obj)
+        # Número e gravação na mesma transação: se o create falhar, o número não é consumido
+        with transaction.atomic():
+            numero = proximo_numero_bo()
+            bo = BO.objects.create(encarregado=request.user, status='EDICAO', numero=numero, emissao=timezone.now(), talao=talao_obj)
         # Pré-preencher campos do BO a partir do Talão/Plantão
         try:
             changed = False
@@ -926,8 +802,9 @@ def novo_layout(request):
         if not force_novo:
             bo = BO.objects.filter(status='EDICAO', encarregado=request.user).order_by('-emissao').first()
         if not bo:
-            numero = proximo_numero_bo()
-            bo = BO.objects.create(encarregado=request.user, status='EDICAO', numero=numero, emissao=timezone.now())
+            with transaction.atomic():
+                numero = proximo_numero_bo()
+                bo = BO.objects.create(encarregado=request.user, status='EDICAO', numero=numero, emissao=timezone.now())
             created_new = True
     # Se foi explicitamente solicitado novo (novo=1) ou veio de talão, redireciona para rota padronizada de edição
     if created_new and (force_novo or talao_param):
@@ -944,10 +821,11 @@ def duplicar_bo(request, pk=None):
     bo_orig = get_object_or_404(BO, pk=pk) if pk else BO.objects.filter(encarregado=request.user).order_by('-emissao').first()
     if not bo_orig:
         return redirect('bogcmi:novo')
-    numero_novo = proximo_numero_bo()
     campos_copiar = ['natureza','cod_natureza','solicitante','rua','numero_endereco','bairro','cidade','uf','referencia','viatura_id','motorista_id','auxiliar1_id','auxiliar2_id','cecom_id','km_inicio','km_final','horario_inicial','horario_final','duracao']
     dados = {c: getattr(bo_orig, c) for c in campos_copiar}
-    novo = BO.objects.create(encarregado=request.user, status='EDICAO', numero=numero_novo, emissao=timezone.now(), **dados)
+    with transaction.atomic():
+        numero_novo = proximo_numero_bo()
+        novo = BO.objects.create(encarregado=request.user, status='EDICAO', numero=numero_novo, emissao=timezone.now(), **dados)
     return redirect(f"{reverse('bogcmi:editar', args=[novo.id])}?duplicado=1")
 
 @csrf_exempt
@@ -963,8 +841,9 @@ def criar_bo_automatico(request):
         return JsonResponse({'success': True, 'id': bo.id, 'numero_bogcm': bo.numero})
     bo = BO.objects.filter(status='EDICAO', encarregado=user).first()
     if not bo:
-        numero = proximo_numero_bo()
-        bo = BO.objects.create(encarregado=user, status='EDICAO', numero=numero, emissao=timezone.now())
+        with transaction.atomic():
+            numero = proximo_numero_bo()
+            bo = BO.objects.create(encarregado=user, status='EDICAO', numero=numero, emissao=timezone.now())
     return JsonResponse({'success': True, 'id': bo.id, 'numero_bogcm': bo.numero})
 
 def pode_editar(bo, user):
@@ -978,21 +857,72 @@ def get_or_create_bo_em_edicao(user):
     bo = BO.objects.filter(status='EDICAO', encarregado=user).order_by('-emissao').first()
     if bo:
         return bo
-    numero = proximo_numero_bo()
-    return BO.objects.create(encarregado=user, status='EDICAO', numero=numero, emissao=timezone.now())
+    with transaction.atomic():
+        numero = proximo_numero_bo()
+        return BO.objects.create(encarregado=user, status='EDICAO', numero=numero, emissao=timezone.now())
 
-@login_required
-def bo_list(request):
+# Ordem da lista de BOs -> ordenação do cursor (common.keyset); o id desempata emissões iguais
+_ORDENS_LISTA = {
+    'cod': ('cod_natureza', '-emissao', '-id'),
+    '-cod': ('-cod_natureza', '-emissao', '-id'),
+}
+
+
+def _doc_map(page):
+    """{número do BO: documento assinado} para os BOs da página.
+
+    O número vem do nome do arquivo (`DocumentoAssinavel.bo_numero`); o filtro no banco
+    só descarta os arquivos que não podem citar o número nem o pk de nenhum BO da página.
+    """
+    numeros = {b.numero for b in page if b.numero}
+    if not numeros:
+        return {}
+    cond = Q()
+    for b in page:
+        if b.numero:
+            cond |= Q(arquivo__contains=f"_{b.numero}")
+        cond |= Q(arquivo__contains=f"BOGCM_{b.pk}")  # nome antigo: *_BOGCM_<pk>.pdf
+    doc_map = {}
+    for d in DocumentoAssinavel.objects.filter(cond, tipo='BOGCMI', status='ASSINADO'):
+        num = d.bo_numero
+        if num and num in numeros:
+            doc_map[num] = d
+    return doc_map
+
+
+def _listar_bos(request) -> dict:
+    """Página da lista de BOs por cursor (``?apos=``/``?antes=``), filtros e total.
+
+    ``Paginator`` fazia ``COUNT(*)`` a cada página e ``OFFSET`` crescente; aqui a página
+    vem de ``WHERE (emissao, id) < (...)`` sobre os índices de emissão e o total é
+    estimado (exato com ``?contagem=exata``), como nos logs.
+    """
+    from common import keyset
     qs = BO.objects.select_related('viatura','encarregado','motorista','cecom','auxiliar1','auxiliar2')
-    order = request.GET.get('order')
-    if order == 'cod':
-        qs = qs.order_by('cod_natureza','-emissao')
-    elif order == '-cod':
-        qs = qs.order_by('-cod_natureza','-emissao')
-    else:
-        qs = qs.order_by('-emissao')
     f = BOFilter(request.GET, queryset=qs)
-    page = Paginator(f.qs, 15).get_page(request.GET.get('page'))
+    ordem = _ORDENS_LISTA.get(request.GET.get('order'), ('-emissao', '-id'))
+    page = keyset.paginar(f.qs, 15, apos=request.GET.get('apos'), antes=request.GET.get('antes'), ordem=ordem)
+    exata = request.GET.get('contagem') == 'exata'
+    # querystrings sem o cursor (filtros preservados nos links) e, para os links de ordenação, sem a ordem
+    qd = request.GET.copy()
+    for k in ('apos', 'antes', 'page'):
+        qd.pop(k, None)
+    qo = qd.copy()
+    qo.pop('order', None)
+    return {
+        'filter': f,
+        'page': page,
+        'total': keyset.contar(f.qs, exata=exata),
+        'contagem_exata': exata,
+        'querystring': qd.urlencode(),
+        'querystring_ordem': qo.urlencode(),
+        'doc_map': _doc_map(page),
+    }
+
+
+@login_required
+def bo_list(request):
+    ctx = _listar_bos(request)
     try:
         from users.models import Perfil
         perfis = Perfil.objects.select_related('user').order_by('matricula')
@@ -1009,39 +939,13 @@ def bo_list(request):
         codigos = CodigoOcorrencia.objects.all().order_by('sigla')
     except Exception:
         codigos = []
-    # Mapear documentos assinados (BOGCMI) por número para facilitar exibição de link direto
-    from common.models import DocumentoAssinavel
-    numeros = [b.numero for b in page if b.numero]
-    docs = DocumentoAssinavel.objects.filter(tipo='BOGCMI', status='ASSINADO')
-    doc_map = {}
-    for d in docs:
-        num = d.bo_numero
-        if num and num in numeros:
-            doc_map[num] = d
-    return render(request, 'bogcmi/list.html', {'filter': f,'page': page,'perfis': perfis,'viaturas': viaturas,'doc_map': doc_map,'codigos': codigos})
+    ctx.update({'perfis': perfis, 'viaturas': viaturas, 'codigos': codigos})
+    return render(request, 'bogcmi/list.html', ctx)
 
 @login_required
 def bo_table(request):
-    qs = BO.objects.select_related('viatura','encarregado','motorista','cecom','auxiliar1','auxiliar2')
-    order = request.GET.get('order')
-    if order == 'cod':
-        qs = qs.order_by('cod_natureza','-emissao')
-    elif order == '-cod':
-        qs = qs.order_by('-cod_natureza','-emissao')
-    else:
-        qs = qs.order_by('-emissao')
-    f = BOFilter(request.GET, queryset=qs)
-    page = Paginator(f.qs, 15).get_page(request.GET.get('page'))
-    from common.models import DocumentoAssinavel
-    numeros = [b.numero for b in page if b.numero]
-    docs = DocumentoAssinavel.objects.filter(tipo='BOGCMI', status='ASSINADO')
-    doc_map = {}
-    for d in docs:
-        num = d.bo_numero
-        if num and num in numeros:
-            doc_map[num] = d
     # codigos não é necessário aqui pois o select está no filterbar (fora da partial)
-    return render(request, 'bogcmi/_table.html', {'page': page,'doc_map': doc_map})
+    return render(request, 'bogcmi/_table.html', _listar_bos(request))
 
 @login_required
 def bo_novo(request):
@@ -1142,13 +1046,15 @@ def bo_finalizar(request, pk):
         messages.error(request, "Apenas o Encarregado pode realizar essa ação.")
         return redirect('bogcmi:editar', pk=bo.pk)
     
-    if not bo.numero:
-        bo.numero = proximo_numero_bo()
-    agora = timezone.now()
-    bo.finalizado_em = agora
-    bo.edit_deadline = agora + timedelta(minutes=30)
-    bo.status = 'FINALIZADO'
-    bo.save()
+    # Número e gravação na mesma transação: se o save falhar, o número não é consumido
+    with transaction.atomic():
+        if not bo.numero:
+            bo.numero = proximo_numero_bo()
+        agora = timezone.now()
+        bo.finalizado_em = agora
+        bo.edit_deadline = agora + timedelta(minutes=30)
+        bo.status = 'FINALIZADO'
+        bo.save()
     return redirect('bogcmi:editar', pk=bo.pk)
 
 @login_required
@@ -1173,6 +1079,7 @@ def bo_despachar_cmt(request, pk):
     # Gerar PDF fiel; se falhar não cria documento pendente (evita PDF "zuado")
     try:
         pdf_bytes = _gerar_pdf_bo_bytes(bo, request)
+        pdf_cache.guardar(bo, pdf_cache.chave(bo, request.build_absolute_uri('/')), pdf_cache.VARIANTE_COMPLETO, pdf_bytes)
     except Exception as e:
         import traceback
         trace = traceback.format_exc()
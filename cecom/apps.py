@@ -1,2 +1,9 @@
 from django.apps import AppConfig
-class CecomConfig(AppConfig): name='cecom'
+
+
+class CecomConfig(AppConfig):
+    name = 'cecom'
+
+    def ready(self):
+        # Invalidação do snapshot do painel (ativos.json)
+        from . import signals  # noqa: F401
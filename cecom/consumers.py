@@ -0,0 +1,47 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from panic import metricas
+
+from . import painel_ws
+
+logger = logging.getLogger(__name__)
+
+
+class CecomPainelConsumer(AsyncJsonWebsocketConsumer):
+    """Painel do CECOM em tempo real: snapshot completo ao conectar e depois diffs.
+
+    Os diffs (ver `cecom.painel_ws`) são montados uma vez por alteração no processo
+    que gravou e repassados sem consulta ao banco. O cliente pode pedir um novo
+    snapshot com ``{"acao": "snapshot"}`` (ex.: ao voltar de uma reconexão).
+    """
+    group_name = painel_ws.GRUPO
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if not user or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self._enviar_snapshot()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if isinstance(content, dict) and content.get("acao") == "snapshot":
+            await self._enviar_snapshot()
+
+    async def _enviar_snapshot(self):
+        try:
+            await self.send_json(await sync_to_async(painel_ws.snapshot)())
+        except Exception as e:
+            logger.warning(f"[WS:CECOM] falha ao montar snapshot: {e}")
+
+    async def painel_evento(self, event):
+        data = event.get("data", {})
+        await self.send_json(data)
+        metricas.registrar_entrega(f"CECOM_{data.get('tipo', '')}", event.get("enviado_em"))
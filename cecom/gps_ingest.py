@@ -0,0 +1,334 @@
+"""Ingestão de localização das viaturas (``views.localizacao_post``).
+
+Antes cada ping fazia get_or_create + save da última posição, busca do último
+ponto, INSERT e uma limpeza "manter 400" — cinco ou mais consultas por ping.
+Agora:
+
+- o plantão/viatura do usuário vem do cache (chave versionada, nova versão a cada
+  alteração de plantão ou participante — ver ``cecom.signals``);
+- o estado de throttling (último ponto gravado) fica no cache, por viatura;
+- a posição é publicada na hora para o painel (evento ``POSICAO`` de ``painel_ws``) e
+  acumulada num buffer do processo; uma thread grava a cada ``GPS_FLUSH_MS``:
+  um UPDATE condicional por viatura (só avança a última posição, nunca volta
+  para um ping mais antigo vindo de outro worker) e um ``bulk_create`` dos pontos;
+- a retenção dos pontos é um job periódico (`limpar_pontos`, ``manage.py
+  gps_retencao`` ou a própria thread, no máximo uma vez por hora entre os processos);
+  a mesma thread compacta a trilha em blocos a cada minuto (``cecom.trilhas``);
+- o app pode enviar vários pontos de uma vez (``{"pontos": [...]}``) depois de
+  ficar sem conexão. Pontos de lote não passam pelo throttling (chegam fora de
+  ordem em relação aos pings ao vivo): só se descartam instantes já gravados, e a
+  resposta diz quais índices do lote foram gravados para o app tirá-los da fila.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from math import cos, radians, sqrt
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import PlantaoCECOM, ViaturaLocalizacao, ViaturaLocalizacaoPonto
+
+logger = logging.getLogger(__name__)
+
+CHAVE_VERSAO_PLANTOES = "cecom:gps:plantoes:versao"
+
+# Ponto novo na trilha: a cada 15s ou deslocamento > ~15m
+INTERVALO_PONTO_S = 15
+DISTANCIA_PONTO_M = 15
+
+
+def _cfg(nome: str, padrao):
+    return getattr(settings, nome, padrao)
+
+
+# ---------------------------------------------------------------- plantão do usuário
+
+def _compartilhado():
+    # Versão dos plantões e travas entre processos: poucas escritas, vistas por todos os workers
+    return caches["compartilhado"]
+
+
+def invalidar_plantoes():
+    try:
+        _compartilhado().set(CHAVE_VERSAO_PLANTOES, uuid.uuid4().hex, None)
+    except Exception:
+        pass
+
+
+def plantao_do_usuario(user):
+    """(plantao_id, viatura_id) do plantão ativo do usuário, com cache de 60s."""
+    versao = _compartilhado().get(CHAVE_VERSAO_PLANTOES)
+    if versao is None:
+        versao = uuid.uuid4().hex
+        if not _compartilhado().add(CHAVE_VERSAO_PLANTOES, versao, None):
+            versao = _compartilhado().get(CHAVE_VERSAO_PLANTOES) or versao
+    chave = f"cecom:gps:usuario:{user.id}:{versao}"
+    valor = cache.get(chave)
+    if valor is None:
+        p = PlantaoCECOM.ativo_do_usuario_ou_participado(user)
+        valor = (p.id, p.viatura_id) if p and p.ativo and p.viatura_id else (None, None)
+        cache.set(chave, valor, 60)
+    return valor
+
+
+# ---------------------------------------------------------------- normalização
+
+def _float(v):
+    if v in (None, ''):
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _instante(v, agora: datetime) -> datetime:
+    """capturado_em do app: ISO 8601 ou epoch (s/ms). Ausente, inválido ou no futuro -> agora."""
+    dt = None
+    try:
+        if isinstance(v, (int, float)) or (isinstance(v, str) and v.replace('.', '', 1).isdigit()):
+            n = float(v)
+            if n > 1e11:  # milissegundos
+                n /= 1000.0
+            dt = datetime.fromtimestamp(n, tz=dt_timezone.utc)
+        elif isinstance(v, str) and v:
+            dt = parse_datetime(v)
+            if dt is not None and timezone.is_naive(dt):
+                dt = timezone.make_aware(dt)
+    except (OverflowError, OSError, ValueError):
+        dt = None  # epoch fora do intervalo, NaN ou data impossível ("2024-13-45")
+    if dt is None or dt > agora:
+        return agora
+    return dt
+
+
+def normalizar(body: dict, agora: datetime | None = None) -> list[dict]:
+    """Lista de pontos válidos, em ordem cronológica (ping único ou lote ``pontos``)."""
+    agora = agora or timezone.now()
+    brutos = body.get('pontos')
+    if not isinstance(brutos, list):
+        brutos = [body]
+    brutos = brutos[: int(_cfg("GPS_LOTE_MAX", 500))]
+    pontos = []
+    for i, b in enumerate(brutos):
+        if not isinstance(b, dict):
+            continue
+        lat, lng = _float(b.get('latitude')), _float(b.get('longitude'))
+        if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            continue
+        pontos.append({
+            'latitude': round(lat, 8),
+            'longitude': round(lng, 8),
+            'precisao_m': _float(b.get('precisao') if b.get('precisao') not in (None, '') else b.get('accuracy')),
+            'velocidade_kmh': _float(b.get('velocidade') if b.get('velocidade') not in (None, '') else b.get('speed')),
+            'direcao_graus': _float(b.get('direcao') if b.get('direcao') not in (None, '') else b.get('heading')),
+            'capturado_em': _instante(b.get('capturado_em') or b.get('timestamp'), agora),
+            'indice': i,
+        })
+    pontos.sort(key=lambda p: p['capturado_em'])
+    return pontos
+
+
+def invalidos(body: dict, pontos: list[dict]) -> list[int]:
+    """Índices do lote (dentro de ``GPS_LOTE_MAX``) descartados por `normalizar`."""
+    brutos = body.get('pontos')
+    if not isinstance(brutos, list):
+        return []
+    validos = {p['indice'] for p in pontos}
+    return [i for i in range(min(len(brutos), int(_cfg("GPS_LOTE_MAX", 500)))) if i not in validos]
+
+
+def _distancia_m(lat1, lon1, lat2, lon2) -> float:
+    # Aproximação plana (graus -> metros), válida para pequenas diferenças
+    dx = (lon2 - lon1) * 111320 * cos(radians((lat1 + lat2) / 2))
+    dy = (lat2 - lat1) * 110540
+    return sqrt(dx * dx + dy * dy)
+
+
+# ---------------------------------------------------------------- buffer + flush
+
+class _Buffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ultimas: dict[int, dict] = {}   # viatura_id -> última posição pendente
+        self.pontos: list[ViaturaLocalizacaoPonto] = []
+        self.evento = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.ultima_retencao = 0.0
+        self.ultima_compactacao = 0.0
+
+    def garantir_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(target=self._loop, name="gps-flush", daemon=True)
+                    self.thread.start()
+
+    def _loop(self):
+        while True:
+            self.evento.wait(float(_cfg("GPS_FLUSH_MS", 1000)) / 1000.0)
+            self.evento.clear()
+            try:
+                descarregar()
+                agora = time.monotonic()
+                if agora - self.ultima_compactacao > 60:
+                    self.ultima_compactacao = agora
+                    # Trilha compactada (cecom.trilhas); um processo por minuto
+                    if _compartilhado().add("cecom:gps:compactar", 1, 55):
+                        from . import trilhas
+                        trilhas.compactar()
+                if agora - self.ultima_retencao > 3600:
+                    self.ultima_retencao = agora
+                    # Só um processo por hora (cache compartilhado)
+                    if _compartilhado().add("cecom:gps:retencao", 1, 3600):
+                        limpar_pontos()
+            except Exception as e:
+                logger.warning("[GPS] falha ao gravar buffer: %s", e)
+            finally:
+                close_old_connections()
+
+
+_buffer = _Buffer()
+
+
+def descarregar() -> tuple[int, int]:
+    """Grava o buffer deste processo. Retorna (posições, pontos)."""
+    with _buffer.lock:
+        ultimas, _buffer.ultimas = _buffer.ultimas, {}
+        pontos, _buffer.pontos = _buffer.pontos, []
+    for viatura_id, u in ultimas.items():
+        campos = dict(
+            latitude=u['latitude'], longitude=u['longitude'], precisao_m=u['precisao_m'],
+            velocidade_kmh=u['velocidade_kmh'], direcao_graus=u['direcao_graus'],
+            atualizado_em=u['capturado_em'], origem_usuario_id=u['usuario_id'], origem_plantao_id=u['plantao_id'],
+        )
+        # Só avança: outro worker pode ter gravado um ping mais recente
+        if not ViaturaLocalizacao.objects.filter(viatura_id=viatura_id, atualizado_em__lt=u['capturado_em']).update(**campos):
+            if not ViaturaLocalizacao.objects.filter(viatura_id=viatura_id).exists():
+                try:
+                    # Primeira posição da viatura. O insert aplica o auto_now; o UPDATE grava o instante do app.
+                    ViaturaLocalizacao.objects.bulk_create([ViaturaLocalizacao(viatura_id=viatura_id, **campos)])
+                    ViaturaLocalizacao.objects.filter(viatura_id=viatura_id).update(atualizado_em=u['capturado_em'])
+                except Exception:
+                    pass  # outro worker criou no meio tempo
+    if pontos:
+        ViaturaLocalizacaoPonto.objects.bulk_create(pontos, batch_size=500)
+    return len(ultimas), len(pontos)
+
+
+@atexit.register
+def _descarregar_ao_sair():
+    try:
+        descarregar()
+    except Exception:
+        pass
+
+
+def _ja_gravados(viatura_id: int, instantes: list[datetime]) -> set[datetime]:
+    """Instantes da viatura já na trilha (banco ou buffer deste processo)."""
+    existentes = set(
+        ViaturaLocalizacaoPonto.objects.filter(viatura_id=viatura_id, capturado_em__in=instantes)
+        .values_list('capturado_em', flat=True)
+    )
+    with _buffer.lock:
+        existentes.update(p.capturado_em for p in _buffer.pontos if p.viatura_id == viatura_id)
+    return existentes
+
+
+def registrar(usuario_id: int, plantao_id: int, viatura_id: int, pontos: list[dict], lote: bool = False) -> dict:
+    """Aplica throttling, publica a posição e enfileira a gravação. Retorna resumo.
+
+    ``lote``: pontos guardados offline. Podem ser mais antigos que o último ping ao vivo,
+    então não passam pelo throttling; só se descartam instantes já gravados. O resumo
+    traz ``gravados`` (índices do lote gravados agora ou antes) para o app limpar a fila.
+    """
+    if not pontos:
+        return {'recebidos': 0, 'pontos': 0, 'atualizado_em': None}
+    chave = f"cecom:gps:viatura:{viatura_id}"
+    estado = cache.get(chave) or {}
+    novos, gravados = [], []
+    existentes = _ja_gravados(viatura_id, [p['capturado_em'] for p in pontos]) if lote else set()
+    for p in pontos:
+        ultimo = estado.get('ponto')
+        if lote:
+            gravados.append(p['indice'])
+            if p['capturado_em'] in existentes:
+                continue  # reenvio de um ponto já gravado
+            existentes.add(p['capturado_em'])
+        elif ultimo:
+            dt = (p['capturado_em'] - ultimo['capturado_em']).total_seconds()
+            if dt <= 0:
+                continue  # repetido/atrasado em relação à trilha já gravada
+            if dt < INTERVALO_PONTO_S and _distancia_m(ultimo['latitude'], ultimo['longitude'], p['latitude'], p['longitude']) < DISTANCIA_PONTO_M:
+                continue
+        if not ultimo or ultimo['capturado_em'] < p['capturado_em']:  # ponto atrasado do lote não recua o estado
+            estado['ponto'] = {k: p[k] for k in ('latitude', 'longitude', 'capturado_em')}
+        novos.append(ViaturaLocalizacaoPonto(
+            viatura_id=viatura_id, plantao_id=plantao_id, latitude=p['latitude'], longitude=p['longitude'],
+            capturado_em=p['capturado_em'], origem_usuario_id=usuario_id, precisao_m=p['precisao_m'],
+        ))
+    ultimo = pontos[-1]
+    anterior = estado.get('posicao')
+    posicao_nova = not anterior or anterior['capturado_em'] < ultimo['capturado_em']
+    if posicao_nova:
+        estado['posicao'] = {k: ultimo[k] for k in ('latitude', 'longitude', 'capturado_em')}
+    cache.set(chave, estado, 6 * 3600)
+
+    with _buffer.lock:
+        if posicao_nova:
+            _buffer.ultimas[viatura_id] = {**ultimo, 'usuario_id': usuario_id, 'plantao_id': plantao_id}
+        _buffer.pontos.extend(novos)
+        cheio = len(_buffer.pontos) >= int(_cfg("GPS_BUFFER_MAX", 2000))
+    _buffer.garantir_thread()
+    if cheio:
+        _buffer.evento.set()
+
+    if posicao_nova:
+        try:
+            from . import painel_ws
+            painel_ws.publicar("POSICAO", {"posicao": {
+                "viatura_id": viatura_id,
+                "latitude": ultimo['latitude'],
+                "longitude": ultimo['longitude'],
+                "precisao_m": ultimo['precisao_m'],
+                "velocidade_kmh": ultimo['velocidade_kmh'],
+                "direcao_graus": ultimo['direcao_graus'],
+                "atualizado_em": timezone.localtime(ultimo['capturado_em']).isoformat(),
+            }})
+        except Exception:
+            pass
+    resumo = {
+        'recebidos': len(pontos),
+        'pontos': len(novos),
+        'atualizado_em': timezone.localtime(ultimo['capturado_em']).isoformat(),
+    }
+    if lote:
+        resumo['gravados'] = sorted(gravados)
+    return resumo
+
+
+# ---------------------------------------------------------------- retenção
+
+def limpar_pontos(dias: int | None = None) -> int:
+    """Remove pontos da trilha mais antigos que ``GPS_RETENCAO_DIAS`` (substitui o "manter 400" por ping)."""
+    from . import trilhas
+    dias = int(dias if dias is not None else _cfg("GPS_RETENCAO_DIAS", 30))
+    limite = timezone.now() - timedelta(days=dias)
+    # Os blocos compactados guardam o trajeto depois que os pontos saem
+    trilhas.compactar()
+    trilhas.limpar_blocos()
+    total = 0
+    while True:
+        ids = list(ViaturaLocalizacaoPonto.objects.filter(capturado_em__lt=limite).values_list('id', flat=True)[:5000])
+        if not ids:
+            return total
+        total += ViaturaLocalizacaoPonto.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,127 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from cecom import trilhas
+from cecom.models import PlantaoCECOM, PlantaoParticipante, ViaturaLocalizacao
+from cecom.views import localizacoes_ativas
+from viaturas.models import Viatura
+
+
+def _legado(request):
+    """Algoritmo anterior de localizacoes_ativas (equipe consultada por plantão)."""
+    ativos = PlantaoCECOM.objects.select_related('viatura').filter(ativo=True, viatura__isnull=False)
+    v_ids = [p.viatura_id for p in ativos]
+    locs = ViaturaLocalizacao.objects.select_related('viatura').filter(viatura_id__in=v_ids)
+    equipe_map = {}
+    for p in ativos.prefetch_related('participantes__usuario__perfil'):
+        equipe = []
+        for part in p.participantes.filter(saida_em__isnull=True).select_related('usuario__perfil'):
+            u = part.usuario
+            perfil = getattr(u, 'perfil', None)
+            equipe.append({'nome': (u.get_full_name() or u.username).strip(),
+                           'matricula': getattr(perfil, 'matricula', '') if perfil else ''})
+        equipe_map[p.viatura_id] = equipe
+    trilhas_vtr = trilhas.trilhas_recentes(v_ids)
+    data = []
+    for l in locs:
+        v = l.viatura
+        data.append({'viatura_id': v.id, 'prefixo': v.prefixo, 'equipe': equipe_map.get(v.id, []),
+                     'trilha_polyline': trilhas_vtr.get(v.id, '')})
+    user_pl = PlantaoCECOM.objects.filter(ativo=True, participantes__usuario=request.user, viatura__isnull=False).first()
+    return {'viaturas': data, 'viatura_usuario_id': user_pl.viatura_id if user_pl else None}
+
+
+class Command(BaseCommand):
+    help = ("Benchmark de cecom.views.localizacoes_ativas (mapa em tempo real) e verificação de que o "
+            "número de consultas não cresce com a frota. Os dados de teste são descartados ao final.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--viaturas', type=int, default=50)
+        parser.add_argument('--participantes', type=int, default=5, help='Participantes por plantão.')
+        parser.add_argument('--repeticoes', type=int, default=20)
+        parser.add_argument('--sem-legado', action='store_true')
+
+    def handle(self, *args, **options):
+        n_vtr = max(2, options['viaturas'])
+        n_part = max(1, options['participantes'])
+        rep = max(1, options['repeticoes'])
+        resultado = {}
+        with transaction.atomic(), override_settings(GPS_TRILHA_CACHE_S=0):
+            usuario = self._popular(n_vtr, n_part)
+            req = RequestFactory().get('/cecom/api/localizacao/ativas/')
+            req.user = usuario
+
+            def atual():
+                return json.loads(localizacoes_ativas(req).content)
+
+            # Frota pequena x frota completa: o número de consultas deve ser o mesmo
+            consultas = {}
+            for ativas in (2, n_vtr):
+                PlantaoCECOM.objects.filter(viatura__prefixo__startswith='BENCH-MAPA-').update(ativo=False)
+                PlantaoCECOM.objects.filter(pk__in=self.plantoes[:ativas]).update(ativo=True)
+                with CaptureQueriesContext(connection) as q:
+                    dados = atual()
+                consultas[ativas] = len(q.captured_queries)
+                if not options['sem_legado']:
+                    with CaptureQueriesContext(connection) as q:
+                        _legado(req)
+                    self.stdout.write(f"  {ativas:3d} viaturas: legado {len(q.captured_queries):4d} consultas, "
+                                      f"atual {consultas[ativas]:2d}")
+                else:
+                    self.stdout.write(f"  {ativas:3d} viaturas: atual {consultas[ativas]:2d} consultas")
+            if dados['viatura_usuario_id'] != self.viatura_usuario or \
+                    any(len(v['equipe']) != n_part for v in dados['viaturas']
+                        if v['prefixo'].startswith('BENCH-MAPA-')):
+                raise CommandError("localizacoes_ativas devolveu equipe/viatura do usuário incorretas.")
+            resultado['consistente'] = len(set(consultas.values())) == 1
+
+            def medir(rotulo, func):
+                func()
+                t0 = time.perf_counter()
+                for _ in range(rep):
+                    func()
+                dt = (time.perf_counter() - t0) / rep
+                self.stdout.write(f"  {rotulo:8s} {dt * 1000:7.1f} ms/requisição")
+                return dt
+
+            self.stdout.write(f"{n_vtr} viaturas x {n_part} participantes, {rep} repetições")
+            if not options['sem_legado']:
+                t_leg = medir('legado', lambda: _legado(req))
+            t_novo = medir('atual', atual)
+            if not options['sem_legado'] and t_novo:
+                self.stdout.write(f"  ganho: {t_leg / t_novo:.1f}x")
+            transaction.set_rollback(True)
+        if not resultado.get('consistente'):
+            raise CommandError("O número de consultas de localizacoes_ativas cresce com a frota.")
+        self.stdout.write(self.style.SUCCESS("Número de consultas constante."))
+
+    def _popular(self, n_vtr, n_part):
+        User = get_user_model()
+        agora = timezone.now()
+        self.plantoes = []
+        usuarios = [User.objects.create(username=f"bench-mapa-{i:04d}", first_name="Bench", last_name=str(i))
+                    for i in range(n_vtr * n_part)]
+        for i in range(n_vtr):
+            v = Viatura.objects.create(prefixo=f"BENCH-MAPA-{i:03d}")
+            pl = PlantaoCECOM.objects.create(iniciado_por=usuarios[i * n_part], viatura=v, ativo=True,
+                                             inicio=agora - timezone.timedelta(minutes=i),
+                                             fim_previsto=agora + timezone.timedelta(hours=8))
+            self.plantoes.append(pl.pk)
+            PlantaoParticipante.objects.bulk_create([
+                PlantaoParticipante(plantao=pl, usuario=u)
+                for u in usuarios[i * n_part:(i + 1) * n_part]
+            ])
+            # Ex-integrante: não entra na equipe
+            PlantaoParticipante.objects.create(plantao=pl, usuario=usuarios[(i + 1) * n_part % len(usuarios)],
+                                             saida_em=agora)
+            if i:  # a primeira fica sem localização
+                ViaturaLocalizacao.objects.create(viatura=v, latitude=-23.65, longitude=-47.22)
+        self.viatura_usuario = Viatura.objects.get(prefixo="BENCH-MAPA-000").pk
+        return usuarios[0]
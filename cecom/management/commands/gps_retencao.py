@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from cecom import gps_ingest, trilhas
+
+
+class Command(BaseCommand):
+    help = ("Compacta a trilha das viaturas em blocos e remove pontos mais antigos que "
+            "GPS_RETENCAO_DIAS (ou --dias) e blocos mais antigos que GPS_TRILHA_RETENCAO_DIAS.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None, help='Sobrescreve GPS_RETENCAO_DIAS.')
+        parser.add_argument('--so-compactar', action='store_true', help='Só grava os blocos pendentes.')
+
+    def handle(self, *args, **options):
+        if options['so_compactar']:
+            self.stdout.write(self.style.SUCCESS(f"{trilhas.compactar()} bloco(s) gravado(s)."))
+            return
+        removidos = gps_ingest.limpar_pontos(options['dias'])
+        self.stdout.write(self.style.SUCCESS(f"{removidos} ponto(s) removido(s)."))
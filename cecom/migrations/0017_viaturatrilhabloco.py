@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cecom', '0016_despachoocorrencia_codigos'),
+        ('viaturas', '0005_avariaresolvidalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViaturaTrilhaBloco',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField()),
+                ('primeiro_em', models.DateTimeField()),
+                ('ultimo_em', models.DateTimeField()),
+                ('polyline', models.TextField()),
+                ('tempos', models.TextField(help_text='Deltas em segundos a partir de primeiro_em (encoded polyline)')),
+                ('pontos', models.PositiveIntegerField(default=0)),
+                ('pontos_originais', models.PositiveIntegerField(default=0)),
+                ('ultimo_ponto_id', models.BigIntegerField(db_index=True, default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('plantao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trilha_blocos', to='cecom.plantaocecom')),
+                ('viatura', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trilha_blocos', to='viaturas.viatura')),
+            ],
+            options={
+                'ordering': ['inicio'],
+                'indexes': [models.Index(fields=['plantao', 'inicio'], name='cecom_viatu_plantao_046858_idx'), models.Index(fields=['viatura', 'inicio'], name='cecom_viatu_viatura_eb9bc6_idx')],
+                'constraints': [models.UniqueConstraint(fields=('viatura', 'plantao', 'inicio'), name='cecom_trilha_bloco_unico')],
+            },
+        ),
+    ]
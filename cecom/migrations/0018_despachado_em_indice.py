@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cecom', '0017_viaturatrilhabloco'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='despachoocorrencia',
+            name='despachado_em',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Despachado em'),
+        ),
+    ]
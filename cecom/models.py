@@ -295,7 +295,7 @@ class DespachoOcorrencia(models.Model):
     # Controle
     status = models.CharField("Status", max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
     despachado_por = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name="Despachado por")
-    despachado_em = models.DateTimeField("Despachado em", default=timezone.now)
+    despachado_em = models.DateTimeField("Despachado em", default=timezone.now, db_index=True)
     
     # Controle de notificações e respostas
     notificado_em = models.DateTimeField("Notificado em", null=True, blank=True)
@@ -427,3 +427,37 @@ class ViaturaLocalizacaoPonto(models.Model):
 
     def __str__(self):  # pragma: no cover
         return f"Ponto VTR {getattr(self.viatura,'prefixo','?')} @ {self.latitude},{self.longitude} {self.capturado_em:%H:%M:%S}" 
+
+
+class ViaturaTrilhaBloco(models.Model):
+    """Trilha compactada de uma viatura num intervalo fixo (``GPS_TRILHA_BLOCO_MIN``).
+
+    Gerado a partir de `ViaturaLocalizacaoPonto` por ``cecom.trilhas.compactar``:
+    pontos simplificados (Douglas-Peucker) em encoded polyline e os instantes como
+    deltas em segundos, no mesmo formato. Usado no replay do plantão e mantido
+    por mais tempo que os pontos brutos.
+    """
+    viatura = models.ForeignKey('viaturas.Viatura', on_delete=models.CASCADE, related_name='trilha_blocos')
+    plantao = models.ForeignKey(PlantaoCECOM, null=True, blank=True, on_delete=models.SET_NULL, related_name='trilha_blocos')
+    inicio = models.DateTimeField()
+    primeiro_em = models.DateTimeField()
+    ultimo_em = models.DateTimeField()
+    polyline = models.TextField()
+    tempos = models.TextField(help_text="Deltas em segundos a partir de primeiro_em (encoded polyline)")
+    pontos = models.PositiveIntegerField(default=0)
+    pontos_originais = models.PositiveIntegerField(default=0)
+    ultimo_ponto_id = models.BigIntegerField(default=0, db_index=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['viatura', 'plantao', 'inicio'], name='cecom_trilha_bloco_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['plantao', 'inicio']),
+            models.Index(fields=['viatura', 'inicio']),
+        ]
+        ordering = ['inicio']
+
+    def __str__(self):  # pragma: no cover
+        return f"Trilha VTR {getattr(self.viatura,'prefixo','?')} {self.inicio:%d/%m %H:%M} ({self.pontos}/{self.pontos_originais})"
@@ -0,0 +1,158 @@
+"""Snapshot pré-serializado do payload de `views.ativos_json`.
+
+O painel do CECOM consulta ``ativos.json`` a cada 10 s em cada console aberto.
+O payload só muda quando talões, despachos, disparos de pânico, plantões ou
+avarias mudam; por isso:
+
+- ``cecom.signals`` chama `invalidar()` após o commit dessas alterações, que grava
+  uma nova versão (token aleatório, sem corrida de incremento entre processos) no
+  alias ``compartilhado`` do cache (visto por todos os workers);
+- `obter()` devolve o JSON já serializado + ETag enquanto a versão gravada junto do
+  snapshot for a atual; senão reconstrói (uma vez) e guarda;
+- ``PAINEL_SNAPSHOT_TTL`` limita a idade do snapshot (contagem de despachos das
+  últimas 24h e alterações feitas por ``QuerySet.update``, que não disparam sinais).
+
+O ETag é o hash do conteúdo sem o carimbo ``agora``: reconstruções que não
+mudam nada continuam respondendo 304.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q
+from django.utils import timezone
+
+CHAVE_VERSAO = "cecom:painel:versao"
+CHAVE_SNAPSHOT = "cecom:painel:snapshot"
+
+
+def _cache():
+    # Alias visto por todos os workers: a invalidação de um processo vale para os outros
+    return caches["compartilhado"]
+
+
+def invalidar():
+    try:
+        _cache().set(CHAVE_VERSAO, uuid.uuid4().hex, None)
+    except Exception:
+        pass
+
+
+def _versao() -> str:
+    versao = _cache().get(CHAVE_VERSAO)
+    if versao is None:
+        versao = uuid.uuid4().hex
+        # add(): se outro processo gravou primeiro, usa a versão dele
+        if not _cache().add(CHAVE_VERSAO, versao, None):
+            versao = _cache().get(CHAVE_VERSAO) or versao
+    return versao
+
+
+def _nome(u):
+    return u.get_full_name() or u.username
+
+
+def item_talao(t) -> dict:
+    """Talão aberto no formato de ``ativos`` (também usado nos diffs do CecomPainelConsumer)."""
+    vtr = getattr(t, "viatura", None)
+    cod = getattr(t, "codigo_ocorrencia", None)
+
+    # Informações da equipe
+    equipe_info = []
+    if t.encarregado_id:
+        equipe_info.append(f"Enc: {_nome(t.encarregado)}")
+    if t.motorista_id:
+        equipe_info.append(f"Mot: {_nome(t.motorista)}")
+
+    return {
+        "talao_id": t.pk,
+        "status": t.status,
+        "iniciado_em": t.iniciado_em.isoformat() if t.iniciado_em else None,
+        "km_inicial": t.km_inicial,
+        "km_final": t.km_final,
+        "viatura_id": getattr(t, "viatura_id", None),
+        "viatura_prefixo": getattr(vtr, "prefixo", None),
+        "viatura_placa": getattr(vtr, "placa", None),
+        "codigo": getattr(cod, "sigla", None),
+        "descricao": getattr(cod, "descricao", None),
+        "local_bairro": getattr(t, "local_bairro", None),
+        "local_rua": getattr(t, "local_rua", None),
+        "equipe": " | ".join(equipe_info) if equipe_info else "N/I",
+    }
+
+
+def contadores() -> dict:
+    """Contadores do painel: despachos pendentes/24h (uma consulta) e pânicos abertos."""
+    from panic.models import DisparoPanico
+
+    from .models import DespachoOcorrencia
+
+    # Pendentes (não respondidos, para alertas) e últimas 24h numa única consulta
+    c = DespachoOcorrencia.objects.filter(arquivado=False).aggregate(
+        pendentes=Count("id", filter=Q(status="PENDENTE", respondido_em__isnull=True)),
+        recentes=Count("id", filter=Q(despachado_em__gte=timezone.now() - timezone.timedelta(hours=24))),
+    )
+    return {
+        "despachos_count": c["recentes"],
+        "despachos_pendentes_count": c["pendentes"],
+        "panico_abertos_count": DisparoPanico.objects.filter(status__in=["ABERTA", "EM_ATENDIMENTO"]).count(),
+    }
+
+
+def montar_payload() -> dict:
+    """Payload completo do painel (consultas ao banco)."""
+    from .models import PlantaoCECOM
+    from .views import _taloes_abertos
+
+    data = [item_talao(t) for t in _taloes_abertos()]
+
+    # Plantões ativos (para detectar início e vincular avarias)
+    pl_list = [
+        {
+            "id": pk,
+            "viatura_id": viatura_id,
+            "viatura_prefixo": prefixo or "",
+            "inicio": timezone.localtime(inicio).isoformat() if inicio else None,
+        }
+        for pk, viatura_id, prefixo, inicio in PlantaoCECOM.objects.filter(ativo=True, viatura__isnull=False)
+        .values_list("id", "viatura_id", "viatura__prefixo", "inicio")
+    ]
+    prefixo_por_viatura = {p["viatura_id"]: p["viatura_prefixo"] for p in pl_list}
+    # Avarias por viatura para os plantões ativos (estado persistente)
+    avarias = []
+    try:
+        from viaturas.models import ViaturaAvariaEstado
+        for e in ViaturaAvariaEstado.objects.filter(viatura_id__in=list(prefixo_por_viatura)):
+            avarias.append({
+                "viatura_id": e.viatura_id,
+                "viatura_prefixo": prefixo_por_viatura.get(e.viatura_id, ""),
+                "itens": e.get_labels() or [],
+            })
+    except Exception:
+        pass
+
+    return {
+        "ativos": data,
+        **contadores(),
+        "plantoes": pl_list,
+        "avarias": avarias,
+    }
+
+
+def obter() -> tuple[bytes, str]:
+    """(corpo JSON, ETag) do snapshot atual, reconstruindo se a versão mudou."""
+    versao = _versao()
+    snap = _cache().get(CHAVE_SNAPSHOT)
+    if snap and snap[0] == versao:
+        return snap[1], snap[2]
+    payload = montar_payload()
+    conteudo = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    etag = '"' + hashlib.sha1(conteudo.encode("utf-8")).hexdigest()[:20] + '"'
+    payload["agora"] = timezone.localtime().isoformat()
+    corpo = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    _cache().set(CHAVE_SNAPSHOT, (versao, corpo, etag), int(getattr(settings, "PAINEL_SNAPSHOT_TTL", 60)))
+    return corpo, etag
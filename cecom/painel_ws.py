@@ -0,0 +1,130 @@
+"""Diffs do painel do CECOM enviados ao `CecomPainelConsumer` (grupo ``cecom_painel``).
+
+Chamados por ``cecom.signals`` após o commit. Cada evento é montado uma vez no
+processo que gravou a alteração (com as consultas necessárias) e entregue pelo
+channel layer a todos os consoles, que aplicam o diff sobre o snapshot recebido
+ao conectar. Tipos:
+
+- ``TALAO`` (aberto/atualizado, com o item completo) e ``TALAO_REMOVIDO``;
+- ``DESPACHO`` e ``PANICO`` (com ``contadores`` recalculados);
+- ``PLANTAO`` (iniciado/encerrado) e ``AVARIAS``;
+- ``POSICAO`` (última localização da viatura).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from . import painel_snapshot
+
+logger = logging.getLogger(__name__)
+
+GRUPO = "cecom_painel"
+
+
+def publicar(tipo: str, dados: dict):
+    layer = get_channel_layer()
+    if not layer:
+        return
+    try:
+        async_to_sync(layer.group_send)(GRUPO, {
+            "type": "painel.evento",
+            "data": {"tipo": tipo, **dados},
+            "enviado_em": time.time(),
+        })
+    except Exception as e:
+        logger.warning("[PAINEL:WS] falha ao publicar %s: %s", tipo, e)
+
+
+def item_posicao(loc) -> dict:
+    return {
+        "viatura_id": loc.viatura_id,
+        "latitude": float(loc.latitude),
+        "longitude": float(loc.longitude),
+        "precisao_m": loc.precisao_m,
+        "velocidade_kmh": loc.velocidade_kmh,
+        "direcao_graus": loc.direcao_graus,
+        "atualizado_em": timezone.localtime(loc.atualizado_em).isoformat() if loc.atualizado_em else None,
+    }
+
+
+def posicoes() -> list[dict]:
+    """Últimas posições das viaturas com plantão ativo (snapshot inicial do consumer)."""
+    from .models import PlantaoCECOM, ViaturaLocalizacao
+    v_ids = PlantaoCECOM.objects.filter(ativo=True, viatura__isnull=False).values("viatura_id")
+    return [item_posicao(loc) for loc in ViaturaLocalizacao.objects.filter(viatura_id__in=v_ids)]
+
+
+def entre_processos() -> bool:
+    """Diffs publicados por outro processo chegam aos consumers? Com o layer em memória
+    (``CHANNEL_LAYER=memoria``) não: o HTTP roda no gunicorn e o /ws/ no daphne."""
+    from channels.layers import InMemoryChannelLayer
+    layer = get_channel_layer()
+    return bool(layer) and not isinstance(layer, InMemoryChannelLayer)
+
+
+def snapshot() -> dict:
+    corpo, etag = painel_snapshot.obter()
+    # tempo_real=False: o cliente mantém o polling normal mesmo com o WebSocket aberto
+    return {"tipo": "SNAPSHOT", "etag": etag, "painel": json.loads(corpo), "posicoes": posicoes(),
+            "tempo_real": entre_processos()}
+
+
+# ---------------------------------------------------------------- eventos por modelo
+
+def talao_mudou(talao_id: int, removido: bool = False):
+    from .views import _taloes_abertos
+    t = None if removido else _taloes_abertos().filter(pk=talao_id).first()
+    if t is None:
+        # encerrado/cancelado (saiu de "ABERTO") ou apagado
+        publicar("TALAO_REMOVIDO", {"talao_id": talao_id})
+    else:
+        publicar("TALAO", {"talao": painel_snapshot.item_talao(t)})
+
+
+def despacho_mudou(despacho_id: int, status: str, viatura_id):
+    publicar("DESPACHO", {
+        "despacho_id": despacho_id,
+        "status": status,
+        "viatura_id": viatura_id,
+        "contadores": painel_snapshot.contadores(),
+    })
+
+
+def panico_mudou(disparo_id: int, status: str):
+    publicar("PANICO", {
+        "disparo_id": disparo_id,
+        "status": status,
+        "contadores": painel_snapshot.contadores(),
+    })
+
+
+def plantao_mudou(plantao, plantao_id: int, removido: bool = False):
+    if not plantao.viatura_id:
+        return
+    publicar("PLANTAO", {
+        "plantao": {
+            "id": plantao_id,
+            "viatura_id": plantao.viatura_id,
+            "viatura_prefixo": getattr(plantao.viatura, "prefixo", "") or "",
+            "inicio": timezone.localtime(plantao.inicio).isoformat() if plantao.inicio else None,
+        },
+        "ativo": bool(plantao.ativo) and not removido,
+    })
+
+
+def avarias_mudou(estado, removido: bool = False):
+    publicar("AVARIAS", {
+        "viatura_id": estado.viatura_id,
+        "viatura_prefixo": getattr(estado.viatura, "prefixo", "") or "",
+        "itens": [] if removido else (estado.get_labels() or []),
+    })
+
+
+def posicao_mudou(loc):
+    publicar("POSICAO", {"posicao": item_posicao(loc)})
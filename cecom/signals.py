@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from panic.models import DisparoPanico
+from taloes.models import Talao
+from viaturas.models import ViaturaAvariaEstado
+
+from . import gps_ingest, painel_snapshot, painel_ws
+from .models import DespachoOcorrencia, PlantaoCECOM, PlantaoParticipante, ViaturaLocalizacao
+
+# Modelos cujo estado aparece em ativos.json
+_MODELOS_PAINEL = (Talao, DespachoOcorrencia, DisparoPanico, PlantaoCECOM, ViaturaAvariaEstado)
+
+
+def _so_localizacao(sender, kwargs) -> bool:
+    # Pings de localização do disparo (public_api) não mudam nada no painel
+    campos = kwargs.get('update_fields')
+    return sender is DisparoPanico and bool(campos) and 'status' not in campos
+
+
+def _invalidar_painel(sender, **kwargs):
+    """Nova versão do snapshot do painel após o commit (os leitores já enxergam a alteração)."""
+    if _so_localizacao(sender, kwargs):
+        return
+    transaction.on_commit(painel_snapshot.invalidar)
+
+
+for _modelo in _MODELOS_PAINEL:
+    post_save.connect(_invalidar_painel, sender=_modelo, dispatch_uid=f"cecom_painel_save_{_modelo.__name__}")
+    post_delete.connect(_invalidar_painel, sender=_modelo, dispatch_uid=f"cecom_painel_delete_{_modelo.__name__}")
+
+
+# Diffs para os consoles conectados ao CecomPainelConsumer (também após o commit)
+
+def _talao(sender, instance, signal=None, **kwargs):
+    pk, removido = instance.pk, signal is post_delete  # pk vira None após o delete
+    transaction.on_commit(lambda: painel_ws.talao_mudou(pk, removido=removido))
+
+
+def _despacho(sender, instance, signal=None, **kwargs):
+    pk, status, viatura_id = instance.pk, instance.status, instance.viatura_id
+    transaction.on_commit(lambda: painel_ws.despacho_mudou(pk, status, viatura_id))
+
+
+def _panico(sender, instance, **kwargs):
+    if _so_localizacao(sender, kwargs):
+        return
+    pk, status = instance.pk, instance.status
+    transaction.on_commit(lambda: painel_ws.panico_mudou(pk, status))
+
+
+def _plantao(sender, instance, signal=None, **kwargs):
+    pk, removido = instance.pk, signal is post_delete
+    transaction.on_commit(lambda: painel_ws.plantao_mudou(instance, pk, removido=removido))
+
+
+def _avarias(sender, instance, signal=None, **kwargs):
+    removido = signal is post_delete
+    transaction.on_commit(lambda: painel_ws.avarias_mudou(instance, removido=removido))
+
+
+def _posicao(sender, instance, **kwargs):
+    transaction.on_commit(lambda: painel_ws.posicao_mudou(instance))
+
+
+for _modelo, _handler in ((Talao, _talao), (DespachoOcorrencia, _despacho), (DisparoPanico, _panico),
+                          (PlantaoCECOM, _plantao), (ViaturaAvariaEstado, _avarias)):
+    post_save.connect(_handler, sender=_modelo, dispatch_uid=f"cecom_painel_ws_save_{_modelo.__name__}")
+    post_delete.connect(_handler, sender=_modelo, dispatch_uid=f"cecom_painel_ws_delete_{_modelo.__name__}")
+post_save.connect(_posicao, sender=ViaturaLocalizacao, dispatch_uid="cecom_painel_ws_posicao")
+
+
+# Plantão/viatura do usuário usado na ingestão de localização (cache em gps_ingest)
+
+def _invalidar_plantoes_gps(sender, **kwargs):
+    transaction.on_commit(gps_ingest.invalidar_plantoes)
+
+
+for _modelo in (PlantaoCECOM, PlantaoParticipante):
+    post_save.connect(_invalidar_plantoes_gps, sender=_modelo, dispatch_uid=f"cecom_gps_save_{_modelo.__name__}")
+    post_delete.connect(_invalidar_plantoes_gps, sender=_modelo, dispatch_uid=f"cecom_gps_delete_{_modelo.__name__}")
@@ -0,0 +1,280 @@
+"""Trilhas compactadas das viaturas (mapa em tempo real e replay do plantão).
+
+- `simplificar` aplica Douglas-Peucker (tolerância ``GPS_TRILHA_TOLERANCIA_M``)
+  e `codificar`/`decodificar` usam o formato encoded polyline do Google
+  (precisão 1e-5, ~1 m): uma trilha de 120 pontos vira algumas centenas de bytes;
+- `trilhas_recentes` monta as trilhas de todas as viaturas ativas com uma
+  consulta (``values_list``, sem instanciar objetos) e guarda o resultado no
+  cache por ``GPS_TRILHA_CACHE_S``;
+- `compactar` grava `ViaturaTrilhaBloco` (um por viatura/plantão/intervalo de
+  ``GPS_TRILHA_BLOCO_MIN``) para os pontos novos desde o último bloco gravado;
+  pontos que chegam atrasados (lote offline) reconstroem o bloco do intervalo deles;
+- `replay_plantao` devolve o trajeto do plantão inteiro a partir dos blocos.
+"""
+from __future__ import annotations
+
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from math import cos, radians
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ViaturaLocalizacaoPonto, ViaturaTrilhaBloco
+
+
+def _cfg(nome: str, padrao):
+    return getattr(settings, nome, padrao)
+
+
+# ---------------------------------------------------------------- Douglas-Peucker
+
+def _xy(lat0: float):
+    kx = 111320 * cos(radians(lat0))
+    return lambda p: (p[1] * kx, p[0] * 110540)
+
+
+def simplificar(pts: list, tolerancia_m: float | None = None) -> list:
+    """Douglas-Peucker (iterativo) sobre ``[lat, lng, ...]``; mantém primeiro e último."""
+    if tolerancia_m is None:
+        tolerancia_m = float(_cfg("GPS_TRILHA_TOLERANCIA_M", 5))
+    n = len(pts)
+    if n < 3 or tolerancia_m <= 0:
+        return list(pts)
+    xy = list(map(_xy(pts[0][0]), pts))
+    manter = [False] * n
+    manter[0] = manter[-1] = True
+    tol2 = tolerancia_m * tolerancia_m
+    pilha = [(0, n - 1)]
+    while pilha:
+        a, b = pilha.pop()
+        (ax, ay), (bx, by) = xy[a], xy[b]
+        dx, dy = bx - ax, by - ay
+        den = dx * dx + dy * dy
+        pior, idx = -1.0, -1
+        for i in range(a + 1, b):
+            px, py = xy[i]
+            if den:
+                t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / den))
+                ex, ey = ax + t * dx - px, ay + t * dy - py
+            else:
+                ex, ey = px - ax, py - ay
+            d2 = ex * ex + ey * ey
+            if d2 > pior:
+                pior, idx = d2, i
+        if pior > tol2:
+            manter[idx] = True
+            pilha.append((a, idx))
+            pilha.append((idx, b))
+    return [p for p, m in zip(pts, manter) if m]
+
+
+# ---------------------------------------------------------------- encoded polyline
+
+def _codificar_valor(v: int, saida: list):
+    v = ~(v << 1) if v < 0 else v << 1
+    while v >= 0x20:
+        saida.append(chr((0x20 | (v & 0x1f)) + 63))
+        v >>= 5
+    saida.append(chr(v + 63))
+
+
+def _decodificar_valores(s: str) -> list[int]:
+    valores, v, desloc = [], 0, 0
+    for c in s:
+        b = ord(c) - 63
+        v |= (b & 0x1f) << desloc
+        desloc += 5
+        if b < 0x20:
+            valores.append(~(v >> 1) if v & 1 else v >> 1)
+            v, desloc = 0, 0
+    return valores
+
+
+def codificar(pts: list) -> str:
+    saida: list[str] = []
+    plat = plng = 0
+    for p in pts:
+        lat, lng = round(p[0] * 1e5), round(p[1] * 1e5)
+        _codificar_valor(lat - plat, saida)
+        _codificar_valor(lng - plng, saida)
+        plat, plng = lat, lng
+    return "".join(saida)
+
+
+def decodificar(s: str) -> list[list[float]]:
+    vals = _decodificar_valores(s)
+    pts, lat, lng = [], 0, 0
+    for i in range(0, len(vals) - 1, 2):
+        lat += vals[i]
+        lng += vals[i + 1]
+        pts.append([lat / 1e5, lng / 1e5])
+    return pts
+
+
+def codificar_tempos(segundos: list[int]) -> str:
+    saida: list[str] = []
+    anterior = 0
+    for s in segundos:
+        _codificar_valor(s - anterior, saida)
+        anterior = s
+    return "".join(saida)
+
+
+def decodificar_tempos(s: str) -> list[int]:
+    total, saida = 0, []
+    for d in _decodificar_valores(s):
+        total += d
+        saida.append(total)
+    return saida
+
+
+# ---------------------------------------------------------------- trilhas ao vivo
+
+def trilhas_recentes(viatura_ids, minutos: int = 30, limite: int = 120) -> dict[int, str]:
+    """{viatura_id: polyline} dos últimos ``minutos`` (até ``limite`` pontos), em uma consulta."""
+    v_ids = sorted(set(viatura_ids))
+    if not v_ids:
+        return {}
+    chave = "cecom:gps:trilhas:" + hashlib.sha1(f"{v_ids}:{minutos}:{limite}".encode()).hexdigest()[:16]
+    ttl = int(_cfg("GPS_TRILHA_CACHE_S", 5))
+    if ttl:
+        em_cache = cache.get(chave)
+        if em_cache is not None:
+            return em_cache
+    cutoff = timezone.now() - timedelta(minutes=minutos)
+    por_viatura: dict[int, list] = defaultdict(list)
+    for vid, lat, lng in (
+        ViaturaLocalizacaoPonto.objects
+        .filter(viatura_id__in=v_ids, capturado_em__gte=cutoff)
+        .order_by('viatura_id', 'capturado_em')
+        .values_list('viatura_id', 'latitude', 'longitude')
+        .iterator(chunk_size=2000)
+    ):
+        por_viatura[vid].append((float(lat), float(lng)))
+    trilhas = {vid: codificar(simplificar(pts[-limite:])) for vid, pts in por_viatura.items()}
+    if ttl:
+        cache.set(chave, trilhas, ttl)
+    return trilhas
+
+
+# ---------------------------------------------------------------- blocos
+
+def _inicio_bloco(dt: datetime) -> datetime:
+    minutos = max(1, int(_cfg("GPS_TRILHA_BLOCO_MIN", 15)))
+    dt = dt.replace(second=0, microsecond=0)
+    return dt - timedelta(minutes=(dt.hour * 60 + dt.minute) % minutos)
+
+
+def _montar_bloco(linhas: list) -> dict:
+    """``linhas`` = [(id, lat, lng, capturado_em)] em ordem cronológica."""
+    primeiro = linhas[0][3]
+    pts = [(float(lat), float(lng), (cap - primeiro).total_seconds()) for _, lat, lng, cap in linhas]
+    simpl = simplificar(pts)
+    return {
+        'primeiro_em': primeiro,
+        'ultimo_em': linhas[-1][3],
+        'polyline': codificar(simpl),
+        'tempos': codificar_tempos([round(p[2]) for p in simpl]),
+        'pontos': len(simpl),
+        'pontos_originais': len(linhas),
+        'ultimo_ponto_id': max(r[0] for r in linhas),
+    }
+
+
+def _pontos_do_bloco(viatura_id, plantao_id, inicio: datetime) -> list:
+    minutos = max(1, int(_cfg("GPS_TRILHA_BLOCO_MIN", 15)))
+    return list(
+        ViaturaLocalizacaoPonto.objects
+        .filter(viatura_id=viatura_id, plantao_id=plantao_id,
+                capturado_em__gte=inicio, capturado_em__lt=inicio + timedelta(minutes=minutos))
+        .order_by('capturado_em', 'id')
+        .values_list('id', 'latitude', 'longitude', 'capturado_em')
+    )
+
+
+def compactar(plantao_id=None) -> int:
+    """Grava/atualiza os blocos com pontos novos. Retorna quantos blocos foram gravados.
+
+    Com ``plantao_id`` só os pontos desse plantão (replay); sem ele, todos (ingestão/cron).
+    """
+    blocos = ViaturaTrilhaBloco.objects.all()
+    pontos = ViaturaLocalizacaoPonto.objects.all()
+    if plantao_id is not None:
+        blocos = blocos.filter(plantao_id=plantao_id)
+        pontos = pontos.filter(plantao_id=plantao_id)
+    marco = blocos.aggregate(m=Max('ultimo_ponto_id'))['m'] or 0
+    # Folga para ids alocados antes do marco mas gravados depois (inserts concorrentes)
+    desde = max(0, marco - int(_cfg("GPS_BUFFER_MAX", 2000)))
+    chaves: dict[tuple, int] = {}
+    for pk, vid, pid, cap in (
+        pontos.filter(id__gt=desde)
+        .values_list('id', 'viatura_id', 'plantao_id', 'capturado_em')
+        .iterator(chunk_size=5000)
+    ):
+        chave = (vid, pid, _inicio_bloco(cap))
+        chaves[chave] = max(pk, chaves.get(chave, 0))
+    if not chaves:
+        return 0
+    gravados_ate = {
+        (vid, pid, inicio): ultimo_id
+        for vid, pid, inicio, ultimo_id in blocos.filter(
+            viatura_id__in={c[0] for c in chaves},
+            inicio__in={c[2] for c in chaves},
+        ).values_list('viatura_id', 'plantao_id', 'inicio', 'ultimo_ponto_id')
+    }
+    gravados = 0
+    for (vid, pid, inicio), ultimo_id in sorted(chaves.items(), key=lambda c: c[0][2]):
+        if gravados_ate.get((vid, pid, inicio), 0) >= ultimo_id:
+            continue  # bloco já contém estes pontos (caiu só na folga do marco)
+        linhas = _pontos_do_bloco(vid, pid, inicio)
+        if not linhas:
+            continue
+        ViaturaTrilhaBloco.objects.update_or_create(
+            viatura_id=vid, plantao_id=pid, inicio=inicio, defaults=_montar_bloco(linhas))
+        gravados += 1
+    return gravados
+
+
+def limpar_blocos(dias: int | None = None) -> int:
+    dias = int(dias if dias is not None else _cfg("GPS_TRILHA_RETENCAO_DIAS", 365))
+    return ViaturaTrilhaBloco.objects.filter(ultimo_em__lt=timezone.now() - timedelta(days=dias)).delete()[0]
+
+
+# ---------------------------------------------------------------- replay
+
+def _bloco_json(inicio, primeiro_em, ultimo_em, polyline, tempos, pontos, originais) -> dict:
+    return {
+        'inicio': timezone.localtime(inicio).isoformat(),
+        'primeiro_em': timezone.localtime(primeiro_em).isoformat(),
+        'ultimo_em': timezone.localtime(ultimo_em).isoformat(),
+        'polyline': polyline,
+        'tempos': tempos,
+        'pontos': pontos,
+        'pontos_originais': originais,
+    }
+
+
+def replay_plantao(plantao) -> dict:
+    """Trajeto do plantão em blocos (encoded polyline + deltas de tempo em segundos)."""
+    compactar(plantao.pk)  # só os pontos pendentes deste plantão; o resto fica com a ingestão/cron
+    blocos = [
+        _bloco_json(*b) for b in
+        ViaturaTrilhaBloco.objects.filter(plantao_id=plantao.pk).order_by('inicio')
+        .values_list('inicio', 'primeiro_em', 'ultimo_em', 'polyline', 'tempos', 'pontos', 'pontos_originais')
+    ]
+    viatura = getattr(plantao, 'viatura', None)
+    return {
+        'plantao_id': plantao.pk,
+        'viatura_id': plantao.viatura_id,
+        'viatura_prefixo': getattr(viatura, 'prefixo', '') or '',
+        'inicio': timezone.localtime(plantao.inicio).isoformat() if plantao.inicio else None,
+        'fim': timezone.localtime(plantao.encerrado_em).isoformat() if plantao.encerrado_em else None,
+        'ativo': plantao.ativo,
+        'pontos': sum(b['pontos'] for b in blocos),
+        'pontos_originais': sum(b['pontos_originais'] for b in blocos),
+        'blocos': blocos,
+    }
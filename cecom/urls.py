@@ -31,6 +31,7 @@ urlpatterns = [
     path("mapa/viaturas/", views.mapa_viaturas, name="mapa_viaturas"),
     path("api/localizacao/", views.localizacao_post, name="localizacao_post"),
     path("api/localizacao/ativas/", views.localizacoes_ativas, name="localizacoes_ativas"),
+    path("api/plantao/<int:pk>/trilha/", views.plantao_trilha, name="plantao_trilha"),
     
     # Despachos
     path("despachar/", views.despachar_ocorrencia, name="despachar"),
@@ -4,10 +4,11 @@ from __future__ import annotations
 from django.apps import apps
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
 from django.core.paginator import Paginator
+from django.db.models import Prefetch
 from django.views.decorators.csrf import csrf_exempt
 import json
 import hashlib
@@ -16,7 +17,7 @@ from .models import (
     DespachoOcorrencia, PlantaoCecomPrincipal, LivroPlantaoCecom,
     LivroPlantaoCecomViatura, LivroPlantaoCecomPostoFixo, LivroPlantaoCecomRelatorio,
     LivroPlantaoCecomPessoa,
-    PlantaoCECOM, ViaturaLocalizacao, ViaturaLocalizacaoPonto,
+    PlantaoCECOM, PlantaoParticipante, ViaturaLocalizacao,
 )
 from .forms import (
     DespachoOcorrenciaForm,
@@ -25,8 +26,8 @@ from .forms import (
     LivroPlantaoCecomViaturaForm,
     LivroPlantaoCecomPostoFixoForm,
 )
-from common.models import PushDevice
-from common.views import enviar_push
+from common import push_outbox
+from . import gps_ingest, trilhas
 from taloes.views_extra import SESSION_PLANTAO
 
 # Pega o modelo sem depender de taloes.models existir como arquivo
@@ -1051,14 +1052,13 @@ def despachar_ocorrencia(request):
 
 
 def _notificar_despacho_para_viatura(despacho: DespachoOcorrencia) -> int:
-    """Envia push de 'Nova Ocorrência' para os usuários do plantão ativo da viatura.
+    """Enfileira push de 'Nova Ocorrência' para os usuários do plantão ativo da viatura.
 
     - Busca PlantaoCECOM ativo com a viatura do despacho e coleta participantes (atuais) + iniciador.
-    - Obtém tokens de PushDevice habilitados desses usuários.
-    - Envia via FCM (common.views.enviar_push). Em caso de erro de configuração, ignora silenciosamente.
+    - Enfileira a notificação em `common.push_outbox` (tokens resolvidos e enviados fora da requisição).
     - Marca `notificado_em` no despacho.
 
-    Retorna o número de entregas relatadas como sucesso pelo FCM (quando possível).
+    Retorna o número de usuários-alvo da notificação enfileirada.
     """
     if not despacho or not getattr(despacho, 'viatura_id', None):
         return 0
@@ -1072,22 +1072,10 @@ def _notificar_despacho_para_viatura(despacho: DespachoOcorrencia) -> int:
     if not pl:
         return 0
     # Usuários-alvo: participantes atuais + quem iniciou (se ainda presente)
-    participantes_qs = pl.participantes.filter(saida_em__isnull=True).select_related('usuario')
-    users = [p.usuario for p in participantes_qs if getattr(p, 'usuario', None)]
-    if pl.iniciado_por and pl.iniciado_por not in users:
-        users.append(pl.iniciado_por)
-    if not users:
-        return 0
-    user_ids = [u.id for u in users if getattr(u, 'id', None)]
-    tokens = list(
-        PushDevice.objects.filter(user_id__in=user_ids, enabled=True)
-        .values_list('token', flat=True)
-    )
-    if not tokens:
-        # Mesmo sem tokens, marca como notificado para evitar reenvio em loop
-        if not despacho.notificado_em:
-            despacho.notificado_em = timezone.now()
-            despacho.save(update_fields=['notificado_em'])
+    user_ids = list(pl.participantes.filter(saida_em__isnull=True).values_list('usuario_id', flat=True))
+    if pl.iniciado_por_id and pl.iniciado_por_id not in user_ids:
+        user_ids.append(pl.iniciado_por_id)
+    if not user_ids:
         return 0
     title_extra = ''
     if getattr(despacho, 'cod_natureza', ''):
@@ -1105,16 +1093,12 @@ def _notificar_despacho_para_viatura(despacho: DespachoOcorrencia) -> int:
         'cod_natureza': getattr(despacho, 'cod_natureza', ''),
         'natureza': getattr(despacho, 'natureza', ''),
     }
-    sent = 0
-    try:
-        sent = enviar_push(tokens, title=title, body=body, data=data)
-    except Exception:
-        sent = 0
-    # Marca como notificado (independente do count reportado)
+    push_outbox.enfileirar('despacho', title, body, data, usuarios=user_ids)
+    # Marca como notificado (a entrega é acompanhada pela fila)
     if not despacho.notificado_em:
         despacho.notificado_em = timezone.now()
         despacho.save(update_fields=['notificado_em'])
-    return sent
+    return len(user_ids)
 
 
 @login_required
@@ -1326,92 +1310,19 @@ def painel_viaturas(request):
 def ativos_json(request):
     """
     API JSON com talões ativos para atualizações em tempo real.
-    """
-    data = []
-    for t in _taloes_abertos():
-        vtr = getattr(t, "viatura", None)
-        cod = getattr(t, "codigo_ocorrencia", None)
-        
-        # Informações da equipe
-        equipe_info = []
-        if hasattr(t, 'encarregado') and t.encarregado:
-            equipe_info.append(f"Enc: {t.encarregado.get_full_name() or t.encarregado.username}")
-        if hasattr(t, 'motorista') and t.motorista:
-            equipe_info.append(f"Mot: {t.motorista.get_full_name() or t.motorista.username}")
-            
-        data.append({
-            "talao_id": t.pk,
-            "status": t.status,
-            "iniciado_em": t.iniciado_em.isoformat() if t.iniciado_em else None,
-            "km_inicial": t.km_inicial,
-            "km_final": t.km_final,
-            "viatura_id": getattr(t, "viatura_id", None),
-            "viatura_prefixo": getattr(vtr, "prefixo", None),
-            "viatura_placa": getattr(vtr, "placa", None),
-            "codigo": getattr(cod, "sigla", None),
-            "descricao": getattr(cod, "descricao", None),
-            "local_bairro": getattr(t, "local_bairro", None),
-            "local_rua": getattr(t, "local_rua", None),
-            "equipe": " | ".join(equipe_info) if equipe_info else "N/I",
-        })
-    
-    # Contar apenas despachos pendentes (não respondidos) para alertas
-    despachos_pendentes_count = DespachoOcorrencia.objects.filter(
-        status='PENDENTE',
-        respondido_em__isnull=True,
-        arquivado=False
-    ).count()
-    
-    # Contar total de despachos recentes para estatísticas
-    despachos_count = DespachoOcorrencia.objects.filter(
-        despachado_em__gte=timezone.now() - timezone.timedelta(hours=24),
-        arquivado=False
-    ).count()
-    
-    # Contar alertas de pânico abertos
-    from panic.models import DisparoPanico
-    panico_abertos_count = DisparoPanico.objects.filter(
-        status__in=['ABERTA', 'EM_ATENDIMENTO']
-    ).count()
-    
-    # Plantoes ativos (para detectar início e vincular avarias)
-    hoje = timezone.localdate()
-    pl_ativos = PlantaoCECOM.objects.select_related('viatura').filter(ativo=True, viatura__isnull=False)
-    pl_list = [
-        {
-            'id': p.id,
-            'viatura_id': p.viatura_id,
-            'viatura_prefixo': getattr(p.viatura, 'prefixo', ''),
-            'inicio': timezone.localtime(p.inicio).isoformat() if p.inicio else None,
-        }
-        for p in pl_ativos
-    ]
-    # Avarias por viatura para os plantoes ativos (estado persistente)
-    avarias_by_viatura: dict[int, list[str]] = {}
-    try:
-        from viaturas.models import ViaturaAvariaEstado
-        v_ids = [p['viatura_id'] for p in pl_list]
-        estados = {e.viatura_id: e.get_labels() for e in ViaturaAvariaEstado.objects.filter(viatura_id__in=v_ids)}
-        avarias_by_viatura.update({vid: (labels or []) for vid, labels in estados.items()})
-    except Exception:
-        pass
 
-    return JsonResponse({
-        "agora": timezone.localtime().isoformat(), 
-        "ativos": data,
-        "despachos_count": despachos_count,
-        "despachos_pendentes_count": despachos_pendentes_count,
-        "panico_abertos_count": panico_abertos_count,
-        "plantoes": pl_list,
-        "avarias": [
-            {
-                'viatura_id': vid,
-                'viatura_prefixo': getattr(next((p for p in pl_ativos if p.viatura_id == vid), None), 'viatura', None).prefixo if next((p for p in pl_ativos if p.viatura_id == vid), None) else '',
-                'itens': itens
-            }
-            for vid, itens in avarias_by_viatura.items()
-        ]
-    })
+    Servido do snapshot em cache (cecom.painel_snapshot) com ETag: polls sem
+    mudanças no painel respondem 304 sem consultar o banco.
+    """
+    from . import painel_snapshot
+    corpo, etag = painel_snapshot.obter()
+    if etag in [t.strip() for t in request.headers.get('If-None-Match', '').split(',')]:
+        resp = HttpResponse(status=304)
+    else:
+        resp = HttpResponse(corpo, content_type='application/json')
+    resp['ETag'] = etag
+    resp['Cache-Control'] = 'private, no-cache'
+    return resp
 
 
 # ---------------- Localização em tempo real das Viaturas ----------------
@@ -1430,7 +1341,10 @@ def localizacao_post(request):
     Regras:
     - Usuário deve ter plantão ativo (iniciado ou participante) e estar vinculado a uma viatura
       via PlantaoCECOM.viatura.
-    - Atualiza/Cria ViaturaLocalizacao daquela viatura.
+    - Atualiza a ViaturaLocalizacao daquela viatura e a trilha (gravação em lote, ver cecom.gps_ingest).
+    - Aceita um ping ({latitude, longitude, ...}) ou um lote acumulado offline
+      ({"pontos": [{latitude, longitude, capturado_em, ...}, ...]}); a resposta do lote traz os
+      índices ``gravados`` e ``invalidos``, que o app tira da fila (o resto é reenviado).
     """
     if request.method != 'POST':
         return JsonResponse({'erro': 'Método não permitido'}, status=405)
@@ -1439,69 +1353,24 @@ def localizacao_post(request):
         body = json.loads(request.body.decode('utf-8') or '{}')
     except Exception:
         body = request.POST.dict()
+    if not isinstance(body, dict):
+        body = {}
 
-    lat = body.get('latitude')
-    lng = body.get('longitude')
-    precisao = body.get('precisao') or body.get('accuracy')
-    vel = body.get('velocidade') or body.get('speed')
-    dirg = body.get('direcao') or body.get('heading')
-
-    if lat is None or lng is None:
+    pontos = gps_ingest.normalizar(body)
+    if not pontos:
         return JsonResponse({'erro': 'latitude e longitude são obrigatórias'}, status=400)
 
     # Verificar plantão ativo do usuário (iniciado ou participante)
-    plantao = PlantaoCECOM.ativo_do_usuario_ou_participado(request.user)
-    if not plantao or not plantao.viatura_id or not plantao.ativo:
+    plantao_id, viatura_id = gps_ingest.plantao_do_usuario(request.user)
+    if not plantao_id:
         return JsonResponse({'erro': 'Sem plantão ativo ou viatura vinculada'}, status=403)
 
-    # Atualizar/criar localização
     try:
-        obj, _ = ViaturaLocalizacao.objects.get_or_create(viatura_id=plantao.viatura_id, defaults={
-            'latitude': lat,
-            'longitude': lng,
-        })
-        # Atribuições convertendo quando possível
-        obj.latitude = lat
-        obj.longitude = lng
-        obj.precisao_m = float(precisao) if precisao not in (None, '') else None
-        obj.velocidade_kmh = float(vel) if vel not in (None, '') else None
-        obj.direcao_graus = float(dirg) if dirg not in (None, '') else None
-        obj.origem_usuario = request.user
-        obj.origem_plantao = plantao
-        obj.save()
-
-        # Registrar ponto histórico (throttling: a cada 15s ou se deslocamento > ~15m)
-        should_add = True
-        last_pt = ViaturaLocalizacaoPonto.objects.filter(viatura_id=plantao.viatura_id).order_by('-capturado_em').first()
-        if last_pt:
-            dt_delta = timezone.now() - last_pt.capturado_em
-            # Distância aproximada usando fórmula simplificada (graus -> metros) válido para pequenas diferenças
-            try:
-                from math import cos, radians, sqrt
-                lat1 = float(last_pt.latitude); lon1 = float(last_pt.longitude)
-                lat2 = float(lat); lon2 = float(lng)
-                # Conversões aproximadas
-                dx = (lon2 - lon1) * 111320 * cos(radians((lat1+lat2)/2))
-                dy = (lat2 - lat1) * 110540
-                dist_m = sqrt(dx*dx + dy*dy)
-            except Exception:
-                dist_m = 0
-            if dt_delta.total_seconds() < 15 and dist_m < 15:
-                should_add = False
-        if should_add:
-            ViaturaLocalizacaoPonto.objects.create(
-                viatura_id=plantao.viatura_id,
-                plantao=plantao,
-                latitude=lat,
-                longitude=lng,
-                origem_usuario=request.user,
-                precisao_m=obj.precisao_m,
-            )
-            # Manter apenas últimos 400 pontos por viatura (limpeza simples)
-            qs_ids = list(ViaturaLocalizacaoPonto.objects.filter(viatura_id=plantao.viatura_id).order_by('-capturado_em').values_list('id', flat=True)[0:400])
-            ViaturaLocalizacaoPonto.objects.filter(viatura_id=plantao.viatura_id).exclude(id__in=qs_ids).delete()
-
-        return JsonResponse({'sucesso': True, 'atualizado_em': timezone.localtime(obj.atualizado_em).isoformat()})
+        lote = isinstance(body.get('pontos'), list)
+        resumo = gps_ingest.registrar(request.user.id, plantao_id, viatura_id, pontos, lote=lote)
+        if lote:
+            resumo['invalidos'] = gps_ingest.invalidos(body, pontos)
+        return JsonResponse({'sucesso': True, **resumo})
     except Exception as e:
         return JsonResponse({'erro': f'Falha ao salvar localização: {e}'}, status=500)
 
@@ -1510,43 +1379,63 @@ def localizacao_post(request):
 def localizacoes_ativas(request):
     """JSON com últimas localizações de viaturas com plantão ativo.
 
-    Inclui prefixo, id da viatura e timestamp de atualização.
+    Inclui prefixo, id da viatura e timestamp de atualização. Número fixo de
+    consultas, independente da frota: plantões + viaturas, equipe (Prefetch dos
+    participantes sem ``saida_em``, com usuário e perfil), localizações e
+    trilhas (uma consulta ou cache). Ver ``manage.py bench_mapa``.
     """
-    # Viaturas com plantão ativo
-    ativos = PlantaoCECOM.objects.select_related('viatura').filter(ativo=True, viatura__isnull=False)
-    v_ids = [p.viatura_id for p in ativos]
-
-    locs = (
-        ViaturaLocalizacao.objects
-        .select_related('viatura')
-        .filter(viatura_id__in=v_ids)
+    # Viaturas com plantão ativo, com a equipe atual já carregada
+    ativos = list(
+        PlantaoCECOM.objects.select_related('viatura')
+        .filter(ativo=True, viatura__isnull=False)
+        .prefetch_related(Prefetch(
+            'participantes',
+            queryset=PlantaoParticipante.objects.filter(saida_em__isnull=True)
+            .select_related('usuario__perfil').order_by('id'),
+            to_attr='equipe_ativa',
+        ))
     )
-
-    # Opcional: participantes/equipe pelo PlantaoCECOM
-    equipe_map = {}
-    for p in ativos.prefetch_related('participantes__usuario__perfil'):
+    v_ids = [p.viatura_id for p in ativos]
+    locs = {l.viatura_id: l for l in ViaturaLocalizacao.objects.filter(viatura_id__in=v_ids)}
+    # Trilha: últimos 30 minutos ou 120 pontos, simplificada e em encoded polyline
+    # (uma consulta para todas as viaturas, ver cecom.trilhas). ?trilha=pontos mantém
+    # o formato antigo [[lat, lng], ...] para clientes que ainda não decodificam.
+    trilhas_vtr = trilhas.trilhas_recentes(v_ids)
+    em_pontos = request.GET.get('trilha') == 'pontos'
+
+    data, sem_localizacao = [], []
+    # Viatura do usuário: primeiro plantão ativo (mais recente) em que ele está na equipe
+    viatura_usuario_id = None
+    for p in ativos:
+        v = p.viatura
         equipe = []
-        for part in p.participantes.filter(saida_em__isnull=True).select_related('usuario__perfil'):
+        for part in p.equipe_ativa:
             u = part.usuario
+            if u.id == request.user.id and viatura_usuario_id is None:
+                viatura_usuario_id = p.viatura_id
             perfil = getattr(u, 'perfil', None)
             equipe.append({
                 'nome': (u.get_full_name() or u.username).strip(),
                 'matricula': getattr(perfil, 'matricula', '') if perfil else ''
             })
-        equipe_map[p.viatura_id] = equipe
-
-    data = []
-    # Limites para trilha: últimos 30 minutos ou 120 pontos (o que vier primeiro)
-    from datetime import timedelta
-    cutoff = timezone.now() - timedelta(minutes=30)
-    for l in locs:
-        v = l.viatura
-        pontos_qs = ViaturaLocalizacaoPonto.objects.filter(viatura_id=v.id, capturado_em__gte=cutoff).order_by('-capturado_em')[:120]
-        # Ordenar cronologicamente ascendente para polyline
-        pts = [
-            [float(p.latitude), float(p.longitude)]
-            for p in reversed(list(pontos_qs))
-        ]
+        l = locs.get(v.id)
+        if l is None:
+            # Viatura ativa que ainda não possui registro de localização
+            sem_localizacao.append({
+                'viatura_id': v.id,
+                'prefixo': getattr(v, 'prefixo', ''),
+                'latitude': None,
+                'longitude': None,
+                'precisao_m': None,
+                'velocidade_kmh': None,
+                'direcao_graus': None,
+                'atualizado_em': None,
+                'equipe': equipe,
+                **({'trilha': []} if em_pontos else {'trilha_polyline': ''}),
+                'tem_localizacao': False,
+            })
+            continue
+        poly = trilhas_vtr.get(v.id, '')
         data.append({
             'viatura_id': v.id,
             'prefixo': getattr(v, 'prefixo', ''),
@@ -1556,41 +1445,25 @@ def localizacoes_ativas(request):
             'velocidade_kmh': l.velocidade_kmh,
             'direcao_graus': l.direcao_graus,
             'atualizado_em': timezone.localtime(l.atualizado_em).isoformat(),
-            'equipe': equipe_map.get(v.id, []),
-            'trilha': pts,
+            'equipe': equipe,
+            **({'trilha': trilhas.decodificar(poly)} if em_pontos else {'trilha_polyline': poly}),
             'tem_localizacao': True,
         })
 
-    # Adicionar viaturas ativas que não possuem registro atual de localização
-    localizadas_ids = {d['viatura_id'] for d in data}
-    for p in ativos:
-        if p.viatura_id and p.viatura_id not in localizadas_ids:
-            v = p.viatura
-            data.append({
-                'viatura_id': v.id,
-                'prefixo': getattr(v, 'prefixo', ''),
-                'latitude': None,
-                'longitude': None,
-                'precisao_m': None,
-                'velocidade_kmh': None,
-                'direcao_graus': None,
-                'atualizado_em': None,
-                'equipe': equipe_map.get(v.id, []),
-                'trilha': [],
-                'tem_localizacao': False,
-            })
-
-    # Identificar viatura do usuário (assumindo primeiro plantão ativo do usuário com viatura)
-    viatura_usuario_id = None
-    try:
-        user_pl = PlantaoCECOM.objects.filter(ativo=True, participantes__usuario=request.user, viatura__isnull=False).first()
-        if user_pl and user_pl.viatura_id:
-            viatura_usuario_id = user_pl.viatura_id
-    except Exception:
-        pass
-
     return JsonResponse({
         'agora': timezone.localtime().isoformat(),
-        'viaturas': data,
+        'viaturas': data + sem_localizacao,
         'viatura_usuario_id': viatura_usuario_id,
     })
+
+
+@login_required
+def plantao_trilha(request, pk):
+    """Trajeto completo de um PlantaoCECOM para replay no mapa.
+
+    Blocos de ``GPS_TRILHA_BLOCO_MIN`` minutos com a trilha simplificada em
+    encoded polyline e os instantes de cada ponto (``tempos``: deltas em
+    segundos a partir de ``primeiro_em``, mesmo formato). Ver cecom.trilhas.
+    """
+    plantao = get_object_or_404(PlantaoCECOM.objects.select_related('viatura'), pk=pk)
+    return JsonResponse(trilhas.replay_plantao(plantao))
@@ -0,0 +1,316 @@
+"""Assinatura em lote processada fora da requisição HTTP.
+
+`views.assinar_documentos_lote` apenas cria um `LoteAssinatura` (um item por
+documento) e dispara `iniciar(lote_id)`. Uma thread coordenadora no processo web:
+
+- prepara uma única vez por lote a imagem da assinatura (já normalizada), nome,
+  matrícula e cargo/classe do comandante, e busca os BOs de todos os itens numa
+  só consulta;
+- reivindica cada item com um UPDATE condicional (PENDENTE → PROCESSANDO), de
+  modo que duas execuções do mesmo lote nunca assinam o mesmo item;
+- executa `_append_assinatura` em paralelo (``ASSINATURA_LOTE_WORKERS``) em
+  threads ou processos (``ASSINATURA_LOTE_EXECUTOR``);
+- grava o resultado com UPDATE condicional no documento (só se ainda pendente),
+  o que torna o reprocessamento idempotente.
+
+Só a coordenadora acessa o banco; os workers (`common.assinatura_worker`) apenas
+montam o PDF.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from PIL import Image
+
+from . import assinatura_worker
+from .models import DocumentoAssinavel, LoteAssinatura, LoteAssinaturaItem
+
+logger = logging.getLogger(__name__)
+
+_RE_BO_NUMERO = re.compile(r'_BOGCMI?_(\d+-\d{4})')
+_RE_BO_PK = re.compile(r'_BOGCMI?_(\d+)\.pdf$')
+
+ESTADOS_PENDENTES = ('PENDENTE', 'PENDENTE_ADM')
+ESTADOS_FINAIS = ('ASSINADO', 'ASSINADO_ADM')
+
+
+def _workers() -> int:
+    return max(1, int(getattr(settings, 'ASSINATURA_LOTE_WORKERS', 2)))
+
+
+def _timeout_item() -> int:
+    return int(getattr(settings, 'ASSINATURA_LOTE_ITEM_TIMEOUT', 300))
+
+
+def numero_bo_do_arquivo(nome_arquivo: str):
+    """Número do BO (ex.: 64-2025) ou pk legado a partir do nome do PDF gerado."""
+    base = os.path.basename(nome_arquivo or '')
+    m = _RE_BO_NUMERO.search(base)
+    if m:
+        return m.group(1)
+    m = _RE_BO_PK.search(base)
+    return m.group(1) if m else None
+
+
+def titulo_assinatura(tipo: str) -> str:
+    if tipo in ('BOGCMI', 'BOGCM'):
+        return 'Despacho CMT/SUBCMT'
+    if tipo == 'LIVRO_CECOM':
+        return 'Despacho / Assinatura da Administração'
+    return 'Despacho / Assinatura do Comando/Sub Comando'
+
+
+class _Preparo:
+    """Dados do comandante comuns a todos os documentos do lote."""
+
+    def __init__(self, usuario):
+        from .views import _nome_primeiro_ultimo, _obter_assinatura_comando
+        img = _obter_assinatura_comando(usuario)
+        if img is not None:
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA')
+            # mesma normalização de _append_assinatura, feita uma única vez
+            img.thumbnail((240, 70), Image.LANCZOS)
+            img.load()
+        self.assinatura_img = img
+        self.nome = _nome_primeiro_ultimo(usuario.get_full_name() or usuario.username)
+        perfil = getattr(usuario, 'perfil', None)
+        self.matricula = getattr(perfil, 'matricula', None) if perfil else None
+        self.cargo = getattr(perfil, 'cargo', None) if perfil else None
+        self.classe = getattr(perfil, 'classe_legivel', None) if perfil else None
+
+
+def _bos_por_referencia(docs) -> dict:
+    """Busca em uma consulta os BOs referenciados pelos nomes de arquivo (numero ou pk)."""
+    from bogcmi.models import BO
+    numeros, pks = set(), set()
+    for doc in docs:
+        if doc.tipo not in ('BOGCMI', 'BOGCM'):
+            continue
+        ref = numero_bo_do_arquivo(doc.arquivo.name)
+        if ref and '-' in ref:
+            numeros.add(ref)
+        elif ref and ref.isdigit():
+            pks.add(int(ref))
+    if not numeros and not pks:
+        return {}
+    bos = {}
+    for bo in BO.objects.filter(Q(numero__in=numeros) | Q(pk__in=pks)):
+        if bo.numero:
+            bos[bo.numero] = bo
+        bos[str(bo.pk)] = bo
+    return bos
+
+
+def _executor(n: int):
+    workers = min(_workers(), max(1, n))
+    if getattr(settings, 'ASSINATURA_LOTE_EXECUTOR', 'threads') == 'processos':
+        import multiprocessing
+        # spawn: o processo web tem threads ativas, fork não é seguro
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=assinatura_worker.inicializar_processo)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='assinatura-lote')
+
+
+def _reivindicar(item_id: int) -> bool:
+    return LoteAssinaturaItem.objects.filter(pk=item_id, status='PENDENTE').update(
+        status='PROCESSANDO', tentativas=F('tentativas') + 1, erro='', atualizado_em=timezone.now(),
+    ) == 1
+
+
+def _marcar(item_id: int, status: str, erro: str = ''):
+    LoteAssinaturaItem.objects.filter(pk=item_id).update(status=status, erro=(erro or '')[:255], atualizado_em=timezone.now())
+
+
+def _concluir(item_id: int, doc: DocumentoAssinavel, ref_bo, bo, pdf: bytes, usuario):
+    numero_for_name = ref_bo or 'DOC'
+    ts = timezone.now()
+    hash8 = hashlib.sha256(f"ASSIN-{doc.id}-{numero_for_name}-{ts.timestamp()}".encode()).hexdigest()[:8]
+    caminho = f"{ts.year}/{ts:%Y%m%d_%H%M%S}_BOGCMI_{numero_for_name}_{doc.id}_SIGN_{hash8}.pdf"
+    doc.arquivo_assinado.save(caminho, ContentFile(pdf), save=False)
+    nome = doc.arquivo_assinado.name
+    with transaction.atomic():
+        alterados = DocumentoAssinavel.objects.filter(pk=doc.pk, status__in=ESTADOS_PENDENTES).update(
+            arquivo_assinado=nome,
+            status='ASSINADO_ADM' if doc.tipo == 'LIVRO_CECOM' else 'ASSINADO',
+            comando_assinou=True,
+            comando_assinou_em=ts,
+            comando_usuario=usuario,
+            updated_at=ts,
+        )
+    if not alterados:
+        # assinado por outro caminho enquanto processava: descarta a cópia e mantém o existente
+        try:
+            doc.arquivo_assinado.storage.delete(nome)
+        except Exception:
+            pass
+        _marcar(item_id, 'OK', 'Já estava assinado')
+        return
+    if doc.tipo == 'BOGCMI' and bo is not None and bo.status != 'ARQUIVADO':
+        try:
+            bo.status = 'ARQUIVADO'
+            bo.save(update_fields=['status'])
+        except Exception:
+            logger.exception('Falha ao arquivar BO %s após assinatura do documento %s', bo.pk, doc.pk)
+    _marcar(item_id, 'OK')
+
+
+def _fechar_lote(lote_id: int):
+    abertos = LoteAssinaturaItem.objects.filter(lote_id=lote_id, status__in=('PENDENTE', 'PROCESSANDO')).exists()
+    if abertos:
+        return
+    falhas = LoteAssinaturaItem.objects.filter(lote_id=lote_id, status='FALHA').exists()
+    LoteAssinatura.objects.filter(pk=lote_id).update(
+        status='CONCLUIDO_FALHAS' if falhas else 'CONCLUIDO',
+        concluido_em=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    # Os documentos foram assinados por UPDATE (sem sinais): atualiza os badges do topo
+    from core import badges
+    badges.invalidar()
+
+
+def processar_lote(lote_id: int):
+    """Processa os itens pendentes do lote (chamado na thread coordenadora)."""
+    close_old_connections()
+    try:
+        lote = LoteAssinatura.objects.select_related('usuario').get(pk=lote_id)
+        itens = list(lote.itens.filter(status='PENDENTE').select_related('documento'))
+        if not itens:
+            _fechar_lote(lote_id)
+            return
+        preparo = _Preparo(lote.usuario)
+        bos = _bos_por_referencia([i.documento for i in itens])
+        with _executor(len(itens)) as executor:
+            futuros = {}
+            for item in itens:
+                if not _reivindicar(item.pk):
+                    continue
+                doc = item.documento
+                try:
+                    # estado atual (outro usuário pode ter assinado após a criação do lote)
+                    status_atual = DocumentoAssinavel.objects.filter(pk=doc.pk).values_list('status', flat=True).first()
+                    if status_atual in ESTADOS_FINAIS:
+                        _marcar(item.pk, 'OK', 'Já estava assinado')
+                        continue
+                    if status_atual not in ESTADOS_PENDENTES:
+                        _marcar(item.pk, 'FALHA', 'Documento não está disponível para assinatura')
+                        continue
+                    ref_bo = numero_bo_do_arquivo(doc.arquivo.name) if doc.tipo in ('BOGCMI', 'BOGCM') else None
+                    bo = bos.get(ref_bo) if ref_bo else None
+                    qr = None
+                    if doc.tipo == 'BOGCMI' and bo is not None and ref_bo and '-' in ref_bo:
+                        try:
+                            from bogcmi.views_core import _gerar_qr_code_para_bo
+                            qr = _gerar_qr_code_para_bo(None, bo)
+                        except Exception:
+                            qr = None
+                    opcoes = {
+                        'titulo_assinatura': titulo_assinatura(doc.tipo),
+                        'bo_num': ref_bo,
+                        'data_emissao_dt': doc.created_at,
+                        'matricula': preparo.matricula,
+                        'cargo': preparo.cargo,
+                        'classe': preparo.classe,
+                        'qr_code_base64': qr,
+                    }
+                    fut = executor.submit(assinatura_worker.assinar_pdf, doc.arquivo.path, preparo.assinatura_img, preparo.nome, opcoes)
+                except Exception as e:
+                    _marcar(item.pk, 'FALHA', str(e))
+                    continue
+                futuros[fut] = (item.pk, doc, ref_bo, bo)
+            for fut in as_completed(futuros):
+                item_id, doc, ref_bo, bo = futuros[fut]
+                try:
+                    _concluir(item_id, doc, ref_bo, bo, fut.result(), lote.usuario)
+                except Exception as e:
+                    logger.warning('Lote %s: falha ao assinar documento %s: %s', lote_id, doc.pk, e)
+                    _marcar(item_id, 'FALHA', str(e) or e.__class__.__name__)
+        _fechar_lote(lote_id)
+    except Exception:
+        logger.exception('Falha no processamento do lote de assinatura %s', lote_id)
+    finally:
+        connection.close()
+
+
+def iniciar(lote_id: int):
+    """Dispara o processamento do lote em uma thread de segundo plano (após o commit)."""
+    def _start():
+        threading.Thread(target=processar_lote, args=(lote_id,), name=f'assinatura-lote-{lote_id}', daemon=True).start()
+    transaction.on_commit(_start)
+
+
+def criar_lote(usuario, ids) -> LoteAssinatura:
+    """Cria o lote com os documentos válidos (ids inexistentes são ignorados)."""
+    pks = []
+    for sid in ids:
+        try:
+            pk = int(sid)
+        except (TypeError, ValueError):
+            continue
+        if pk not in pks:
+            pks.append(pk)
+    existentes = set(DocumentoAssinavel.objects.filter(pk__in=pks).values_list('pk', flat=True))
+    pks = [pk for pk in pks if pk in existentes]
+    with transaction.atomic():
+        lote = LoteAssinatura.objects.create(usuario=usuario, total=len(pks))
+        LoteAssinaturaItem.objects.bulk_create([LoteAssinaturaItem(lote=lote, documento_id=pk) for pk in pks])
+        iniciar(lote.pk)
+    return lote
+
+
+def reprocessar(lote: LoteAssinatura) -> int:
+    """Volta para PENDENTE os itens com falha (e os presos em PROCESSANDO) e reinicia o lote.
+
+    Itens já assinados não são tocados; documentos assinados por outro caminho
+    são reconhecidos na nova execução e contam como OK.
+    """
+    limite = timezone.now() - timedelta(seconds=_timeout_item())
+    with transaction.atomic():
+        n = lote.itens.filter(
+            Q(status='FALHA') | Q(status='PROCESSANDO', atualizado_em__lt=limite)
+        ).update(status='PENDENTE', erro='', atualizado_em=timezone.now())
+        if n:
+            LoteAssinatura.objects.filter(pk=lote.pk).update(status='PROCESSANDO', concluido_em=None, updated_at=timezone.now())
+            iniciar(lote.pk)
+    return n
+
+
+def progresso(lote: LoteAssinatura) -> dict:
+    contagem = {s: 0 for s, _ in LoteAssinaturaItem.STATUS_CHOICES}
+    for row in lote.itens.values('status').annotate(n=Count('id')):
+        contagem[row['status']] = row['n']
+    itens = []
+    for item in lote.itens.select_related('documento').order_by('id'):
+        doc = item.documento
+        itens.append({
+            'id': item.pk,
+            'documento_id': doc.pk,
+            'documento': numero_bo_do_arquivo(doc.arquivo.name) or doc.nome_arquivo,
+            'status': item.status,
+            'status_display': item.get_status_display(),
+            'erro': item.erro,
+            'tentativas': item.tentativas,
+        })
+    lote.refresh_from_db(fields=['status', 'concluido_em'])
+    return {
+        'id': lote.pk,
+        'status': lote.status,
+        'status_display': lote.get_status_display(),
+        'total': lote.total,
+        'contagem': contagem,
+        'concluidos': contagem['OK'] + contagem['FALHA'],
+        'finalizado': lote.status != 'PROCESSANDO',
+        'itens': itens,
+    }
@@ -0,0 +1,18 @@
+"""Funções executadas nos workers da assinatura em lote (`common.assinatura_lote`).
+
+Ficam num módulo sem imports do Django no topo: com ``ASSINATURA_LOTE_EXECUTOR=processos``
+o processo filho (spawn) importa este módulo antes de ``django.setup()``.
+"""
+import os
+
+
+def inicializar_processo():
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gcm_project.settings')
+    django.setup()
+
+
+def assinar_pdf(pdf_path: str, assinatura_img, nome: str, opcoes: dict) -> bytes:
+    """Monta o PDF assinado (sem acesso ao banco)."""
+    from .views import _append_assinatura
+    return _append_assinatura(pdf_path, assinatura_img, nome, **opcoes)
@@ -0,0 +1,331 @@
+"""Gravação em lote da trilha de auditoria (`middleware.AuditLogMiddleware`).
+
+O middleware fazia um ``AuditLog.objects.create`` por requisição — um INSERT
+disputando o lock de escrita do SQLite em toda página e todo ping de GPS. Agora
+`registrar` só põe o registro num buffer limitado do processo e uma thread
+grava a cada ``AUDIT_FLUSH_MS`` com ``bulk_create``:
+
+- buffer cheio (``AUDIT_BUFFER_MAX``) ou falha ao gravar no banco: os registros
+  vão para o spool em disco (JSONL append-only em ``AUDIT_SPOOL_DIR``, um
+  arquivo por processo e por minuto), ingerido depois pela própria thread ou por
+  ``manage.py audit_spool``; só se o spool também falhar o registro é descartado;
+- a ingestão toma o arquivo por rename (``ingerindo-<pid>-…``); arquivo tomado por
+  processo que morreu (ou parado há mais de ``AUDIT_SPOOL_ORFAO_S``) é retomado;
+- lote recusado pelo banco por um registro ruim (IntegrityError/DataError, ex.:
+  usuário apagado, IP inválido no PostgreSQL): grava registro a registro e manda
+  só os recusados para a quarentena (``quarentena-*.jsonl`` no mesmo diretório,
+  não reingerida), em vez de devolver o lote inteiro ao spool para sempre;
+- ``AUDIT_MODO=spool`` grava sempre no spool (nenhum INSERT no processo web);
+  ``AUDIT_MODO=sincrono`` volta ao INSERT por requisição;
+- o buffer é gravado no encerramento do worker (atexit; o gunicorn encerra os
+  workers com ``sys.exit`` no SIGTERM/HUP);
+- `metricas` expõe os contadores do processo (enfileirados, gravados,
+  transbordados para o spool, descartados…).
+"""
+from __future__ import annotations
+
+import atexit
+import calendar
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+CAMPOS = ('user_id', 'method', 'path', 'action', 'querystring', 'body', 'ip', 'user_agent', 'created_at')
+MINUTO = "%Y%m%d%H%M"  # sufixo dos arquivos do spool (UTC)
+
+
+def _cfg(nome: str, padrao):
+    return getattr(settings, nome, padrao)
+
+
+class _Buffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.registros: deque[dict] = deque()
+        self.evento = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.ultima_ingestao = 0.0
+        self.contadores = dict.fromkeys(
+            ('enfileirados', 'gravados', 'lotes', 'transbordados', 'descartados', 'falhas', 'ingeridos',
+             'quarentena'), 0)
+
+    def contar(self, nome: str, n: int = 1):
+        with self.lock:
+            self.contadores[nome] += n
+
+    def garantir_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(target=self._loop, name="audit-flush", daemon=True)
+                    self.thread.start()
+
+    def _loop(self):
+        while True:
+            self.evento.wait(float(_cfg("AUDIT_FLUSH_MS", 1000)) / 1000.0)
+            self.evento.clear()
+            try:
+                descarregar()
+                if time.monotonic() - self.ultima_ingestao > 60:
+                    self.ultima_ingestao = time.monotonic()
+                    ingerir_spool()
+            except Exception as e:
+                logger.warning("[AUDIT] falha ao gravar buffer: %s", e)
+            finally:
+                close_old_connections()
+
+
+_buffer = _Buffer()
+
+
+# ---------------------------------------------------------------- spool JSONL
+
+def _spool_dir() -> Path:
+    return Path(_cfg("AUDIT_SPOOL_DIR", Path(settings.BASE_DIR) / "cache" / "audit"))
+
+
+def _serializar(r: dict) -> str:
+    return json.dumps({**r, 'created_at': r['created_at'].isoformat()}, ensure_ascii=False)
+
+
+def _para_spool(registros: list[dict]) -> bool:
+    if not registros:
+        return True
+    try:
+        pasta = _spool_dir()
+        pasta.mkdir(parents=True, exist_ok=True)
+        linhas = "".join(_serializar(r) + "\n" for r in registros)
+        # Um arquivo por processo (append sem disputa entre workers) e por minuto: o arquivo
+        # de um minuto encerrado não recebe mais appends e pode ser ingerido mesmo com tráfego
+        nome = f"audit-{os.getpid()}-{time.strftime(MINUTO, time.gmtime())}.jsonl"
+        with open(pasta / nome, "a", encoding="utf-8") as f:
+            f.write(linhas)
+        _buffer.contar('transbordados', len(registros))
+        return True
+    except Exception as e:
+        logger.warning("[AUDIT] falha no spool, %d registro(s) descartado(s): %s", len(registros), e)
+        _buffer.contar('descartados', len(registros))
+        return False
+
+
+def _quarentena(registros: list[dict]):
+    """Registros que o banco recusa (não voltam ao spool; ficam para análise)."""
+    if not registros:
+        return
+    try:
+        pasta = _spool_dir()
+        pasta.mkdir(parents=True, exist_ok=True)
+        with open(pasta / f"quarentena-{os.getpid()}.jsonl", "a", encoding="utf-8") as f:
+            f.write("".join(_serializar(r) + "\n" for r in registros))
+        _buffer.contar('quarentena', len(registros))
+    except Exception as e:
+        logger.warning("[AUDIT] falha na quarentena, %d registro(s) descartado(s): %s", len(registros), e)
+        _buffer.contar('descartados', len(registros))
+
+
+def _gravar(registros: list[dict]) -> list[dict]:
+    """Grava o lote e devolve os registros recusados pelo banco.
+
+    Lote inteiro numa transação; se um registro ruim derruba o lote
+    (IntegrityError/DataError), grava um a um e devolve só os que falharem.
+    Outras falhas (banco travado/indisponível) sobem: o lote vai inteiro para o spool.
+    """
+    try:
+        with transaction.atomic():
+            AuditLog.objects.bulk_create([AuditLog(**r) for r in registros], batch_size=int(_cfg("AUDIT_LOTE", 500)))
+        return []
+    except (IntegrityError, DataError) as e:
+        logger.warning("[AUDIT] lote de %d recusado, gravando um a um: %s", len(registros), e)
+    recusados = []
+    for r in registros:
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create([AuditLog(**r)])
+        except (IntegrityError, DataError):
+            recusados.append(r)
+    return recusados
+
+
+def _ip(valor):
+    """IP válido ou None (GenericIPAddressField recusa o lote inteiro no PostgreSQL)."""
+    try:
+        return str(ipaddress.ip_address(str(valor).strip())) if valor else None
+    except ValueError:
+        return None
+
+
+def _fechado(arq: Path, agora: float) -> bool:
+    """O arquivo do spool não recebe mais appends?"""
+    partes = arq.stem.split('-')  # audit-<pid>-<minuto> | audit-retorno-<ns> | audit-<pid> (formato anterior)
+    if len(partes) == 3 and partes[1].isdigit() and len(partes[2]) == 12 and partes[2].isdigit():
+        return agora > calendar.timegm(time.strptime(partes[2], MINUTO)) + 60 + 5
+    try:
+        return arq.stat().st_mtime < agora - 5  # ninguém mais escreve nos demais; só espera o último append
+    except OSError:
+        return False
+
+
+def _orfao(arq: Path, agora: float) -> bool:
+    """``ingerindo-<pid>-<ns>-…`` de um processo morto ou parado há mais de ``AUDIT_SPOOL_ORFAO_S``."""
+    try:
+        _, pid, tomado_ns, _ = arq.name.split('-', 3)
+        pid, tomado_em = int(pid), int(tomado_ns) / 1e9
+    except ValueError:
+        return False
+    if agora - tomado_em > float(_cfg("AUDIT_SPOOL_ORFAO_S", 600)):
+        return True
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass  # processo existe (de outro usuário)
+    return False
+
+
+def ingerir_spool() -> int:
+    """Grava no banco os arquivos do spool. Retorna quantos registros foram gravados.
+
+    Arquivo retomado de um processo que morreu depois do INSERT e antes de apagá-lo é
+    gravado de novo (duplica registros em vez de perdê-los).
+    """
+    pasta = _spool_dir()
+    if not pasta.is_dir():
+        return 0
+    total = 0
+    agora = time.time()
+    candidatos = [(a, a.name) for a in sorted(pasta.glob("audit-*.jsonl")) if _fechado(a, agora)]
+    candidatos += [(a, a.name.split('-', 3)[3]) for a in sorted(pasta.glob("ingerindo-*")) if _orfao(a, agora)]
+    for arq, nome in candidatos:
+        # rename atômico: só um processo ingere (ou retoma) cada arquivo
+        tomado = arq.with_name(f"ingerindo-{os.getpid()}-{time.time_ns()}-{nome}")
+        try:
+            arq.rename(tomado)
+        except OSError:
+            continue
+        registros, invalidas = [], 0
+        with open(tomado, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    d = json.loads(linha)
+                    criado = parse_datetime(d.get('created_at') or '')
+                    registros.append({k: d.get(k) for k in CAMPOS} | {
+                        'created_at': criado or timezone.now(),
+                        'action': d.get('action') or '',
+                        'querystring': d.get('querystring') or '',
+                        'body': d.get('body') or '',
+                        'user_agent': d.get('user_agent') or '',
+                        'ip': _ip(d.get('ip')),
+                    })
+                except Exception:
+                    invalidas += 1  # linha cortada (processo morto no meio do append)
+        try:
+            recusados = _gravar(registros)
+        except Exception as e:
+            # devolve para a próxima rodada
+            tomado.rename(arq.with_name(f"audit-retorno-{time.time_ns()}.jsonl"))
+            logger.warning("[AUDIT] falha ao ingerir %s: %s", nome, e)
+            continue
+        _quarentena(recusados)
+        tomado.unlink(missing_ok=True)
+        if invalidas:
+            logger.warning("[AUDIT] %d linha(s) inválida(s) em %s", invalidas, nome)
+        total += len(registros) - len(recusados)
+    if total:
+        _buffer.contar('ingeridos', total)
+    return total
+
+
+# ---------------------------------------------------------------- buffer
+
+def descarregar() -> int:
+    """Grava o buffer deste processo. Retorna quantos registros foram gravados no banco."""
+    with _buffer.lock:
+        registros = list(_buffer.registros)
+        _buffer.registros.clear()
+    if not registros:
+        return 0
+    try:
+        recusados = _gravar(registros)
+    except Exception as e:
+        # banco ocupado/indisponível: não perde, vai para o spool
+        logger.warning("[AUDIT] falha no bulk_create (%d registros), usando spool: %s", len(registros), e)
+        _buffer.contar('falhas')
+        _para_spool(registros)
+        return 0
+    _quarentena(recusados)
+    gravados = len(registros) - len(recusados)
+    with _buffer.lock:
+        _buffer.contadores['gravados'] += gravados
+        _buffer.contadores['lotes'] += 1
+    return gravados
+
+
+@atexit.register
+def _descarregar_ao_sair():
+    try:
+        descarregar()
+    except Exception:
+        pass
+
+
+def registrar(**campos):
+    """Enfileira um registro de auditoria (nunca levanta exceção)."""
+    campos.setdefault('created_at', timezone.now())
+    modo = _cfg("AUDIT_MODO", "buffer")
+    try:
+        campos['ip'] = _ip(campos.get('ip'))
+        if modo == "sincrono":
+            AuditLog.objects.create(**campos)
+            return
+        if modo == "spool":
+            _para_spool([campos])
+            return
+        limite = int(_cfg("AUDIT_BUFFER_MAX", 5000))
+        with _buffer.lock:
+            cheio = len(_buffer.registros) >= limite
+            if not cheio:
+                _buffer.registros.append(campos)
+                _buffer.contadores['enfileirados'] += 1
+                acordar = len(_buffer.registros) >= int(_cfg("AUDIT_LOTE", 500))
+        if cheio:
+            # gravação atrasada (banco travado): transborda para o disco em vez de crescer sem limite
+            _para_spool([campos])
+            _buffer.evento.set()
+            return
+        _buffer.garantir_thread()
+        if acordar:
+            _buffer.evento.set()
+    except Exception:
+        # Não quebra a requisição por erro de auditoria
+        _buffer.contar('descartados')
+
+
+def metricas() -> dict:
+    with _buffer.lock:
+        dados = dict(_buffer.contadores)
+        dados['no_buffer'] = len(_buffer.registros)
+    dados['pid'] = os.getpid()
+    dados['modo'] = _cfg("AUDIT_MODO", "buffer")
+    try:
+        dados['spool_arquivos'] = len(list(_spool_dir().glob("audit-*.jsonl")))
+        dados['quarentena_arquivos'] = len(list(_spool_dir().glob("quarentena-*.jsonl")))
+    except Exception:
+        dados['spool_arquivos'] = dados['quarentena_arquivos'] = None
+    return dados
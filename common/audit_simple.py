@@ -24,6 +24,23 @@ def record(
     - extra: dicionário opcional serializado como texto (debug/inspeção)
     - app: rótulo do app (auto do obj._meta.app_label quando possível)
     """
+    try:
+        _montar(request, event=event, obj=obj, message=message, extra=extra, app=app).save()
+    except Exception:
+        # Não interromper o fluxo da aplicação por falha de logging simplificado
+        pass
+
+
+def record_many(request: Optional[HttpRequest], eventos: list[dict]) -> None:
+    """Registra vários eventos com um único INSERT (mesmos argumentos de `record` em cada dict)."""
+    try:
+        dados_req = _dados_requisicao(request)
+        SimpleLog.objects.bulk_create([_montar(None, _req=dados_req, **ev) for ev in eventos], batch_size=500)
+    except Exception:
+        pass
+
+
+def _dados_requisicao(request: Optional[HttpRequest]) -> dict:
     user = None
     ip = None
     ua = ""
@@ -47,7 +64,10 @@ def record(
             path = getattr(request, 'path', '') or ''
         except Exception:
             path = ""
+    return {'user': user, 'ip': ip, 'user_agent': ua, 'path': path[:512]}
+
 
+def _montar(request, *, event, obj=None, message="", extra=None, app=None, _req=None) -> SimpleLog:
     content_type = None
     object_id = None
     target_repr = ""
@@ -66,21 +86,14 @@ def record(
         except Exception:
             pass
 
-    try:
-        SimpleLog.objects.create(
-            user=user,
-            app_label=(app_label or "core")[:50],
-            event=(event or "EVENTO")[:50],
-            message=(message or "")[:255],
-            content_type=content_type,
-            object_id=object_id,
-            target_repr=target_repr,
-            path=path[:512],
-            ip=ip,
-            user_agent=ua,
-            extra=SimpleLog.dumps(extra) if hasattr(SimpleLog, 'dumps') else (''),
-            created_at=timezone.now(),
-        )
-    except Exception:
-        # Não interromper o fluxo da aplicação por falha de logging simplificado
-        pass
+    return SimpleLog(
+        **(_req if _req is not None else _dados_requisicao(request)),
+        app_label=(app_label or "core")[:50],
+        event=(event or "EVENTO")[:50],
+        message=(message or "")[:255],
+        content_type=content_type,
+        object_id=object_id,
+        target_repr=target_repr,
+        extra=SimpleLog.dumps(extra) if hasattr(SimpleLog, 'dumps') else (''),
+        created_at=timezone.now(),
+    )
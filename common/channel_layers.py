@@ -0,0 +1,222 @@
+"""Channel layer em arquivo SQLite para testes locais com vários processos.
+
+Substituto do channels_redis quando não há Redis disponível (carga/integração
+com vários workers daphne na mesma máquina). Não usar em produção.
+
+- cada processo tem um prefixo próprio; canais específicos são
+  ``<prefixo>!<id>`` e um único poller por event loop busca as mensagens do
+  prefixo e as distribui para as filas locais;
+- ``group_send`` grava uma linha por processo com a lista de canais destino
+  (fan-out local no processo receptor, como o pub/sub do Redis);
+- mensagens são serializadas em JSON.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from collections import defaultdict
+
+from channels.layers import BaseChannelLayer
+
+logger = logging.getLogger(__name__)
+
+_ESQUEMA = (
+    "CREATE TABLE IF NOT EXISTS mensagens ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT, prefixo TEXT NOT NULL, canais TEXT NOT NULL,"
+    " corpo TEXT NOT NULL, expira REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS mensagens_prefixo ON mensagens (prefixo, id)",
+    "CREATE TABLE IF NOT EXISTS grupos ("
+    " grupo TEXT NOT NULL, canal TEXT NOT NULL, expira REAL NOT NULL, PRIMARY KEY (grupo, canal))",
+)
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    extensions = ["groups", "flush"]
+
+    def __init__(self, path, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None,
+                 intervalo_poll=0.01, lote=500):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity)
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self.path = str(path)
+        self.group_expiry = group_expiry
+        self.intervalo_poll = float(intervalo_poll)
+        self.lote = int(lote)
+        self.prefixo = f"sqlite.{uuid.uuid4().hex[:12]}"
+        self._local = threading.local()
+        self._esquema_lock = threading.Lock()
+        self._esquema_ok = False
+        self._estados: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    # ---------------- acesso ao banco (executado em threads) ----------------
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            pasta = os.path.dirname(self.path)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._esquema_lock:
+                if not self._esquema_ok:
+                    for sql in _ESQUEMA:
+                        conn.execute(sql)
+                    self._esquema_ok = True
+            self._local.conn = conn
+        return conn
+
+    def _inserir(self, linhas):
+        conn = self._conn()
+        conn.executemany("INSERT INTO mensagens (prefixo, canais, corpo, expira) VALUES (?, ?, ?, ?)", linhas)
+
+    def _group_send_sync(self, grupo: str, corpo: str) -> int:
+        conn = self._conn()
+        agora = time.time()
+        canais = [r[0] for r in conn.execute("SELECT canal FROM grupos WHERE grupo = ? AND expira > ?", (grupo, agora))]
+        por_prefixo = defaultdict(list)
+        for canal in canais:
+            por_prefixo[self.non_local_name(canal)].append(canal)
+        if por_prefixo:
+            expira = agora + self.expiry
+            self._inserir([(p, json.dumps(chs), corpo, expira) for p, chs in por_prefixo.items()])
+        return len(canais)
+
+    def _buscar(self, prefixos):
+        conn = self._conn()
+        marcadores = ','.join('?' * len(prefixos))
+        # leitura barata sem lock; só trava para consumir se houver algo
+        if conn.execute(f"SELECT 1 FROM mensagens WHERE prefixo IN ({marcadores}) LIMIT 1", prefixos).fetchone() is None:
+            return []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            linhas = conn.execute(
+                f"SELECT id, canais, corpo, expira FROM mensagens WHERE prefixo IN ({marcadores}) ORDER BY id LIMIT ?",
+                (*prefixos, self.lote),
+            ).fetchall()
+            if linhas:
+                conn.executemany("DELETE FROM mensagens WHERE id = ?", [(r[0],) for r in linhas])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        agora = time.time()
+        return [(r[1], r[2]) for r in linhas if r[3] > agora]
+
+    def _limpar_expirados(self):
+        agora = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM mensagens WHERE expira < ?", (agora,))
+        conn.execute("DELETE FROM grupos WHERE expira < ?", (agora,))
+
+    # ---------------- estado por event loop ----------------
+
+    def _estado(self) -> dict:
+        loop = asyncio.get_running_loop()
+        estado = self._estados.get(loop)
+        if estado is None:
+            estado = {'filas': {}, 'uso': {}, 'prefixos': {self.prefixo + '!'}, 'tarefa': None}
+            self._estados[loop] = estado
+        tarefa = estado['tarefa']
+        if tarefa is None or tarefa.done():
+            estado['tarefa'] = loop.create_task(self._poller(estado))
+        return estado
+
+    async def _poller(self, estado):
+        ultima_limpeza = time.monotonic()
+        while True:
+            try:
+                linhas = await asyncio.to_thread(self._buscar, tuple(estado['prefixos']))
+            except Exception as e:
+                logger.warning("SQLiteChannelLayer: falha no poll: %s", e)
+                await asyncio.sleep(1)
+                continue
+            for canais, corpo in linhas:
+                for canal in json.loads(canais):
+                    fila = estado['filas'].get(canal)
+                    if fila is None:
+                        fila = estado['filas'][canal] = asyncio.Queue()
+                        estado['uso'][canal] = time.monotonic()
+                    if fila.qsize() < self.get_capacity(canal):
+                        fila.put_nowait(json.loads(corpo))
+            if not linhas:
+                await asyncio.sleep(self.intervalo_poll)
+            if time.monotonic() - ultima_limpeza > 5:
+                ultima_limpeza = time.monotonic()
+                limite = ultima_limpeza - self.expiry * 2
+                for canal in [c for c, t in estado['uso'].items() if t < limite]:
+                    estado['uso'].pop(canal, None)
+                    estado['filas'].pop(canal, None)
+                try:
+                    await asyncio.to_thread(self._limpar_expirados)
+                except Exception:
+                    pass
+
+    # ---------------- API de channel layer ----------------
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        assert "__asgi_channel__" not in message
+        await asyncio.to_thread(
+            self._inserir,
+            [(self.non_local_name(channel), json.dumps([channel]), json.dumps(message), time.time() + self.expiry)],
+        )
+
+    async def receive(self, channel):
+        assert self.valid_channel_name(channel)
+        estado = self._estado()
+        if "!" not in channel:
+            estado['prefixos'].add(channel)
+        fila = estado['filas'].get(channel)
+        if fila is None:
+            fila = estado['filas'][channel] = asyncio.Queue()
+        estado['uso'][channel] = time.monotonic()
+        try:
+            return await fila.get()
+        finally:
+            estado['uso'][channel] = time.monotonic()
+
+    async def new_channel(self, prefix="specific"):
+        return f"{self.prefixo}!{prefix}.{uuid.uuid4().hex[:12]}"
+
+    async def flush(self):
+        def _flush():
+            conn = self._conn()
+            conn.execute("DELETE FROM mensagens")
+            conn.execute("DELETE FROM grupos")
+        await asyncio.to_thread(_flush)
+        self._estados = weakref.WeakKeyDictionary()
+
+    async def close(self):
+        pass
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+
+        def _add():
+            self._conn().execute(
+                "INSERT OR REPLACE INTO grupos (grupo, canal, expira) VALUES (?, ?, ?)",
+                (group, channel, time.time() + self.group_expiry),
+            )
+        await asyncio.to_thread(_add)
+
+    async def group_discard(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        await asyncio.to_thread(
+            lambda: self._conn().execute("DELETE FROM grupos WHERE grupo = ? AND canal = ?", (group, channel))
+        )
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        assert self.valid_group_name(group), "Group name not valid"
+        await asyncio.to_thread(self._group_send_sync, group, json.dumps(message))
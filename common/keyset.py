@@ -0,0 +1,121 @@
+"""Paginação por chave (keyset) e contagem estimada para listas grandes.
+
+``Paginator`` faz ``COUNT(*)`` a cada página e ``OFFSET`` cresce com o número da
+página; em tabelas de milhões de linhas (AuditLog, SimpleLog) as duas coisas
+varrem o índice inteiro. Aqui:
+
+- `paginar` devolve a página seguinte/anterior a partir de um cursor com os
+  valores da ordenação da última/primeira linha (``?apos=`` / ``?antes=``), com
+  ``WHERE (created_at, id) < (...)`` — custo constante em qualquer profundidade;
+- `contar` devolve a contagem exata só quando pedida; sem filtros estima pelo
+  intervalo de ids (ou ``pg_class.reltuples`` no PostgreSQL) e com filtros conta
+  até ``limite`` linhas ("10.000+").
+"""
+from __future__ import annotations
+
+import base64
+import json
+
+from django.db import connection
+from django.db.models import Q
+
+
+class Pagina:
+    def __init__(self, object_list, has_next, has_previous, next_cursor, prev_cursor):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _campos(ordem) -> list[tuple[str, bool]]:
+    return [(c.lstrip('-'), c.startswith('-')) for c in ordem]
+
+
+def _codificar(valores: list) -> str:
+    bruto = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def _decodificar(model, campos, cursor: str):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+        if len(valores) != len(campos):
+            return None
+        return [model._meta.get_field(nome).to_python(v) for (nome, _), v in zip(campos, valores)]
+    except Exception:
+        return None
+
+
+def _depois_de(campos, valores, para_tras: bool) -> Q:
+    """Linhas depois do cursor na ordenação (ou antes, ``para_tras``), em comparação lexicográfica."""
+    cond = Q()
+    for i, (nome, desc) in enumerate(campos):
+        op = 'lt' if desc != para_tras else 'gt'
+        termo = Q(**{f"{nome}__{op}": valores[i]})
+        for nome_ant, v_ant in zip((c[0] for c in campos[:i]), valores[:i]):
+            termo &= Q(**{nome_ant: v_ant})
+        cond |= termo
+    # Limite redundante no primeiro campo: o OR sozinho não vira busca por intervalo no índice
+    nome, desc = campos[0]
+    return Q(**{f"{nome}__{'lte' if desc != para_tras else 'gte'}": valores[0]}) & cond
+
+
+def paginar(qs, por_pagina: int, apos: str | None = None, antes: str | None = None,
+            ordem=('-created_at', '-id')) -> Pagina:
+    """Página de ``qs`` na ordem ``ordem`` (o último campo deve ser único, ex.: ``id``)."""
+    campos = _campos(ordem)
+    cursor = apos or antes
+    valores = _decodificar(qs.model, campos, cursor) if cursor else None
+    para_tras = bool(antes) and valores is not None
+    if para_tras:
+        inversa = [('' if desc else '-') + nome for nome, desc in campos]
+        linhas = list(qs.filter(_depois_de(campos, valores, True)).order_by(*inversa)[:por_pagina + 1])
+        has_previous = len(linhas) > por_pagina
+        linhas = linhas[:por_pagina][::-1]
+        has_next = True
+    else:
+        if valores is not None:
+            qs = qs.filter(_depois_de(campos, valores, False))
+        linhas = list(qs.order_by(*ordem)[:por_pagina + 1])
+        has_next = len(linhas) > por_pagina
+        linhas = linhas[:por_pagina]
+        has_previous = valores is not None
+
+    def _cursor(obj):
+        return _codificar([getattr(obj, nome) for nome, _ in campos])
+
+    return Pagina(
+        linhas,
+        has_next=has_next and bool(linhas),
+        has_previous=has_previous and bool(linhas),
+        next_cursor=_cursor(linhas[-1]) if linhas else None,
+        prev_cursor=_cursor(linhas[0]) if linhas else None,
+    )
+
+
+def contar(qs, exata: bool = False, limite: int = 10000) -> dict:
+    """{'valor': n, 'aproximada': bool, 'mais_de': bool} para exibir "Total ~n"."""
+    if exata:
+        return {'valor': qs.count(), 'aproximada': False, 'mais_de': False}
+    if not qs.query.where:
+        tabela = qs.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cur:
+                cur.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [tabela])
+                linha = cur.fetchone()
+            if linha and linha[0] and linha[0] > 0:
+                return {'valor': int(linha[0]), 'aproximada': True, 'mais_de': False}
+        # Fora do PostgreSQL não há estatística confiável (max(id)-min(id) conta as lacunas
+        # de exclusão): COUNT(*) sem filtro, que o SQLite resolve pelo menor índice
+        return {'valor': qs.order_by().count(), 'aproximada': False, 'mais_de': False}
+    n = qs.order_by()[:limite + 1].count()
+    return {'valor': min(n, limite), 'aproximada': n > limite, 'mais_de': n > limite}
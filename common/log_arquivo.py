@@ -0,0 +1,105 @@
+"""Arquivamento mensal de AuditLog e SimpleLog.
+
+As tabelas de log só crescem; a lista do administrativo e os filtros ficam lentos
+e o SQLite não tem particionamento. `arquivar` move os meses anteriores a
+``LOG_MESES_ONLINE`` para arquivos JSONL comprimidos, um por mês
+(``LOG_ARQUIVO_DIR/<chave>/<AAAA-MM>.jsonl.gz``), em lotes por id:
+
+- cada lote é acrescentado ao arquivo do mês como um novo membro gzip (o arquivo
+  continua legível com ``zcat``/``gzip.open``) e só depois apagado do banco;
+- uma interrupção entre a escrita e a exclusão pode repetir linhas no arquivo na
+  próxima execução (o campo ``id`` permite descartar duplicatas), nunca perdê-las;
+- `meses_arquivados` lista os arquivos para download na tela de logs.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AuditLog, SimpleLog
+
+MODELOS = {
+    'auditoria': AuditLog,
+    'simples': SimpleLog,
+}
+
+
+def _cfg(nome: str, padrao):
+    return getattr(settings, nome, padrao)
+
+
+def pasta(chave: str) -> Path:
+    return Path(_cfg("LOG_ARQUIVO_DIR", Path(settings.BASE_DIR) / "cache" / "logs")) / chave
+
+
+def corte(meses: int | None = None) -> datetime:
+    """Início (hora local) do mês mais antigo mantido no banco."""
+    meses = int(meses if meses is not None else _cfg("LOG_MESES_ONLINE", 6))
+    hoje = timezone.localdate()
+    ano, mes = divmod(hoje.year * 12 + hoje.month - 1 - max(0, meses), 12)
+    return timezone.make_aware(datetime(ano, mes + 1, 1))
+
+
+def _linha(d: dict) -> str:
+    return json.dumps({k: (v.isoformat() if hasattr(v, 'isoformat') else v) for k, v in d.items()},
+                      ensure_ascii=False)
+
+
+def arquivar(chave: str, meses: int | None = None, lote: int = 5000) -> dict[str, int]:
+    """Move para o arquivo os registros anteriores a `corte`. Retorna {mês: registros}."""
+    model = MODELOS[chave]
+    limite = corte(meses)
+    destino = pasta(chave)
+    destino.mkdir(parents=True, exist_ok=True)
+    campos = [f.attname for f in model._meta.concrete_fields]
+    por_mes: dict[str, int] = {}
+    ultimo_id = 0
+    while True:
+        linhas = list(
+            model.objects.filter(created_at__lt=limite, id__gt=ultimo_id)
+            .order_by('id').values(*campos)[:lote]
+        )
+        if not linhas:
+            break
+        grupos: dict[str, list[str]] = {}
+        for d in linhas:
+            mes = timezone.localtime(d['created_at']).strftime('%Y-%m')
+            grupos.setdefault(mes, []).append(_linha(d))
+        for mes, conteudo in grupos.items():
+            with open(destino / f"{mes}.jsonl.gz", "ab") as f:
+                f.write(gzip.compress(("\n".join(conteudo) + "\n").encode("utf-8")))
+                f.flush()
+                os.fsync(f.fileno())
+            por_mes[mes] = por_mes.get(mes, 0) + len(conteudo)
+        ids = [d['id'] for d in linhas]
+        with transaction.atomic():
+            model.objects.filter(id__in=ids).delete()
+        ultimo_id = ids[-1]
+    return por_mes
+
+
+def meses_arquivados(chave: str) -> list[dict]:
+    """[{'mes': 'AAAA-MM', 'tamanho': bytes}] do mais recente para o mais antigo."""
+    try:
+        arquivos = sorted(pasta(chave).glob("????-??.jsonl.gz"), reverse=True)
+        return [{'mes': a.name[:7], 'tamanho': a.stat().st_size} for a in arquivos]
+    except Exception:
+        return []
+
+
+def arquivo_do_mes(chave: str, mes: str) -> Path | None:
+    if chave not in MODELOS:
+        return None
+    try:
+        datetime.strptime(mes, '%Y-%m')
+    except ValueError:
+        return None
+    caminho = pasta(chave) / f"{mes}.jsonl.gz"
+    return caminho if caminho.is_file() else None
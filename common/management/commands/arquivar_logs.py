@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from common import log_arquivo
+
+
+class Command(BaseCommand):
+    help = ("Move AuditLog/SimpleLog anteriores a LOG_MESES_ONLINE meses para arquivos mensais "
+            "JSONL comprimidos (common.log_arquivo, LOG_ARQUIVO_DIR).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=None, help='Meses mantidos no banco (padrão LOG_MESES_ONLINE).')
+        parser.add_argument('--so', choices=sorted(log_arquivo.MODELOS), default=None,
+                            help='Arquivar só um dos logs.')
+        parser.add_argument('--lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        chaves = [options['so']] if options['so'] else sorted(log_arquivo.MODELOS)
+        self.stdout.write(f"Arquivando registros anteriores a {log_arquivo.corte(options['meses']):%Y-%m-%d}")
+        for chave in chaves:
+            por_mes = log_arquivo.arquivar(chave, meses=options['meses'], lote=max(100, options['lote']))
+            for mes, n in sorted(por_mes.items()):
+                self.stdout.write(f"  {chave} {mes}: {n} registro(s)")
+            if not por_mes:
+                self.stdout.write(f"  {chave}: nada a arquivar")
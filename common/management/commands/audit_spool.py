@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from common import audit_buffer
+
+
+class Command(BaseCommand):
+    help = "Ingere no banco o spool JSONL da auditoria (common.audit_buffer, AUDIT_SPOOL_DIR)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help='Continua ingerindo a cada --intervalo segundos.')
+        parser.add_argument('--intervalo', type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                n = audit_buffer.ingerir_spool()
+                if n:
+                    self.stdout.write(f"{n} registro(s) de auditoria gravado(s)")
+            except Exception as e:
+                self.stderr.write(f"Falha na ingestão: {e}")
+            finally:
+                close_old_connections()
+            if not options['continuo']:
+                return
+            time.sleep(max(0.5, options['intervalo']))
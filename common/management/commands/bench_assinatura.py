@@ -0,0 +1,151 @@
+import base64
+import hashlib
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from PIL import Image, ImageDraw
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from common import pagina_assinatura
+
+
+def _pdf_teste(paginas: int, seed: int) -> bytes:
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    for p in range(paginas):
+        c.setFont('Helvetica', 9)
+        for linha in range(60):
+            c.drawString(40, 800 - linha * 12, f"Documento {seed} página {p + 1} linha {linha + 1} " + "x" * 70)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def _assinatura_teste() -> Image.Image:
+    img = Image.new('RGBA', (600, 180), (255, 255, 255, 0))
+    d = ImageDraw.Draw(img)
+    d.line([(20, 140), (120, 40), (200, 150), (320, 30), (420, 140), (580, 60)], fill=(10, 10, 80, 255), width=6)
+    return img
+
+
+def _qr_teste(i: int) -> str:
+    import qrcode
+    buf = BytesIO()
+    qrcode.make(f"https://exemplo.invalid/bogcmi/validar/{i}/{'a' * 32}/").save(buf, format='PNG')
+    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+def _legado(pdf_path, assinatura_img, nome, titulo, bo_num, data_emissao_dt, matricula, cargo, classe, qr_code_base64):
+    """Implementação anterior de _append_assinatura (sem logs de debug), para comparação."""
+    from PyPDF2 import PdfReader, PdfWriter
+    assinatura_buff = BytesIO()
+    c = canvas.Canvas(assinatura_buff, pagesize=A4)
+    w, h = A4
+    assinatura_img.thumbnail((240, 70), Image.LANCZOS)
+    img_buf = BytesIO(); assinatura_img.save(img_buf, format='PNG'); img_buf.seek(0)
+    card_width, card_height = w - 100, 210
+    card_bottom = (h / 2) - (card_height / 2) + 50
+    card_left = 50
+    c.setFillColorRGB(1, 1, 1); c.setStrokeColorRGB(229 / 255.0, 231 / 255.0, 235 / 255.0); c.setLineWidth(1)
+    c.roundRect(card_left, card_bottom, card_width, card_height, 8, stroke=1, fill=1)
+    inner_x, inner_y = card_left + 14, card_bottom + 14
+    inner_w, inner_h = card_width - 28, card_height - 28
+    c.setFillColorRGB(0, 0, 0); c.setFont('Helvetica-Bold', 11)
+    c.drawString(inner_x + 6, inner_y + inner_h - 24, titulo)
+    assinatura_y = inner_y + inner_h / 2 - 8
+    center_x = card_left + card_width / 2
+    c.drawImage(ImageReader(img_buf), center_x - (assinatura_img.width / 2), assinatura_y, width=assinatura_img.width, height=assinatura_img.height, mask='auto')
+    linha_y = assinatura_y - 10
+    c.line(center_x - 120, linha_y, center_x + 120, linha_y)
+    c.setFont('Helvetica', 10); c.drawCentredString(center_x, linha_y - 16, nome)
+    c.setFont('Helvetica', 9); c.drawCentredString(center_x, linha_y - 30, f"Mat: {matricula}")
+    c.drawCentredString(center_x, linha_y - 44, f"{cargo} - {classe}")
+    qr_img = Image.open(BytesIO(base64.b64decode(qr_code_base64.split(',')[-1])))
+    qr_img.thumbnail((90, 90), Image.LANCZOS)
+    qr_buf = BytesIO(); qr_img.save(qr_buf, format='PNG'); qr_buf.seek(0)
+    qr_x = inner_x + inner_w - qr_img.width - 8
+    qr_y = inner_y + (inner_h - qr_img.height) / 2
+    c.roundRect(qr_x - 4, qr_y - 4, qr_img.width + 8, qr_img.height + 8, 6, stroke=1, fill=1)
+    c.drawImage(ImageReader(qr_buf), qr_x, qr_y, width=qr_img.width, height=qr_img.height, mask='auto')
+    c.setFont('Helvetica', 6); c.drawCentredString(qr_x + qr_img.width / 2, qr_y - 12, 'Verificação Online')
+    c.showPage(); c.save()
+    with open(pdf_path, 'rb') as fsrc:
+        orig = PdfReader(fsrc, strict=False)
+        writer = PdfWriter()
+        for p in orig.pages:
+            writer.add_page(p)
+        for p in PdfReader(BytesIO(assinatura_buff.getvalue()), strict=False).pages:
+            writer.add_page(p)
+        out_buf = BytesIO(); writer.write(out_buf)
+    merged = out_buf.getvalue()
+    PdfReader(BytesIO(merged), strict=False)  # validação de contagem
+    base_reader = PdfReader(BytesIO(merged))
+    final_writer = PdfWriter()
+    num_total = len(base_reader.pages)
+    data_text = f"Data/Hora: {timezone.localtime(data_emissao_dt):%d/%m/%Y %H:%M}"
+    for idx in range(num_total):
+        page = base_reader.pages[idx]
+        tmp_buf = BytesIO(); tmp_w = PdfWriter(); tmp_w.add_page(page); tmp_w.write(tmp_buf)
+        packet = BytesIO(); can = canvas.Canvas(packet, pagesize=A4)
+        can.setFont('Helvetica', 7)
+        can.drawRightString(A4[0] - 36, 18, f"Página {idx + 1} / {num_total}")
+        can.drawString(36, 18, f"BO Nº {bo_num}   H:{hashlib.sha256(tmp_buf.getvalue()).hexdigest()[:12].upper()}")
+        can.drawCentredString(A4[0] / 2, 18, data_text)
+        can.save(); packet.seek(0)
+        page.merge_page(PdfReader(packet).pages[0])
+        final_writer.add_page(page)
+    out_final = BytesIO(); final_writer.write(out_final)
+    return out_final.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark da assinatura: N documentos com a implementação anterior x cartão em cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documentos', type=int, default=100)
+        parser.add_argument('--paginas', type=int, default=3, help='Páginas de cada documento original.')
+        parser.add_argument('--sem-legado', action='store_true', help='Mede apenas a implementação atual.')
+
+    def handle(self, *args, **options):
+        n = max(1, options['documentos'])
+        assinatura = _assinatura_teste()
+        agora = timezone.now()
+        comum = dict(matricula='12345', cargo='Inspetor', classe='Classe Distinta')
+        with tempfile.TemporaryDirectory() as td:
+            caminhos, qrs = [], []
+            for i in range(n):
+                path = os.path.join(td, f"doc_{i}_BOGCMI_{i + 1}-2026.pdf")
+                with open(path, 'wb') as f:
+                    f.write(_pdf_teste(options['paginas'], i))
+                caminhos.append(path)
+                qrs.append(_qr_teste(i))
+
+            def rodar(func, copiar_img):
+                t0 = time.perf_counter()
+                tamanho = 0
+                for i, path in enumerate(caminhos):
+                    img = assinatura.copy() if copiar_img else assinatura
+                    out = func(path, img, 'Fulano Silva', 'Despacho CMT/SUBCMT', f"{i + 1}-2026", agora,
+                               comum['matricula'], comum['cargo'], comum['classe'], qrs[i])
+                    tamanho += len(out)
+                return time.perf_counter() - t0, tamanho
+
+            def novo(path, img, nome, titulo, bo_num, dt, matricula, cargo, classe, qr):
+                return pagina_assinatura.anexar(path, img, nome, titulo, bo_num=bo_num, data_emissao_dt=dt,
+                                                matricula=matricula, cargo=cargo, classe=classe, qr_code_base64=qr)
+
+            self.stdout.write(f"{n} documentos x {options['paginas']} página(s)")
+            if not options['sem_legado']:
+                t_leg, b_leg = rodar(_legado, True)
+                self.stdout.write(f"  legado: {t_leg:7.2f}s  {t_leg / n * 1000:7.1f} ms/doc  {b_leg / n / 1024:7.1f} KiB/doc")
+            t_novo, b_novo = rodar(novo, False)
+            self.stdout.write(f"  cache:  {t_novo:7.2f}s  {t_novo / n * 1000:7.1f} ms/doc  {b_novo / n / 1024:7.1f} KiB/doc")
+            if not options['sem_legado'] and t_novo:
+                self.stdout.write(f"  ganho: {t_leg / t_novo:.1f}x")
+            self.stdout.write(f"  cartões: {pagina_assinatura.metricas()}")
@@ -0,0 +1,82 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from common import push_fake
+from common.models import PushDevice
+from common.views import _should_disable_push_token, enviar_push
+
+
+def _legado(tokens, title, body, data):
+    """Algoritmo anterior de enviar_push (lotes em série, UPDATE por token, fallback em série)."""
+    m = push_fake
+    params = {'data': data, 'notification': m.Notification(title=title, body=body),
+              'android': m.AndroidConfig(priority='high')}
+    success = 0
+    try:
+        for i in range(0, len(tokens), 500):
+            chunk = tokens[i:i + 500]
+            resp = m.send_multicast(m.MulticastMessage(tokens=chunk, **params))
+            success += resp.success_count
+            for idx, r in enumerate(resp.responses):
+                if not r.success and _should_disable_push_token(r.exception):
+                    with transaction.atomic():
+                        PushDevice.objects.filter(token=chunk[idx]).update(enabled=False)
+        return success
+    except Exception:
+        for t in tokens:
+            try:
+                m.send(m.Message(token=t, **params))
+                success += 1
+            except Exception as e:
+                if _should_disable_push_token(e):
+                    with transaction.atomic():
+                        PushDevice.objects.filter(token=t).update(enabled=False)
+        return success
+
+
+class Command(BaseCommand):
+    help = "Benchmark de enviar_push com o backend falso do FCM (common.push_fake)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=800)
+        parser.add_argument('--invalidos', type=float, default=0.1, help='Fração de tokens inválidos.')
+        parser.add_argument('--latencia-ms', type=float, default=80, help='Latência simulada por chamada ao FCM.')
+        parser.add_argument('--falha-lote', action='store_true', help='Simula falha do envio em lote (fallback por token).')
+        parser.add_argument('--sem-legado', action='store_true')
+
+    def handle(self, *args, **options):
+        logging.getLogger('common.views').setLevel(logging.WARNING)  # um log por lote/token distorce a medição
+        n = max(1, options['tokens'])
+        n_inv = int(n * options['invalidos'])
+        tokens = [f"invalido-bench-{i:06d}" if i < n_inv else f"bench-{i:06d}" for i in range(n)]
+        PushDevice.objects.filter(token__in=tokens).delete()
+        try:
+            with override_settings(PUSH_BACKEND='fake', PUSH_FAKE_LATENCIA_MS=options['latencia_ms'],
+                                   PUSH_FAKE_FALHA_LOTE=options['falha_lote']):
+                self.stdout.write(f"{n} tokens ({n_inv} inválidos), latência {options['latencia_ms']:.0f} ms/chamada"
+                                  + (", lote falhando" if options['falha_lote'] else ""))
+
+                def rodar(rotulo, func):
+                    PushDevice.objects.filter(token__in=tokens).delete()
+                    PushDevice.objects.bulk_create([PushDevice(token=t) for t in tokens])
+                    push_fake.contadores(resetar=True)
+                    t0 = time.perf_counter()
+                    ok = func()
+                    dt = time.perf_counter() - t0
+                    desativados = PushDevice.objects.filter(token__in=tokens, enabled=False).count()
+                    c = push_fake.contadores()
+                    self.stdout.write(f"  {rotulo:8s} {dt:7.2f}s  {n / dt:8.0f} tokens/s  sucesso={ok} "
+                                      f"desativados={desativados} chamadas={c['lotes'] + c['individuais']}")
+                    return dt
+
+                if not options['sem_legado']:
+                    t_leg = rodar('legado', lambda: _legado(tokens, 'Bench', 'Corpo', {'kind': 'bench'}))
+                t_novo = rodar('atual', lambda: enviar_push(tokens, 'Bench', 'Corpo', {'kind': 'bench'}))
+                if not options['sem_legado'] and t_novo:
+                    self.stdout.write(f"  ganho: {t_leg / t_novo:.1f}x")
+        finally:
+            PushDevice.objects.filter(token__in=tokens).delete()
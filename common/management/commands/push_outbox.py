@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from common import push_outbox
+
+
+class Command(BaseCommand):
+    help = "Worker da fila de push FCM (common.push_outbox): drena a fila com retentativa e backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uma-vez', action='store_true', help='Drena o que estiver pronto e sai.')
+        parser.add_argument('--intervalo', type=float, default=1.0, help='Segundos entre rodadas com a fila vazia.')
+        parser.add_argument('--limpar-dias', type=int, default=7,
+                            help='Remove itens enviados há mais de N dias (0 desliga).')
+        parser.add_argument('--metricas', action='store_true', help='Apenas imprime as métricas da fila.')
+
+    def handle(self, *args, **options):
+        if options['metricas']:
+            for tipo, m in sorted(push_outbox.metricas()['tipos'].items()):
+                self.stdout.write(f"{tipo}: {m}")
+            return
+        ultima_limpeza = 0.0
+        while True:
+            try:
+                n = push_outbox.drenar()
+                if n:
+                    self.stdout.write(f"{n} item(ns) processado(s)")
+                if options['limpar_dias'] and time.monotonic() - ultima_limpeza > 3600:
+                    ultima_limpeza = time.monotonic()
+                    removidos = push_outbox.limpar(options['limpar_dias'])
+                    if removidos:
+                        self.stdout.write(f"{removidos} item(ns) antigo(s) removido(s)")
+            except Exception as e:
+                self.stderr.write(f"Falha na drenagem: {e}")
+                n = 0
+            finally:
+                close_old_connections()
+            if options['uma_vez'] and not n:
+                return
+            if not n:
+                time.sleep(options['intervalo'])
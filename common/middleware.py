@@ -5,7 +5,7 @@ from django.conf import settings
 from django.utils.timezone import now
 from django.http import HttpRequest
 
-from .models import AuditLog
+from . import audit_buffer
 
 
 class AuditLogMiddleware(MiddlewareMixin):
@@ -40,7 +40,8 @@ class AuditLogMiddleware(MiddlewareMixin):
             # Capturar corpo apenas para métodos de escrita
             if method in ('POST', 'PUT', 'PATCH', 'DELETE'):
                 try:
-                    raw = request.body.decode('utf-8', errors='ignore')
+                    # Só o início do corpo (uploads grandes não são decodificados inteiros)
+                    raw = request.body[:4000].decode('utf-8', errors='ignore')
                 except Exception:
                     raw = ''
                 # Sanitização básica: esconder senhas/tokens
@@ -48,10 +49,11 @@ class AuditLogMiddleware(MiddlewareMixin):
                     raw = raw.replace(key, f"{key[0]}***")
                 body = raw[:2000]
 
-            AuditLog.objects.create(
-                user=user,
+            # Gravação em lote fora da requisição (common.audit_buffer)
+            audit_buffer.registrar(
+                user_id=user.pk if user else None,
                 method=method,
-                path=path,
+                path=path[:512],
                 action='',
                 querystring=query,
                 body=body,
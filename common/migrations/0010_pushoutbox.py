@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0009_loteassinatura'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(db_index=True, help_text='kind do payload: panico, panico_status, despacho…', max_length=32)),
+                ('destino', models.CharField(choices=[('USUARIOS', 'Usuários informados'), ('PLANTAO_CECOM', 'Plantão CECOM ativo'), ('TODOS', 'Todos os dispositivos ativos')], default='USUARIOS', max_length=16)),
+                ('usuarios', models.TextField(blank=True, help_text='IDs de usuário (JSON) quando destino=USUARIOS')),
+                ('titulo', models.CharField(blank=True, max_length=150)),
+                ('corpo', models.CharField(blank=True, max_length=255)),
+                ('dados', models.TextField(blank=True, help_text='Payload data do FCM (JSON)')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('ENVIANDO', 'Enviando'), ('ENVIADO', 'Enviado'), ('FALHA', 'Falha')], default='PENDENTE', max_length=10)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('proxima_tentativa_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('erro', models.CharField(blank=True, max_length=255)),
+                ('tokens', models.PositiveIntegerField(default=0)),
+                ('sucessos', models.PositiveIntegerField(default=0)),
+                ('desativados', models.PositiveIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reivindicado_em', models.DateTimeField(blank=True, null=True)),
+                ('enviado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('id',),
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa_em'], name='common_push_status_229f45_idx'), models.Index(fields=['tipo', 'status', 'enviado_em'], name='common_push_tipo_0ec178_idx')],
+            },
+        ),
+    ]
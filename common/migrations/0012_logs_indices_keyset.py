@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0011_auditlog_created_at_default'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='common_audi_created_5f768f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='simplelog',
+            name='common_simp_created_acadb1_idx',
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['created_at', 'id'], name='common_audi_created_ee38d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', 'created_at'], name='common_audi_user_id_8b57b8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simplelog',
+            index=models.Index(fields=['created_at', 'id'], name='common_simp_created_766e77_idx'),
+        ),
+    ]
@@ -162,12 +162,15 @@ class AuditLog(models.Model):
     body = models.TextField(blank=True, help_text="Corpo da requisição (truncado)")
     ip = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.CharField(max_length=512, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # default (e não auto_now_add): a gravação em lote (common.audit_buffer) preserva o instante da requisição
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ("-created_at",)
         indexes = [
-            models.Index(fields=["created_at"]),
+            # (created_at, id): filtro por período e paginação por chave (common.keyset)
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["user", "created_at"]),
             models.Index(fields=["method"]),
             models.Index(fields=["path"]),
         ]
@@ -303,7 +306,7 @@ class SimpleLog(models.Model):
     class Meta:
         ordering = ("-created_at", "-id")
         indexes = [
-            models.Index(fields=["created_at"]),
+            models.Index(fields=["created_at", "id"]),
             models.Index(fields=["app_label", "event", "created_at"]),
             models.Index(fields=["user", "created_at"]),
         ]
@@ -390,3 +393,95 @@ class TokenAcessoPdf(TimeStamped):
         self.usado_em = timezone.now()
         self.save(update_fields=['usado', 'usado_em'])
 
+
+
+class LoteAssinatura(TimeStamped):
+    """Lote de assinatura em segundo plano (ver `common.assinatura_lote`).
+
+    O formulário de assinatura em lote cria o lote com um item por documento e
+    retorna imediatamente; a página do lote acompanha o progresso por polling.
+    """
+    STATUS_CHOICES = (
+        ("PROCESSANDO", "Processando"),
+        ("CONCLUIDO", "Concluído"),
+        ("CONCLUIDO_FALHAS", "Concluído com falhas"),
+    )
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="lotes_assinatura")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PROCESSANDO", db_index=True)
+    total = models.PositiveIntegerField(default=0)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+
+    def __str__(self):
+        return f"Lote de assinatura #{self.id} ({self.get_status_display()})"
+
+
+class LoteAssinaturaItem(models.Model):
+    STATUS_CHOICES = (
+        ("PENDENTE", "Pendente"),
+        ("PROCESSANDO", "Processando"),
+        ("OK", "Assinado"),
+        ("FALHA", "Falha"),
+    )
+    lote = models.ForeignKey(LoteAssinatura, on_delete=models.CASCADE, related_name="itens")
+    documento = models.ForeignKey(DocumentoAssinavel, on_delete=models.CASCADE, related_name="+")
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default="PENDENTE", db_index=True)
+    erro = models.CharField(max_length=255, blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("id",)
+        constraints = [
+            models.UniqueConstraint(fields=["lote", "documento"], name="common_loteitem_lote_doc_uniq"),
+        ]
+
+    def __str__(self):  # pragma: no cover
+        return f"Lote {self.lote_id} doc {self.documento_id}: {self.status}"
+
+
+class PushOutbox(models.Model):
+    """Fila de notificações push (FCM) entregues fora da requisição (ver `common.push_outbox`).
+
+    Quem gera a notificação grava a linha na mesma transação do evento; os
+    tokens são resolvidos só no envio, a partir de ``destino``/``usuarios``.
+    """
+    STATUS_CHOICES = (
+        ("PENDENTE", "Pendente"),
+        ("ENVIANDO", "Enviando"),
+        ("ENVIADO", "Enviado"),
+        ("FALHA", "Falha"),
+    )
+    DESTINO_CHOICES = (
+        ("USUARIOS", "Usuários informados"),
+        ("PLANTAO_CECOM", "Plantão CECOM ativo"),
+        ("TODOS", "Todos os dispositivos ativos"),
+    )
+    tipo = models.CharField(max_length=32, db_index=True, help_text="kind do payload: panico, panico_status, despacho…")
+    destino = models.CharField(max_length=16, choices=DESTINO_CHOICES, default="USUARIOS")
+    usuarios = models.TextField(blank=True, help_text="IDs de usuário (JSON) quando destino=USUARIOS")
+    titulo = models.CharField(max_length=150, blank=True)
+    corpo = models.CharField(max_length=255, blank=True)
+    dados = models.TextField(blank=True, help_text="Payload data do FCM (JSON)")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PENDENTE")
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    proxima_tentativa_em = models.DateTimeField(default=timezone.now)
+    erro = models.CharField(max_length=255, blank=True)
+    tokens = models.PositiveIntegerField(default=0)
+    sucessos = models.PositiveIntegerField(default=0)
+    desativados = models.PositiveIntegerField(default=0)
+    criado_em = models.DateTimeField(default=timezone.now)
+    reivindicado_em = models.DateTimeField(null=True, blank=True)
+    enviado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("id",)
+        indexes = [
+            models.Index(fields=["status", "proxima_tentativa_em"]),
+            models.Index(fields=["tipo", "status", "enviado_em"]),
+        ]
+
+    def __str__(self):  # pragma: no cover
+        return f"Push {self.tipo} #{self.id} ({self.status})"
@@ -0,0 +1,356 @@
+"""Página de assinatura do comando anexada aos documentos (`views._append_assinatura`).
+
+- O cartão (moldura, título, imagem da assinatura, linha, nome, matrícula e
+  cargo/classe) é desenhado com ReportLab uma vez por combinação de assinatura,
+  nome, título e cargo/classe e fica em cache no processo (LRU).
+- Por documento entram apenas os campos variáveis: o QR de verificação (imagem
+  inserida direto na página do cartão) e o rodapé de cada página (BO nº,
+  data/hora, hash e "Página X / Y"), gravados como streams de conteúdo
+  anexados à página — sem ``merge_page`` nem canvas por página.
+- Se a leitura do original falhar com uma biblioteca (pypdf/PyPDF2), tenta a
+  outra antes de desistir. Nenhuma página é rasterizada.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Optional
+
+from django.utils import timezone
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+CARTAO_CACHE_MAX = 16
+
+_BIBLIOTECAS = []
+try:
+    import pypdf as _pypdf
+    from pypdf import generic as _pypdf_generic
+    _BIBLIOTECAS.append(('pypdf', _pypdf.PdfReader, _pypdf.PdfWriter, _pypdf_generic))
+except ImportError:  # pragma: no cover - produção pode ter só PyPDF2
+    pass
+try:
+    import PyPDF2 as _pypdf2
+    from PyPDF2 import generic as _pypdf2_generic
+    _BIBLIOTECAS.append(('PyPDF2', _pypdf2.PdfReader, _pypdf2.PdfWriter, _pypdf2_generic))
+except ImportError:  # pragma: no cover
+    pass
+
+# Geometria do cartão (mesma do layout histórico)
+_W, _H = A4
+_CARD_LEFT = 50
+_CARD_W = _W - 100
+_CARD_H = 210
+_CARD_BOTTOM = (_H / 2) - (_CARD_H / 2) + 50
+_INNER_MARGIN = 14
+_INNER_X = _CARD_LEFT + _INNER_MARGIN
+_INNER_Y = _CARD_BOTTOM + _INNER_MARGIN
+_INNER_W = _CARD_W - _INNER_MARGIN * 2
+_INNER_H = _CARD_H - _INNER_MARGIN * 2
+_BORDA = (229 / 255.0, 231 / 255.0, 235 / 255.0)
+
+_FONTE_RODAPE = '/GcmHelv'
+_TAM_RODAPE = 7
+
+
+def _posicao_qr(qr_w: int, qr_h: int) -> tuple[float, float]:
+    return _INNER_X + _INNER_W - qr_w - 8, _INNER_Y + (_INNER_H - qr_h) / 2
+
+
+def _desenhar_cartao(assinatura_img, nome, titulo, matricula, cargo, classe, qr_tam) -> bytes:
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    if assinatura_img is None:
+        c.setFillColorRGB(0, 0, 0)
+        c.setFont('Helvetica-Bold', 12)
+        c.drawString(50, _H - 80, titulo)
+        c.setFont('Helvetica', 12)
+        c.drawString(50, _H - 110, '(Sem assinatura cadastrada)')
+        c.showPage(); c.save()
+        return buf.getvalue()
+
+    img = assinatura_img.copy()
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA')
+    # Normalizar tamanho para padronizar com o documento do BO (assinatura do encarregado): max 240x70
+    img.thumbnail((240, 70), Image.LANCZOS)
+    img_buf = BytesIO()
+    img.save(img_buf, format='PNG')
+    img_buf.seek(0)
+
+    c.setFillColorRGB(1, 1, 1)
+    c.setStrokeColorRGB(*_BORDA)
+    c.setLineWidth(1)
+    c.roundRect(_CARD_LEFT, _CARD_BOTTOM, _CARD_W, _CARD_H, 8, stroke=1, fill=1)
+
+    c.setFillColorRGB(0, 0, 0)
+    c.setFont('Helvetica-Bold', 11)
+    c.drawString(_INNER_X + 6, _INNER_Y + _INNER_H - 24, titulo)
+
+    assinatura_y = _INNER_Y + _INNER_H / 2 - 8
+    center_x = _CARD_LEFT + _CARD_W / 2
+    c.drawImage(ImageReader(img_buf), center_x - (img.width / 2), assinatura_y, width=img.width, height=img.height, mask='auto')
+
+    linha_w = 240
+    linha_x1 = center_x - (linha_w / 2)
+    linha_y = assinatura_y - 10
+    c.setStrokeColorRGB(0.07, 0.08, 0.12)
+    c.setLineWidth(1.0)
+    c.line(linha_x1, linha_y, linha_x1 + linha_w, linha_y)
+
+    c.setFillColorRGB(0, 0, 0)
+    c.setFont('Helvetica', 10)
+    c.drawCentredString(center_x, linha_y - 16, nome)
+    next_y = linha_y - 30
+    if matricula:
+        c.setFont('Helvetica', 9)
+        c.drawCentredString(center_x, next_y, f"Mat: {matricula}")
+        next_y -= 14
+    info_cargo = [x for x in (cargo, classe) if x]
+    if info_cargo:
+        c.setFont('Helvetica', 9)
+        c.drawCentredString(center_x, next_y, ' - '.join(info_cargo))
+
+    # Moldura e legenda do QR ficam no cartão; a imagem do QR entra por documento
+    if qr_tam:
+        qr_w, qr_h = qr_tam
+        qr_x, qr_y = _posicao_qr(qr_w, qr_h)
+        c.setFillColorRGB(1, 1, 1)
+        c.setStrokeColorRGB(*_BORDA)
+        c.setLineWidth(0.8)
+        c.roundRect(qr_x - 4, qr_y - 4, qr_w + 8, qr_h + 8, 6, stroke=1, fill=1)
+        c.setFillColorRGB(0.22, 0.25, 0.31)
+        c.setFont('Helvetica', 6)
+        c.drawCentredString(qr_x + qr_w / 2, qr_y - 12, 'Verificação Online')
+    c.showPage(); c.save()
+    return buf.getvalue()
+
+
+class _Cartao:
+    """PDF de uma página com o cartão; leitores por biblioteca criados sob demanda."""
+
+    def __init__(self, pdf_bytes: bytes):
+        self.pdf_bytes = pdf_bytes
+        self._leitores = {}
+        self._lock = threading.Lock()
+
+    def anexar_em(self, lib: str, PdfReader, writer):
+        # o leitor compartilhado lê do mesmo buffer: a cópia para o writer é serializada
+        with self._lock:
+            leitor = self._leitores.get(lib)
+            if leitor is None:
+                leitor = self._leitores[lib] = PdfReader(BytesIO(self.pdf_bytes))
+            writer.add_page(leitor.pages[0])
+        return writer.pages[-1]
+
+
+_cartoes: "OrderedDict[tuple, _Cartao]" = OrderedDict()
+_cartoes_lock = threading.Lock()
+_contadores = {'hits': 0, 'misses': 0}
+
+
+def _assinatura_digest(img) -> str:
+    if img is None:
+        return ''
+    return hashlib.sha1(img.tobytes() + f"{img.mode}{img.size}".encode()).hexdigest()
+
+
+def cartao(assinatura_img, nome, titulo, matricula=None, cargo=None, classe=None, qr_tam=None) -> _Cartao:
+    """Cartão em cache para o comandante/título (e tamanho do QR, que define a moldura)."""
+    if assinatura_img is None:
+        qr_tam = None
+    chave = (_assinatura_digest(assinatura_img), nome or '', titulo or '', matricula or '', cargo or '', classe or '', qr_tam)
+    with _cartoes_lock:
+        item = _cartoes.get(chave)
+        if item is not None:
+            _cartoes.move_to_end(chave)
+            _contadores['hits'] += 1
+            return item
+        _contadores['misses'] += 1
+    item = _Cartao(_desenhar_cartao(assinatura_img, nome, titulo, matricula, cargo, classe, qr_tam))
+    with _cartoes_lock:
+        _cartoes[chave] = item
+        while len(_cartoes) > CARTAO_CACHE_MAX:
+            _cartoes.popitem(last=False)
+    return item
+
+
+def metricas() -> dict:
+    with _cartoes_lock:
+        return {**_contadores, 'cartoes': len(_cartoes)}
+
+
+def _qr_imagem(qr_code_base64: Optional[str]):
+    if not qr_code_base64:
+        return None
+    try:
+        img = Image.open(BytesIO(base64.b64decode(qr_code_base64.split(',')[-1])))
+        img.thumbnail((90, 90), Image.LANCZOS)
+        return img.convert('L')
+    except Exception:
+        return None
+
+
+def _texto_pdf(texto: str) -> bytes:
+    raw = texto.encode('cp1252', errors='replace')
+    return b'(' + raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _tj(x: float, y: float, texto: str) -> bytes:
+    return b'BT %s %d Tf 1 0 0 1 %.2f %.2f Tm ' % (_FONTE_RODAPE.encode(), _TAM_RODAPE, x, y) + _texto_pdf(texto) + b' Tj ET\n'
+
+
+def _largura(texto: str) -> float:
+    return stringWidth(texto, 'Helvetica', _TAM_RODAPE)
+
+
+def _rodape(idx: int, total: int, largura: float, bo_text, data_text, page_hash) -> bytes:
+    y = 18
+    partes = [b'0 g\n']
+    pag = f"Página {idx + 1} / {total}"
+    partes.append(_tj(largura - 36 - _largura(pag), y, pag))
+    esquerda = [p for p in (bo_text, f"H:{page_hash}" if page_hash else None) if p]
+    if esquerda:
+        partes.append(_tj(36, y, '   '.join(esquerda)))
+    if data_text:
+        partes.append(_tj(largura / 2 - _largura(data_text) / 2, y, data_text))
+    return b''.join(partes)
+
+
+class _Montagem:
+    """Objetos auxiliares de um PDF de saída (uma biblioteca, um writer)."""
+
+    def __init__(self, writer, g):
+        self.writer = writer
+        self.g = g
+        self.abre = self.stream(b'q\n')
+        fonte = g.DictionaryObject({
+            g.NameObject('/Type'): g.NameObject('/Font'),
+            g.NameObject('/Subtype'): g.NameObject('/Type1'),
+            g.NameObject('/BaseFont'): g.NameObject('/Helvetica'),
+            g.NameObject('/Encoding'): g.NameObject('/WinAnsiEncoding'),
+        })
+        self.fonte = writer._add_object(fonte)
+
+    def stream(self, data: bytes):
+        s = self.g.DecodedStreamObject()
+        s.set_data(data)
+        return self.writer._add_object(s)
+
+    def imagem(self, img):
+        s = self.g.DecodedStreamObject()
+        s.set_data(img.tobytes())
+        s = s.flate_encode()  # PyPDF2 não copia as chaves do dicionário no flate_encode
+        s.update({
+            self.g.NameObject('/Type'): self.g.NameObject('/XObject'),
+            self.g.NameObject('/Subtype'): self.g.NameObject('/Image'),
+            self.g.NameObject('/Width'): self.g.NumberObject(img.width),
+            self.g.NameObject('/Height'): self.g.NumberObject(img.height),
+            self.g.NameObject('/ColorSpace'): self.g.NameObject('/DeviceGray'),
+            self.g.NameObject('/BitsPerComponent'): self.g.NumberObject(8),
+        })
+        return self.writer._add_object(s)
+
+    def recurso(self, pagina, tipo: str, nome: str, ref):
+        g = self.g
+        if '/Resources' in pagina:
+            recursos = pagina['/Resources'].get_object()
+        else:
+            recursos = g.DictionaryObject()
+            pagina[g.NameObject('/Resources')] = recursos
+        if tipo in recursos:
+            dic = recursos[tipo].get_object()
+        else:
+            dic = g.DictionaryObject()
+            recursos[g.NameObject(tipo)] = dic
+        dic[g.NameObject(nome)] = ref
+
+    def conteudos(self, pagina) -> list:
+        g = self.g
+        conteudo = pagina.get('/Contents')
+        if conteudo is None:
+            return []
+        obj = conteudo.get_object()
+        if isinstance(obj, g.ArrayObject):
+            return list(obj)
+        return [conteudo if hasattr(conteudo, 'idnum') else self.writer._add_object(obj)]
+
+    def hash_pagina(self, refs) -> str:
+        """SHA-256 (12 hex) do conteúdo da página antes do rodapé."""
+        h = hashlib.sha256()
+        for ref in refs:
+            try:
+                h.update(ref.get_object().get_data())
+            except Exception:
+                continue
+        return h.hexdigest()[:12].upper()
+
+    def anexar_ao_conteudo(self, pagina, refs, extra: bytes):
+        pagina[self.g.NameObject('/Contents')] = self.g.ArrayObject([self.abre, *refs, self.stream(b'\nQ\n' + extra)])
+
+
+def _montar(lib, pdf_path: str, cartao_: _Cartao, qr, bo_text, data_text) -> bytes:
+    nome_lib, PdfReader, PdfWriter, g = lib
+    with open(pdf_path, 'rb') as fsrc:
+        reader = PdfReader(fsrc, strict=False)
+        num_orig = len(reader.pages)
+        if num_orig == 0:
+            raise ValueError('PDF original sem páginas')
+        writer = PdfWriter()
+        for p in reader.pages:
+            writer.add_page(p)
+        pag_assin = cartao_.anexar_em(nome_lib, PdfReader, writer)
+        m = _Montagem(writer, g)
+        if qr is not None:
+            qr_x, qr_y = _posicao_qr(qr.width, qr.height)
+            m.recurso(pag_assin, '/XObject', '/GcmQr', m.imagem(qr))
+            refs = m.conteudos(pag_assin)
+            refs.append(m.stream(b'q %d 0 0 %d %.2f %.2f cm /GcmQr Do Q\n' % (qr.width, qr.height, qr_x, qr_y)))
+            pag_assin[g.NameObject('/Contents')] = g.ArrayObject(refs)
+
+        total = len(writer.pages)
+        if total != num_orig + 1:
+            raise RuntimeError('Falha na validação do merge (contagem de páginas)')
+        for idx, pagina in enumerate(writer.pages):
+            refs = m.conteudos(pagina)
+            box = pagina.mediabox
+            x0, y0 = float(box.left), float(box.bottom)
+            extra = _rodape(idx, total, float(box.width), bo_text, data_text, m.hash_pagina(refs))
+            if x0 or y0:
+                extra = b'q 1 0 0 1 %g %g cm\n' % (x0, y0) + extra + b'Q\n'
+            m.recurso(pagina, '/Font', _FONTE_RODAPE, m.fonte)
+            m.anexar_ao_conteudo(pagina, refs, extra)
+        out = BytesIO()
+        writer.write(out)
+    return out.getvalue()
+
+
+def anexar(pdf_original_path: str, assinatura_img, nome_comando: str, titulo_assinatura: str,
+           bo_num=None, data_emissao_dt=None, matricula=None, cargo=None, classe=None,
+           qr_code_base64=None) -> bytes:
+    """Retorna o PDF original + página de assinatura, com rodapé em todas as páginas."""
+    qr = _qr_imagem(qr_code_base64) if assinatura_img is not None else None
+    cartao_ = cartao(assinatura_img, nome_comando, titulo_assinatura, matricula, cargo, classe,
+                     qr.size if qr is not None else None)
+    bo_text = f"BO Nº {bo_num}" if bo_num else None
+    data_text = None
+    if data_emissao_dt:
+        try:
+            data_text = f"Data/Hora: {timezone.localtime(data_emissao_dt):%d/%m/%Y %H:%M}"
+        except Exception:
+            data_text = f"Data/Hora: {timezone.now():%d/%m/%Y %H:%M}"
+    if not _BIBLIOTECAS:
+        raise RuntimeError("Biblioteca PDF não encontrada (PyPDF2/pypdf). Servidor provavelmente fora do virtualenv.")
+    erros = []
+    for lib in _BIBLIOTECAS:
+        try:
+            return _montar(lib, pdf_original_path, cartao_, qr, bo_text, data_text)
+        except Exception as e:
+            erros.append(f"{lib[0]}: {e.__class__.__name__}: {e}")
+    raise RuntimeError('Falha ao anexar página de assinatura — ' + ' | '.join(erros))
@@ -0,0 +1,337 @@
+"""Pool persistente de renderização HTML→PDF.
+
+Centraliza a conversão usada pelo BO (`bogcmi.views_core._gerar_pdf_bo_bytes`)
+e pelos documentos de fiscalização (`core.views._pdf_from_html_core`):
+
+- o binário wkhtmltopdf (caminho e versão) é detectado uma única vez por processo;
+- os workers são threads de vida longa que importam WeasyPrint/xhtml2pdf no
+  início (aquecimento), evitando o custo de import em cada requisição;
+- a fila é limitada: quando cheia, o envio espera no máximo
+  ``PDF_POOL_ESPERA_FILA`` segundos e então falha com ``PdfPoolOcupado``;
+- a espera na fila e a renderização têm limites separados: o job que não começa em
+  ``PDF_POOL_ESPERA_FILA`` segundos é cancelado (``PdfPoolOcupado``); o timeout
+  (``PdfRenderTimeout``) conta do início do job e vale para a cadeia de motores —
+  o wkhtmltopdf recebe o tempo que resta e os motores seguintes não são tentados
+  depois do prazo (WeasyPrint/xhtml2pdf rodam na thread e não podem ser interrompidos);
+- profundidade da fila, latências e contadores ficam em ``metricas()``.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from io import BytesIO
+from typing import Optional
+
+from django.conf import settings
+
+
+class PdfPoolOcupado(RuntimeError):
+    """Fila do pool cheia (backpressure)."""
+
+
+class PdfRenderTimeout(RuntimeError):
+    """Renderização excedeu o tempo limite do job."""
+
+
+# Opções wkhtmltopdf por tipo de documento (mantêm o layout histórico de cada chamador)
+PERFIS_WKHTMLTOPDF = {
+    'bo': [
+        '--enable-local-file-access',
+        '--encoding', 'utf-8',
+        '--page-size', 'A4',
+        '--margin-top', '10mm', '--margin-bottom', '12mm', '--margin-left', '10mm', '--margin-right', '10mm',
+        '--zoom', '1.0',
+        '--dpi', '96',
+        '--load-error-handling', 'ignore',
+    ],
+    'documento': [
+        '--enable-local-file-access',
+        '--encoding', 'utf-8',
+        '--page-size', 'A4',
+        '--margin-top', '14mm', '--margin-bottom', '16mm', '--margin-left', '12mm', '--margin-right', '12mm',
+        '--print-media-type',
+        '--disable-smart-shrinking',
+        '--zoom', '1.0',
+        '--dpi', '96',
+    ],
+}
+
+_WK_CANDIDATOS = [
+    r"C:\\Program Files\\wkhtmltopdf\\bin\\wkhtmltopdf.exe",
+    r"C:\\Program Files (x86)\\wkhtmltopdf\\bin\\wkhtmltopdf.exe",
+]
+
+_wk_info: Optional[dict] = None
+_wk_lock = threading.Lock()
+
+
+def detectar_wkhtmltopdf() -> dict:
+    """Retorna {'path': str|None, 'version': str} detectado uma vez por processo."""
+    global _wk_info
+    if _wk_info is not None:
+        return _wk_info
+    with _wk_lock:
+        if _wk_info is not None:
+            return _wk_info
+        path = None
+        cfg = getattr(settings, 'WKHTMLTOPDF_CMD', '') or ''
+        if cfg and os.path.exists(cfg):
+            path = cfg
+        if not path:
+            path = next((p for p in _WK_CANDIDATOS if os.path.exists(p)), None)
+        if not path:
+            try:
+                path = shutil.which('wkhtmltopdf')
+            except Exception:
+                path = None
+        version = ''
+        if path:
+            try:
+                proc = subprocess.run([path, '-V'], capture_output=True, text=True, timeout=10)
+                version = (proc.stdout or proc.stderr or '').strip()
+            except Exception as e:
+                version = f'erro: {e}'
+        _wk_info = {'path': path, 'version': version}
+        return _wk_info
+
+
+def caminho_wkhtmltopdf() -> Optional[str]:
+    return detectar_wkhtmltopdf().get('path')
+
+
+def _aquecer_worker():
+    """Inicializador das threads: importa os motores uma vez."""
+    if not getattr(settings, 'PDF_DISABLE_WEASYPRINT', False):
+        try:
+            import weasyprint  # type: ignore  # noqa: F401
+        except Exception:
+            pass
+    try:
+        from xhtml2pdf import pisa  # type: ignore  # noqa: F401
+    except Exception:
+        pass
+
+
+def _render_wkhtmltopdf(html: str, perfil: str, timeout: float) -> bytes:
+    wk = caminho_wkhtmltopdf()
+    if not wk:
+        raise FileNotFoundError('wkhtmltopdf não encontrado')
+    opcoes = PERFIS_WKHTMLTOPDF.get(perfil) or PERFIS_WKHTMLTOPDF['documento']
+    with tempfile.TemporaryDirectory() as td:
+        html_f = os.path.join(td, 'doc.html')
+        pdf_f = os.path.join(td, 'out.pdf')
+        with open(html_f, 'w', encoding='utf-8') as f:
+            f.write(html)
+        proc = subprocess.run([wk, *opcoes, html_f, pdf_f], capture_output=True, text=True, timeout=timeout)
+        if proc.returncode == 0 and os.path.exists(pdf_f):
+            with open(pdf_f, 'rb') as pf:
+                data = pf.read()
+            if data:
+                return data
+        raise RuntimeError(f"wkhtmltopdf rc={proc.returncode} stderr={(proc.stderr or '')[-300:]}")
+
+
+def _render_weasyprint(html: str, base_url: str) -> bytes:
+    from weasyprint import HTML  # type: ignore
+    return HTML(string=html, base_url=base_url).write_pdf()
+
+
+def _render_xhtml2pdf(html: str) -> bytes:
+    from xhtml2pdf import pisa  # type: ignore
+    out = BytesIO()
+    status = pisa.CreatePDF(html, dest=out, encoding='utf-8')
+    if status.err:
+        raise RuntimeError(status.err)
+    return out.getvalue()
+
+
+def _percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    idx = min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))
+    return round(ordenados[idx], 4)
+
+
+class PdfRenderPool:
+    """Executor de renderização com fila limitada e métricas."""
+
+    def __init__(self, workers: int, fila_max: int, timeout: float, espera_fila: float):
+        self.workers = max(1, int(workers))
+        self.fila_max = max(0, int(fila_max))
+        self.timeout = float(timeout)
+        self.espera_fila = float(espera_fila)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix='pdf-render',
+            initializer=_aquecer_worker,
+        )
+        # vagas = em execução + aguardando
+        self._vagas = threading.BoundedSemaphore(self.workers + self.fila_max)
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._em_execucao = 0
+        self._contadores = {
+            'enviados': 0, 'concluidos': 0, 'falhas': 0, 'timeouts': 0, 'rejeitados': 0,
+        }
+        self._por_motor: dict[str, int] = {}
+        self._latencias = deque(maxlen=500)
+        self._esperas = deque(maxlen=500)
+
+    def _inc(self, chave: str, n: int = 1):
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + n
+
+    def _job(self, html: str, base_url: str, perfil: str, limite: float, t_envio: float, inicio: dict):
+        t_inicio = time.monotonic()
+        inicio['t'] = t_inicio
+        inicio['evento'].set()
+        with self._lock:
+            self._pendentes -= 1
+            self._em_execucao += 1
+            self._esperas.append(t_inicio - t_envio)
+        prazo = t_inicio + limite
+        erros = []
+        try:
+            for motor in ('wkhtmltopdf', 'weasyprint', 'xhtml2pdf'):
+                if motor == 'weasyprint' and getattr(settings, 'PDF_DISABLE_WEASYPRINT', False):
+                    continue
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    raise PdfRenderTimeout(f'Geração de PDF excedeu {limite:.0f}s ({"; ".join(erros)})')
+                try:
+                    if motor == 'wkhtmltopdf':
+                        data = _render_wkhtmltopdf(html, perfil, restante)
+                    elif motor == 'weasyprint':
+                        data = _render_weasyprint(html, base_url)
+                    else:
+                        data = _render_xhtml2pdf(html)
+                    if data:
+                        with self._lock:
+                            self._por_motor[motor] = self._por_motor.get(motor, 0) + 1
+                        return data, motor, erros
+                except Exception as e:
+                    erros.append(f"{motor}: {e}")
+            raise RuntimeError('; '.join(erros) or 'nenhum motor de PDF disponível')
+        finally:
+            with self._lock:
+                self._em_execucao -= 1
+                self._latencias.append(time.monotonic() - t_inicio)
+            self._vagas.release()
+
+    def renderizar(self, html: str, *, base_url: str = '', perfil: str = 'documento',
+                   timeout: Optional[float] = None) -> tuple[bytes, str, list]:
+        """Enfileira o HTML e aguarda o PDF.
+
+        Retorna (pdf_bytes, motor, erros_dos_motores_anteriores).
+        Lança PdfPoolOcupado, PdfRenderTimeout ou RuntimeError.
+        """
+        if not self._vagas.acquire(timeout=self.espera_fila):
+            self._inc('rejeitados')
+            raise PdfPoolOcupado('Fila de geração de PDF cheia; tente novamente em instantes.')
+        t_envio = time.monotonic()
+        with self._lock:
+            self._pendentes += 1
+            self._contadores['enviados'] += 1
+        limite = self.timeout if timeout is None else float(timeout)
+        inicio = {'evento': threading.Event(), 't': None}
+        try:
+            fut = self._executor.submit(self._job, html, base_url, perfil, limite, t_envio, inicio)
+        except Exception:
+            with self._lock:
+                self._pendentes -= 1
+            self._vagas.release()
+            raise
+        # Espera na fila limitada à parte: fila lenta não vira timeout de renderização
+        if not inicio['evento'].wait(self.espera_fila) and fut.cancel():
+            # job nem chegou a rodar: devolve a vaga que o _job liberaria
+            with self._lock:
+                self._pendentes -= 1
+            self._vagas.release()
+            self._inc('rejeitados')
+            raise PdfPoolOcupado('Fila de geração de PDF ocupada; tente novamente em instantes.')
+        inicio['evento'].wait()  # começou entre o wait e o cancel
+        try:
+            # o _job encerra sozinho no prazo; a folga cobre só a troca de motor
+            resultado = fut.result(timeout=max(0.0, inicio['t'] + limite - time.monotonic()) + 1)
+        except (FutureTimeout, PdfRenderTimeout):
+            self._inc('timeouts')
+            raise PdfRenderTimeout(f'Geração de PDF excedeu {limite:.0f}s')
+        except Exception:
+            self._inc('falhas')
+            raise
+        self._inc('concluidos')
+        return resultado
+
+    def metricas(self) -> dict:
+        with self._lock:
+            lat = list(self._latencias)
+            esp = list(self._esperas)
+            return {
+                'workers': self.workers,
+                'fila_max': self.fila_max,
+                'fila_atual': self._pendentes,
+                'em_execucao': self._em_execucao,
+                **self._contadores,
+                'por_motor': dict(self._por_motor),
+                'latencia_p50_s': _percentil(lat, 0.5),
+                'latencia_p95_s': _percentil(lat, 0.95),
+                'espera_fila_p95_s': _percentil(esp, 0.95),
+            }
+
+    def encerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool: Optional[PdfRenderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> PdfRenderPool:
+    """Pool do processo atual (criado no primeiro uso, após o fork do gunicorn)."""
+    global _pool
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            detectar_wkhtmltopdf()
+            _pool = PdfRenderPool(
+                workers=getattr(settings, 'PDF_POOL_WORKERS', 2),
+                fila_max=getattr(settings, 'PDF_POOL_FILA_MAX', 8),
+                timeout=getattr(settings, 'PDF_POOL_TIMEOUT', 60),
+                espera_fila=getattr(settings, 'PDF_POOL_ESPERA_FILA', 5),
+            )
+    return _pool
+
+
+def _reset_apos_fork():
+    # Threads não sobrevivem ao fork: o filho cria seu próprio pool no primeiro uso
+    global _pool, _pool_lock, _wk_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+    _wk_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_apos_fork)
+
+
+def renderizar_html(html: str, *, base_url: str = '', perfil: str = 'documento',
+                    timeout: Optional[float] = None) -> bytes:
+    """Atalho: envia ao pool do processo e retorna apenas os bytes do PDF."""
+    pdf, _motor, _erros = get_pool().renderizar(html, base_url=base_url, perfil=perfil, timeout=timeout)
+    return pdf
+
+
+def metricas() -> dict:
+    info = detectar_wkhtmltopdf()
+    dados = get_pool().metricas() if _pool is not None else {'workers': 0, 'fila_atual': 0}
+    dados['wkhtmltopdf'] = info.get('path') or ''
+    dados['wkhtmltopdf_version'] = info.get('version') or ''
+    return dados
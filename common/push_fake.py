@@ -0,0 +1,106 @@
+"""Backend falso do FCM para benchmark/desenvolvimento (``PUSH_BACKEND=fake``).
+
+Imita a parte de `firebase_admin.messaging` usada por `views.enviar_push`, sem
+rede: cada chamada dorme ``PUSH_FAKE_LATENCIA_MS`` (um round trip ao Google) e
+responde como o FCM. Tokens que começam com ``invalido`` falham como
+não registrados; com ``PUSH_FAKE_FALHA_LOTE`` ligado o envio em lote levanta
+exceção (simula proxy quebrando o lote) e força o fallback por token.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_contadores = {'lotes': 0, 'individuais': 0, 'mensagens': 0}
+
+
+class _Params:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class Notification(_Params):
+    pass
+
+
+class AndroidNotification(_Params):
+    pass
+
+
+class AndroidConfig(_Params):
+    pass
+
+
+class Message(_Params):
+    pass
+
+
+class MulticastMessage(_Params):
+    pass
+
+
+class UnregisteredError(Exception):
+    pass
+
+
+class SendResponse:
+    def __init__(self, message_id=None, exception=None):
+        self.message_id = message_id
+        self.exception = exception
+
+    @property
+    def success(self) -> bool:
+        return self.exception is None
+
+
+class BatchResponse:
+    def __init__(self, responses):
+        self.responses = responses
+        self.success_count = sum(1 for r in responses if r.success)
+        self.failure_count = len(responses) - self.success_count
+
+
+def _round_trip():
+    time.sleep(float(getattr(settings, 'PUSH_FAKE_LATENCIA_MS', 80)) / 1000.0)
+
+
+def _resposta(token: str, i: int) -> SendResponse:
+    if token.startswith('invalido'):
+        return SendResponse(exception=UnregisteredError('Requested entity was not found.'))
+    return SendResponse(message_id=f'projects/fake/messages/{i}')
+
+
+def send_each_for_multicast(message: MulticastMessage, dry_run: bool = False) -> BatchResponse:
+    _round_trip()
+    with _lock:
+        _contadores['lotes'] += 1
+        _contadores['mensagens'] += len(message.tokens)
+    if getattr(settings, 'PUSH_FAKE_FALHA_LOTE', False):
+        raise ConnectionError('fake: envio em lote recusado pelo proxy')
+    return BatchResponse([_resposta(t, i) for i, t in enumerate(message.tokens)])
+
+
+send_multicast = send_each_for_multicast
+
+
+def send(message: Message, dry_run: bool = False) -> str:
+    _round_trip()
+    with _lock:
+        _contadores['individuais'] += 1
+        _contadores['mensagens'] += 1
+    r = _resposta(message.token, 0)
+    if r.exception:
+        raise r.exception
+    return r.message_id
+
+
+def contadores(resetar: bool = False) -> dict:
+    with _lock:
+        atual = dict(_contadores)
+        if resetar:
+            for k in _contadores:
+                _contadores[k] = 0
+    return atual
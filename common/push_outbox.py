@@ -0,0 +1,275 @@
+"""Fila de saída (outbox) das notificações push FCM.
+
+Sinais e views não chamam mais `views.enviar_push` no caminho da requisição:
+`enfileirar` grava um `PushOutbox` na mesma transação do evento (o disparo de
+pânico, o despacho…) e, após o commit, acorda o drenador. O envio acontece em:
+
+- uma thread drenadora no próprio processo web (``PUSH_OUTBOX_DRENAR_NO_PROCESSO``,
+  padrão ligado), acordada a cada enfileiramento;
+- e/ou no worker dedicado ``manage.py push_outbox`` (recomendado em produção,
+  desligando a thread dos processos web).
+
+Cada rodada reivindica até ``PUSH_OUTBOX_LOTE`` linhas com UPDATE condicional
+(PENDENTE → ENVIANDO), resolve os tokens de todas elas com poucas consultas e
+envia. Falhas transitórias (Firebase indisponível, nenhum token aceito) voltam
+para PENDENTE com backoff exponencial até ``PUSH_OUTBOX_MAX_TENTATIVAS``; tokens
+inválidos são desativados pelo próprio `enviar_push`.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import PushDevice, PushOutbox
+
+logger = logging.getLogger(__name__)
+
+# Limite herdado dos envios "para todos" de panic.api (status do disparo)
+MAX_TOKENS_TODOS = 800
+
+
+def _cfg(nome: str, padrao):
+    return getattr(settings, nome, padrao)
+
+
+def enfileirar(tipo: str, titulo: str, corpo: str, dados: dict | None = None, *,
+               usuarios=None, destino: str = "USUARIOS") -> PushOutbox | None:
+    """Grava a notificação na fila e agenda o drenador para depois do commit.
+
+    Nunca levanta exceção: falha ao enfileirar é apenas registrada em log, como
+    acontecia com o envio direto.
+    """
+    try:
+        ids = sorted({int(u) for u in (usuarios or []) if u})
+        if destino == "USUARIOS" and not ids:
+            return None
+        # Savepoint: no PostgreSQL um INSERT com erro abortaria a transação de quem chamou
+        with transaction.atomic():
+            item = PushOutbox.objects.create(
+                tipo=(tipo or "")[:32],
+                destino=destino,
+                usuarios=json.dumps(ids) if ids else "",
+                titulo=(titulo or "")[:150],
+                corpo=(corpo or "")[:255],
+                dados=json.dumps({k: str(v) for k, v in (dados or {}).items()}, ensure_ascii=False),
+            )
+    except Exception as e:
+        logger.warning("[PUSH:OUTBOX] falha ao enfileirar %s: %s", tipo, e)
+        return None
+    transaction.on_commit(acordar)
+    return item
+
+
+# ---------------------------------------------------------------- drenagem
+
+def _backoff(tentativas: int) -> timedelta:
+    base = float(_cfg("PUSH_OUTBOX_BACKOFF_BASE", 5))
+    teto = float(_cfg("PUSH_OUTBOX_BACKOFF_MAX", 900))
+    segundos = min(teto, base * (2 ** max(0, tentativas - 1)))
+    return timedelta(seconds=segundos * random.uniform(0.9, 1.1))
+
+
+def _reivindicar(limite: int) -> list[PushOutbox]:
+    agora = timezone.now()
+    # Itens presos em ENVIANDO (processo morto no meio do envio) voltam para a fila
+    timeout = int(_cfg("PUSH_OUTBOX_ENVIO_TIMEOUT", 120))
+    PushOutbox.objects.filter(status="ENVIANDO", reivindicado_em__lt=agora - timedelta(seconds=timeout)).update(status="PENDENTE")
+    candidatos = list(
+        PushOutbox.objects.filter(status="PENDENTE", proxima_tentativa_em__lte=agora)
+        .order_by("id").values_list("id", flat=True)[:limite]
+    )
+    meus = [
+        pk for pk in candidatos
+        if PushOutbox.objects.filter(pk=pk, status="PENDENTE").update(status="ENVIANDO", reivindicado_em=agora)
+    ]
+    return list(PushOutbox.objects.filter(pk__in=meus).order_by("id"))
+
+
+def _usuarios_plantao_cecom() -> set[int]:
+    from cecom.models import PlantaoCecomPrincipal
+    ids: set[int] = set()
+    for usuario_id, aux_id in PlantaoCecomPrincipal.objects.filter(ativo=True).values_list("usuario_id", "aux_cecom_id"):
+        ids.update(u for u in (usuario_id, aux_id) if u)
+    return ids
+
+
+def _resolver_tokens(itens: list[PushOutbox]) -> dict[int, list[str]]:
+    """Tokens habilitados de cada item, com no máximo uma consulta por tipo de destino."""
+    alvos: dict[int, set[int]] = {}
+    plantao = None
+    for item in itens:
+        if item.destino == "PLANTAO_CECOM":
+            if plantao is None:
+                plantao = _usuarios_plantao_cecom()
+            alvos[item.pk] = plantao
+        elif item.destino == "USUARIOS":
+            try:
+                alvos[item.pk] = set(json.loads(item.usuarios or "[]"))
+            except ValueError:
+                alvos[item.pk] = set()
+    todos_ids = set().union(*alvos.values()) if alvos else set()
+    por_usuario: dict[int, list[str]] = {}
+    if todos_ids:
+        for user_id, token in PushDevice.objects.filter(user_id__in=todos_ids, enabled=True).values_list("user_id", "token"):
+            por_usuario.setdefault(user_id, []).append(token)
+    todos = None
+    resultado: dict[int, list[str]] = {}
+    for item in itens:
+        if item.destino == "TODOS":
+            if todos is None:
+                # Dispositivos com usuário ativo OU sem usuário (apps anônimos como SafeBP)
+                todos = list(
+                    PushDevice.objects.filter(Q(user__is_active=True) | Q(user__isnull=True), enabled=True)
+                    .values_list("token", flat=True)[:MAX_TOKENS_TODOS]
+                )
+            resultado[item.pk] = todos
+        else:
+            resultado[item.pk] = [t for u in sorted(alvos.get(item.pk, ())) for t in por_usuario.get(u, [])]
+    return resultado
+
+
+def _falhou(item: PushOutbox, erro: str):
+    tentativas = item.tentativas + 1
+    maximo = int(_cfg("PUSH_OUTBOX_MAX_TENTATIVAS", 8))
+    campos = dict(tentativas=tentativas, erro=(erro or "")[:255], reivindicado_em=None)
+    if tentativas >= maximo:
+        campos["status"] = "FALHA"
+    else:
+        campos.update(status="PENDENTE", proxima_tentativa_em=timezone.now() + _backoff(tentativas))
+    PushOutbox.objects.filter(pk=item.pk).update(**campos)
+    logger.warning("[PUSH:OUTBOX] %s #%s tentativa %s falhou: %s", item.tipo, item.pk, tentativas, erro)
+
+
+def _enviar(item: PushOutbox, tokens: list[str]):
+    from .views import enviar_push
+    if not tokens:
+        PushOutbox.objects.filter(pk=item.pk).update(
+            status="ENVIADO", enviado_em=timezone.now(), tokens=0, erro="sem tokens", reivindicado_em=None)
+        return
+    try:
+        dados = json.loads(item.dados or "{}")
+    except ValueError:
+        dados = {}
+    try:
+        det = enviar_push(tokens, title=item.titulo, body=item.corpo, data=dados, return_details=True)
+    except Exception as e:
+        _falhou(item, str(e))
+        return
+    sucessos = int(det.get("success", 0))
+    desativados = int(det.get("disabled", 0))
+    falhas = int(det.get("failures", 0))
+    if not sucessos and falhas and desativados < falhas:
+        # nenhum token aceitou e nem todos eram inválidos: trata como falha transitória
+        erros = det.get("errors") or [{}]
+        _falhou(item, erros[0].get("error", "nenhum envio aceito"))
+        if desativados:
+            PushOutbox.objects.filter(pk=item.pk).update(desativados=item.desativados + desativados)
+        return
+    PushOutbox.objects.filter(pk=item.pk).update(
+        status="ENVIADO", enviado_em=timezone.now(), tokens=len(set(tokens)), sucessos=sucessos,
+        desativados=item.desativados + desativados, erro="", reivindicado_em=None,
+    )
+
+
+def drenar(limite: int | None = None) -> int:
+    """Uma rodada de envio. Retorna quantos itens foram reivindicados."""
+    itens = _reivindicar(int(limite or _cfg("PUSH_OUTBOX_LOTE", 100)))
+    if not itens:
+        return 0
+    try:
+        tokens = _resolver_tokens(itens)
+    except Exception as e:
+        for item in itens:
+            _falhou(item, f"tokens: {e}")
+        return len(itens)
+    for item in itens:
+        try:
+            _enviar(item, tokens.get(item.pk, []))
+        except Exception as e:  # pragma: no cover
+            _falhou(item, str(e))
+    return len(itens)
+
+
+class _Drenador(threading.Thread):
+    def __init__(self):
+        super().__init__(name="push-outbox", daemon=True)
+        self.evento = threading.Event()
+
+    def run(self):
+        intervalo = float(_cfg("PUSH_OUTBOX_INTERVALO", 5))
+        while True:
+            self.evento.wait(intervalo)
+            self.evento.clear()
+            try:
+                while drenar():
+                    pass
+            except Exception as e:
+                logger.warning("[PUSH:OUTBOX] falha na drenagem: %s", e)
+            finally:
+                close_old_connections()
+
+
+_drenador: _Drenador | None = None
+_drenador_lock = threading.Lock()
+
+
+def acordar():
+    """Acorda (e inicia, se preciso) a thread drenadora deste processo."""
+    global _drenador
+    if not _cfg("PUSH_OUTBOX_DRENAR_NO_PROCESSO", True):
+        return
+    with _drenador_lock:
+        if _drenador is None or not _drenador.is_alive():
+            _drenador = _Drenador()
+            _drenador.start()
+    _drenador.evento.set()
+
+
+def limpar(dias: int) -> int:
+    """Remove itens enviados há mais de ``dias`` dias."""
+    limite = timezone.now() - timedelta(days=dias)
+    return PushOutbox.objects.filter(status="ENVIADO", enviado_em__lt=limite).delete()[0]
+
+
+# ---------------------------------------------------------------- métricas
+
+def _percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return round(ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))], 3)
+
+
+def metricas(amostra: int = 500) -> dict:
+    """Idade da fila e latência de entrega (criação → aceite pelo FCM) por tipo."""
+    agora = timezone.now()
+    tipos: dict[str, dict] = {}
+    for linha in PushOutbox.objects.values("tipo", "status").annotate(n=Count("id"), mais_antigo=Min("criado_em")):
+        t = tipos.setdefault(linha["tipo"], {"pendentes": 0, "enviando": 0, "enviados": 0, "falhas": 0, "idade_fila_s": 0.0})
+        chave = {"PENDENTE": "pendentes", "ENVIANDO": "enviando", "ENVIADO": "enviados", "FALHA": "falhas"}[linha["status"]]
+        t[chave] += linha["n"]
+        if linha["status"] in ("PENDENTE", "ENVIANDO") and linha["mais_antigo"]:
+            t["idade_fila_s"] = max(t["idade_fila_s"], round((agora - linha["mais_antigo"]).total_seconds(), 3))
+    for tipo, t in tipos.items():
+        pares = (
+            PushOutbox.objects.filter(tipo=tipo, status="ENVIADO", tokens__gt=0)
+            .order_by("-enviado_em").values_list("criado_em", "enviado_em")[:amostra]
+        )
+        lat = [(e - c).total_seconds() for c, e in pares if c and e]
+        t.update(
+            latencia_p50_s=_percentil(lat, 0.5),
+            latencia_p95_s=_percentil(lat, 0.95),
+            latencia_max_s=round(max(lat), 3) if lat else 0.0,
+        )
+    return {
+        "tipos": tipos,
+        "drenador_no_processo": bool(_drenador and _drenador.is_alive()),
+    }
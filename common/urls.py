@@ -15,6 +15,9 @@ urlpatterns = [
     path('documentos/assinados/livro/', views.documentos_assinados_livro, name='documentos_assinados_livro'),
     path('documentos/<int:pk>/assinar/', views.assinar_documento, name='assinar_documento'),
     path('documentos/assinar-lote/', views.assinar_documentos_lote, name='assinar_documentos_lote'),
+    path('documentos/lotes/<int:pk>/', views.lote_assinatura, name='lote_assinatura'),
+    path('documentos/lotes/<int:pk>/status/', views.lote_assinatura_status, name='lote_assinatura_status'),
+    path('documentos/lotes/<int:pk>/reprocessar/', views.lote_assinatura_reprocessar, name='lote_assinatura_reprocessar'),
     path('documentos/<int:pk>/recusar/', views.recusar_documento, name='recusar_documento'),
     path('documentos/<int:pk>/excluir/', views.excluir_documento, name='excluir_documento'),
     path('documentos/<int:pk>/ver/', views.servir_documento, name='servir_documento'),
@@ -28,4 +31,6 @@ urlpatterns = [
     path('push/register-device/', views.register_device, name='push_register_device'),
     path('push/test/', views.push_test, name='push_test'),
     path('push/diag/', views.push_diag, name='push_diag'),
+    path('push/outbox/metricas/', views.push_outbox_metricas, name='push_outbox_metricas'),
+    path('auditoria/metricas/', views.audit_metricas, name='audit_metricas'),
 ]
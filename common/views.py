@@ -5,18 +5,15 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.core.paginator import Paginator
 from django.db.models import Q
-from django.db import transaction
 from django.http import HttpResponseForbidden, HttpRequest, JsonResponse, HttpResponse, FileResponse
 from .models import DocumentoAssinavel, PushDevice
 from django.utils import timezone
 from django.core.files.base import File, ContentFile
 from django.conf import settings
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
 from io import BytesIO
 from PIL import Image
-from reportlab.lib.utils import ImageReader
-import importlib, shutil, subprocess, sys, os, tempfile, re, hashlib
+import importlib, shutil, subprocess, sys, os, re, hashlib
 from typing import Iterable, Optional, Union, List, Dict
 
 
@@ -374,6 +371,7 @@ def diagnostico_pdfs(request: HttpRequest):
       - Import ok/falha e mensagem
       - Versão
       - Caminhos de binários relevantes (wkhtmltopdf)
+      - Métricas do pool de renderização (fila, latência); ?format=json para coleta
     """
     def check_import(mod_name):
         try:
@@ -425,7 +423,13 @@ def diagnostico_pdfs(request: HttpRequest):
         'platform': sys.platform,
         'wkhtmltopdf_in_path': bool(shutil.which('wkhtmltopdf')),
     }
-    return render(request, 'common/diagnostico_pdfs.html', {'results': results, 'env': env_info, 'test_pdf_size': test_pdf_size})
+    from . import pdf_pool
+    from bogcmi import pdf_cache
+    pool_info = pdf_pool.metricas()
+    cache_info = pdf_cache.metricas()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'pool': pool_info, 'bo_pdf_cache': cache_info, 'results': results, 'env': env_info})
+    return render(request, 'common/diagnostico_pdfs.html', {'results': results, 'env': env_info, 'test_pdf_size': test_pdf_size, 'pool': pool_info, 'bo_pdf_cache': cache_info})
 
 
 def _obter_assinatura_comando(user):
@@ -472,269 +476,26 @@ def _nome_primeiro_ultimo(nome_raw: str) -> str:
 def _append_assinatura(pdf_original_path: str, assinatura_img: Image.Image, nome_comando: str, titulo_assinatura: str = 'Despacho / Assinatura do Comando', bo_num: str | None = None, data_emissao_dt=None, matricula: str | None = None, cargo: str | None = None, classe: str | None = None, qr_code_base64: str | None = None) -> bytes:
     """Anexa página de assinatura ao PDF preservando conteúdo original.
 
-    Estratégia:
-      1. Tenta mesclar via PyPDF2 (mais fiel, mantém texto pesquisável).
-      2. Se falhar, rasteriza páginas originais em imagens e recompõe + página de assinatura.
-      3. Se ainda assim falhar, retorna somente página de assinatura (último recurso).
+    O cartão de assinatura é reaproveitado do cache por comandante/título; por
+    documento entram apenas QR e rodapé (BO nº, data/hora, hash, página X/Y).
+    Se a leitura falhar com pypdf, tenta PyPDF2 (ver common.pagina_assinatura).
+    Falha definitiva levanta exceção (nunca gera PDF truncado ou rasterizado).
     """
-    # Página de assinatura isolada
-    assinatura_buff = BytesIO()
-    c = canvas.Canvas(assinatura_buff, pagesize=A4)
-    w,h = A4
-    if assinatura_img and assinatura_img.mode not in ('RGB','RGBA'):
-        assinatura_img = assinatura_img.convert('RGBA')
-    if assinatura_img:
-        # Normalizar tamanho para padronizar com o documento do BO (assinatura do encarregado): max 240x70
-        max_w, max_h = 240, 70
-        assinatura_img.thumbnail((max_w, max_h), Image.LANCZOS)
-        img_buf = BytesIO()
-        assinatura_img.save(img_buf, format='PNG')
-        img_buf.seek(0)
-        # Cartão estilo "bloco" do BO (apenas uma borda clara, sem fundo azul)
-        # Cores aproximadas do template: borda #e5e7eb (229,231,235)
-        border_r = 229/255.0; border_g = 231/255.0; border_b = 235/255.0
-        inner_margin = 14
-        card_width = w - 100  # margem lateral de 50
-        card_height = 210     # altura similar ao bloco de assinatura do BO
-        # Posicionar pouco acima do centro
-        card_bottom = (h/2) - (card_height/2) + 50
-        card_left = 50
-        # Desenhar cartão
-        c.setFillColorRGB(1, 1, 1)
-        c.setStrokeColorRGB(border_r, border_g, border_b)
-        c.setLineWidth(1)
-        c.roundRect(card_left, card_bottom, card_width, card_height, 8, stroke=1, fill=1)
-
-        inner_x = card_left + inner_margin
-        inner_y = card_bottom + inner_margin
-        inner_w = card_width - inner_margin*2
-        inner_h = card_height - inner_margin*2
-
-        # Título no topo interno, alinhado à esquerda como um h4
-        c.setFillColorRGB(0, 0, 0)
-        c.setFont('Helvetica-Bold', 11)
-        c.drawString(inner_x + 6, inner_y + inner_h - 24, titulo_assinatura)
-
-        # Área de assinatura centralizada (um pouco mais baixa)
-        assinatura_y = inner_y + inner_h/2 - 8
-        # Desenhar imagem de assinatura
-        center_x = card_left + card_width/2
-        c.drawImage(ImageReader(img_buf), center_x - (assinatura_img.width/2), assinatura_y, width=assinatura_img.width, height=assinatura_img.height, mask='auto')
-
-        # Linha horizontal sob a assinatura (largura 240px)
-        linha_w = 240
-        linha_x1 = (card_left + card_width/2) - (linha_w/2)
-        linha_x2 = linha_x1 + linha_w
-        linha_y = assinatura_y - 10
-        c.setStrokeColorRGB(0.07, 0.08, 0.12)
-        c.setLineWidth(1.0)
-        c.line(linha_x1, linha_y, linha_x2, linha_y)
-
-        # Nome, matrícula (abaixo do nome) e cargo/classe centralizados
-        c.setFillColorRGB(0, 0, 0)
-        c.setFont('Helvetica', 10)
-        c.drawCentredString(center_x, linha_y - 16, nome_comando)
-        next_y = linha_y - 30
-        if matricula:
-            c.setFont('Helvetica', 9)
-            c.drawCentredString(center_x, next_y, f"Mat: {matricula}")
-            next_y -= 14
-        info_cargo = []
-        if cargo:
-            info_cargo.append(cargo)
-        if classe:
-            info_cargo.append(classe)
-        if info_cargo:
-            c.setFont('Helvetica', 9)
-            c.drawCentredString(center_x, next_y, ' - '.join(info_cargo))
-
-        # QR Code à direita dentro do cartão, tamanho ~90px com moldura clara e legenda
-        if qr_code_base64:
-            try:
-                import base64
-                qr_data = base64.b64decode(qr_code_base64.split(',')[-1])
-                qr_img = Image.open(BytesIO(qr_data))
-                qr_img.thumbnail((90, 90), Image.LANCZOS)
-                qr_buf = BytesIO(); qr_img.save(qr_buf, format='PNG'); qr_buf.seek(0)
-                qr_x = inner_x + inner_w - qr_img.width - 8
-                qr_y = inner_y + (inner_h - qr_img.height)/2
-                c.setFillColorRGB(1, 1, 1)
-                c.setStrokeColorRGB(border_r, border_g, border_b)
-                c.setLineWidth(0.8)
-                c.roundRect(qr_x-4, qr_y-4, qr_img.width+8, qr_img.height+8, 6, stroke=1, fill=1)
-                c.drawImage(ImageReader(qr_buf), qr_x, qr_y, width=qr_img.width, height=qr_img.height, mask='auto')
-                c.setFillColorRGB(0.22, 0.25, 0.31)
-                c.setFont('Helvetica', 6)
-                c.drawCentredString(qr_x + qr_img.width/2, qr_y-12, 'Verificação Online')
-            except Exception:
-                pass
-    else:
-        c.setFillColorRGB(0, 0, 0)
-        c.setFont('Helvetica-Bold', 12)
-        c.drawString(50, h-80, titulo_assinatura)
-        c.setFont('Helvetica', 12)
-        c.drawString(50, h-110, '(Sem assinatura cadastrada)')
-    c.showPage(); c.save()
-
-    assinatura_pdf_bytes = assinatura_buff.getvalue()
-
-    def _dbg(msg: str):
+    from . import pagina_assinatura
+    try:
+        return pagina_assinatura.anexar(
+            pdf_original_path, assinatura_img, nome_comando, titulo_assinatura,
+            bo_num=bo_num, data_emissao_dt=data_emissao_dt, matricula=matricula,
+            cargo=cargo, classe=classe, qr_code_base64=qr_code_base64,
+        )
+    except Exception as e:
         try:
-            media_root = getattr(settings, 'MEDIA_ROOT', 'media')
-            log_dir = os.path.join(media_root, 'logs')
+            log_dir = os.path.join(getattr(settings, 'MEDIA_ROOT', 'media'), 'logs')
             os.makedirs(log_dir, exist_ok=True)
             with open(os.path.join(log_dir, 'assinatura_debug.log'), 'a', encoding='utf-8') as f:
-                f.write(f"{timezone.now():%Y-%m-%d %H:%M:%S} | {msg}\n")
+                f.write(f"{timezone.now():%Y-%m-%d %H:%M:%S} | ERRO {pdf_original_path}: {e}\n")
         except Exception:
-            print(msg)
-
-    import os
-    try:
-        stat_info = os.stat(pdf_original_path)
-        _dbg(f"Orig path={pdf_original_path} size={stat_info.st_size} bytes")
-    except FileNotFoundError:
-        _dbg(f"Arquivo não encontrado: {pdf_original_path}")
-    except Exception as e:
-        _dbg(f"Falha stat arquivo original: {e}")
-
-    # Verificar bytes iniciais
-    try:
-        with open(pdf_original_path,'rb') as ftest:
-            head = ftest.read(8)
-            _dbg(f"Magic bytes: {head!r}")
-    except Exception as e:
-        _dbg(f"Falha lendo magic bytes: {e}")
-
-    # Nova estratégia determinística: ler original -> montar writer -> anexar assinatura
-    # Diagnóstico avançado de import (captura caminho do Python e sys.path)
-    import sys, traceback, importlib
-    try:
-        _dbg(f"Python exec: {sys.executable}")
-        _dbg("sys.path (primeiros 5): " + ' | '.join(sys.path[:5]))
-    except Exception:  # pragma: no cover - não deve falhar, mas não quebra fluxo
-        pass
-
-    # Testar explicitamente cada biblioteca e registrar motivo da falha
-    PdfReader = PdfWriter = None
-    import_errors: dict[str,str] = {}
-    for lib in ('PyPDF2','pypdf'):
-        try:
-            mod = importlib.import_module(lib)
-            # Algumas versões expõem PdfReader em caminhos diferentes; usar getattr seguro
-            reader = getattr(mod, 'PdfReader', None)
-            writer = getattr(mod, 'PdfWriter', None)
-            if reader and writer:
-                PdfReader, PdfWriter = reader, writer
-                _dbg(f"Import OK {lib} version={getattr(mod,'__version__','?')}")
-                break
-            else:
-                import_errors[lib] = 'Classes PdfReader/PdfWriter não encontradas'
-        except Exception as e:  # Registrar mensagem compacta e tipo
-            import_errors[lib] = f"{e.__class__.__name__}: {e}"
-            # Capturar 1ª linha do traceback para facilitar debug sem poluir log
-            tb_line = traceback.format_exc().strip().splitlines()[-1]
-            _dbg(f"Import FAIL {lib}: {tb_line}")
-
-    if PdfReader is None or PdfWriter is None:
-        # Fail-fast: não gerar PDF truncado silenciosamente
-        msg = "Biblioteca PDF não encontrada (PyPDF2/pypdf). Servidor provavelmente fora do virtualenv."
-        _dbg(msg + " Motivos: " + ' ; '.join(f"{k}=>{v}" for k,v in import_errors.items()))
-        raise RuntimeError(msg)
-    try:
-        import shutil, tempfile
-        # Copiar para arquivo temporário (evita lock ou escrita incompleta)
-        temp_dir = tempfile.gettempdir()
-        temp_copy = os.path.join(temp_dir, f"orig_merge_{os.path.basename(pdf_original_path)}")
-        try:
-            shutil.copy2(pdf_original_path, temp_copy)
-            _dbg(f"Copia temporária criada: {temp_copy}")
-        except Exception as e:
-            _dbg(f"Falha ao criar cópia temporária: {e}")
-
-        with open(temp_copy if os.path.exists(temp_copy) else pdf_original_path,'rb') as fsrc:
-            orig_reader = PdfReader(fsrc, strict=False)
-            num_orig = len(orig_reader.pages)
-            _dbg(f"Mesclagem determinística: paginas_orig={num_orig}")
-            if num_orig == 0:
-                _dbg("Nenhuma página no PDF original - abortando")
-                raise ValueError("PDF original sem páginas")
-            assinatura_reader = PdfReader(BytesIO(assinatura_pdf_bytes), strict=False)
-            writer = PdfWriter()
-            for i,p in enumerate(orig_reader.pages):
-                try:
-                    writer.add_page(p)
-                except Exception as e:
-                    _dbg(f"Falha add página original {i}: {e}")
-                    raise
-            for j,p in enumerate(assinatura_reader.pages):
-                writer.add_page(p)
-            out_buf = BytesIO(); writer.write(out_buf)
-            merged_bytes = out_buf.getvalue()
-            final_reader = PdfReader(BytesIO(merged_bytes), strict=False)
-            total = len(final_reader.pages)
-            _dbg(f"Sucesso mesclagem final: total_paginas={total}")
-            esperado = num_orig + len(assinatura_reader.pages)
-            if total != esperado:
-                _dbg(f"ERRO: total_paginas({total}) != esperado({esperado}) — abortando para evitar PDF truncado")
-                raise RuntimeError("Falha na validação do merge (contagem de páginas)")
-            # Reabrir para sobrepor numeração de páginas no rodapé
-            try:
-                from reportlab.pdfgen import canvas as _c
-                from reportlab.lib.pagesizes import A4 as _A4
-                from PyPDF2 import PdfReader as _R, PdfWriter as _W
-                temp_pdf = BytesIO(merged_bytes)
-                base_reader = _R(temp_pdf)
-                final_writer = _W()
-                num_total = len(base_reader.pages)
-                # Preparar textos fixos de rodapé (BO + Data/Hora) se fornecidos
-                bo_text = f"BO Nº {bo_num}" if bo_num else None
-                if data_emissao_dt:
-                    try:
-                        data_emissao_fmt = timezone.localtime(data_emissao_dt).strftime('%d/%m/%Y %H:%M')
-                    except Exception:
-                        data_emissao_fmt = timezone.now().strftime('%d/%m/%Y %H:%M')
-                else:
-                    data_emissao_fmt = None
-                data_text = f"Data/Hora: {data_emissao_fmt}" if data_emissao_fmt else None
-                for idx in range(num_total):
-                    page = base_reader.pages[idx]
-                    # Hash da página (antes do overlay): SHA-256 dos bytes da página isolada
-                    try:
-                        _tmp_buf = BytesIO(); _tmp_w = _W(); _tmp_w.add_page(page)
-                        _tmp_w.write(_tmp_buf)
-                        page_hash8 = hashlib.sha256(_tmp_buf.getvalue()).hexdigest()[:12].upper()
-                    except Exception:
-                        page_hash8 = None
-                    packet = BytesIO(); can = _c.Canvas(packet, pagesize=_A4)
-                    can.setFont('Helvetica',7)
-                    y_footer = 18
-                    # Página X / Y (sempre à direita)
-                    can.drawRightString(_A4[0]-36, y_footer, f"Página {idx+1} / {num_total}")
-                    # BO Nº + Hash (à esquerda)
-                    left_parts = []
-                    if bo_text:
-                        left_parts.append(bo_text)
-                    if page_hash8:
-                        left_parts.append(f"H:{page_hash8}")
-                    if left_parts:
-                        can.drawString(36, y_footer, '   '.join(left_parts))
-                    # Data/Hora (centralizado se existir)
-                    if data_text:
-                        can.drawCentredString(_A4[0]/2, y_footer, data_text)
-                    can.save(); packet.seek(0)
-                    overlay = _R(packet)
-                    try:
-                        page.merge_page(overlay.pages[0])
-                    except Exception:
-                        pass
-                    final_writer.add_page(page)
-                out_final = BytesIO(); final_writer.write(out_final)
-                merged_bytes = out_final.getvalue()
-            except Exception as e:
-                _dbg(f"Falha ao aplicar numeração de páginas: {e}")
-            return merged_bytes
-    except Exception as e:
-        _dbg(f"ERRO FATAL mesclagem: {e}")
+            pass
         raise
 
 
@@ -860,131 +621,73 @@ def assinar_documento(request: HttpRequest, pk: int):
 @login_required
 @comando_required
 def assinar_documentos_lote(request: HttpRequest):
+    """Cria um lote de assinatura processado em segundo plano (ver common.assinatura_lote)."""
     if request.method != 'POST':
         return HttpResponseForbidden()
     from django.contrib import messages
+    from . import assinatura_lote
     ids = request.POST.getlist('ids')
-    # redirecionamento preferencial: volta para a página que chamou (aba pendente)
-    redirect_fallback = request.META.get('HTTP_REFERER') or 'common:documentos_pendentes'
-    if not ids:
+    lote = assinatura_lote.criar_lote(request.user, ids) if ids else None
+    if not lote or not lote.total:
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({'ok': False, 'erro': 'Nenhum documento selecionado para assinatura.'}, status=400)
         messages.warning(request, 'Nenhum documento selecionado para assinatura.')
-        return redirect(redirect_fallback)
-    ok = 0; fail = 0
-    # Processar em ordem; em caso de erro num, continua nos demais
-    for sid in ids:
-        try:
-            pk = int(sid)
-        except Exception:
-            fail += 1
-            continue
-        try:
-            # Replicar fluxo de assinar_documento com try/except por item
-            doc = DocumentoAssinavel.objects.get(pk=pk)
-            estados_finais = {'ASSINADO', 'ASSINADO_ADM'}
-            if doc.status in estados_finais:
-                # já assinado, conta como ok idempotente
-                ok += 1
-                continue
-            if doc.status not in {'PENDENTE', 'PENDENTE_ADM'}:
-                fail += 1
-                continue
-            assinatura_img = _obter_assinatura_comando(request.user)
-            pdf_path = doc.arquivo.path
-            titulo_assin = 'Despacho / Assinatura da Administração' if doc.tipo == 'LIVRO_CECOM' else 'Despacho / Assinatura do Comando/Sub Comando'
-            if doc.tipo in ('BOGCMI','BOGCM'):
-                titulo_assin = 'Despacho CMT/SUBCMT'
-            bo_num = None
-            data_emissao_dt = getattr(doc, 'created_at', None)
-            if doc.tipo in ['BOGCMI', 'BOGCM']:
-                try:
-                    base = os.path.basename(doc.arquivo.name)
-                    m_new = re.search(r'_BOGCMI?_(\d+-\d{4})', base)
-                    if m_new:
-                        bo_num = m_new.group(1)
-                    else:
-                        m_old = re.search(r'_BOGCMI?_(\d+)\.pdf$', base)
-                        if m_old:
-                            bo_num = m_old.group(1)
-                except Exception:
-                    pass
-            nome_full = request.user.get_full_name() or request.user.username
-            nome_assin = _nome_primeiro_ultimo(nome_full)
-            perfil_cmd = getattr(request.user, 'perfil', None)
-            matricula = getattr(perfil_cmd, 'matricula', None) if perfil_cmd else None
-            cargo = getattr(perfil_cmd, 'cargo', None) if perfil_cmd else None
-            classe_legivel = getattr(perfil_cmd, 'classe_legivel', None) if perfil_cmd else None
-            qr_code_val = None
-            if doc.tipo == 'BOGCMI':
-                try:
-                    from bogcmi.models import BO
-                    base = os.path.basename(doc.arquivo.name)
-                    m_new = re.search(r'_BOGCMI?_(\d+-\d{4})', base)
-                    bo_obj = None
-                    if m_new:
-                        bo_obj = BO.objects.filter(numero=m_new.group(1)).first()
-                    if bo_obj:
-                        from bogcmi.views_core import _gerar_qr_code_para_bo
-                        qr_code_val = _gerar_qr_code_para_bo(request, bo_obj)
-                except Exception:
-                    pass
-            novo_pdf = _append_assinatura(
-                pdf_path,
-                assinatura_img,
-                nome_assin,
-                titulo_assinatura=titulo_assin,
-                bo_num=bo_num,
-                data_emissao_dt=data_emissao_dt,
-                matricula=matricula,
-                cargo=cargo,
-                classe=classe_legivel,
-                qr_code_base64=qr_code_val
-            )
-            year = timezone.now().year
-            numero_for_name = bo_num or 'DOC'
-            ts = timezone.now()
-            hash8 = hashlib.sha256(f"ASSIN-{doc.id}-{numero_for_name}-{ts.timestamp()}".encode()).hexdigest()[:8]
-            signed_filename = f"{ts:%Y%m%d_%H%M%S}_BOGCMI_{numero_for_name}_{doc.id}_SIGN_{hash8}.pdf"
-            caminho = f"{year}/{signed_filename}"
-            doc.arquivo_assinado.save(caminho, ContentFile(novo_pdf), save=False)
-            if doc.tipo == 'LIVRO_CECOM':
-                doc.status = 'ASSINADO_ADM'
-            else:
-                doc.status = 'ASSINADO'
-            doc.comando_assinou = True
-            doc.comando_assinou_em = timezone.now()
-            doc.comando_usuario = request.user
-            doc.save(update_fields=['arquivo_assinado', 'status', 'comando_assinou', 'comando_assinou_em', 'comando_usuario'])
-            if doc.tipo == 'BOGCMI':
-                try:
-                    from bogcmi.models import BO
-                    bo = None
-                    if bo_num and '-' in bo_num:
-                        bo = BO.objects.filter(numero=bo_num).first()
-                    elif bo_num and bo_num.isdigit():
-                        bo = BO.objects.filter(id=bo_num).first()
-                    if bo and bo.status != 'ARQUIVADO':
-                        bo.status = 'ARQUIVADO'
-                        bo.save(update_fields=['status'])
-                except Exception:
-                    pass
-            ok += 1
-        except Exception:
-            fail += 1
-            continue
-    if ok and not fail:
-        messages.success(request, f'{ok} documento(s) assinados com sucesso.')
-    elif ok and fail:
-        messages.warning(request, f'{ok} assinado(s), {fail} falhou(aram). Verifique os arquivos problemáticos.')
+        referer = request.META.get('HTTP_REFERER') or ''
+        return redirect(referer if referer.startswith('http') else 'common:documentos_pendentes')
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({
+            'ok': True,
+            'lote_id': lote.pk,
+            'total': lote.total,
+            'status_url': reverse('common:lote_assinatura_status', args=[lote.pk]),
+            'pagina_url': reverse('common:lote_assinatura', args=[lote.pk]),
+        }, status=202)
+    return redirect('common:lote_assinatura', pk=lote.pk)
+
+
+def _lote_do_usuario(request: HttpRequest, pk: int):
+    from .models import LoteAssinatura
+    qs = LoteAssinatura.objects.all()
+    if not request.user.is_superuser:
+        qs = qs.filter(usuario=request.user)
+    return get_object_or_404(qs, pk=pk)
+
+
+@login_required
+@comando_required
+def lote_assinatura(request: HttpRequest, pk: int):
+    from . import assinatura_lote
+    lote = _lote_do_usuario(request, pk)
+    return render(request, 'common/lote_assinatura.html', {
+        'lote': lote,
+        'progresso': assinatura_lote.progresso(lote),
+    })
+
+
+@login_required
+@comando_required
+def lote_assinatura_status(request: HttpRequest, pk: int):
+    from . import assinatura_lote
+    lote = _lote_do_usuario(request, pk)
+    return JsonResponse(assinatura_lote.progresso(lote))
+
+
+@login_required
+@comando_required
+def lote_assinatura_reprocessar(request: HttpRequest, pk: int):
+    if request.method != 'POST':
+        return HttpResponseForbidden()
+    from django.contrib import messages
+    from . import assinatura_lote
+    lote = _lote_do_usuario(request, pk)
+    n = assinatura_lote.reprocessar(lote)
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'ok': True, 'reenfileirados': n})
+    if n:
+        messages.info(request, f'{n} documento(s) reenviado(s) para assinatura.')
     else:
-        messages.error(request, 'Falha ao assinar os documentos selecionados.')
-    # Preferir voltar para a aba pendente original (HTTP_REFERER); se for None, cair no "pendentes"
-    try:
-        from django.shortcuts import redirect as _redir
-        if isinstance(redirect_fallback, str) and redirect_fallback.startswith('http'):
-            return _redir(redirect_fallback)
-    except Exception:
-        pass
-    return redirect('common:documentos_pendentes')
+        messages.info(request, 'Nenhum item com falha para reprocessar.')
+    return redirect('common:lote_assinatura', pk=lote.pk)
 
 
 @login_required
@@ -1150,6 +853,37 @@ def _get_firebase_app():
     return True
 
 
+def _push_messaging():
+    """Módulo de envio: `firebase_admin.messaging` ou o backend falso de benchmark (PUSH_BACKEND=fake)."""
+    if getattr(settings, 'PUSH_BACKEND', 'fcm') == 'fake':
+        from . import push_fake
+        return push_fake
+    _get_firebase_app()
+    from firebase_admin import messaging
+    return messaging
+
+
+def _should_disable_push_token(exc: Exception) -> bool:
+    """Heurística para desativar tokens inválidos/obsoletos.
+
+    As mensagens do Firebase podem variar; cobrimos os textos mais comuns
+    retornados pelo SDK Admin (HTTP v1) e pelo endpoint legado.
+    """
+    s = (str(exc) or '').lower()
+    patterns = (
+        'not registered',
+        'unregistered',
+        'no matching registration token',
+        'invalid registration',
+        'mismatch sender',
+        'invalid-argument',
+        'requested entity was not found',       # HTTP v1
+        'registration-token-not-registered',    # código canônico
+        'invalid registration token',
+    )
+    return any(p in s for p in patterns)
+
+
 def enviar_push(tokens: Iterable[str], title: str, body: str, data: Optional[dict] = None, return_details: bool = False) -> Union[int, Dict[str, object]]:
     """Envia notificação push via FCM para uma lista de tokens.
 
@@ -1157,9 +891,15 @@ def enviar_push(tokens: Iterable[str], title: str, body: str, data: Optional[dic
     - title/body: texto da notificação
     - data: payload adicional (strings)
     - return_details: quando True, retorna dict com detalhes de falhas/remoções; caso contrário, retorna apenas número de sucessos.
+
+    Lotes de 500 tokens são enviados em paralelo (PUSH_ENVIO_WORKERS threads). Um lote
+    que falha inteiro cai no envio individual por token, também em paralelo
+    (PUSH_FALLBACK_WORKERS). Tokens inválidos são desativados num único UPDATE ao final.
     """
-    _get_firebase_app()
-    from firebase_admin import messaging
+    from concurrent.futures import ThreadPoolExecutor
+    import logging
+    logger = logging.getLogger(__name__)
+    messaging = _push_messaging()
     data = {k: str(v) for k, v in (data or {}).items()}
     # Normaliza: remove vazios e deduplica preservando ordem
     seen: set[str] = set()
@@ -1167,133 +907,92 @@ def enviar_push(tokens: Iterable[str], title: str, body: str, data: Optional[dic
     if not tokens:
         return {'success': 0, 'failures': 0, 'disabled': 0, 'errors': []} if return_details else 0
 
-    def _should_disable(exc: Exception) -> bool:
-        """Heurística para desativar tokens inválidos/obsoletos.
-
-        As mensagens do Firebase podem variar; cobrimos os textos mais comuns
-        retornados pelo SDK Admin (HTTP v1) e pelo endpoint legado.
-        """
-        s = (str(exc) or '').lower()
-        patterns = (
-            'not registered',
-            'unregistered',
-            'no matching registration token',
-            'invalid registration',
-            'mismatch sender',
-            'invalid-argument',
-            'requested entity was not found',       # HTTP v1
-            'registration-token-not-registered',    # código canônico
-            'invalid registration token',
-        )
-        return any(p in s for p in patterns)
+    # Se houver título/corpo envia notification + data.
+    # Caso contrário envia data-only (service recebe em qualquer estado e monta notificação própria).
+    if title or body:
+        base_params = {
+            'data': data,
+            'notification': messaging.Notification(title=title, body=body),
+            'android': messaging.AndroidConfig(
+                priority='high',
+                notification=messaging.AndroidNotification(
+                    channel_id='default',
+                    sound='default',
+                    color='#2E7D32'
+                )
+            )
+        }
+    else:
+        base_params = {
+            'data': data,
+            'android': messaging.AndroidConfig(priority='high')
+        }
+    tipo = 'notification' if (title or body) else 'data-only'
+    # send_multicast usa o endpoint /batch (descontinuado pelo Google); send_each_for_multicast usa HTTP v1
+    send_multicast = getattr(messaging, 'send_each_for_multicast', None) or messaging.send_multicast
 
-    errors: List[Dict[str, str]] = []
-    disabled_count = 0
-    success = 0
-    # Primeiro, tenta envio em lote (usa endpoint /batch do Google APIs)
-    try:
-        for i in range(0, len(tokens), 500):
-            chunk = tokens[i:i+500]
-            # Se houver título/corpo envia notification + data.
-            # Caso contrário envia data-only (service recebe em qualquer estado e monta notificação própria).
-            if title or body:
-                message_params = {
-                    'data': data,
-                    'tokens': chunk,
-                    'notification': messaging.Notification(title=title, body=body),
-                    'android': messaging.AndroidConfig(
-                        priority='high',
-                        notification=messaging.AndroidNotification(
-                            channel_id='default',
-                            sound='default',
-                            color='#2E7D32'
-                        )
-                    )
-                }
-            else:
-                message_params = {
-                    'data': data,
-                    'tokens': chunk,
-                    'android': messaging.AndroidConfig(priority='high')
-                }
+    def _label(t: str) -> str:
+        return t[:24] + '…' if len(t) > 24 else t
 
-            # Log simples para auditoria (não critica se falhar)
-            try:
-                import logging
-                logging.getLogger(__name__).info(
-                    f"[PUSH] tipo={'notification' if (title or body) else 'data-only'} qtd_tokens={len(chunk)} keys_data={list(data.keys())[:6]}"
-                )
-            except Exception:
-                pass
-            
-            message = messaging.MulticastMessage(**message_params)
-            resp = messaging.send_multicast(message)
-            success += resp.success_count
-            # Detalhes de falhas por token
-            if getattr(resp, 'responses', None):
-                for idx, r in enumerate(resp.responses):
-                    if not r.success:
-                        t = chunk[idx]
-                        exc = getattr(r, 'exception', Exception('unknown error'))
-                        token_label = t[:24] + '…' if len(t) > 24 else t
-                        errors.append({'token': token_label, 'error': str(exc)[:240]})
-                        if _should_disable(exc):
-                            try:
-                                with transaction.atomic():
-                                    PushDevice.objects.filter(token=t).update(enabled=False)
-                                disabled_count += 1
-                            except Exception:
-                                pass
-        return {'success': success, 'failures': max(0, len(errors)), 'disabled': disabled_count, 'errors': errors} if return_details else success
-    except Exception:
-        # Fallback: algumas redes/proxies quebram o endpoint /batch.
-        # Envia individualmente para evitar o /batch.
-        for t in list(tokens):
+    def _enviar_lote(chunk: List[str]):
+        """Retorna (sucessos, [(token, exc)]) ou levanta exceção se o lote inteiro falhou."""
+        try:
+            logger.info(f"[PUSH] tipo={tipo} qtd_tokens={len(chunk)} keys_data={list(data.keys())[:6]}")
+        except Exception:
+            pass
+        resp = send_multicast(messaging.MulticastMessage(tokens=chunk, **base_params))
+        falhas = []
+        if getattr(resp, 'responses', None):
+            for idx, r in enumerate(resp.responses):
+                if not r.success:
+                    falhas.append((chunk[idx], getattr(r, 'exception', None) or Exception('unknown error')))
+        return resp.success_count, falhas
+
+    def _enviar_um(t: str):
+        # Fallback: algumas redes/proxies quebram o envio em lote; envia individualmente.
+        try:
+            logger.info(f"[PUSH:FALLBACK] tipo={tipo} token_pref={t[:12]}")
+        except Exception:
+            pass
+        try:
+            messaging.send(messaging.Message(token=t, **base_params))
+            return None
+        except Exception as e:
+            return e
+
+    chunks = [tokens[i:i+500] for i in range(0, len(tokens), 500)]
+    workers = max(1, int(getattr(settings, 'PUSH_ENVIO_WORKERS', 4)))
+    success = 0
+    falhas: List[tuple] = []
+    pendentes_fallback: List[str] = []
+    with ThreadPoolExecutor(max_workers=min(workers, len(chunks)), thread_name_prefix='push-lote') as pool:
+        futuros = [(chunk, pool.submit(_enviar_lote, chunk)) for chunk in chunks]
+        for chunk, fut in futuros:
             try:
-                if title or body:
-                    msg_params = {
-                        'token': t,
-                        'data': data,
-                        'notification': messaging.Notification(title=title, body=body),
-                        'android': messaging.AndroidConfig(
-                            priority='high',
-                            notification=messaging.AndroidNotification(
-                                channel_id='default',
-                                sound='default',
-                                color='#2E7D32'
-                            )
-                        )
-                    }
+                ok, f = fut.result()
+                success += ok
+                falhas.extend(f)
+            except Exception as e:
+                logger.warning(f"[PUSH] lote de {len(chunk)} falhou ({e}); enviando individualmente")
+                pendentes_fallback.extend(chunk)
+    if pendentes_fallback:
+        workers_fb = max(1, int(getattr(settings, 'PUSH_FALLBACK_WORKERS', 16)))
+        with ThreadPoolExecutor(max_workers=min(workers_fb, len(pendentes_fallback)), thread_name_prefix='push-um') as pool:
+            for t, exc in zip(pendentes_fallback, pool.map(_enviar_um, pendentes_fallback)):
+                if exc is None:
+                    success += 1
                 else:
-                    msg_params = {
-                        'token': t,
-                        'data': data,
-                        'android': messaging.AndroidConfig(priority='high')
-                    }
+                    falhas.append((t, exc))
 
-                try:
-                    import logging
-                    logging.getLogger(__name__).info(
-                        f"[PUSH:FALLBACK] tipo={'notification' if (title or body) else 'data-only'} token_pref={t[:12]}"
-                    )
-                except Exception:
-                    pass
-                
-                msg = messaging.Message(**msg_params)
-                messaging.send(msg)
-                success += 1
-            except Exception as e:
-                token_label = t[:24] + '…' if len(t) > 24 else t
-                errors.append({'token': token_label, 'error': str(e)[:240]})
-                if _should_disable(e):
-                    try:
-                        with transaction.atomic():
-                            PushDevice.objects.filter(token=t).update(enabled=False)
-                        disabled_count += 1
-                    except Exception:
-                        pass
-                continue
-        return {'success': success, 'failures': max(0, len(errors)), 'disabled': disabled_count, 'errors': errors} if return_details else success
+    errors: List[Dict[str, str]] = [{'token': _label(t), 'error': str(exc)[:240]} for t, exc in falhas]
+    invalidos = [t for t, exc in falhas if _should_disable_push_token(exc)]
+    disabled_count = 0
+    if invalidos:
+        try:
+            disabled_count = PushDevice.objects.filter(token__in=invalidos, enabled=True).update(enabled=False)
+        except Exception:
+            pass
+    return {'success': success, 'failures': max(0, len(errors)), 'disabled': disabled_count, 'errors': errors} if return_details else success
 
 
 @csrf_exempt
@@ -1440,6 +1139,24 @@ def push_diag(request: HttpRequest):
     return JsonResponse(resp)
 
 
+@login_required
+def push_outbox_metricas(request: HttpRequest):
+    """Fila de push (common.push_outbox): pendências, idade da fila e latência de entrega por tipo."""
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({'detail': 'Acesso negado'}, status=403)
+    from . import push_outbox
+    return JsonResponse(push_outbox.metricas())
+
+
+@login_required
+def audit_metricas(request: HttpRequest):
+    """Contadores da gravação em lote da auditoria (common.audit_buffer) deste processo."""
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({'detail': 'Acesso negado'}, status=403)
+    from . import audit_buffer
+    return JsonResponse(audit_buffer.metricas())
+
+
 @login_required
 def servir_documento(request: HttpRequest, pk: int):
     """Serve documento para visualização no mobile (download direto compatível com WebView)."""
@@ -1,2 +1,9 @@
 from django.apps import AppConfig
-class CoreConfig(AppConfig): name='core'
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        # Invalidação dos contadores do topo (core.badges) e marcação dos resumos (core.resumos)
+        from . import signals  # noqa: F401
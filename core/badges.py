@@ -0,0 +1,180 @@
+"""Contadores dos badges do topo (notificações, despachos, assinaturas, avarias).
+
+Antes o context processor ``oficios_pendentes`` fazia ~7 consultas em toda página
+renderizada (mais ``viaturas_avarias_nav`` e ``plantao``). Agora:
+
+- `contadores` calcula os números do usuário e guarda no cache por ``BADGES_TTL``
+  segundos, em chave versionada: versão global (ofícios, talões, plantões,
+  despachos, assinaturas, avarias) e versão do usuário (avisos e BOs);
+  ``core.signals`` troca as versões após o commit;
+- o context processor devolve valores preguiçosos: nada é consultado se o
+  template não mostrar o badge;
+- com ``BADGES_ASSINCRONO`` (padrão) a página só lê o cache; sem cache, o badge
+  sai vazio e o base.html busca ``core:badges`` depois de carregar.
+"""
+from __future__ import annotations
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+CHAVE_VERSAO = "core:badges:versao"
+
+CAMPOS = (
+    'oficios_pendentes_count',
+    'despachos_pendentes_count',
+    'assinaturas_pendentes_count',
+    'bos_ativos_count',
+    'avisos_pendentes_count',
+    'navbar_notif_count',
+    'viaturas_avarias_count',
+)
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "BADGES_TTL", 30))
+
+
+def invalidar(usuario_id: int | None = None):
+    """Nova versão global ou só do usuário."""
+    chave = CHAVE_VERSAO if usuario_id is None else f"{CHAVE_VERSAO}:{usuario_id}"
+    try:
+        cache.set(chave, uuid.uuid4().hex, None)
+    except Exception:
+        pass
+
+
+def _chave(usuario_id: int) -> str:
+    chave_usuario = f"{CHAVE_VERSAO}:{usuario_id}"
+    versoes = cache.get_many([CHAVE_VERSAO, chave_usuario])
+    for k in (CHAVE_VERSAO, chave_usuario):
+        if k not in versoes:
+            versoes[k] = uuid.uuid4().hex
+            if not cache.add(k, versoes[k], None):
+                versoes[k] = cache.get(k) or versoes[k]
+    return f"core:badges:{usuario_id}:{versoes[CHAVE_VERSAO]}:{versoes[chave_usuario]}"
+
+
+def _viaturas_avarias() -> int:
+    """Viaturas ativas com avarias registradas no estado persistente (igual para todos)."""
+    from viaturas.models import Viatura, ViaturaAvariaEstado
+    vids = (
+        ViaturaAvariaEstado.objects
+        .exclude(labels_json__isnull=True)
+        .exclude(labels_json="[]")
+        .values('viatura_id')
+    )
+    return Viatura.objects.filter(id__in=vids, ativo=True).count()
+
+
+def _calcular(user) -> dict:
+    from bogcmi.models import BO
+    from cecom.models import DespachoOcorrencia, PlantaoCECOM
+    from common.models import DocumentoAssinavel
+    from taloes.models import Talao
+
+    from .models import OficioInterno, UserNotification
+
+    uname = (user.username or '').lower()
+    c = dict.fromkeys(CAMPOS, 0)
+
+    # Ofícios: supervisor (PEND_SUP), subcomandante (PEND_SUB), comandante (PEND_CMT)
+    cond = Q(status='PEND_SUP', supervisor=user)
+    if uname == 'subcomandante':
+        cond |= Q(status='PEND_SUB')
+    if uname == 'comandante':
+        cond |= Q(status='PEND_CMT')
+    c['oficios_pendentes_count'] = OficioInterno.objects.filter(cond).count()
+
+    # Despachos pendentes das viaturas em que o usuário tem vínculo
+    # (talão aberto em qualquer função ou plantão CECOM ativo)
+    try:
+        viaturas_ids = set(
+            Talao.objects.filter(status='ABERTO', viatura__isnull=False)
+            .filter(Q(encarregado=user) | Q(motorista=user) | Q(auxiliar1=user) | Q(auxiliar2=user))
+            .values_list('viatura_id', flat=True)
+        )
+        viaturas_ids.update(
+            PlantaoCECOM.objects.filter(ativo=True, viatura__isnull=False)
+            .filter(Q(iniciado_por=user) | Q(participantes__usuario=user, participantes__saida_em__isnull=True))
+            .values_list('viatura_id', flat=True)
+        )
+        if viaturas_ids:
+            c['despachos_pendentes_count'] = DespachoOcorrencia.objects.filter(
+                viatura_id__in=viaturas_ids, status='PENDENTE', respondido_em__isnull=True,
+            ).count()
+    except Exception:
+        pass
+
+    # Assinaturas pendentes (CMT/SUBCMT: PLANTAO/BOGCMI; ADM: LIVRO_CECOM)
+    try:
+        if uname in {'comandante', 'subcomandante'}:
+            c['assinaturas_pendentes_count'] = DocumentoAssinavel.objects.filter(
+                status='PENDENTE', tipo__in=['PLANTAO', 'BOGCMI']).count()
+        elif uname in {'administrativo', 'admnistrativo'}:
+            c['assinaturas_pendentes_count'] = DocumentoAssinavel.objects.filter(
+                status='PENDENTE_ADM', tipo='LIVRO_CECOM').count()
+    except Exception:
+        pass
+
+    # BOs em edição em que o usuário é integrante
+    try:
+        c['bos_ativos_count'] = BO.objects.filter(
+            Q(encarregado=user) | Q(motorista=user) | Q(auxiliar1=user) | Q(auxiliar2=user) | Q(cecom=user),
+            status='EDICAO',
+        ).count()
+    except Exception:
+        pass
+
+    # Avisos do usuário (notificações persistentes não lidas)
+    try:
+        c['avisos_pendentes_count'] = UserNotification.objects.filter(user=user, read_at__isnull=True).count()
+    except Exception:
+        pass
+
+    c['navbar_notif_count'] = sum(c[k] for k in (
+        'oficios_pendentes_count', 'despachos_pendentes_count', 'assinaturas_pendentes_count',
+        'bos_ativos_count', 'avisos_pendentes_count',
+    ))
+
+    try:
+        chave = f"core:badges:global:{cache.get(CHAVE_VERSAO)}"
+        avarias = cache.get(chave)
+        if avarias is None:
+            avarias = _viaturas_avarias()
+            cache.set(chave, avarias, _ttl())
+        c['viaturas_avarias_count'] = avarias
+    except Exception:
+        pass
+    return c
+
+
+def em_cache(user) -> dict | None:
+    """Contadores já calculados (só leitura do cache) ou None."""
+    if not getattr(user, 'is_authenticated', False):
+        return dict.fromkeys(CAMPOS, 0)
+    try:
+        return cache.get(_chave(user.id))
+    except Exception:
+        return None
+
+
+def contadores(user) -> dict:
+    """Contadores do usuário (cache de ``BADGES_TTL`` segundos)."""
+    if not getattr(user, 'is_authenticated', False):
+        return dict.fromkeys(CAMPOS, 0)
+    try:
+        chave = _chave(user.id)
+        dados = cache.get(chave)
+    except Exception:
+        chave, dados = None, None
+    if dados is None:
+        try:
+            dados = _calcular(user)
+        except Exception:
+            return dict.fromkeys(CAMPOS, 0)
+        if chave:
+            cache.set(chave, dados, _ttl())
+    return dados
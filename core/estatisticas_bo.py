@@ -0,0 +1,203 @@
+"""Agregação da tela Estatísticas de BO (`views.estatisticas_bo`) em duas passadas.
+
+A view fazia uma consulta por métrica sobre o mesmo período (total, abertos,
+finalizados, offline, status, viaturas, códigos, bairros, bairros × códigos, DV,
+flagrantes, encarregados e as quebras de DV) e normalizava o bairro de cada BO
+em Python. Aqui:
+
+- uma consulta agrupada pelas dimensões exibidas (status, viatura, encarregado,
+  código/natureza e bairro normalizado), com as contagens condicionais de
+  offline, DV e flagrante (``Count(filter=...)``); totais, rankings e
+  cruzamentos são somas sobre essas linhas (uma por combinação, não por BO);
+- uma consulta para a série diária;
+- o bairro vem da coluna ``BO.bairro_normalizado`` (mantida no ``save``);
+- prefixo da viatura e nome do encarregado só para os ids exibidos.
+
+`contagens` reduz as linhas agrupadas a um ``Counter`` por dimensão; os resumos
+diários/mensais (`core.resumos`, fonte ``bo``) guardam essas mesmas contagens e
+`agregar_resumo` monta a tela a partir deles.
+"""
+from __future__ import annotations
+
+import re
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# DV contra Mulher: código A-18 ou natureza contendo 'mulher'/'maria da penha'
+DV_Q = (
+    Q(cod_natureza__istartswith='A-18') |
+    Q(natureza__icontains='mulher') |
+    Q(natureza__icontains='maria da penha')
+)
+FLAGRANTE_Q = Q(flagrante__iexact='SIM') | Q(flagrante__iexact='S')
+
+DIMENSOES = ('status', 'viatura_id', 'encarregado_id', 'cod_natureza', 'natureza', 'bairro_normalizado')
+
+
+def periodo(de, ate) -> Q:
+    """``emissao`` entre as datas locais ``de`` e ``ate`` (inclusive).
+
+    Compara a coluna com limites de data/hora em vez de ``emissao__date__range``,
+    que aplica a conversão de data em cada linha e não usa índice.
+    """
+    inicio = timezone.make_aware(datetime.combine(de, time.min))
+    fim = timezone.make_aware(datetime.combine(ate + timedelta(days=1), time.min))
+    return Q(emissao__gte=inicio, emissao__lt=fim)
+
+
+def _natureza_sem_codigo(cod: str, natureza: str) -> str:
+    # Remove prefixo duplicado do código na natureza, ex.: "A-04 - Homicídio" -> "Homicídio"
+    if not (cod and natureza):
+        return natureza
+    try:
+        return re.sub(rf'^{re.escape(cod)}\s*[-–—:]?\s*', '', natureza, flags=re.IGNORECASE)
+    except Exception:
+        return natureza
+
+
+def _nomes(viatura_ids, user_ids):
+    from viaturas.models import Viatura
+    prefixos = dict(Viatura.objects.filter(pk__in=[v for v in viatura_ids if v]).values_list('id', 'prefixo'))
+    usuarios = {
+        u['id']: u for u in get_user_model().objects.filter(pk__in=[u for u in user_ids if u])
+        .values('id', 'first_name', 'last_name', 'username')
+    }
+    return prefixos, usuarios
+
+
+def _usuario(uid, usuarios) -> dict:
+    u = usuarios.get(uid) or {}
+    return {
+        'encarregado_id': uid,
+        'encarregado__first_name': u.get('first_name') or '',
+        'encarregado__last_name': u.get('last_name') or '',
+        'encarregado__username': u.get('username') or '',
+    }
+
+
+def cubo(qs, *extras):
+    """Linhas agrupadas por ``DIMENSOES`` (e ``extras``) com as contagens condicionais."""
+    return (
+        qs.order_by().values(*extras, *DIMENSOES)
+        .annotate(
+            qtd=Count('id'),
+            n_offline=Count('id', filter=Q(offline=True)),
+            n_dv=Count('id', filter=DV_Q),
+            n_flagrante=Count('id', filter=FLAGRANTE_Q),
+            bairro_exibicao=Max('bairro'),
+        )
+    )
+
+
+def contagens(linhas) -> tuple[dict[str, Counter], dict[str, str]]:
+    """({dimensão: Counter(chave -> qtd)}, {bairro normalizado: grafia}) das linhas de `cubo`.
+
+    Com a coluna ``dia`` nas linhas, conta também a dimensão ``serie`` (chave AAAA-MM-DD).
+    """
+    c = {d: Counter() for d in ('serie', 'indicador', 'status', 'viatura', 'codigo', 'usuario', 'usuario_codigo',
+                                'bairro', 'bairro_codigo', 'dv_codigo', 'dv_usuario', 'dv_viatura')}
+    exibicao_bairro = {}
+    for r in linhas:
+        n = r['qtd']
+        cod = (r['cod_natureza'] or '', r['natureza'] or '')
+        nb, uid, vid = r['bairro_normalizado'] or '', r['encarregado_id'], r['viatura_id']
+        if r.get('dia'):
+            c['serie'][r['dia'].isoformat()] += n
+        for indicador in ('offline', 'flagrante', 'dv'):
+            if r[f'n_{indicador}']:
+                c['indicador'][indicador] += r[f'n_{indicador}']
+        c['status'][r['status']] += n
+        c['viatura'][vid] += n
+        c['codigo'][cod] += n
+        c['usuario'][uid] += n
+        c['usuario_codigo'][(uid, cod)] += n
+        c['bairro'][nb] += n
+        c['bairro_codigo'][(nb, cod)] += n
+        if nb and r['bairro_exibicao'] and nb not in exibicao_bairro:
+            exibicao_bairro[nb] = r['bairro_exibicao']
+        if r['n_dv']:
+            c['dv_codigo'][cod] += r['n_dv']
+            c['dv_usuario'][uid] += r['n_dv']
+            c['dv_viatura'][vid] += r['n_dv']
+    return c, exibicao_bairro
+
+
+def montar(c: dict[str, Counter], exibicao_bairro: dict[str, str], serie_por_dia: list[dict]) -> dict:
+    """Contexto da tela a partir das contagens por dimensão (de `contagens` ou dos resumos)."""
+    por_status = c['status']
+    total = sum(por_status.values())
+    dv_total = c['indicador']['dv']
+    top_viaturas = c['viatura'].most_common(5)
+    top_encarregados = c['usuario'].most_common(20)
+    top_dv_encarregados = c['dv_usuario'].most_common(5)
+    top_dv_viaturas = c['dv_viatura'].most_common(5)
+    prefixos, usuarios = _nomes(
+        {v for v, _ in top_viaturas + top_dv_viaturas},
+        {u for u, _ in top_encarregados + top_dv_encarregados},
+    )
+
+    def _bairro(nb):
+        nome = (exibicao_bairro.get(nb) or '').strip()
+        if nome and (nome.isupper() or nome.islower()):
+            nome = nome.title()  # grafia sem capitalização definida: "CENTRO"/"centro" -> "Centro"
+        return nome or (nb.title() if nb else 'Não informado')
+
+    codigos_por_usuario = {}
+    for (uid, (cod, natureza)), qtd in c['usuario_codigo'].most_common():
+        codigos_por_usuario.setdefault(uid, []).append({'cod': cod, 'natureza': natureza, 'qtd': qtd})
+    users_ranking = []
+    for uid, qtd in top_encarregados:
+        u = _usuario(uid, usuarios)
+        fn, ln = u['encarregado__first_name'], u['encarregado__last_name']
+        top = (codigos_por_usuario.get(uid) or [])[:3]
+        users_ranking.append({
+            'user_id': uid,
+            'nome': (f"{fn} {ln}" if (fn or ln) else u['encarregado__username']).strip(),
+            'total': qtd,
+            'top_codigos': [{**t, 'natureza': _natureza_sem_codigo(t['cod'], t['natureza'])} for t in top],
+        })
+
+    return {
+        'total': total,
+        'abertos': por_status['EDICAO'],
+        'finalizados': por_status['FINALIZADO'],
+        'offline': c['indicador']['offline'],
+        'por_status': [{'status': s, 'qtd': q} for s, q in por_status.most_common()],
+        'top_viaturas': [{'viatura_id': v, 'viatura__prefixo': prefixos.get(v), 'qtd': q} for v, q in top_viaturas],
+        'serie_por_dia': serie_por_dia,
+        'ranking_codigos': [{'cod_natureza': cd, 'natureza': n, 'qtd': q} for (cd, n), q in c['codigo'].most_common(20)],
+        'ranking_bairros': [{'bairro': _bairro(nb), 'qtd': q, 'bairro_norm': nb} for nb, q in c['bairro'].most_common(20)],
+        'bairros_codigos': sorted(
+            ({'bairro': _bairro(nb), 'cod': cd or '-', 'natureza': n or '-', 'qtd': q}
+             for (nb, (cd, n)), q in c['bairro_codigo'].items()),
+            key=lambda r: (r['bairro'], -r['qtd']),
+        ),
+        'dv_total': dv_total,
+        'dv_percent': round((dv_total / total) * 100, 1) if total else 0.0,
+        'dv_por_codigo': [{'cod_natureza': cd, 'natureza': n, 'qtd': q} for (cd, n), q in c['dv_codigo'].most_common(5)],
+        'dv_por_usuario': [{**_usuario(u, usuarios), 'qtd': q} for u, q in top_dv_encarregados],
+        'dv_por_viatura': [{'viatura_id': v, 'viatura__prefixo': prefixos.get(v), 'qtd': q} for v, q in top_dv_viaturas],
+        'flagrantes': c['indicador']['flagrante'],
+        'users_ranking': users_ranking,
+    }
+
+
+def agregar(qs) -> dict:
+    """Métricas da tela para os BOs de ``qs`` (já filtrado pelo período)."""
+    c, exibicao_bairro = contagens(cubo(qs))
+    serie_por_dia = list(
+        qs.order_by().annotate(dia=TruncDate('emissao')).values('dia').annotate(qtd=Count('id')).order_by('dia')
+    )
+    return montar(c, exibicao_bairro, serie_por_dia)
+
+
+def agregar_resumo(de, ate) -> dict:
+    """Mesmas métricas de `agregar`, lidas dos resumos diários/mensais (`core.resumos`)."""
+    from . import resumos
+    r = resumos.ler('bo', de, ate)
+    return montar(r.qtd, r.rotulo['bairro'], r.serie())
@@ -0,0 +1,101 @@
+"""Agregação das telas de Abordados e Policiamentos (`views_estatisticas`) por colunas.
+
+As views percorriam cada Abordado/Talão do período como instância (com cinco
+``select_related``) só para contar os integrantes da equipe em Python, faziam
+uma consulta por total e montavam os locais varrendo o queryset duas vezes.
+Aqui tudo sai de consultas agrupadas que devolvem só as colunas usadas:
+
+- integrantes: ``GROUP BY`` pela combinação das cinco funções do talão
+  (criado_por, encarregado, motorista, auxiliares) com ``COUNT``; cada
+  combinação soma ``n`` uma vez para cada integrante distinto dela, então o
+  trabalho em Python acompanha o número de equipes do período, não o de registros;
+- tipos, locais (bairro + rua) e dias também são agrupados no banco;
+- o período é filtrado por limites de data/hora (`periodo`), que usam os
+  índices de ``criado_em``/``iniciado_em``.
+
+Usado pelas views quando há filtro de GCM (a visão geral vem de `core.resumos`)
+e pelo cálculo dos resumos dessas duas fontes.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+EQUIPE = ('criado_por_id', 'encarregado_id', 'motorista_id', 'auxiliar1_id', 'auxiliar2_id')
+
+
+def periodo(campo: str, de, ate) -> Q:
+    """``campo`` entre as datas locais ``de`` e ``ate`` (inclusive), comparando com limites
+    de data/hora: ``__date__range`` converte a data linha a linha e não usa o índice."""
+    inicio = timezone.make_aware(datetime.combine(de, time.min))
+    fim = timezone.make_aware(datetime.combine(ate + timedelta(days=1), time.min))
+    return Q(**{f'{campo}__gte': inicio, f'{campo}__lt': fim})
+
+
+def equipe(prefixo: str = '') -> list[str]:
+    """Colunas da equipe do talão, ex.: ``equipe('talao__')`` a partir de Abordado."""
+    return [f"{prefixo}{c}" for c in EQUIPE]
+
+
+def contar_integrantes(linhas) -> Counter:
+    """Counter(user_id -> n) de linhas ``(n, *ids)``; quem aparece em duas funções conta uma vez."""
+    c = Counter()
+    for n, *ids in linhas:
+        for uid in {i for i in ids if i}:
+            c[uid] += n
+    return c
+
+
+def local_talao(bairro: str, rua: str) -> str:
+    """Local do talão como exibido em Policiamentos: "Bairro - Rua", um dos dois ou "Não informado"."""
+    bairro, rua = (bairro or '').strip(), (rua or '').strip()
+    if bairro and rua:
+        return f"{bairro} - {rua}"
+    return bairro or rua or "Não informado"
+
+
+def _top_dias(qs, campo: str, n: int = 10) -> list[dict]:
+    return list(
+        qs.order_by().annotate(dia=TruncDate(campo)).values('dia').annotate(qtd=Count('id')).order_by('-qtd', 'dia')[:n]
+    )
+
+
+def abordados(qs) -> dict:
+    """Totais, integrantes e top dias dos Abordados de ``qs`` (já filtrado)."""
+    campos = equipe('talao__')
+    linhas = list(qs.order_by().values('tipo', *campos).annotate(n=Count('id')))
+    por_tipo = Counter()
+    for r in linhas:
+        por_tipo[r['tipo']] += r['n']
+    return {
+        'total': sum(por_tipo.values()),
+        'total_veiculos': por_tipo['VEICULO'],
+        'total_pessoas': por_tipo['PESSOA'],
+        'integrantes': contar_integrantes((r['n'], *(r[c] for c in campos)) for r in linhas),
+        'top_dias': _top_dias(qs, 'criado_em'),
+    }
+
+
+def policiamentos(qs) -> dict:
+    """Total, integrantes, top dias, tipos e locais dos Talões de ``qs`` (já filtrado)."""
+    campos = equipe()
+    equipes = list(qs.order_by().values(*campos).annotate(n=Count('id')))
+    locais, grafias = Counter(), {}
+    for r in qs.order_by().values('local_bairro', 'local_rua').annotate(n=Count('id')):
+        local = local_talao(r['local_bairro'], r['local_rua'])
+        locais[local.lower()] += r['n']  # agrupa variações de maiúsculas/minúsculas
+        grafias.setdefault(local.lower(), Counter())[local] += r['n']
+    return {
+        'total': sum(r['n'] for r in equipes),
+        'integrantes': contar_integrantes((r['n'], *(r[c] for c in campos)) for r in equipes),
+        'top_dias': _top_dias(qs, 'iniciado_em'),
+        'top_tipos': list(
+            qs.order_by().values('codigo_ocorrencia__descricao').annotate(qtd=Count('id')).order_by('-qtd')[:10]
+        ),
+        # exibe a grafia mais usada de cada local
+        'top_locais': [{'local': grafias[k].most_common(1)[0][0], 'qtd': q} for k, q in locais.most_common(10)],
+    }
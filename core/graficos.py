@@ -0,0 +1,335 @@
+"""Cache das telas de gráficos (``estatisticas_*_graficos``) e do PDF de gráficos por usuário.
+
+Os gráficos são desenhados no navegador (Chart.js); o que custa no servidor são as
+consultas de cada gráfico (refeitas a cada carregamento e troca de aba) e, no PDF,
+o wkhtmltopdf. Aqui:
+
+- `dados(nome, de, ate, **filtros)` devolve o resultado de ``SERIES[nome]`` guardado
+  em JSON; `artefato(...)` faz o mesmo com bytes já renderizados (o PDF);
+- a chave é (tela, filtros, período, versão dos dados). A versão é o maior
+  ``alterado_em`` de `ResumoEstatisticaPeriodo` nos dias do período: os sinais de
+  `core.resumos` carimbam o dia de cada registro gravado ou excluído, então qualquer
+  alteração no período muda a chave, sem invalidação explícita;
+- os arquivos ficam em ``GRAFICOS_CACHE_DIR/<tela>/``. ``GRAFICOS_CACHE_TTL``
+  (contado da gravação, pelo mtime) cobre o que os sinais não veem (``QuerySet.update``,
+  nome de usuário, descrição de código); o total é limitado por
+  ``GRAFICOS_CACHE_MAX_BYTES``, descartando os menos usados (atime, gravado a cada acerto);
+- `aquecer()` (``manage.py aquecer_graficos``, cron logo após a meia-noite) calcula
+  as abas padrão Mês e Ano de cada tela sem filtro.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import estatisticas_bo, estatisticas_taloes, resumos
+from .models import ResumoEstatisticaPeriodo
+
+# Incrementar quando o formato dos dados ou o template do PDF mudar (invalida tudo)
+VERSAO = '1'
+
+ABAS = ('dia', 'mes', 'semestre', 'ano')
+
+_lock = threading.Lock()
+_contadores = {'hits': 0, 'misses': 0, 'gravados': 0, 'expirados': 0, 'removidos_lru': 0}
+
+
+def _inc(chave_: str, n: int = 1):
+    with _lock:
+        _contadores[chave_] = _contadores.get(chave_, 0) + n
+
+
+def periodo_aba(tab: str, hoje: date) -> tuple[date, date]:
+    """Período padrão das abas Dia/Mês/Semestre/Ano (aba desconhecida = Mês)."""
+    if tab == 'dia':
+        return hoje, hoje
+    if tab == 'semestre':
+        if hoje.month <= 6:
+            return date(hoje.year, 1, 1), date(hoje.year, 6, 30)
+        return date(hoje.year, 7, 1), min(date(hoje.year, 12, 31), hoje)
+    if tab == 'ano':
+        return date(hoje.year, 1, 1), hoje
+    return hoje.replace(day=1), hoje
+
+
+# ---------------------------------------------------------------- dados de cada tela
+
+def _serie(qs, campo: str) -> list[dict]:
+    return [
+        {'dia': r['dia'].strftime('%Y-%m-%d') if r['dia'] else '', 'qtd': int(r['qtd'] or 0)}
+        for r in qs.order_by().annotate(dia=TruncDate(campo)).values('dia').annotate(qtd=Count('id')).order_by('dia')
+    ]
+
+
+def _total_serie(qs, campo: str) -> dict:
+    serie = _serie(qs, campo)
+    return {'total': sum(r['qtd'] for r in serie), 'serie': serie}
+
+
+def _equipe_q(uid: int, prefixo: str = ''):
+    q = Q()
+    for campo in estatisticas_taloes.equipe(prefixo):
+        q |= Q(**{campo: uid})
+    return q
+
+
+def _ait(de, ate, uid=0):
+    from taloes.models import AitRegistro
+    qs = AitRegistro.objects.filter(estatisticas_taloes.periodo('criado_em', de, ate))
+    if uid:
+        qs = qs.filter(Q(integrante_id=uid) | _equipe_q(uid, 'talao__'))
+    return _total_serie(qs, 'criado_em')
+
+
+def _abordados(de, ate, uid=0):
+    from taloes.models import Abordado
+    qs = Abordado.objects.filter(estatisticas_taloes.periodo('criado_em', de, ate))
+    if uid:
+        qs = qs.filter(_equipe_q(uid, 'talao__'))
+    return _total_serie(qs, 'criado_em')
+
+
+def _policiamentos(de, ate, uid=0):
+    from taloes.models import Talao
+    qs = Talao.objects.filter(estatisticas_taloes.periodo('iniciado_em', de, ate), status='FECHADO',
+                              codigo_ocorrencia__descricao__icontains='Policiamento')
+    if uid:
+        qs = qs.filter(_equipe_q(uid))
+    return _total_serie(qs, 'iniciado_em')
+
+
+def _cecom(de, ate, op=0, cod=''):
+    from cecom.models import DespachoOcorrencia
+    qs = DespachoOcorrencia.objects.filter(estatisticas_taloes.periodo('despachado_em', de, ate))
+    if op:
+        qs = qs.filter(despachado_por_id=op)
+    if cod:
+        qs = qs.filter(cod_natureza=cod)
+    return _total_serie(qs, 'despachado_em')
+
+
+def _remocoes(de, ate, uid=0):
+    from bogcmi.models import VeiculoEnvolvido
+    qs = VeiculoEnvolvido.objects.filter(
+        estatisticas_taloes.periodo('bo__emissao', de, ate),
+        Q(apreensao_ait__gt='') | Q(apreensao_crr__gt='') | Q(apreensao_destino__gt='') |
+        Q(apreensao_responsavel_guincho__gt=''),
+    )
+    if uid:
+        qs = qs.filter(Q(bo__encarregado_id=uid) | Q(bo__motorista_id=uid) | Q(bo__auxiliar1_id=uid) |
+                       Q(bo__auxiliar2_id=uid) | Q(bo__cecom_id=uid))
+    return _total_serie(qs, 'bo__emissao')
+
+
+def _bo_usuario(de, ate, uid=0, flag=''):
+    from bogcmi.models import BO
+    if not uid:
+        return {'total': 0, 'por_status': [], 'qtd_flag': 0, 'ranking_codigos': [], 'serie': []}
+    qs = BO.objects.filter(estatisticas_bo.periodo(de, ate), encarregado_id=uid)
+    if flag == 'sim':
+        qs = qs.filter(estatisticas_bo.FLAGRANTE_Q)
+    elif flag == 'nao':
+        qs = qs.exclude(estatisticas_bo.FLAGRANTE_Q)
+    por_status = list(qs.order_by().values('status').annotate(qtd=Count('id')).order_by('-qtd'))
+    return {
+        'total': sum(r['qtd'] for r in por_status),
+        'por_status': por_status,
+        'qtd_flag': qs.filter(estatisticas_bo.FLAGRANTE_Q).count(),
+        'ranking_codigos': list(qs.order_by().values('cod_natureza', 'natureza').annotate(qtd=Count('id')).order_by('-qtd')[:10]),
+        'serie': _serie(qs, 'emissao'),
+    }
+
+
+# tela -> (fonte dos resumos que versiona os dados, cálculo(de, ate, **filtros))
+SERIES: dict[str, tuple[str, Callable]] = {
+    'ait': ('ait', _ait),
+    'abordados': ('abordados', _abordados),
+    'policiamentos': ('policiamentos', _policiamentos),
+    'cecom': ('cecom', _cecom),
+    'remocoes': ('remocoes', _remocoes),
+    'bo_usuario': ('bo', _bo_usuario),
+}
+# telas abertas sem filtro (as que `aquecer` prepara)
+PADRAO = ('ait', 'abordados', 'policiamentos', 'cecom', 'remocoes')
+
+
+# ---------------------------------------------------------------- cache em disco
+
+def _diretorio() -> str:
+    return str(getattr(settings, 'GRAFICOS_CACHE_DIR', '') or os.path.join(settings.BASE_DIR, 'cache', 'graficos'))
+
+
+def _ttl() -> int:
+    return int(getattr(settings, 'GRAFICOS_CACHE_TTL', 12 * 3600))
+
+
+def _limite_bytes() -> int:
+    return int(getattr(settings, 'GRAFICOS_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+
+def versao(fonte: str, de: date, ate: date) -> Optional[str]:
+    """Carimbo da última alteração de ``fonte`` nos dias [de, ate] ('' se nenhuma); None se indisponível."""
+    try:
+        v = ResumoEstatisticaPeriodo.objects.filter(
+            fonte=fonte, granularidade=resumos.DIA, inicio__gte=de, inicio__lte=ate,
+        ).aggregate(v=Max('alterado_em'))['v']
+    except Exception:
+        return None
+    return v.isoformat() if v else ''
+
+
+def chave(nome: str, de: date, ate: date, filtros: dict, versao_: str) -> str:
+    # filtros vazios (uid=0, cod='') equivalem à tela sem filtro
+    bruto = json.dumps([VERSAO, nome, f"{de:%Y-%m-%d}", f"{ate:%Y-%m-%d}",
+                        sorted((k, v) for k, v in filtros.items() if v), versao_], default=str)
+    return hashlib.sha256(bruto.encode()).hexdigest()[:32]
+
+
+def _caminho(nome: str, chave_: str, ext: str) -> str:
+    return os.path.join(_diretorio(), nome, f"{chave_}.{ext}")
+
+
+def _ler(path: str) -> Optional[bytes]:
+    try:
+        st = os.stat(path)
+        if time.time() - st.st_mtime > _ttl():
+            _inc('expirados')
+            _descartar(path)
+            raise FileNotFoundError(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.utime(path, (time.time(), st.st_mtime))  # atime = último uso (LRU); mtime = gravação (TTL)
+    except OSError:
+        _inc('misses')
+        return None
+    _inc('hits')
+    return data
+
+
+def _gravar(path: str, data: bytes):
+    """Grava de forma atômica e aplica o limite de tamanho. Falhas não interrompem a view."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        return
+    _inc('gravados')
+    _evict()
+
+
+def _descartar(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _arquivos():
+    raiz = _diretorio()
+    if not os.path.isdir(raiz):
+        return []
+    itens = []
+    for sub in os.scandir(raiz):
+        if not sub.is_dir():
+            continue
+        for ent in os.scandir(sub.path):
+            if ent.is_file() and not ent.name.endswith('.tmp'):
+                try:
+                    st = ent.stat()
+                except OSError:
+                    continue  # removido em paralelo
+                itens.append((st.st_atime, st.st_mtime, st.st_size, ent.path))
+    return itens
+
+
+def _evict():
+    limite, vencimento = _limite_bytes(), time.time() - _ttl()
+    with _lock:
+        itens = []
+        for atime, mtime, size, path in _arquivos():
+            if mtime < vencimento:
+                _descartar(path)
+                _contadores['expirados'] += 1
+            else:
+                itens.append((atime, size, path))
+        total = sum(i[1] for i in itens)
+        for _atime, size, path in sorted(itens):
+            if total <= limite:
+                break
+            _descartar(path)
+            total -= size
+            _contadores['removidos_lru'] += 1
+
+
+def dados(nome: str, de: date, ate: date, **filtros) -> dict:
+    """Dados do gráfico ``nome`` (ver `SERIES`) no período, do cache quando a versão confere."""
+    fonte, calcular = SERIES[nome]
+    v = versao(fonte, de, ate) if _ttl() > 0 else None
+    if v is None:
+        return calcular(de, ate, **filtros)
+    path = _caminho(nome, chave(nome, de, ate, filtros, v), 'json')
+    bruto = _ler(path)
+    if bruto is not None:
+        try:
+            return json.loads(bruto)
+        except ValueError:
+            pass  # arquivo truncado: recalcula e regrava
+    res = calcular(de, ate, **filtros)
+    _gravar(path, json.dumps(res, default=str).encode('utf-8'))
+    return res
+
+
+def artefato(nome: str, fonte: str, de: date, ate: date, filtros: dict, ext: str,
+             gerar: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+    """Bytes de ``gerar()`` (ex.: PDF) em cache. ``gerar`` devolve None quando não há o que guardar."""
+    v = versao(fonte, de, ate) if _ttl() > 0 else None
+    if v is None:
+        return gerar()
+    path = _caminho(nome, chave(nome, de, ate, filtros, v), ext)
+    data = _ler(path)
+    if data is None:
+        data = gerar()
+        if data:
+            _gravar(path, data)
+    return data
+
+
+def aquecer(hoje: Optional[date] = None, abas=('mes', 'ano')) -> list[tuple[str, str, bool]]:
+    """Calcula as abas padrão das telas sem filtro; devolve (tela, aba, já estava em cache)."""
+    hoje = hoje or timezone.localdate()
+    feitos = []
+    for nome in PADRAO:
+        for tab in abas:
+            de, ate = periodo_aba(tab, hoje)
+            hits = _contadores['hits']
+            dados(nome, de, ate)
+            feitos.append((nome, tab, _contadores['hits'] > hits))
+    return feitos
+
+
+def metricas() -> dict:
+    itens = _arquivos()
+    with _lock:
+        res = dict(_contadores)
+    total = res['hits'] + res['misses']
+    res.update({
+        'arquivos': len(itens),
+        'bytes': sum(i[2] for i in itens),
+        'limite_bytes': _limite_bytes(),
+        'taxa_acerto': round(res['hits'] / total, 3) if total else 0.0,
+    })
+    return res
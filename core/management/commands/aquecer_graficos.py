@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core import graficos
+
+
+class Command(BaseCommand):
+    help = ("Calcula e guarda no cache (core.graficos) as abas padrão das telas de gráficos sem filtro, "
+            "para que abram prontas pela manhã. Rodar logo após a meia-noite (cron), depois de recalcular_resumos.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--aba', choices=graficos.ABAS, action='append',
+                            help='Só esta aba (pode repetir). Padrão: mes e ano.')
+
+    def handle(self, *args, **options):
+        for nome, tab, em_cache in graficos.aquecer(abas=options['aba'] or ('mes', 'ano')):
+            self.stdout.write(f"{nome} ({tab}): {'já estava em cache' if em_cache else 'calculado'}")
+        m = graficos.metricas()
+        self.stdout.write(f"cache: {m['arquivos']} arquivo(s), {m['bytes'] / 1024:.0f} KB de {m['limite_bytes'] // (1024 * 1024)} MB")
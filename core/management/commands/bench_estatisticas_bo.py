@@ -0,0 +1,158 @@
+import random
+import time
+import unicodedata
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from bogcmi.models import BO, NumeroBOLivre, SequenciaBO, _normalize_nome
+from core import estatisticas_bo
+from viaturas.models import Viatura
+
+BAIRROS = ['Centro', 'Jardim Primavera', 'Vila São José', 'Cachoeira', 'Paiol do Meio', 'Rio Acima',
+           'Campo Verde', 'Lageado', 'Murundu', 'Carmo Messias', 'Caucaia', 'Verava']
+NATUREZAS = [f"A-{i:02d} - Ocorrência {i}" for i in range(1, 60)] + ['A-18 - Violência doméstica contra a mulher']
+
+
+def _variante(rnd, bairro):
+    """Grafias diferentes do mesmo bairro, como digitadas nos BOs."""
+    sem_acento = unicodedata.normalize('NFKD', bairro).encode('ascii', 'ignore').decode('ascii')
+    return rnd.choice([bairro, bairro.upper(), sem_acento.lower(), f" {bairro} "])
+
+
+def _legado(de, ate):
+    """Consultas da view antes do motor de agregação (uma por métrica, bairro normalizado em Python)."""
+    from django.db.models import Q
+    qs = BO.objects.select_related('viatura').filter(emissao__date__range=(de, ate))
+    total = qs.count()
+    abertos = qs.filter(status='EDICAO').count()
+    finalizados = qs.filter(status='FINALIZADO').count()
+    offline = qs.filter(offline=True).count()
+    por_status = list(qs.values('status').annotate(qtd=Count('id')).order_by('-qtd'))
+    top_viaturas = list(qs.values('viatura_id', 'viatura__prefixo').annotate(qtd=Count('id')).order_by('-qtd')[:5])
+    serie = list(qs.annotate(dia=TruncDate('emissao')).values('dia').annotate(qtd=Count('id')).order_by('dia'))
+    ranking_codigos = list(qs.values('cod_natureza', 'natureza').annotate(qtd=Count('id')).order_by('-qtd')[:20])
+
+    def _norm(txt):
+        txt = unicodedata.normalize('NFKD', (txt or '').strip().lower())
+        return ''.join(c for c in txt if not unicodedata.combining(c))
+
+    c_bairros = Counter(_norm(b) for b in qs.values_list('bairro', flat=True))
+    bairros_codigos = [(_norm(r['bairro']), r['qtd']) for r in
+                       qs.values('bairro', 'cod_natureza', 'natureza').annotate(qtd=Count('id')).order_by('bairro', '-qtd')]
+    dv_q = estatisticas_bo.DV_Q
+    dv_total = qs.filter(dv_q).count()
+    flagrantes = qs.filter(Q(flagrante__iexact='SIM') | Q(flagrante__iexact='S')).count()
+    enc = list(qs.values('encarregado_id', 'encarregado__first_name', 'encarregado__last_name', 'encarregado__username')
+               .annotate(total=Count('id')).order_by('-total')[:20])
+    list(qs.filter(encarregado_id__in=[r['encarregado_id'] for r in enc])
+         .values('encarregado_id', 'cod_natureza', 'natureza').annotate(qtd=Count('id')).order_by('encarregado_id', '-qtd'))
+    list(qs.filter(dv_q).values('cod_natureza', 'natureza').annotate(qtd=Count('id')).order_by('-qtd')[:5])
+    list(qs.filter(dv_q).values('encarregado_id', 'encarregado__first_name', 'encarregado__last_name',
+                                'encarregado__username').annotate(qtd=Count('id')).order_by('-qtd')[:5])
+    list(qs.filter(dv_q).values('viatura_id', 'viatura__prefixo').annotate(qtd=Count('id')).order_by('-qtd')[:5])
+    return {
+        'total': total, 'abertos': abertos, 'finalizados': finalizados, 'offline': offline,
+        'dv_total': dv_total, 'flagrantes': flagrantes, 'dias': len(serie),
+        'status': sorted(r['qtd'] for r in por_status),
+        'viaturas': [r['qtd'] for r in top_viaturas],
+        'codigos': [r['qtd'] for r in ranking_codigos],
+        'bairros': sorted(c_bairros.values()),
+        'encarregados': [r['total'] for r in enc],
+        'bairros_codigos_total': sum(q for _, q in bairros_codigos),
+    }
+
+
+def _resumo(m):
+    return {
+        'total': m['total'], 'abertos': m['abertos'], 'finalizados': m['finalizados'], 'offline': m['offline'],
+        'dv_total': m['dv_total'], 'flagrantes': m['flagrantes'], 'dias': len(m['serie_por_dia']),
+        'status': sorted(r['qtd'] for r in m['por_status']),
+        'viaturas': [r['qtd'] for r in m['top_viaturas']],
+        'codigos': [r['qtd'] for r in m['ranking_codigos']],
+        'bairros': sorted(r['qtd'] for r in m['ranking_bairros']),
+        'encarregados': [r['total'] for r in m['users_ranking']],
+        'bairros_codigos_total': sum(r['qtd'] for r in m['bairros_codigos']),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Compara core.estatisticas_bo.agregar com as consultas anteriores de estatisticas_bo "
+            "(tempo, número de consultas e resultados) sobre BOs sintéticos de um ano fictício. "
+            "Os dados de teste são apagados ao final.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bos', type=int, default=100000, help='BOs no ano fictício.')
+        parser.add_argument('--ano', type=int, default=9980)
+        parser.add_argument('--repeticoes', type=int, default=3)
+
+    def handle(self, *args, **options):
+        ano, n = options['ano'], max(1, options['bos'])
+        if BO.objects.filter(numero__endswith=f'-{ano}').exists():
+            raise CommandError(f"Já existem BOs de {ano}; escolha outro --ano.")
+        marca = f"bench-estat-{int(time.time())}"
+        User = get_user_model()
+        usuarios = [User.objects.create(username=f"{marca}-{i}", first_name=f"GCM {i}") for i in range(25)]
+        viaturas = [Viatura.objects.create(prefixo=f"B{int(time.time()) % 100000}-{i}") for i in range(15)]
+        try:
+            self._popular(ano, n, usuarios, viaturas)
+            self._comparar(ano, options['repeticoes'])
+        finally:
+            SequenciaBO.objects.filter(ano=ano).delete()  # antes dos BOs: as exclusões não geram lacunas
+            BO.objects.filter(numero__endswith=f'-{ano}').delete()
+            NumeroBOLivre.objects.filter(ano=ano).delete()
+            Viatura.objects.filter(pk__in=[v.pk for v in viaturas]).delete()
+            User.objects.filter(username__startswith=marca).delete()
+
+    def _popular(self, ano, n, usuarios, viaturas):
+        rnd = random.Random(ano)
+        inicio = timezone.make_aware(datetime(ano, 1, 1))
+        t0 = time.perf_counter()
+        lote = []
+        for i in range(1, n + 1):
+            bairro = _variante(rnd, rnd.choice(BAIRROS)) if rnd.random() > 0.05 else ''
+            natureza = rnd.choice(NATUREZAS)
+            lote.append(BO(
+                numero=f"{i}-{ano}", emissao=inicio + timedelta(seconds=rnd.randrange(365 * 86400)),
+                natureza=natureza, cod_natureza=natureza.split(' - ', 1)[0],
+                bairro=bairro, bairro_normalizado=_normalize_nome(bairro),
+                encarregado=rnd.choice(usuarios), viatura=rnd.choice(viaturas + [None]),
+                status=rnd.choice(['FINALIZADO'] * 8 + ['EDICAO', 'ARQUIVADO']),
+                offline=rnd.random() < 0.03, flagrante=rnd.choice(['', '', '', 'NAO', 'SIM', 's']),
+            ))
+            if len(lote) == 5000:
+                BO.objects.bulk_create(lote)
+                lote = []
+        BO.objects.bulk_create(lote)
+        self.stdout.write(f"{n} BOs criados em {time.perf_counter() - t0:.1f} s ({connection.vendor})")
+
+    def _medir(self, func, repeticoes):
+        melhor, resultado, consultas = None, None, 0
+        for _ in range(repeticoes):
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                resultado = func()
+                dt = time.perf_counter() - t0
+            consultas = len(ctx)
+            melhor = dt if melhor is None else min(melhor, dt)
+        return melhor, consultas, resultado
+
+    def _comparar(self, ano, repeticoes):
+        fim_ano = date(ano, 12, 31)
+        for aba, de in (('mes', date(ano, 12, 1)), ('semestre', date(ano, 7, 1)), ('ano', date(ano, 1, 1))):
+            t_leg, q_leg, leg = self._medir(lambda: _legado(de, fim_ano), repeticoes)
+            qs = BO.objects.filter(estatisticas_bo.periodo(de, fim_ano))
+            t_novo, q_novo, novo = self._medir(lambda: _resumo(estatisticas_bo.agregar(qs)), repeticoes)
+            self.stdout.write(f"aba {aba:8} ({leg['total']} BOs): anterior {t_leg * 1000:.0f} ms / {q_leg} consultas, "
+                              f"atual {t_novo * 1000:.0f} ms / {q_novo} consultas")
+            diferentes = [k for k in leg if leg[k] != novo[k]]
+            if diferentes:
+                raise CommandError(f"Resultados diferentes na aba {aba}: {diferentes}")
+        self.stdout.write(self.style.SUCCESS("Resultados iguais aos das consultas anteriores."))
@@ -0,0 +1,143 @@
+import random
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import estatisticas_taloes
+from taloes.models import Abordado, CodigoOcorrencia, Talao
+
+LOCAIS = [('Centro', 'Rua Um'), ('CENTRO', 'RUA UM'), ('Jardim Primavera', ''), ('', 'Av. Brasil'), ('Vila Nova', 'Rua Dois'),
+          ('vila nova', 'rua dois'), ('', ''), ('Cachoeira', 'Estrada Velha')]
+
+
+def _equipe_legado(talao) -> set:
+    return {i for i in (talao.criado_por_id, talao.encarregado_id, talao.motorista_id,
+                        talao.auxiliar1_id, talao.auxiliar2_id) if i}
+
+
+def _legado_abordados(qs):
+    """Contagens da view antes da agregação por colunas (uma instância por abordado)."""
+    total = qs.count()
+    veiculos = qs.filter(tipo='VEICULO').count()
+    pessoas = qs.filter(tipo='PESSOA').count()
+    integrantes = Counter()
+    for a in qs.select_related('talao', 'talao__criado_por', 'talao__encarregado', 'talao__motorista',
+                               'talao__auxiliar1', 'talao__auxiliar2'):
+        if a.talao:
+            integrantes.update(_equipe_legado(a.talao))
+    return {'total': total, 'veiculos': veiculos, 'pessoas': pessoas, 'integrantes': integrantes}
+
+
+def _legado_policiamentos(qs):
+    qs = qs.select_related('codigo_ocorrencia', 'criado_por', 'encarregado', 'motorista', 'auxiliar1', 'auxiliar2')
+    total = qs.count()
+    integrantes = Counter()
+    for t in qs:
+        integrantes.update(_equipe_legado(t))
+    tipos = list(qs.values('codigo_ocorrencia__descricao').annotate(qtd=Count('id')).order_by('-qtd')[:10])
+    locais, grafias = Counter(), {}
+    for t in qs:  # a view varria as instâncias duas vezes (contagem e grafia de exibição)
+        locais[estatisticas_taloes.local_talao(t.local_bairro, t.local_rua).lower()] += 1
+    for t in qs:
+        local = estatisticas_taloes.local_talao(t.local_bairro, t.local_rua)
+        grafias.setdefault(local.lower(), local)
+    return {'total': total, 'integrantes': integrantes, 'tipos': sorted(r['qtd'] for r in tipos),
+            'locais': sorted(q for _, q in locais.most_common(10))}
+
+
+class Command(BaseCommand):
+    help = ("Compara core.estatisticas_taloes (abordados e policiamentos) com a agregação anterior das views "
+            "(tempo, consultas e resultados) em períodos crescentes de um mês fictício. "
+            "Os dados de teste são apagados ao final.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--abordados', type=int, default=50000, help='Abordados no mês fictício.')
+        parser.add_argument('--ano', type=int, default=9981)
+        parser.add_argument('--repeticoes', type=int, default=3)
+
+    def handle(self, *args, **options):
+        ano, n = options['ano'], max(1, options['abordados'])
+        inicio = timezone.make_aware(datetime(ano, 1, 1))
+        if Talao.objects.filter(iniciado_em__year=ano).exists() or Abordado.objects.filter(criado_em__year=ano).exists():
+            raise CommandError(f"Já existem talões de {ano}; escolha outro --ano.")
+        marca = f"bench-taloes-{int(time.time())}"
+        User = get_user_model()
+        usuarios = [User.objects.create(username=f"{marca}-{i}", first_name=f"GCM {i}") for i in range(30)]
+        codigos = [CodigoOcorrencia.objects.create(sigla=f"BP-{i}", descricao=f"Policiamento {marca} {i}") for i in range(6)]
+        try:
+            self._popular(inicio, n, usuarios, codigos)
+            self._comparar(ano, options['repeticoes'])
+        finally:
+            Abordado.objects.filter(talao__codigo_ocorrencia__in=codigos).delete()
+            Talao.objects.filter(codigo_ocorrencia__in=codigos).delete()
+            CodigoOcorrencia.objects.filter(pk__in=[c.pk for c in codigos]).delete()
+            User.objects.filter(username__startswith=marca).delete()
+
+    def _popular(self, inicio, n, usuarios, codigos):
+        rnd = random.Random(n)
+        t0 = time.perf_counter()
+        taloes = []
+        for _ in range(max(1, n // 2)):
+            equipe = rnd.sample(usuarios, 4)
+            bairro, rua = rnd.choice(LOCAIS)
+            taloes.append(Talao(
+                codigo_ocorrencia=rnd.choice(codigos), status='FECHADO', local_bairro=bairro, local_rua=rua,
+                iniciado_em=inicio + timedelta(seconds=rnd.randrange(31 * 86400)),
+                criado_por=equipe[0], encarregado=rnd.choice([equipe[0], equipe[1]]), motorista=equipe[2],
+                auxiliar1=equipe[3] if rnd.random() < 0.7 else None,
+            ))
+        Talao.objects.bulk_create(taloes, batch_size=2000)
+        taloes = list(Talao.objects.filter(codigo_ocorrencia__in=codigos).only('id', 'iniciado_em'))
+        lote = []
+        for i in range(n):
+            t = taloes[i % len(taloes)]
+            lote.append(Abordado(talao=t, tipo=rnd.choice(['PESSOA', 'VEICULO']),
+                                 criado_em=t.iniciado_em + timedelta(minutes=rnd.randrange(60))))
+            if len(lote) == 5000:
+                Abordado.objects.bulk_create(lote)
+                lote = []
+        Abordado.objects.bulk_create(lote)
+        self.stdout.write(f"{len(taloes)} talões e {n} abordados criados em {time.perf_counter() - t0:.1f} s ({connection.vendor})")
+
+    def _medir(self, func, repeticoes):
+        melhor, resultado, consultas = None, None, 0
+        for _ in range(repeticoes):
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                resultado = func()
+                dt = time.perf_counter() - t0
+            consultas = len(ctx)
+            melhor = dt if melhor is None else min(melhor, dt)
+        return melhor, consultas, resultado
+
+    def _comparar(self, ano, repeticoes):
+        for dias in (3, 6, 15, 31):
+            de, ate = date(ano, 1, 1), date(ano, 1, dias)
+            abord = Abordado.objects.filter(estatisticas_taloes.periodo('criado_em', de, ate))
+            t_leg, q_leg, leg = self._medir(lambda: _legado_abordados(abord), repeticoes)
+            t_novo, q_novo, m = self._medir(lambda: estatisticas_taloes.abordados(abord), repeticoes)
+            novo = {'total': m['total'], 'veiculos': m['total_veiculos'], 'pessoas': m['total_pessoas'],
+                    'integrantes': m['integrantes']}
+            self.stdout.write(f"abordados     {dias:2d} dias ({leg['total']:6d}): anterior {t_leg * 1000:6.0f} ms / {q_leg} consultas, "
+                              f"atual {t_novo * 1000:5.0f} ms / {q_novo} consultas")
+            if leg != novo:
+                raise CommandError(f"Resultados diferentes em abordados ({dias} dias): {[k for k in leg if leg[k] != novo[k]]}")
+
+            pol = Talao.objects.filter(estatisticas_taloes.periodo('iniciado_em', de, ate), status='FECHADO',
+                                       codigo_ocorrencia__descricao__icontains='Policiamento')
+            t_leg, q_leg, leg = self._medir(lambda: _legado_policiamentos(pol), repeticoes)
+            t_novo, q_novo, m = self._medir(lambda: estatisticas_taloes.policiamentos(pol), repeticoes)
+            novo = {'total': m['total'], 'integrantes': m['integrantes'],
+                    'tipos': sorted(r['qtd'] for r in m['top_tipos']), 'locais': sorted(r['qtd'] for r in m['top_locais'])}
+            self.stdout.write(f"policiamentos {dias:2d} dias ({leg['total']:6d}): anterior {t_leg * 1000:6.0f} ms / {q_leg} consultas, "
+                              f"atual {t_novo * 1000:5.0f} ms / {q_novo} consultas")
+            if leg != novo:
+                raise CommandError(f"Resultados diferentes em policiamentos ({dias} dias): {[k for k in leg if leg[k] != novo[k]]}")
+        self.stdout.write(self.style.SUCCESS("Resultados iguais aos da agregação anterior."))
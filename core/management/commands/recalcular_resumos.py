@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import resumos
+
+
+class Command(BaseCommand):
+    help = ("Recalcula os resumos diários/mensais das estatísticas (core.resumos) a partir dos registros "
+            "e informa os períodos que estavam divergentes. Rodar todas as noites (cron) após 00:00.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=40, help='Recalcula a partir de hoje menos N dias.')
+        parser.add_argument('--desde', default=None, help='AAAA-MM-DD: recalcula a partir desta data (ex.: carga inicial).')
+        parser.add_argument('--fonte', choices=sorted(resumos.FONTES), action='append',
+                            help='Só esta fonte (pode repetir).')
+
+    def handle(self, *args, **options):
+        if options['desde']:
+            try:
+                desde = datetime.strptime(options['desde'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--desde deve estar no formato AAAA-MM-DD")
+        else:
+            desde = timezone.localdate() - timedelta(days=max(0, options['dias']))
+        for fonte in options['fonte'] or sorted(resumos.FONTES):
+            r = resumos.reconciliar(fonte, desde)
+            self.stdout.write(f"{fonte}: {r['periodos']} período(s) desde {desde:%d/%m/%Y}, {r['linhas']} linha(s)")
+            for gran, inicio in r['divergentes']:
+                rotulo = f"{inicio:%m/%Y}" if gran == resumos.MES else f"{inicio:%d/%m/%Y}"
+                self.stdout.write(self.style.WARNING(f"  corrigido: {rotulo}"))
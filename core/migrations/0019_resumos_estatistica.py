@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_oficiodiverso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoEstatistica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fonte', models.CharField(max_length=20)),
+                ('granularidade', models.CharField(choices=[('D', 'Dia'), ('M', 'Mês')], max_length=1)),
+                ('inicio', models.DateField()),
+                ('dimensao', models.CharField(max_length=20)),
+                ('chave', models.CharField(blank=True, max_length=400)),
+                ('rotulo', models.CharField(blank=True, max_length=255)),
+                ('qtd', models.IntegerField(default=0)),
+                ('soma', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fonte', 'granularidade', 'inicio', 'dimensao', 'chave'), name='uniq_resumo_estatistica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoEstatisticaPeriodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fonte', models.CharField(max_length=20)),
+                ('granularidade', models.CharField(choices=[('D', 'Dia'), ('M', 'Mês')], max_length=1)),
+                ('inicio', models.DateField()),
+                ('alterado_em', models.DateTimeField(blank=True, null=True)),
+                ('calculado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fonte', 'granularidade', 'inicio'), name='uniq_resumo_periodo')],
+            },
+        ),
+    ]
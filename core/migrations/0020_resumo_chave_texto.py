@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_resumos_estatistica'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resumoestatistica',
+            name='chave',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -609,3 +609,49 @@ class BancoHorasLancamento(models.Model):
         saldo_obj.save(update_fields=["saldo_minutos", "updated_at"])
         return lanc
 
+
+
+# --------------------- Resumos das Estatísticas (core.resumos) ---------------------
+class ResumoEstatistica(models.Model):
+    """Contagem de uma fonte de estatística por período (dia ou mês) e dimensão.
+
+    Ex.: fonte='bo', granularidade='D', inicio=2026-03-05, dimensao='bairro',
+    chave='"CENTRO"', qtd=12. ``soma`` guarda totais auxiliares (segundos de
+    resposta no CECOM); ``rotulo`` a grafia exibida.
+    """
+    GRANULARIDADES = (("D", "Dia"), ("M", "Mês"))
+
+    fonte = models.CharField(max_length=20)
+    granularidade = models.CharField(max_length=1, choices=GRANULARIDADES)
+    inicio = models.DateField()
+    dimensao = models.CharField(max_length=20)
+    chave = models.TextField(blank=True)  # JSON da chave: não pode ser cortado
+    rotulo = models.CharField(max_length=255, blank=True)
+    qtd = models.IntegerField(default=0)
+    soma = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["fonte", "granularidade", "inicio", "dimensao", "chave"],
+                                    name="uniq_resumo_estatistica"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.fonte} {self.granularidade}{self.inicio} {self.dimensao}={self.chave}: {self.qtd}"
+
+
+class ResumoEstatisticaPeriodo(models.Model):
+    """Estado de um período dos resumos: pendente se nunca calculado ou alterado depois do cálculo."""
+    fonte = models.CharField(max_length=20)
+    granularidade = models.CharField(max_length=1, choices=ResumoEstatistica.GRANULARIDADES)
+    inicio = models.DateField()
+    alterado_em = models.DateTimeField(null=True, blank=True)
+    calculado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["fonte", "granularidade", "inicio"], name="uniq_resumo_periodo"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.fonte} {self.granularidade}{self.inicio}"
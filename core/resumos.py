@@ -0,0 +1,400 @@
+"""Resumos diários e mensais das telas de estatística (``estatisticas_*``).
+
+As telas de BO, AIT, CECOM, remoções, abordados e policiamentos recalculavam
+tudo a partir das linhas brutas em cada carregamento e troca de aba. Aqui cada
+fonte tem uma função de cálculo que devolve, por período (dia ou mês), as
+contagens por dimensão (série diária, código, bairro, viatura, usuário,
+status…), gravadas em `ResumoEstatistica`:
+
+- os sinais (`core.signals`) marcam como alterados, após o commit, o dia e o
+  mês de cada registro gravado ou excluído (`marcar`);
+- `ler(fonte, de, ate)` recalcula só os períodos do intervalo que estão
+  pendentes (nunca calculados ou alterados depois do cálculo) e soma os resumos.
+  Meses completos e já encerrados vêm da linha mensal, o resto das diárias: a
+  aba "ano" lê ~12 meses + os dias do mês corrente em vez de varrer a tabela;
+- ``manage.py recalcular_resumos`` (cron noturno) recalcula os períodos recentes
+  e corrige o que os sinais não veem (``QuerySet.update``, SQL direto, troca de
+  equipe de talão antigo, descrição de código alterada).
+
+As telas com filtro de usuário/operador/código continuam consultando as linhas
+brutas: os resumos só cobrem a visão geral.
+"""
+from __future__ import annotations
+
+import json
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, DurationField, ExpressionWrapper, F, Max, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from . import estatisticas_taloes
+from .models import ResumoEstatistica, ResumoEstatisticaPeriodo
+
+DIA, MES = 'D', 'M'
+
+
+class Contagens:
+    """Contagens de um período: ``qtd[dimensão][chave]``, ``soma[...]`` e ``rotulo[dimensão][chave]``."""
+
+    def __init__(self, qtd=None, rotulo=None):
+        self.qtd: dict[str, Counter] = defaultdict(Counter, qtd or {})
+        self.soma: dict[str, Counter] = defaultdict(Counter)
+        self.rotulo: dict[str, dict] = defaultdict(dict, rotulo or {})
+
+    def add(self, dimensao: str, chave, qtd: int = 1, soma: int = 0):
+        self.qtd[dimensao][chave] += qtd
+        if soma:
+            self.soma[dimensao][chave] += soma
+
+    def serie(self) -> list[dict]:
+        """[{'dia': date, 'qtd': n}] em ordem de data."""
+        return [{'dia': date.fromisoformat(d), 'qtd': q} for d, q in sorted(self.qtd['serie'].items())]
+
+    def total(self) -> int:
+        return sum(self.qtd['serie'].values())
+
+    def top_dias(self, n: int = 10) -> list[dict]:
+        return [{'dia': date.fromisoformat(d), 'qtd': q} for d, q in self.qtd['serie'].most_common(n)]
+
+
+def _codificar(chave) -> str:
+    return json.dumps(chave, ensure_ascii=False, separators=(',', ':'))
+
+
+def _decodificar(texto: str):
+    def _tupla(v):
+        return tuple(_tupla(x) for x in v) if isinstance(v, list) else v
+    return _tupla(json.loads(texto))
+
+
+# ---------------------------------------------------------------- períodos
+
+def _inicio_mes(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _proximo_mes(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _limite(d: date) -> datetime:
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+def _truncar(campo: str, granularidade: str):
+    return TruncDate(campo) if granularidade == DIA else TruncMonth(campo, output_field=DateField())
+
+
+def _plano(de: date, ate: date) -> list[tuple[str, date]]:
+    """Períodos que cobrem [de, ate] (até hoje): meses encerrados inteiros no intervalo e dias avulsos."""
+    hoje = timezone.localdate()
+    ate = min(ate, hoje)
+    periodos, d = [], de
+    while d <= ate:
+        fim_mes = _proximo_mes(d) - timedelta(days=1)
+        if d.day == 1 and fim_mes <= ate and fim_mes < hoje:
+            periodos.append((MES, d))
+            d = fim_mes + timedelta(days=1)
+        else:
+            periodos.append((DIA, d))
+            d += timedelta(days=1)
+    return periodos
+
+
+def _intervalos(periodos: list[tuple[str, date]]):
+    """Agrupa períodos consecutivos da mesma granularidade: [(granularidade, primeiro, fim exclusivo)]."""
+    grupos = []
+    for gran, inicio in sorted(periodos):
+        fim = inicio + timedelta(days=1) if gran == DIA else _proximo_mes(inicio)
+        if grupos and grupos[-1][0] == gran and grupos[-1][2] == inicio:
+            grupos[-1][2] = fim
+        else:
+            grupos.append([gran, inicio, fim])
+    return grupos
+
+
+def _filtro_periodos(periodos) -> Q:
+    cond = Q(pk__in=[])
+    for gran, inicio, fim in _intervalos(periodos):
+        cond |= Q(granularidade=gran, inicio__gte=inicio, inicio__lt=fim)
+    return cond
+
+
+# ---------------------------------------------------------------- fontes
+
+def _equipe(ids) -> set:
+    return {i for i in ids if i}
+
+
+def _calcular_bo(inicio, fim, gran):
+    from bogcmi.models import BO
+    from . import estatisticas_bo
+    qs = BO.objects.filter(emissao__gte=inicio, emissao__lt=fim).annotate(
+        periodo=_truncar('emissao', gran), dia=TruncDate('emissao'))
+    grupos = defaultdict(list)
+    for r in estatisticas_bo.cubo(qs, 'periodo', 'dia'):
+        grupos[r['periodo']].append(r)
+    for periodo, linhas in grupos.items():
+        qtd, exibicao_bairro = estatisticas_bo.contagens(linhas)
+        yield periodo, Contagens(qtd, {'bairro': exibicao_bairro})
+
+
+def _calcular_ait(inicio, fim, gran):
+    from taloes.models import AitRegistro
+    qs = AitRegistro.objects.filter(criado_em__gte=inicio, criado_em__lt=fim).annotate(
+        periodo=_truncar('criado_em', gran), dia=TruncDate('criado_em'))
+    res = defaultdict(Contagens)
+    for periodo, dia, *ids in qs.values_list(
+            'periodo', 'dia', 'integrante_id', 'talao__criado_por_id', 'talao__encarregado_id',
+            'talao__motorista_id', 'talao__auxiliar1_id', 'talao__auxiliar2_id').iterator(chunk_size=2000):
+        c = res[periodo]
+        c.add('serie', dia.isoformat())
+        for uid in _equipe(ids):  # integrante do AIT + equipe do talão, uma vez por AIT
+            c.add('usuario', uid)
+    return res.items()
+
+
+def _calcular_abordados(inicio, fim, gran):
+    from taloes.models import Abordado
+    campos = estatisticas_taloes.equipe('talao__')
+    linhas = (
+        Abordado.objects.filter(criado_em__gte=inicio, criado_em__lt=fim)
+        .annotate(periodo=_truncar('criado_em', gran), dia=TruncDate('criado_em'))
+        .order_by().values('periodo', 'dia', 'tipo', *campos).annotate(n=Count('id'))
+    )
+    res = defaultdict(Contagens)
+    for r in linhas:
+        c, n = res[r['periodo']], r['n']
+        c.add('serie', r['dia'].isoformat(), n)
+        c.add('tipo', r['tipo'], n)
+        for uid in _equipe(r[k] for k in campos):
+            c.add('usuario', uid, n)
+    return res.items()
+
+
+def _calcular_policiamentos(inicio, fim, gran):
+    from taloes.models import Talao
+    campos = estatisticas_taloes.equipe()
+    linhas = (
+        Talao.objects.filter(
+            status='FECHADO', iniciado_em__gte=inicio, iniciado_em__lt=fim,
+            codigo_ocorrencia__descricao__icontains='Policiamento',
+        )
+        .annotate(periodo=_truncar('iniciado_em', gran), dia=TruncDate('iniciado_em'))
+        .order_by().values('periodo', 'dia', 'codigo_ocorrencia__descricao', 'local_bairro', 'local_rua', *campos)
+        .annotate(n=Count('id'))
+    )
+    res = defaultdict(Contagens)
+    for r in linhas:
+        c, n = res[r['periodo']], r['n']
+        c.add('serie', r['dia'].isoformat(), n)
+        c.add('tipo', r['codigo_ocorrencia__descricao'], n)
+        local = estatisticas_taloes.local_talao(r['local_bairro'], r['local_rua'])
+        c.add('local', local.lower(), n)
+        c.rotulo['local'].setdefault(local.lower(), local)
+        for uid in _equipe(r[k] for k in campos):
+            c.add('usuario', uid, n)
+    return res.items()
+
+
+def _segundos(td) -> int:
+    return int(td.total_seconds()) if td else 0
+
+
+def _calcular_cecom(inicio, fim, gran):
+    from cecom.models import DespachoOcorrencia
+
+    def _delta(campo):
+        return Sum(ExpressionWrapper(F(campo) - F('despachado_em'), output_field=DurationField()),
+                   filter=Q(**{f'{campo}__isnull': False}))
+
+    linhas = (
+        DespachoOcorrencia.objects.filter(despachado_em__gte=inicio, despachado_em__lt=fim)
+        .annotate(periodo=_truncar('despachado_em', gran), dia=TruncDate('despachado_em'))
+        .order_by().values('periodo', 'dia', 'status', 'cod_natureza', 'natureza', 'despachado_por_id')
+        .annotate(
+            qtd=Count('id'),
+            n_resposta=Count('id', filter=Q(respondido_em__isnull=False)), s_resposta=_delta('respondido_em'),
+            n_finalizacao=Count('id', filter=Q(finalizado_em__isnull=False)), s_finalizacao=_delta('finalizado_em'),
+        )
+    )
+    res = defaultdict(Contagens)
+    for r in linhas:
+        c, n = res[r['periodo']], r['qtd']
+        c.add('serie', r['dia'].isoformat(), n)
+        c.add('status', r['status'], n)
+        c.add('codigo', (r['cod_natureza'] or '', r['natureza'] or ''), n)
+        c.add('usuario', r['despachado_por_id'], n)
+        for tempo in ('resposta', 'finalizacao'):
+            if r[f'n_{tempo}']:
+                c.add('tempo', tempo, r[f'n_{tempo}'], _segundos(r[f's_{tempo}']))
+    return res.items()
+
+
+_REMOVIDO_Q = (
+    Q(apreensao_ait__gt='') | Q(apreensao_crr__gt='') | Q(apreensao_destino__gt='') |
+    Q(apreensao_responsavel_guincho__gt='')
+)
+
+
+def _calcular_remocoes(inicio, fim, gran):
+    from bogcmi.models import VeiculoEnvolvido
+    qs = VeiculoEnvolvido.objects.filter(_REMOVIDO_Q, bo__emissao__gte=inicio, bo__emissao__lt=fim).annotate(
+        periodo=_truncar('bo__emissao', gran), dia=TruncDate('bo__emissao'))
+    res = defaultdict(Contagens)
+    for periodo, dia, ait, destino, guincho, *ids in qs.values_list(
+            'periodo', 'dia', 'apreensao_ait', 'apreensao_destino', 'apreensao_responsavel_guincho',
+            'bo__encarregado_id', 'bo__motorista_id', 'bo__auxiliar1_id', 'bo__auxiliar2_id', 'bo__cecom_id',
+    ).iterator(chunk_size=2000):
+        c = res[periodo]
+        c.add('serie', dia.isoformat())
+        c.add('destino', destino)
+        c.add('guincho', guincho)
+        if ait:
+            c.add('indicador', 'com_ait')
+        for uid in _equipe(ids):
+            c.add('usuario', uid)
+    return res.items()
+
+
+FONTES = {
+    'bo': _calcular_bo,
+    'ait': _calcular_ait,
+    'abordados': _calcular_abordados,
+    'policiamentos': _calcular_policiamentos,
+    'cecom': _calcular_cecom,
+    'remocoes': _calcular_remocoes,
+}
+
+
+# ---------------------------------------------------------------- manutenção
+
+def marcar(fonte: str, datas) -> None:
+    """Marca como alterados o dia e o mês (hora local) de cada data/datetime de ``datas``."""
+    chaves = set()
+    for d in datas:
+        if d is None:
+            continue
+        if isinstance(d, datetime):
+            d = timezone.localtime(d).date() if timezone.is_aware(d) else d.date()
+        chaves.add((DIA, d))
+        chaves.add((MES, _inicio_mes(d)))
+    if not chaves:
+        return
+    agora = timezone.now()
+    try:
+        ResumoEstatisticaPeriodo.objects.bulk_create(
+            [ResumoEstatisticaPeriodo(fonte=fonte, granularidade=g, inicio=i, alterado_em=agora) for g, i in chaves],
+            update_conflicts=True, unique_fields=['fonte', 'granularidade', 'inicio'], update_fields=['alterado_em'],
+        )
+    except Exception:
+        pass  # não quebra a gravação; o recálculo noturno corrige
+
+
+def _pendentes(fonte: str, periodos) -> list[tuple[str, date]]:
+    estados = {
+        (e['granularidade'], e['inicio']): e
+        for e in ResumoEstatisticaPeriodo.objects.filter(_filtro_periodos(periodos), fonte=fonte)
+        .values('granularidade', 'inicio', 'alterado_em', 'calculado_em')
+    }
+    pendentes = []
+    for p in periodos:
+        e = estados.get(p)
+        if not e or not e['calculado_em'] or (e['alterado_em'] and e['alterado_em'] >= e['calculado_em']):
+            pendentes.append(p)
+    return pendentes
+
+
+def calcular(fonte: str, periodos) -> int:
+    """Recalcula os resumos de ``periodos`` a partir das linhas brutas. Retorna quantas linhas gravou."""
+    if not periodos:
+        return 0
+    calculado_em = timezone.now()  # antes de ler: alterações durante o cálculo continuam pendentes
+    novos = []
+    for gran, inicio, fim in _intervalos(periodos):
+        for periodo, c in FONTES[fonte](_limite(inicio), _limite(fim), gran):
+            for dimensao, contador in c.qtd.items():
+                rotulos = c.rotulo.get(dimensao) or {}
+                for chave, qtd in contador.items():
+                    if not qtd:
+                        continue
+                    novos.append(ResumoEstatistica(
+                        fonte=fonte, granularidade=gran, inicio=periodo, dimensao=dimensao,
+                        chave=_codificar(chave), rotulo=str(rotulos.get(chave) or '')[:255],
+                        qtd=qtd, soma=c.soma[dimensao][chave] if dimensao in c.soma else 0,
+                    ))
+    try:
+        with transaction.atomic():
+            ResumoEstatistica.objects.filter(_filtro_periodos(periodos), fonte=fonte).delete()
+            ResumoEstatistica.objects.bulk_create(novos, batch_size=1000)
+            ResumoEstatisticaPeriodo.objects.bulk_create(
+                [ResumoEstatisticaPeriodo(fonte=fonte, granularidade=g, inicio=i, calculado_em=calculado_em)
+                 for g, i in periodos],
+                update_conflicts=True, unique_fields=['fonte', 'granularidade', 'inicio'],
+                update_fields=['calculado_em'],
+            )
+    except IntegrityError:
+        pass  # outro processo recalculou os mesmos períodos ao mesmo tempo
+    return len(novos)
+
+
+def garantir(fonte: str, de: date, ate: date) -> list[tuple[str, date]]:
+    """Recalcula os períodos pendentes que cobrem [de, ate]; devolve o plano de leitura."""
+    periodos = _plano(de, ate)
+    calcular(fonte, _pendentes(fonte, periodos))
+    return periodos
+
+
+def ler(fonte: str, de: date, ate: date) -> Contagens:
+    """Soma dos resumos de ``fonte`` entre ``de`` e ``ate`` (inclusive)."""
+    periodos = garantir(fonte, de, ate)
+    res = Contagens()
+    if not periodos:
+        return res
+    linhas = (
+        ResumoEstatistica.objects.filter(_filtro_periodos(periodos), fonte=fonte)
+        .values('dimensao', 'chave').annotate(n=Sum('qtd'), s=Sum('soma'), r=Max('rotulo'))
+    )
+    for r in linhas:
+        chave = _decodificar(r['chave'])
+        res.add(r['dimensao'], chave, r['n'], r['s'] or 0)
+        if r['r']:
+            res.rotulo[r['dimensao']][chave] = r['r']
+    return res
+
+
+def reconciliar(fonte: str, desde: date) -> dict:
+    """Recalcula os períodos de ``fonte`` a partir de ``desde`` e conta os que estavam divergentes.
+
+    Cobre o plano até hoje e todo período já calculado no intervalo (dias lidos
+    enquanto o mês estava aberto, meses que começam antes de ``desde`` não entram).
+    """
+    estados = ResumoEstatisticaPeriodo.objects.filter(fonte=fonte, inicio__gte=desde)
+    periodos = set(_plano(desde, timezone.localdate())) | {
+        (g, i) for g, i in estados.values_list('granularidade', 'inicio')}
+    # só conta como divergência o período dado como em dia (as marcações pendentes já eram esperadas)
+    em_dia = estados.filter(calculado_em__isnull=False).filter(
+        Q(alterado_em__isnull=True) | Q(alterado_em__lt=F('calculado_em')))
+    calculados = {(g, i) for g, i in em_dia.values_list('granularidade', 'inicio')}
+
+    def _retrato():
+        return {
+            (g, i, d, k): (q, s) for g, i, d, k, q, s in
+            ResumoEstatistica.objects.filter(fonte=fonte, inicio__gte=desde)
+            .values_list('granularidade', 'inicio', 'dimensao', 'chave', 'qtd', 'soma').iterator(chunk_size=5000)
+        }
+
+    antes = _retrato()
+    linhas = calcular(fonte, sorted(periodos))
+    depois = _retrato()
+    divergentes = {k[:2] for k in antes.keys() ^ depois.keys()}
+    divergentes |= {k[:2] for k in antes.keys() & depois.keys() if antes[k] != depois[k]}
+    return {'periodos': len(periodos), 'linhas': linhas, 'divergentes': sorted(divergentes & calculados)}
+
+
+def ativo() -> bool:
+    return bool(getattr(settings, 'ESTATISTICAS_RESUMOS', True))
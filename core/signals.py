@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+
+from bogcmi.models import BO, VeiculoEnvolvido
+from cecom.models import DespachoOcorrencia, PlantaoCECOM, PlantaoParticipante
+from common.models import DocumentoAssinavel
+from taloes.models import Abordado, AitRegistro, Talao
+from viaturas.models import Viatura, ViaturaAvariaEstado
+
+from . import badges, resumos
+from .models import OficioInterno, UserNotification
+
+# Modelos que mudam contadores de vários usuários: nova versão global
+_MODELOS_GLOBAIS = (
+    OficioInterno, Talao, PlantaoCECOM, PlantaoParticipante, DespachoOcorrencia,
+    DocumentoAssinavel, Viatura, ViaturaAvariaEstado,
+)
+
+
+def _invalidar_global(sender, **kwargs):
+    transaction.on_commit(badges.invalidar)
+
+
+def _invalidar_usuarios(*ids):
+    ids = {i for i in ids if i}
+    transaction.on_commit(lambda: [badges.invalidar(i) for i in ids])
+
+
+def _aviso(sender, instance, **kwargs):
+    _invalidar_usuarios(instance.user_id)
+
+
+def _bo(sender, instance, **kwargs):
+    # Ex-integrantes (troca de equipe) ficam com o valor antigo até o BADGES_TTL
+    _invalidar_usuarios(instance.encarregado_id, instance.motorista_id, instance.auxiliar1_id,
+                        instance.auxiliar2_id, instance.cecom_id)
+
+
+for _modelo in _MODELOS_GLOBAIS:
+    post_save.connect(_invalidar_global, sender=_modelo, dispatch_uid=f"core_badges_save_{_modelo.__name__}")
+    post_delete.connect(_invalidar_global, sender=_modelo, dispatch_uid=f"core_badges_delete_{_modelo.__name__}")
+
+post_save.connect(_aviso, sender=UserNotification, dispatch_uid="core_badges_aviso_save")
+post_delete.connect(_aviso, sender=UserNotification, dispatch_uid="core_badges_aviso_delete")
+post_save.connect(_bo, sender=BO, dispatch_uid="core_badges_bo_save")
+post_delete.connect(_bo, sender=BO, dispatch_uid="core_badges_bo_delete")
+
+
+# ---------------------------------------------------------------- resumos das estatísticas (core.resumos)
+# Modelo -> (fontes afetadas, campo de data que define o dia/mês do resumo)
+_RESUMOS = {
+    BO: (('bo', 'remocoes'), 'emissao'),
+    DespachoOcorrencia: (('cecom',), 'despachado_em'),
+    AitRegistro: (('ait',), 'criado_em'),
+    Abordado: (('abordados',), 'criado_em'),
+    Talao: (('policiamentos',), 'iniciado_em'),
+}
+
+
+def _marcar_resumos(fontes, datas):
+    datas = {d for d in datas if d}
+    if datas:
+        transaction.on_commit(lambda: [resumos.marcar(f, datas) for f in fontes])
+
+
+# Equipe do talão: entra na contagem dos AITs e abordados dele
+_EQUIPE_TALAO = ('criado_por_id', 'encarregado_id', 'motorista_id', 'auxiliar1_id', 'auxiliar2_id')
+_ADIADO = object()
+
+
+def _equipe(instance) -> tuple:
+    return tuple(instance.__dict__.get(c, _ADIADO) for c in _EQUIPE_TALAO)
+
+
+def _resumo_carregado(sender, instance, **kwargs):
+    # Data como veio do banco (sem carregar campo adiado): uma alteração dela marca também o período antigo
+    instance._resumo_data = instance.__dict__.get(_RESUMOS[sender][1])
+    if sender is Talao:
+        instance._resumo_equipe = _equipe(instance)
+
+
+def _resumo_gravado(sender, instance, created=False, **kwargs):
+    fontes, campo = _RESUMOS[sender]
+    datas = {instance.__dict__.get(campo), getattr(instance, '_resumo_data', None)}
+    instance._resumo_data = instance.__dict__.get(campo)
+    _marcar_resumos(fontes, datas)
+    if sender is Talao:
+        equipe, antes = _equipe(instance), getattr(instance, '_resumo_equipe', None)
+        instance._resumo_equipe = equipe
+        # Só quando a equipe muda (o talão é salvo a cada etapa): remarca os dias dos AITs e abordados dele
+        if not created and equipe != antes:
+            _marcar_resumos(('ait',), AitRegistro.objects.filter(talao_id=instance.pk).dates('criado_em', 'day'))
+            _marcar_resumos(('abordados',), Abordado.objects.filter(talao_id=instance.pk).dates('criado_em', 'day'))
+
+
+def _resumo_excluido(sender, instance, **kwargs):
+    fontes, campo = _RESUMOS[sender]
+    _marcar_resumos(fontes, {instance.__dict__.get(campo), getattr(instance, '_resumo_data', None)})
+
+
+def _resumo_veiculo(sender, instance, **kwargs):
+    if instance.bo_id:
+        _marcar_resumos(('remocoes',), BO.objects.filter(pk=instance.bo_id).values_list('emissao', flat=True))
+
+
+for _modelo in _RESUMOS:
+    post_init.connect(_resumo_carregado, sender=_modelo, dispatch_uid=f"core_resumos_init_{_modelo.__name__}")
+    post_save.connect(_resumo_gravado, sender=_modelo, dispatch_uid=f"core_resumos_save_{_modelo.__name__}")
+    post_delete.connect(_resumo_excluido, sender=_modelo, dispatch_uid=f"core_resumos_delete_{_modelo.__name__}")
+post_save.connect(_resumo_veiculo, sender=VeiculoEnvolvido, dispatch_uid="core_resumos_veiculo_save")
+post_delete.connect(_resumo_veiculo, sender=VeiculoEnvolvido, dispatch_uid="core_resumos_veiculo_delete")
@@ -7,6 +7,7 @@ app_name = 'core'
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('notificacoes/', views.notificacoes_usuario, name='notificacoes'),
+    path('badges/', views.badges_json, name='badges'),
     path('notificacoes/confirmar/<int:pk>/', views.confirmar_notificacao_usuario, name='confirmar_notificacao'),
     path('despacho/<int:despacho_id>/responder/', views.responder_despacho, name='responder_despacho'),
     path('notificacoes/push-teste/', views.push_teste_usuario, name='push_teste_usuario'),
@@ -32,6 +33,7 @@ urlpatterns = [
     path('administracao/audiencias/remover/', views.audiencias_remover, name='audiencias_remover'),
     path('administracao/log-sistema/', views.log_sistema, name='log_sistema'),
     path('administracao/log-simplificado/', views.log_simplificado, name='log_simplificado'),
+    path('administracao/log-arquivo/<str:chave>/<str:mes>/', views.log_arquivo_download, name='log_arquivo_download'),
     path('administracao/almoxarifado/', views.almoxarifado, name='almoxarifado'),
     path('administracao/dispensas/', views.dispensas, name='dispensas'),
     path('administracao/dispensas/solicitar/', views.dispensas_solicitar, name='dispensas_solicitar'),
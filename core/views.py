@@ -4,7 +4,6 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
-import csv
 from django.core.paginator import Paginator
 from django.template.loader import render_to_string
 from django.urls import reverse
@@ -18,6 +17,12 @@ from cecom.models import PlantaoCECOM, PlantaoCecomPrincipal
 from taloes.views_extra import SESSION_PLANTAO
 from .models import EscalaMensal, Audiencias, OrdemServico, OficioDiverso, Dispensa, NotificacaoFiscalizacao, AutoInfracaoComercio, AutoInfracaoSom, OficioInterno, OficioAcao, BancoHorasSaldo, BancoHorasLancamento
 from common.models import AuditLog
+from common import csv_export, pdf_pool
+from asgiref.sync import sync_to_async
+from . import badges
+from . import graficos
+from . import estatisticas_bo as estatisticas_bo_engine
+from . import resumos
 from .forms import DispensaSolicitacaoForm, DispensaAprovacaoForm, NotificacaoFiscalizacaoForm, AutoInfracaoComercioForm, AutoInfracaoSomForm, OficioInternoForm, OficioAcaoForm
 from .views_estatisticas import estatisticas_abordados, estatisticas_abordados_graficos, estatisticas_policiamentos, estatisticas_policiamentos_graficos
 import calendar
@@ -902,40 +907,40 @@ def audiencias_remover(request):
     Audiencias.objects.all().delete()
     return redirect('core:audiencias')
 
-@login_required
-def log_sistema(request):
-    """Lista de logs do sistema (auditoria). Apenas comando/adm e usuário 'moises'."""
-    allowed_users = {"moises", "administrativo", "comandante", "subcomandante"}
-    if (not request.user.is_superuser) and (request.user.username.lower() not in allowed_users):
-        return HttpResponseForbidden('Sem permissão para visualizar logs')
+LOG_ALLOWED_USERS = {"moises", "administrativo", "comandante", "subcomandante"}
 
-    qs = AuditLog.objects.select_related('user').all()
-    # filtros simples
-    u = request.GET.get('usuario')
+
+def _pode_ver_logs(user) -> bool:
+    return user.is_superuser or user.username.lower() in LOG_ALLOWED_USERS
+
+
+def _listar_logs(request, qs, chave: str) -> dict:
+    """Filtros comuns (usuário, período), paginação por chave e contagem estimada.
+
+    O período vira intervalo no timestamp (``created_at >= de 00:00`` e
+    ``< dia seguinte a ate``), que usa o índice (created_at, id); ``__date``
+    aplicava uma função em cada linha. A página é buscada por cursor
+    (``?apos=``/``?antes=``) em vez de OFFSET e o total só é exato com
+    ``?contagem=exata``.
+    """
+    from datetime import datetime, time as dtime
+    from django.contrib.auth import get_user_model
+    from common import keyset, log_arquivo
+
+    u = (request.GET.get('usuario') or '').strip()
     if u:
-        qs = qs.filter(user__username__iexact=u)
-    m = request.GET.get('metodo')
-    if m:
-        qs = qs.filter(method__iexact=m)
-    de = request.GET.get('de')
-    ate = request.GET.get('ate')
-    if de:
-        try:
-            from datetime import datetime
-            dt = datetime.strptime(de, '%Y-%m-%d')
-            qs = qs.filter(created_at__date__gte=dt.date())
-        except Exception:
-            pass
-    if ate:
+        ids = list(get_user_model().objects.filter(username__iexact=u).values_list('id', flat=True))
+        qs = qs.filter(user_id__in=ids)
+    for param, lookup, dias in (('de', 'created_at__gte', 0), ('ate', 'created_at__lt', 1)):
+        valor = request.GET.get(param)
+        if not valor:
+            continue
         try:
-            from datetime import datetime
-            dt = datetime.strptime(ate, '%Y-%m-%d')
-            qs = qs.filter(created_at__date__lte=dt.date())
+            d = datetime.strptime(valor, '%Y-%m-%d').date() + timedelta(days=dias)
+            qs = qs.filter(**{lookup: timezone.make_aware(datetime.combine(d, dtime.min))})
         except Exception:
             pass
-    qs = qs.order_by('-created_at')
 
-    # paginação
     per_page_options = [10, 25, 50, 100]
     try:
         per_page = int(request.GET.get('per_page') or 25)
@@ -944,97 +949,90 @@ def log_sistema(request):
     if per_page not in per_page_options:
         per_page = 25
 
-    paginator = Paginator(qs, per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    pagina = keyset.paginar(qs, per_page, apos=request.GET.get('apos'), antes=request.GET.get('antes'))
+    exata = request.GET.get('contagem') == 'exata'
+    total = keyset.contar(qs, exata=exata)
 
-    # querystring base sem o parâmetro page (para preservar filtros nos links)
+    # querystring base sem o cursor (para preservar filtros nos links)
     qd = request.GET.copy()
-    if 'page' in qd:
-        qd.pop('page')
-    base_query = qd.urlencode()
-
-    metodos = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
-    return render(request, 'core/adm_log_sistema.html', {
-        'logs': page_obj.object_list,
-        'page_obj': page_obj,
+    for k in ('apos', 'antes', 'page'):
+        qd.pop(k, None)
+    return {
+        'logs': pagina.object_list,
+        'page_obj': pagina,
+        'total': total,
+        'contagem_exata': exata,
         'per_page': per_page,
         'per_page_options': per_page_options,
-        'querystring': base_query,
-        'metodos': metodos,
-    })
+        'querystring': qd.urlencode(),
+        'arquivados': log_arquivo.meses_arquivados(chave),
+        'arquivo_chave': chave,
+    }
+
+
+@login_required
+def log_sistema(request):
+    """Lista de logs do sistema (auditoria). Apenas comando/adm e usuário 'moises'."""
+    if not _pode_ver_logs(request.user):
+        return HttpResponseForbidden('Sem permissão para visualizar logs')
+
+    qs = AuditLog.objects.select_related('user').all()
+    m = request.GET.get('metodo')
+    if m:
+        qs = qs.filter(method=m.upper())
+
+    ctx = _listar_logs(request, qs, 'auditoria')
+    ctx['metodos'] = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+    return render(request, 'core/adm_log_sistema.html', ctx)
 
 @login_required
 def log_simplificado(request):
     """Lista de Log Simplificado (eventos legíveis). Mesmo controle de acesso do log técnico."""
-    allowed_users = {"moises", "administrativo", "comandante", "subcomandante"}
-    if (not request.user.is_superuser) and (request.user.username.lower() not in allowed_users):
+    if not _pode_ver_logs(request.user):
         return HttpResponseForbidden('Sem permissão para visualizar logs')
 
+    from django.core.cache import cache
     from common.models import SimpleLog
 
     qs = SimpleLog.objects.select_related('user').all()
-
-    u = request.GET.get('usuario')
-    if u:
-        qs = qs.filter(user__username__iexact=u)
     app = request.GET.get('app')
     if app:
         qs = qs.filter(app_label__iexact=app)
     ev = request.GET.get('evento')
     if ev:
         qs = qs.filter(event__iexact=ev)
-    de = request.GET.get('de')
-    ate = request.GET.get('ate')
-    if de:
-        try:
-            from datetime import datetime
-            dt = datetime.strptime(de, '%Y-%m-%d')
-            qs = qs.filter(created_at__date__gte=dt.date())
-        except Exception:
-            pass
-    if ate:
-        try:
-            from datetime import datetime
-            dt = datetime.strptime(ate, '%Y-%m-%d')
-            qs = qs.filter(created_at__date__lte=dt.date())
-        except Exception:
-            pass
-    qs = qs.order_by('-created_at', '-id')
 
-    per_page_options = [10, 25, 50, 100]
-    try:
-        per_page = int(request.GET.get('per_page') or 25)
-    except ValueError:
-        per_page = 25
-    if per_page not in per_page_options:
-        per_page = 25
-
-    paginator = Paginator(qs, per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    ctx = _listar_logs(request, qs, 'simples')
 
-    qd = request.GET.copy()
-    if 'page' in qd:
-        qd.pop('page')
-    base_query = qd.urlencode()
-
-    # Opções de filtro (listas distintas)
+    # Opções de filtro (listas distintas): varrem a tabela, ficam 10 min em cache
     try:
-        apps = list(SimpleLog.objects.order_by().values_list('app_label', flat=True).distinct())
-        eventos = list(SimpleLog.objects.order_by().values_list('event', flat=True).distinct())
+        opcoes = cache.get('core:log_simplificado:opcoes')
+        if opcoes is None:
+            opcoes = (
+                sorted(SimpleLog.objects.order_by().values_list('app_label', flat=True).distinct()),
+                sorted(SimpleLog.objects.order_by().values_list('event', flat=True).distinct()),
+            )
+            cache.set('core:log_simplificado:opcoes', opcoes, 600)
+        apps, eventos = opcoes
     except Exception:
         apps, eventos = [], []
 
-    return render(request, 'core/adm_log_simplificado.html', {
-        'logs': page_obj.object_list,
-        'page_obj': page_obj,
-        'per_page': per_page,
-        'per_page_options': per_page_options,
-        'querystring': base_query,
-        'apps': apps,
-        'eventos': eventos,
-    })
+    ctx.update({'apps': apps, 'eventos': eventos})
+    return render(request, 'core/adm_log_simplificado.html', ctx)
+
+
+@login_required
+def log_arquivo_download(request, chave, mes):
+    """Download de um mês arquivado (common.log_arquivo) em JSONL comprimido."""
+    if not _pode_ver_logs(request.user):
+        return HttpResponseForbidden('Sem permissão para visualizar logs')
+    from django.http import FileResponse, Http404
+    from common import log_arquivo
+    caminho = log_arquivo.arquivo_do_mes(chave, mes)
+    if caminho is None:
+        raise Http404('Arquivo não encontrado')
+    return FileResponse(open(caminho, 'rb'), as_attachment=True,
+                        filename=f"log-{chave}-{mes}.jsonl.gz", content_type='application/gzip')
 
 @login_required
 def almoxarifado(request):
@@ -1057,6 +1055,42 @@ def estatisticas(request):
         pass
     return render(request, 'core/adm_estatisticas.html', ctx)
 
+def _estatisticas_bo_csv(request, qs, what, nome):
+    """CSV linha a linha de `estatisticas_bo` (detalhes, dvcm, flagrantes) em streaming."""
+    nomes = csv_export.usuarios()
+
+    def _enc(uid):
+        return nomes.get(uid, ('', ''))[0] if uid else ''
+
+    if what == 'dvcm':
+        cabecalho = ['Número','Emissão','Código','Natureza','Status','Encarregado']
+        linhas = (
+            [numero, csv_export.local(emissao, '%d/%m/%Y %H:%M'), cod, natureza, status, _enc(uid)]
+            for numero, emissao, cod, natureza, status, uid in qs.filter(estatisticas_bo_engine.DV_Q).values_list(
+                'numero', 'emissao', 'cod_natureza', 'natureza', 'status', 'encarregado_id'
+            ).iterator(chunk_size=csv_export.LOTE)
+        )
+    elif what == 'flagrantes':
+        cabecalho = ['Número','Emissão','Código','Natureza','Status','Flagrante']
+        linhas = (
+            [numero, csv_export.local(emissao, '%d/%m/%Y %H:%M'), cod, natureza, status, flagrante]
+            for numero, emissao, cod, natureza, status, flagrante in qs.filter(estatisticas_bo_engine.FLAGRANTE_Q).values_list(
+                'numero', 'emissao', 'cod_natureza', 'natureza', 'status', 'flagrante'
+            ).iterator(chunk_size=csv_export.LOTE)
+        )
+    else:  # detalhes
+        cabecalho = ['Número','Emissão','Status','Código','Natureza','Viatura','Encarregado','Offline']
+        linhas = (
+            [numero, csv_export.local(emissao, '%d/%m/%Y %H:%M'), status, cod, natureza, prefixo or (vid or ''),
+             _enc(uid), 'SIM' if offline else 'NÃO']
+            for numero, emissao, status, cod, natureza, prefixo, vid, uid, offline in qs.values_list(
+                'numero', 'emissao', 'status', 'cod_natureza', 'natureza', 'viatura__prefixo', 'viatura_id',
+                'encarregado_id', 'offline'
+            ).iterator(chunk_size=csv_export.LOTE)
+        )
+    return csv_export.resposta_csv(request, nome, cabecalho, linhas)
+
+
 @login_required
 def estatisticas_bo(request):
     """Estatísticas de BO (BOGCMI) – COMPLETO.
@@ -1098,161 +1132,33 @@ def estatisticas_bo(request):
     except Exception:
         de, ate = default_de, default_ate
 
-    qs = BO.objects.select_related('viatura').filter(emissao__date__range=(de, ate))
-
-    # Métricas básicas
-    total = qs.count()
-    abertos = qs.filter(status='EDICAO').count()
-    finalizados = qs.filter(status='FINALIZADO').count()
-    offline = qs.filter(offline=True).count()
-    por_status = list(qs.values('status').annotate(qtd=Count('id')).order_by('-qtd'))
-    top_viaturas = (
-        qs.values('viatura_id', 'viatura__prefixo')
-        .annotate(qtd=Count('id'))
-        .order_by('-qtd')[:5]
-    )
-
-    # Séries temporais por dia (para gráficos)
-    serie_por_dia = list(
-        qs.annotate(dia=TruncDate('emissao')).values('dia').annotate(qtd=Count('id')).order_by('dia')
-    )
+    qs = BO.objects.filter(estatisticas_bo_engine.periodo(de, ate))
+    exportar_csv = (request.GET.get('export') or '').lower() == 'csv'
+    what = (request.GET.get('what') or 'detalhes').lower()
+    if exportar_csv and what not in ('ranking_usuarios', 'ranking_codigos'):
+        # Exportações linha a linha: não dependem das métricas da tela
+        return _estatisticas_bo_csv(request, qs, what, f"bo_{tab}_{de:%Y%m%d}_{ate:%Y%m%d}")
+
+    # Métricas pelos resumos diários/mensais (core/resumos.py) ou, desligados, em duas
+    # consultas agrupadas sobre os BOs (core/estatisticas_bo.py)
+    if resumos.ativo():
+        m = estatisticas_bo_engine.agregar_resumo(de, ate)
+    else:
+        m = estatisticas_bo_engine.agregar(qs)
+    total, abertos, finalizados, offline = m['total'], m['abertos'], m['finalizados'], m['offline']
+    por_status, top_viaturas, ranking_codigos = m['por_status'], m['top_viaturas'], m['ranking_codigos']
+    ranking_bairros, bairros_codigos, users_ranking = m['ranking_bairros'], m['bairros_codigos'], m['users_ranking']
+    dv_total, dv_percent, flagrantes = m['dv_total'], m['dv_percent'], m['flagrantes']
+    dv_por_codigo, dv_por_usuario, dv_por_viatura = m['dv_por_codigo'], m['dv_por_usuario'], m['dv_por_viatura']
     # Serializa para JSON seguro (datas como YYYY-MM-DD)
     serie_js = [
         {
             'dia': (row.get('dia').strftime('%Y-%m-%d') if row.get('dia') else ''),
             'qtd': int(row.get('qtd') or 0)
         }
-        for row in serie_por_dia
+        for row in m['serie_por_dia']
     ]
 
-    # Ranking por código de ocorrência (cod_natureza + natureza)
-    ranking_codigos = list(
-        qs.values('cod_natureza', 'natureza').annotate(qtd=Count('id')).order_by('-qtd')[:20]
-    )
-
-    # Ranking por Bairro (normalizado) e cruzado com código
-    import unicodedata
-    def _norm(txt: str) -> str:
-        txt = (txt or '').strip().lower()
-        try:
-            txt = unicodedata.normalize('NFKD', txt)
-            txt = ''.join([c for c in txt if not unicodedata.combining(c)])
-        except Exception:
-            pass
-        return txt
-
-    # Agrupar por bairro normalizado
-    bairros_map_display = {}
-    from collections import Counter
-    c_bairros = Counter()
-    for b in qs.values_list('bairro', flat=True):
-        nb = _norm(b)
-        c_bairros[nb] += 1
-        if nb and nb not in bairros_map_display and b:
-            bairros_map_display[nb] = b  # primeira variação preserva capitalização
-    # Monta top 20 bairros
-    ranking_bairros = [
-        {
-            'bairro': (bairros_map_display.get(nb) or (nb.title() if nb else 'Não informado')),
-            'qtd': qtd,
-            'bairro_norm': nb,
-        }
-        for nb, qtd in c_bairros.most_common(20)
-    ]
-
-    # Bairros x Códigos (tabela resumida)
-    bairros_codigos_raw = (
-        qs.values('bairro', 'cod_natureza', 'natureza')
-          .annotate(qtd=Count('id'))
-          .order_by('bairro', '-qtd')
-    )
-    bairros_codigos = []
-    for row in bairros_codigos_raw:
-        nb = _norm(row.get('bairro') or '')
-        bairros_codigos.append({
-            'bairro': (bairros_map_display.get(nb) or (row.get('bairro') or 'Não informado')),
-            'cod': row.get('cod_natureza') or '-',
-            'natureza': row.get('natureza') or '-',
-            'qtd': int(row.get('qtd') or 0),
-        })
-
-    # DV contra Mulher (código A-18 ou natureza contendo 'mulher'/'maria da penha')
-    dv_q = (
-        Q(cod_natureza__istartswith='A-18') |
-        Q(natureza__icontains='mulher') |
-        Q(natureza__icontains='maria da penha')
-    )
-    dv_total = qs.filter(dv_q).count()
-
-    # Flagrantes no período (considera 'SIM' ou valor não vazio)
-    flagrantes = qs.filter(Q(flagrante__iexact='SIM') | Q(flagrante__iexact='S')).count()
-
-    # Estatística por usuário (ENC encarregado): ranking + top códigos por usuário
-    enc_group = (
-        qs.values('encarregado_id', 'encarregado__first_name', 'encarregado__last_name', 'encarregado__username')
-        .annotate(total=Count('id'))
-        .order_by('-total')[:20]
-    )
-    # Top códigos por usuário (limitando a 3 por usuário para exibição)
-    users_ranking = []
-    if enc_group:
-        enc_ids = [r['encarregado_id'] for r in enc_group if r['encarregado_id']]
-        by_user_code = (
-            qs.filter(encarregado_id__in=enc_ids)
-              .values('encarregado_id', 'cod_natureza', 'natureza')
-              .annotate(qtd=Count('id'))
-              .order_by('encarregado_id', '-qtd')
-        )
-        # agregação python
-        tmp = {}
-        import re
-        for row in by_user_code:
-            uid = row['encarregado_id']
-            cod = row.get('cod_natureza') or ''
-            natureza = row.get('natureza') or ''
-            # Remove prefixo duplicado do código na natureza, ex.: "A-04 - Homicídio" -> "Homicídio"
-            if cod and natureza:
-                try:
-                    natureza_clean = re.sub(rf'^{re.escape(cod)}\s*[-–—:]?\s*', '', natureza, flags=re.IGNORECASE)
-                except Exception:
-                    natureza_clean = natureza
-            else:
-                natureza_clean = natureza
-            tmp.setdefault(uid, []).append({'cod': cod, 'natureza': natureza_clean, 'qtd': row['qtd']})
-        for r in enc_group:
-            uid = r['encarregado_id']
-            fn = r.get('encarregado__first_name') or ''
-            ln = r.get('encarregado__last_name') or ''
-            un = r.get('encarregado__username') or ''
-            nome = (f"{fn} {ln}" if (fn or ln) else un).strip()
-            users_ranking.append({
-                'user_id': uid,
-                'nome': nome,
-                'total': r['total'],
-                'top_codigos': (tmp.get(uid) or [])[:3],
-            })
-
-    # DV contra Mulher – quebras (top por código, usuário e viatura)
-    dv_por_codigo = list(
-        qs.filter(dv_q)
-          .values('cod_natureza', 'natureza')
-          .annotate(qtd=Count('id'))
-          .order_by('-qtd')[:5]
-    )
-    dv_por_usuario = list(
-        qs.filter(dv_q)
-          .values('encarregado_id', 'encarregado__first_name', 'encarregado__last_name', 'encarregado__username')
-          .annotate(qtd=Count('id'))
-          .order_by('-qtd')[:5]
-    )
-    dv_por_viatura = list(
-        qs.filter(dv_q)
-          .values('viatura_id', 'viatura__prefixo')
-          .annotate(qtd=Count('id'))
-          .order_by('-qtd')[:5]
-    )
-    dv_percent = (round((dv_total / total) * 100, 1) if total else 0.0)
-
     # Dados para gráficos (Chart.js)
     chart_status_labels = [ (s.get('status') or '-') for s in por_status ]
     chart_status_values = [ int(s.get('qtd') or 0) for s in por_status ]
@@ -1314,40 +1220,17 @@ def estatisticas_bo(request):
             resp['Content-Disposition'] = f"inline; filename=bo_{tab}_{de:%Y%m%d}_{ate:%Y%m%d}.html"
             return resp
 
-    if (request.GET.get('export') or '').lower() == 'csv':
-        what = (request.GET.get('what') or 'detalhes').lower()
-        import csv
-        from io import StringIO
-        buf = StringIO()
-        w = csv.writer(buf)
+    if exportar_csv:
         if what == 'ranking_usuarios':
-            w.writerow(['Usuário','Total','Top códigos'])
-            for u in users_ranking:
-                top_str = '; '.join([f"{(c['cod'] or '-')}: {c['qtd']}" for c in u['top_codigos']])
-                w.writerow([u['nome'], u['total'], top_str])
-        elif what == 'ranking_codigos':
-            w.writerow(['Código','Natureza','Total'])
-            for r in ranking_codigos:
-                w.writerow([r['cod_natureza'] or '-', r['natureza'] or '-', r['qtd']])
-        elif what == 'dvcm':
-            w.writerow(['Número','Emissão','Código','Natureza','Status','Encarregado'])
-            for b in qs.filter(dv_q).select_related('encarregado'):
-                nome = (getattr(b.encarregado,'get_full_name',lambda:'' )() or getattr(b.encarregado,'username','')) if b.encarregado_id else ''
-                w.writerow([b.numero, timezone.localtime(b.emissao).strftime('%d/%m/%Y %H:%M'), b.cod_natureza, b.natureza, b.status, nome])
-        elif what == 'flagrantes':
-            w.writerow(['Número','Emissão','Código','Natureza','Status','Flagrante'])
-            for b in qs.filter(Q(flagrante__iexact='SIM') | Q(flagrante__iexact='S')):
-                w.writerow([b.numero, timezone.localtime(b.emissao).strftime('%d/%m/%Y %H:%M'), b.cod_natureza, b.natureza, b.status, b.flagrante])
-        else:  # detalhes
-            w.writerow(['Número','Emissão','Status','Código','Natureza','Viatura','Encarregado','Offline'])
-            for b in qs.select_related('viatura','encarregado'):
-                vtr = getattr(b.viatura, 'prefixo', '') or (b.viatura_id or '')
-                nome = (getattr(b.encarregado,'get_full_name',lambda:'' )() or getattr(b.encarregado,'username','')) if b.encarregado_id else ''
-                w.writerow([b.numero, timezone.localtime(b.emissao).strftime('%d/%m/%Y %H:%M'), b.status, b.cod_natureza, b.natureza, vtr, nome, 'SIM' if b.offline else 'NÃO'])
-        data = buf.getvalue(); buf.close()
-        resp = HttpResponse(data, content_type='text/csv; charset=utf-8')
-        resp['Content-Disposition'] = f"attachment; filename=bo_{tab}_{de:%Y%m%d}_{ate:%Y%m%d}.csv"
-        return resp
+            cabecalho = ['Usuário','Total','Top códigos']
+            linhas = (
+                [u['nome'], u['total'], '; '.join([f"{(c['cod'] or '-')}: {c['qtd']}" for c in u['top_codigos']])]
+                for u in users_ranking
+            )
+        else:  # ranking_codigos
+            cabecalho = ['Código','Natureza','Total']
+            linhas = ([r['cod_natureza'] or '-', r['natureza'] or '-', r['qtd']] for r in ranking_codigos)
+        return csv_export.resposta_csv(request, f"bo_{tab}_{de:%Y%m%d}_{ate:%Y%m%d}", cabecalho, linhas)
 
     abas = [('dia','Dia'), ('mes','Mês'), ('semestre','Semestre'), ('ano','Ano')]
     ctx = {
@@ -1588,21 +1471,9 @@ def estatisticas_bo_usuario_graficos(request):
     from users.models import Perfil
     hoje = timezone.localdate()
     tab = (request.GET.get('tab') or 'mes').lower()
-    if tab not in {'dia','mes','semestre','ano'}:
+    if tab not in graficos.ABAS:
         tab = 'mes'
-    if tab == 'dia':
-        default_de, default_ate = hoje, hoje
-    elif tab == 'mes':
-        default_de, default_ate = hoje.replace(day=1), hoje
-    elif tab == 'semestre':
-        if hoje.month <= 6:
-            default_de, default_ate = date(hoje.year,1,1), date(hoje.year,6,30)
-        else:
-            default_de, default_ate = date(hoje.year,7,1), date(hoje.year,12,31)
-            if hoje < default_ate:
-                default_ate = hoje
-    else:
-        default_de, default_ate = date(hoje.year,1,1), hoje
+    default_de, default_ate = graficos.periodo_aba(tab, hoje)
 
     try:
         from datetime import datetime
@@ -1623,29 +1494,13 @@ def estatisticas_bo_usuario_graficos(request):
     if perfil:
         user_nome = (perfil.user.get_full_name() or perfil.user.username).strip()
 
-    qs = BO.objects.filter(encarregado_id=uid, emissao__date__range=(de, ate)) if uid else BO.objects.none()
-    if uid and flag == 'sim':
-        qs = qs.filter(Q(flagrante__iexact='SIM') | Q(flagrante__iexact='S'))
-    elif uid and flag == 'nao':
-        qs = qs.exclude(Q(flagrante__iexact='SIM') | Q(flagrante__iexact='S'))
-
-    total = qs.count()
-    por_status = list(qs.values('status').annotate(qtd=Count('id')).order_by('-qtd'))
+    d = graficos.dados('bo_usuario', de, ate, uid=uid, flag=flag)
+    total, por_status, ranking_codigos, serie_js = d['total'], d['por_status'], d['ranking_codigos'], d['serie']
     # Flagrante vs Não
-    qtd_flag = qs.filter(Q(flagrante__iexact='SIM') | Q(flagrante__iexact='S')).count()
+    qtd_flag = d['qtd_flag']
     qtd_nao = total - qtd_flag
     pct_flag = round((qtd_flag / total) * 100, 1) if total else 0.0
     pct_nao = round((qtd_nao / total) * 100, 1) if total else 0.0
-    ranking_codigos = list(
-        qs.values('cod_natureza', 'natureza').annotate(qtd=Count('id')).order_by('-qtd')[:10]
-    )
-    serie_por_dia = list(
-        qs.annotate(dia=TruncDate('emissao')).values('dia').annotate(qtd=Count('id')).order_by('dia')
-    )
-    serie_js = [
-        {'dia': (row.get('dia').strftime('%Y-%m-%d') if row.get('dia') else ''), 'qtd': int(row.get('qtd') or 0)}
-        for row in serie_por_dia
-    ]
     chart_status_labels = [ (s.get('status') or '-') for s in por_status ]
     chart_status_values = [ int(s.get('qtd') or 0) for s in por_status ]
     chart_cod_labels = [ (r.get('cod_natureza') or '-') for r in ranking_codigos ]
@@ -1680,6 +1535,7 @@ def estatisticas_bo_usuario_graficos_pdf(request):
     """Exportação PDF dos gráficos por usuário (resumo textual + dados numéricos).
 
     Geramos um HTML simplificado (sem JS) e convertemos via wkhtmltopdf se disponível.
+    O PDF fica em cache (core.graficos) até um BO do período mudar.
     """
     try:
         uid = int(request.GET.get('user') or 0)
@@ -1689,78 +1545,65 @@ def estatisticas_bo_usuario_graficos_pdf(request):
     flag = (request.GET.get('flag') or '').lower()
     from users.models import Perfil
     hoje = timezone.localdate()
-    if tab not in {'dia','mes','semestre','ano'}:
+    if tab not in graficos.ABAS:
         tab = 'mes'
-    if tab == 'dia':
-        default_de, default_ate = hoje, hoje
-    elif tab == 'mes':
-        default_de, default_ate = hoje.replace(day=1), hoje
-    elif tab == 'semestre':
-        if hoje.month <= 6:
-            default_de, default_ate = date(hoje.year,1,1), date(hoje.year,6,30)
-        else:
-            default_de, default_ate = date(hoje.year,7,1), date(hoje.year,12,31)
-            if hoje < default_ate:
-                default_ate = hoje
-    else:
-        default_de, default_ate = date(hoje.year,1,1), hoje
+    default_de, default_ate = graficos.periodo_aba(tab, hoje)
     try:
         from datetime import datetime
         de = datetime.strptime((request.GET.get('de') or f"{default_de:%Y-%m-%d}"), '%Y-%m-%d').date()
         ate = datetime.strptime((request.GET.get('ate') or f"{default_ate:%Y-%m-%d}"), '%Y-%m-%d').date()
     except Exception:
         de, ate = default_de, default_ate
-    perfil = Perfil.objects.select_related('user').filter(user_id=uid).first()
-    user_nome = (perfil.user.get_full_name() or perfil.user.username).strip() if perfil else ''
-    qs = BO.objects.filter(encarregado_id=uid, emissao__date__range=(de, ate)) if uid else BO.objects.none()
-    if uid and flag == 'sim':
-        qs = qs.filter(Q(flagrante__iexact='SIM') | Q(flagrante__iexact='S'))
-    elif uid and flag == 'nao':
-        qs = qs.exclude(Q(flagrante__iexact='SIM') | Q(flagrante__iexact='S'))
-    total = qs.count()
-    por_status = list(qs.values('status').annotate(qtd=Count('id')).order_by('-qtd'))
-    qtd_flag = qs.filter(Q(flagrante__iexact='SIM') | Q(flagrante__iexact='S')).count()
-    qtd_nao = total - qtd_flag
-    pct_flag = round((qtd_flag / total) * 100, 1) if total else 0.0
-    pct_nao = round((qtd_nao / total) * 100, 1) if total else 0.0
-    ranking_codigos = list(qs.values('cod_natureza','natureza').annotate(qtd=Count('id')).order_by('-qtd')[:10])
-    serie_por_dia = list(qs.annotate(dia=TruncDate('emissao')).values('dia').annotate(qtd=Count('id')).order_by('dia'))
-    html = render_to_string('core/adm_estatisticas_bo_usuario_graficos_pdf.html', {
-        'tab': tab,
-        'de': de,
-        'ate': ate,
-        'uid': uid,
-        'user_nome': user_nome,
-        'flag': flag,
-        'total': total,
-        'por_status': por_status,
-        'qtd_flag': qtd_flag,
-        'qtd_nao': qtd_nao,
-        'pct_flag': pct_flag,
-        'pct_nao': pct_nao,
-        'ranking_codigos': ranking_codigos,
-        'serie_por_dia': serie_por_dia,
-    })
-    # Converter
-    try:
-        wkhtml = getattr(settings, 'WKHTMLTOPDF_CMD', None)
-        if not wkhtml or not os.path.exists(wkhtml):
-            raise FileNotFoundError('wkhtmltopdf não encontrado')
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.html') as f_html:
-            f_html.write(html.encode('utf-8')); f_html.flush(); html_path=f_html.name
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as f_pdf:
-            pdf_path = f_pdf.name
-        subprocess.run([wkhtml, '--quiet', html_path, pdf_path], check=True)
-        with open(pdf_path,'rb') as pf: pdf_bytes = pf.read()
-        try: os.unlink(html_path)
-        except Exception: pass
-        try: os.unlink(pdf_path)
-        except Exception: pass
+
+    def _html():
+        perfil = Perfil.objects.select_related('user').filter(user_id=uid).first()
+        user_nome = (perfil.user.get_full_name() or perfil.user.username).strip() if perfil else ''
+        d = graficos.dados('bo_usuario', de, ate, uid=uid, flag=flag)
+        total, qtd_flag = d['total'], d['qtd_flag']
+        qtd_nao = total - qtd_flag
+        return render_to_string('core/adm_estatisticas_bo_usuario_graficos_pdf.html', {
+            'tab': tab,
+            'de': de,
+            'ate': ate,
+            'uid': uid,
+            'user_nome': user_nome,
+            'flag': flag,
+            'total': total,
+            'por_status': [{**r, 'pct': round((r['qtd'] * 100) / total, 1) if total else 0} for r in d['por_status']],
+            'qtd_flag': qtd_flag,
+            'qtd_nao': qtd_nao,
+            'pct_flag': round((qtd_flag / total) * 100, 1) if total else 0.0,
+            'pct_nao': round((qtd_nao / total) * 100, 1) if total else 0.0,
+            'ranking_codigos': d['ranking_codigos'],
+            'serie_por_dia': [{'dia': date.fromisoformat(r['dia']), 'qtd': r['qtd']} for r in d['serie'] if r['dia']],
+        })
+
+    def _pdf():
+        # Converter; None quando o wkhtmltopdf não está disponível ou falha (responde o HTML)
+        try:
+            wkhtml = getattr(settings, 'WKHTMLTOPDF_CMD', None)
+            if not wkhtml or not os.path.exists(wkhtml):
+                raise FileNotFoundError('wkhtmltopdf não encontrado')
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.html') as f_html:
+                f_html.write(_html().encode('utf-8')); f_html.flush(); html_path=f_html.name
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as f_pdf:
+                pdf_path = f_pdf.name
+            subprocess.run([wkhtml, '--quiet', html_path, pdf_path], check=True)
+            with open(pdf_path,'rb') as pf: pdf_bytes = pf.read()
+            try: os.unlink(html_path)
+            except Exception: pass
+            try: os.unlink(pdf_path)
+            except Exception: pass
+            return pdf_bytes
+        except Exception:
+            return None
+
+    pdf_bytes = graficos.artefato('bo_usuario_pdf', 'bo', de, ate, {'uid': uid, 'flag': flag, 'tab': tab}, 'pdf', _pdf)
+    if pdf_bytes:
         resp = HttpResponse(pdf_bytes, content_type='application/pdf')
         resp['Content-Disposition'] = f"attachment; filename=bo_usuario_graficos_{uid}_{de:%Y%m%d}_{ate:%Y%m%d}.pdf"
         return resp
-    except Exception:
-        return HttpResponse(html, content_type='text/html; charset=utf-8')
+    return HttpResponse(_html(), content_type='text/html; charset=utf-8')
 
 @login_required
 def estatisticas_bo_codigo(request):
@@ -1965,46 +1808,50 @@ def estatisticas_ait(request):
     
     # Exportação CSV (detalhes) do período; aplica filtro de usuário se fornecido
     if (request.GET.get('export') or '').lower() == 'csv':
-        resp = HttpResponse(content_type='text/csv; charset=utf-8')
-        resp['Content-Disposition'] = f"attachment; filename=ait_{de:%Y%m%d}_{ate:%Y%m%d}{('_user_'+str(uid)) if uid else ''}.csv"
-        w = csv.writer(resp)
-        w.writerow(['ID','Criado em','Talao ID','Integrante ID','Integrante','Matrícula'])
-        for r in qs.select_related('integrante__perfil').order_by('criado_em'):
-            u = getattr(r,'integrante',None)
-            nome = (u.get_full_name() or u.username).strip() if u else ''
-            perf = getattr(u,'perfil',None) if u else None
-            mat = getattr(perf,'matricula','') if perf else ''
-            criado = timezone.localtime(getattr(r,'criado_em', None)).strftime('%Y-%m-%d %H:%M:%S') if getattr(r,'criado_em', None) else ''
-            w.writerow([r.id, criado, getattr(r,'talao_id',''), getattr(u,'id',''), nome, mat])
-        return resp
-    
-    total = qs.count()
+        nomes = csv_export.usuarios()
+        linhas = (
+            [pk, csv_export.local(criado_em), talao_id or '', integrante_id or '', *nomes.get(integrante_id, ('', ''))]
+            for pk, criado_em, talao_id, integrante_id in qs.order_by('criado_em').values_list(
+                'id', 'criado_em', 'talao_id', 'integrante_id'
+            ).iterator(chunk_size=csv_export.LOTE)
+        )
+        return csv_export.resposta_csv(
+            request, f"ait_{de:%Y%m%d}_{ate:%Y%m%d}{('_user_'+str(uid)) if uid else ''}",
+            ['ID','Criado em','Talao ID','Integrante ID','Integrante','Matrícula'], linhas,
+        )
     
-    # Top 5 por GCM (considera integrante do AIT + todos os integrantes do talão)
-    contador_integrantes = Counter()
-    for ait in qs:
-        # Coletar integrantes: primeiro o integrante direto do AIT
-        integrantes_ids = set()
-        if ait.integrante_id:
-            integrantes_ids.add(ait.integrante_id)
+    # Visão geral (sem filtro de GCM) pelos resumos diários/mensais (core/resumos.py)
+    resumo = resumos.ler('ait', de, ate) if (not uid and resumos.ativo()) else None
+    if resumo is not None:
+        total = resumo.total()
+        contador_integrantes = resumo.qtd['usuario']
+    else:
+        total = qs.count()
+        # Top 5 por GCM (considera integrante do AIT + todos os integrantes do talão)
+        contador_integrantes = Counter()
+        for ait in qs:
+            # Coletar integrantes: primeiro o integrante direto do AIT
+            integrantes_ids = set()
+            if ait.integrante_id:
+                integrantes_ids.add(ait.integrante_id)
         
-        # Depois todos os integrantes do talão
-        talao = ait.talao
-        if talao:
-            if talao.criado_por_id:
-                integrantes_ids.add(talao.criado_por_id)
-            if talao.encarregado_id:
-                integrantes_ids.add(talao.encarregado_id)
-            if talao.motorista_id:
-                integrantes_ids.add(talao.motorista_id)
-            if talao.auxiliar1_id:
-                integrantes_ids.add(talao.auxiliar1_id)
-            if talao.auxiliar2_id:
-                integrantes_ids.add(talao.auxiliar2_id)
+            # Depois todos os integrantes do talão
+            talao = ait.talao
+            if talao:
+                if talao.criado_por_id:
+                    integrantes_ids.add(talao.criado_por_id)
+                if talao.encarregado_id:
+                    integrantes_ids.add(talao.encarregado_id)
+                if talao.motorista_id:
+                    integrantes_ids.add(talao.motorista_id)
+                if talao.auxiliar1_id:
+                    integrantes_ids.add(talao.auxiliar1_id)
+                if talao.auxiliar2_id:
+                    integrantes_ids.add(talao.auxiliar2_id)
         
-        # Incrementar contador para cada integrante
-        for user_id in integrantes_ids:
-            contador_integrantes[user_id] += 1
+            # Incrementar contador para cada integrante
+            for user_id in integrantes_ids:
+                contador_integrantes[user_id] += 1
     
     # Montar top 5 com dados dos usuários
     top_integrantes = []
@@ -2020,13 +1867,16 @@ def estatisticas_ait(request):
             })
         except User.DoesNotExist:
             pass
-    # Top 5 por dia do período
-    top_dias = (
-        qs.extra(select={'dia': "DATE(criado_em)"})
-        .values('dia')
-        .annotate(qtd=Count('id'))
-        .order_by('-qtd')[:10]
-    )
+    # Top 10 dias do período
+    if resumo is not None:
+        top_dias = resumo.top_dias(10)
+    else:
+        top_dias = (
+            qs.extra(select={'dia': "DATE(criado_em)"})
+            .values('dia')
+            .annotate(qtd=Count('id'))
+            .order_by('-qtd')[:10]
+        )
 
     # Exportação PDF (apresentação)
     if (request.GET.get('export') or '').lower() == 'pdf':
@@ -2049,10 +1899,7 @@ def estatisticas_ait(request):
             'ate': ate,
             'total': total,
             'top_integrantes': top_10_pdf,
-            'top_dias': list(
-                qs.extra(select={'dia': "DATE(criado_em)"})
-                  .values('dia').annotate(qtd=Count('id')).order_by('-qtd')[:10]
-            ),
+            'top_dias': list(top_dias),
             'uid': uid,
         })
         try:
@@ -2095,28 +1942,15 @@ def estatisticas_ait(request):
 @login_required
 def estatisticas_ait_graficos(request):
     """Gráfico de linha (série diária) de AIT por período, com filtro opcional por integrante."""
-    from taloes.models import AitRegistro
     try:
         from users.models import Perfil
     except Exception:
         Perfil = None
     hoje = timezone.localdate()
     tab = (request.GET.get('tab') or 'mes').lower()
-    if tab not in {'dia','mes','semestre','ano'}:
+    if tab not in graficos.ABAS:
         tab = 'mes'
-    if tab == 'dia':
-        default_de, default_ate = hoje, hoje
-    elif tab == 'mes':
-        default_de, default_ate = hoje.replace(day=1), hoje
-    elif tab == 'semestre':
-        if hoje.month <= 6:
-            default_de, default_ate = date(hoje.year,1,1), date(hoje.year,6,30)
-        else:
-            default_de, default_ate = date(hoje.year,7,1), date(hoje.year,12,31)
-            if hoje < default_ate:
-                default_ate = hoje
-    else:
-        default_de, default_ate = date(hoje.year,1,1), hoje
+    default_de, default_ate = graficos.periodo_aba(tab, hoje)
     try:
         from datetime import datetime
         de = datetime.strptime((request.GET.get('de') or f"{default_de:%Y-%m-%d}"), '%Y-%m-%d').date()
@@ -2142,26 +1976,8 @@ def estatisticas_ait_graficos(request):
             user_options.append({'id': p.user_id, 'label': label})
             if p.user_id == uid:
                 user_nome = nome
-    # Query base
-    qs = AitRegistro.objects.filter(criado_em__date__range=(de, ate))
-    if uid:
-        from django.db.models import Q
-        qs = qs.filter(
-            Q(integrante_id=uid) |
-            Q(talao__criado_por_id=uid) | 
-            Q(talao__encarregado_id=uid) | 
-            Q(talao__motorista_id=uid) | 
-            Q(talao__auxiliar1_id=uid) | 
-            Q(talao__auxiliar2_id=uid)
-        )
-    total = qs.count()
-    serie = list(
-        qs.annotate(dia=TruncDate('criado_em')).values('dia').annotate(qtd=Count('id')).order_by('dia')
-    )
-    serie_js = [
-        {'dia': (row.get('dia').strftime('%Y-%m-%d') if row.get('dia') else ''), 'qtd': int(row.get('qtd') or 0)}
-        for row in serie
-    ]
+    d = graficos.dados('ait', de, ate, uid=uid)
+    total, serie_js = d['total'], d['serie']
     abas = [('dia','Dia'), ('mes','Mês'), ('semestre','Semestre'), ('ano','Ano')]
     ctx = {
         'tab': tab,
@@ -2217,40 +2033,58 @@ def estatisticas_cecom(request):
         qs = qs.filter(cod_natureza=cod)
     # Export CSV (detalhes)
     if (request.GET.get('export') or '').lower() == 'csv':
-        resp = HttpResponse(content_type='text/csv; charset=utf-8')
         name_parts = [f"cecom_{de:%Y%m%d}_{ate:%Y%m%d}"]
         if op:
             name_parts.append(f"op{op}")
         if cod:
             name_parts.append(f"cod_{cod}")
-        resp['Content-Disposition'] = f"attachment; filename={'_'.join(name_parts)}.csv"
-        w = csv.writer(resp)
-        w.writerow(['ID','Despachado em','Viatura','Código','Descrição','Status','Respondido em','Finalizado em','Arquivado','Operador'])
-        for d in qs.order_by('despachado_em'):
-            disp = timezone.localtime(d.despachado_em).strftime('%Y-%m-%d %H:%M:%S') if d.despachado_em else ''
-            resp_dt = timezone.localtime(d.respondido_em).strftime('%Y-%m-%d %H:%M:%S') if d.respondido_em else ''
-            fin_dt = timezone.localtime(d.finalizado_em).strftime('%Y-%m-%d %H:%M:%S') if d.finalizado_em else ''
-            viat = getattr(d.viatura,'prefixo','') if getattr(d,'viatura',None) else ''
-            operador = (getattr(d.despachado_por,'get_full_name',lambda: '')() or getattr(d.despachado_por,'username','')).strip() if getattr(d,'despachado_por',None) else ''
-            w.writerow([d.id, disp, viat, d.cod_natureza or '', d.natureza or '', d.status, resp_dt, fin_dt, 'SIM' if d.arquivado else 'NÃO', operador])
-        return resp
-    total = qs.count()
-    por_status = list(qs.values('status').annotate(qtd=Count('id')).order_by('-qtd'))
-    pendentes = qs.filter(status='PENDENTE').count()
-    aceitos = qs.filter(status__in=['ACEITO','EM_ANDAMENTO','FINALIZADO']).count()
-    recusados = qs.filter(status='RECUSADO').count()
-    finalizados = qs.filter(status='FINALIZADO').count()
-
-    # Tempos médios (em minutos)
-    from django.db.models.functions import Cast
-    resp_com_delta = qs.filter(respondido_em__isnull=False).annotate(
-        delta=ExpressionWrapper(F('respondido_em') - F('despachado_em'), output_field=DurationField())
-    )
-    media_resp = resp_com_delta.aggregate(m=Avg('delta')).get('m')
-    fim_com_delta = qs.filter(finalizado_em__isnull=False).annotate(
-        delta=ExpressionWrapper(F('finalizado_em') - F('despachado_em'), output_field=DurationField())
-    )
-    media_fim = fim_com_delta.aggregate(m=Avg('delta')).get('m')
+        nomes = csv_export.usuarios()
+        linhas = (
+            [pk, csv_export.local(despachado_em), prefixo or '', cod_natureza or '', natureza or '', status,
+             csv_export.local(respondido_em), csv_export.local(finalizado_em), 'SIM' if arquivado else 'NÃO',
+             nomes.get(operador_id, ('', ''))[0]]
+            for pk, despachado_em, prefixo, cod_natureza, natureza, status, respondido_em, finalizado_em, arquivado, operador_id
+            in qs.order_by('despachado_em').values_list(
+                'id', 'despachado_em', 'viatura__prefixo', 'cod_natureza', 'natureza', 'status',
+                'respondido_em', 'finalizado_em', 'arquivado', 'despachado_por_id',
+            ).iterator(chunk_size=csv_export.LOTE)
+        )
+        return csv_export.resposta_csv(
+            request, '_'.join(name_parts),
+            ['ID','Despachado em','Viatura','Código','Descrição','Status','Respondido em','Finalizado em','Arquivado','Operador'],
+            linhas,
+        )
+    # Visão geral (sem filtros) pelos resumos diários/mensais (core/resumos.py)
+    resumo = resumos.ler('cecom', de, ate) if (not op and not cod and resumos.ativo()) else None
+    if resumo is not None:
+        c_status = resumo.qtd['status']
+        total = sum(c_status.values())
+        por_status = [{'status': s, 'qtd': q} for s, q in c_status.most_common()]
+        pendentes = c_status['PENDENTE']
+        aceitos = c_status['ACEITO'] + c_status['EM_ANDAMENTO'] + c_status['FINALIZADO']
+        recusados = c_status['RECUSADO']
+        finalizados = c_status['FINALIZADO']
+        n_tempo, s_tempo = resumo.qtd['tempo'], resumo.soma['tempo']
+        media_resp = timedelta(seconds=s_tempo['resposta'] / n_tempo['resposta']) if n_tempo['resposta'] else None
+        media_fim = timedelta(seconds=s_tempo['finalizacao'] / n_tempo['finalizacao']) if n_tempo['finalizacao'] else None
+    else:
+        total = qs.count()
+        por_status = list(qs.values('status').annotate(qtd=Count('id')).order_by('-qtd'))
+        pendentes = qs.filter(status='PENDENTE').count()
+        aceitos = qs.filter(status__in=['ACEITO','EM_ANDAMENTO','FINALIZADO']).count()
+        recusados = qs.filter(status='RECUSADO').count()
+        finalizados = qs.filter(status='FINALIZADO').count()
+
+        # Tempos médios (em minutos)
+        from django.db.models.functions import Cast
+        resp_com_delta = qs.filter(respondido_em__isnull=False).annotate(
+            delta=ExpressionWrapper(F('respondido_em') - F('despachado_em'), output_field=DurationField())
+        )
+        media_resp = resp_com_delta.aggregate(m=Avg('delta')).get('m')
+        fim_com_delta = qs.filter(finalizado_em__isnull=False).annotate(
+            delta=ExpressionWrapper(F('finalizado_em') - F('despachado_em'), output_field=DurationField())
+        )
+        media_fim = fim_com_delta.aggregate(m=Avg('delta')).get('m')
 
     def fmt_minutos(td):
         try:
@@ -2279,28 +2113,45 @@ def estatisticas_cecom(request):
         codigo_options = list(CodigoOcorrencia.objects.all().order_by('sigla').values('sigla','descricao'))
 
     # Rankings
-    ranking_codigos = list(
-        qs.values('cod_natureza', 'natureza').annotate(qtd=Count('id')).order_by('-qtd')[:10]
-    )
-    ranking_operadores = list(
-        qs.values('despachado_por__first_name', 'despachado_por__last_name', 'despachado_por__username')
-          .annotate(qtd=Count('id')).order_by('-qtd')[:10]
-    )
+    if resumo is not None:
+        ranking_codigos = [
+            {'cod_natureza': c, 'natureza': n, 'qtd': q} for (c, n), q in resumo.qtd['codigo'].most_common(10)
+        ]
+        top_operadores = resumo.qtd['usuario'].most_common(10)
+        from django.contrib.auth import get_user_model
+        nomes = {
+            u['id']: u for u in get_user_model().objects.filter(pk__in=[u for u, _ in top_operadores if u])
+            .values('id', 'first_name', 'last_name', 'username')
+        }
+        ranking_operadores = [
+            {'despachado_por__first_name': nomes.get(u, {}).get('first_name'),
+             'despachado_por__last_name': nomes.get(u, {}).get('last_name'),
+             'despachado_por__username': nomes.get(u, {}).get('username'), 'qtd': q}
+            for u, q in top_operadores
+        ]
+    else:
+        ranking_codigos = list(
+            qs.values('cod_natureza', 'natureza').annotate(qtd=Count('id')).order_by('-qtd')[:10]
+        )
+        ranking_operadores = list(
+            qs.values('despachado_por__first_name', 'despachado_por__last_name', 'despachado_por__username')
+              .annotate(qtd=Count('id')).order_by('-qtd')[:10]
+        )
 
     # Export PDF (apresentação)
     if (request.GET.get('export') or '').lower() == 'pdf':
         html = render_to_string('core/adm_estatisticas_cecom_pdf.html', {
             'de': de, 'ate': ate,
             'total': total,
-            'por_status': list(qs.values('status').annotate(qtd=Count('id')).order_by('-qtd')),
+            'por_status': por_status,
             'pendentes': pendentes,
             'aceitos': aceitos,
             'recusados': recusados,
             'finalizados': finalizados,
             'media_resposta': fmt_minutos(media_resp) if media_resp else None,
             'media_finalizacao': fmt_minutos(media_fim) if media_fim else None,
-            'ranking_codigos': list(qs.values('cod_natureza','natureza').annotate(qtd=Count('id')).order_by('-qtd')[:10]),
-            'ranking_operadores': list(qs.values('despachado_por__first_name','despachado_por__last_name','despachado_por__username').annotate(qtd=Count('id')).order_by('-qtd')[:10]),
+            'ranking_codigos': ranking_codigos,
+            'ranking_operadores': ranking_operadores,
             'op': op, 'cod': cod,
         })
         try:
@@ -2356,7 +2207,6 @@ def estatisticas_cecom(request):
 @login_required
 def estatisticas_cecom_graficos(request):
     """Gráficos de despachos CECOM (série diária) com filtros de Operador e Código."""
-    from cecom.models import DespachoOcorrencia
     try:
         from users.models import Perfil
     except Exception:
@@ -2368,21 +2218,9 @@ def estatisticas_cecom_graficos(request):
 
     hoje = timezone.localdate()
     tab = (request.GET.get('tab') or 'mes').lower()
-    if tab not in {'dia','mes','semestre','ano'}:
+    if tab not in graficos.ABAS:
         tab = 'mes'
-    if tab == 'dia':
-        default_de, default_ate = hoje, hoje
-    elif tab == 'mes':
-        default_de, default_ate = hoje.replace(day=1), hoje
-    elif tab == 'semestre':
-        if hoje.month <= 6:
-            default_de, default_ate = date(hoje.year,1,1), date(hoje.year,6,30)
-        else:
-            default_de, default_ate = date(hoje.year,7,1), date(hoje.year,12,31)
-            if hoje < default_ate:
-                default_ate = hoje
-    else:
-        default_de, default_ate = date(hoje.year,1,1), hoje
+    default_de, default_ate = graficos.periodo_aba(tab, hoje)
     try:
         from datetime import datetime
         de = datetime.strptime((request.GET.get('de') or f"{default_de:%Y-%m-%d}"), '%Y-%m-%d').date()
@@ -2418,20 +2256,8 @@ def estatisticas_cecom_graficos(request):
             if cod and c.sigla == cod:
                 cod_label = f"{c.sigla} — {c.descricao}"
 
-    # Query base
-    qs = DespachoOcorrencia.objects.filter(despachado_em__date__range=(de, ate))
-    if op:
-        qs = qs.filter(despachado_por_id=op)
-    if cod:
-        qs = qs.filter(cod_natureza=cod)
-    total = qs.count()
-    serie = list(
-        qs.annotate(dia=TruncDate('despachado_em')).values('dia').annotate(qtd=Count('id')).order_by('dia')
-    )
-    serie_js = [
-        {'dia': (row.get('dia').strftime('%Y-%m-%d') if row.get('dia') else ''), 'qtd': int(row.get('qtd') or 0)}
-        for row in serie
-    ]
+    d = graficos.dados('cecom', de, ate, op=op, cod=cod)
+    total, serie_js = d['total'], d['serie']
     abas = [('dia','Dia'), ('mes','Mês'), ('semestre','Semestre'), ('ano','Ano')]
     ctx = {
         'tab': tab,
@@ -2506,42 +2332,65 @@ def estatisticas_remocoes(request):
     removidos = base.filter(
         Q(apreensao_ait__gt='') | Q(apreensao_crr__gt='') | Q(apreensao_destino__gt='') | Q(apreensao_responsavel_guincho__gt='')
     )
-    total = removidos.count()
-    # Série por dia
-    serie = list(
-        removidos.annotate(dia=TruncDate('bo__emissao')).values('dia').annotate(qtd=Count('id')).order_by('dia')
-    )
+    # CSV export (detalhes)
+    if (request.GET.get('export') or '').lower() == 'csv':
+        nomes = csv_export.usuarios()
+        linhas = (
+            [numero or '', csv_export.local(emissao), ait, crr, destino, guincho, nomes.get(enc_id, ('', ''))[0]]
+            for numero, emissao, ait, crr, destino, guincho, enc_id in removidos.order_by('bo__emissao').values_list(
+                'bo__numero', 'bo__emissao', 'apreensao_ait', 'apreensao_crr', 'apreensao_destino',
+                'apreensao_responsavel_guincho', 'bo__encarregado_id',
+            ).iterator(chunk_size=csv_export.LOTE)
+        )
+        return csv_export.resposta_csv(
+            request, f"remocoes_{de:%Y%m%d}_{ate:%Y%m%d}{('_user_'+str(uid)) if uid else ''}",
+            ['BO','Emissão','AIT','CRR','Destino','Resp. Guincho','Encarregado'], linhas,
+        )
+    # Visão geral (sem filtro de GCM) pelos resumos diários/mensais (core/resumos.py)
+    resumo = resumos.ler('remocoes', de, ate) if (not uid and resumos.ativo()) else None
+    if resumo is not None:
+        total = resumo.total()
+        serie = resumo.serie()
+        top_dias = resumo.top_dias(10)
+        contador_usuarios = resumo.qtd['usuario']
+    else:
+        total = removidos.count()
+        # Série por dia
+        serie = list(
+            removidos.annotate(dia=TruncDate('bo__emissao')).values('dia').annotate(qtd=Count('id')).order_by('dia')
+        )
+        # Top 10 dias
+        top_dias = list(
+            removidos.annotate(dia=TruncDate('bo__emissao')).values('dia').annotate(qtd=Count('id')).order_by('-qtd')[:10]
+        )
+        # Ranking usuários (considera TODOS os integrantes do BO)
+        contador_usuarios = Counter()
+        for veiculo in removidos:
+            bo = veiculo.bo
+            if not bo:
+                continue
+            # Coletar todos os integrantes do BO
+            integrantes_ids = set()
+            if bo.encarregado_id:
+                integrantes_ids.add(bo.encarregado_id)
+            if bo.motorista_id:
+                integrantes_ids.add(bo.motorista_id)
+            if bo.auxiliar1_id:
+                integrantes_ids.add(bo.auxiliar1_id)
+            if bo.auxiliar2_id:
+                integrantes_ids.add(bo.auxiliar2_id)
+            if bo.cecom_id:
+                integrantes_ids.add(bo.cecom_id)
+
+            # Incrementar contador para cada integrante
+            for user_id in integrantes_ids:
+                contador_usuarios[user_id] += 1
+
     serie_js = [
         {'dia': (row.get('dia').strftime('%Y-%m-%d') if row.get('dia') else ''), 'qtd': int(row.get('qtd') or 0)}
         for row in serie
     ]
-    # Top 10 dias
-    top_dias = list(
-        removidos.annotate(dia=TruncDate('bo__emissao')).values('dia').annotate(qtd=Count('id')).order_by('-qtd')[:10]
-    )
-    # Ranking usuários (considera TODOS os integrantes do BO)
-    contador_usuarios = Counter()
-    for veiculo in removidos:
-        bo = veiculo.bo
-        if not bo:
-            continue
-        # Coletar todos os integrantes do BO
-        integrantes_ids = set()
-        if bo.encarregado_id:
-            integrantes_ids.add(bo.encarregado_id)
-        if bo.motorista_id:
-            integrantes_ids.add(bo.motorista_id)
-        if bo.auxiliar1_id:
-            integrantes_ids.add(bo.auxiliar1_id)
-        if bo.auxiliar2_id:
-            integrantes_ids.add(bo.auxiliar2_id)
-        if bo.cecom_id:
-            integrantes_ids.add(bo.cecom_id)
-        
-        # Incrementar contador para cada integrante
-        for user_id in integrantes_ids:
-            contador_usuarios[user_id] += 1
-    
+
     # Montar top 10 com dados dos usuários
     top_usuarios = []
     for user_id, qtd in contador_usuarios.most_common(10):
@@ -2555,13 +2404,18 @@ def estatisticas_remocoes(request):
             })
         except User.DoesNotExist:
             pass
-    por_destino = list(
-        removidos.values('apreensao_destino').annotate(qtd=Count('id')).order_by('-qtd')[:10]
-    )
-    por_guincho = list(
-        removidos.values('apreensao_responsavel_guincho').annotate(qtd=Count('id')).order_by('-qtd')[:10]
-    )
-    com_ait = removidos.filter(apreensao_ait__gt='').count()
+    if resumo is not None:
+        por_destino = [{'apreensao_destino': k, 'qtd': q} for k, q in resumo.qtd['destino'].most_common(10)]
+        por_guincho = [{'apreensao_responsavel_guincho': k, 'qtd': q} for k, q in resumo.qtd['guincho'].most_common(10)]
+        com_ait = resumo.qtd['indicador']['com_ait']
+    else:
+        por_destino = list(
+            removidos.values('apreensao_destino').annotate(qtd=Count('id')).order_by('-qtd')[:10]
+        )
+        por_guincho = list(
+            removidos.values('apreensao_responsavel_guincho').annotate(qtd=Count('id')).order_by('-qtd')[:10]
+        )
+        com_ait = removidos.filter(apreensao_ait__gt='').count()
 
     # Options usuários
     user_options = []
@@ -2625,44 +2479,17 @@ def estatisticas_remocoes(request):
         'top_usuarios': top_usuarios,
         'serie_por_dia': mark_safe(json.dumps(serie_js)),
     }
-    # CSV export (detalhes)
-    if (request.GET.get('export') or '').lower() == 'csv':
-        resp = HttpResponse(content_type='text/csv; charset=utf-8')
-        fn = f"remocoes_{de:%Y%m%d}_{ate:%Y%m%d}{('_user_'+str(uid)) if uid else ''}.csv"
-        resp['Content-Disposition'] = f"attachment; filename={fn}"
-        w = csv.writer(resp)
-        w.writerow(['BO','Emissão','AIT','CRR','Destino','Resp. Guincho','Encarregado'])
-        for v in removidos.select_related('bo','bo__encarregado').order_by('bo__emissao'):
-            bo = getattr(v,'bo',None)
-            emissao = timezone.localtime(getattr(bo,'emissao', None)).strftime('%Y-%m-%d %H:%M:%S') if bo and getattr(bo,'emissao',None) else ''
-            enc = getattr(bo,'encarregado',None)
-            enc_nome = (enc.get_full_name() or enc.username).strip() if enc else ''
-            w.writerow([getattr(bo,'numero',''), emissao, v.apreensao_ait, v.apreensao_crr, v.apreensao_destino, v.apreensao_responsavel_guincho, enc_nome])
-        return resp
     return render(request, 'core/adm_estatisticas_remocoes.html', ctx)
 
 
 @login_required
 def estatisticas_remocoes_graficos(request):
     """Gráficos de Veículos Removidos por período, com filtro por encarregado."""
-    from bogcmi.models import VeiculoEnvolvido
     hoje = timezone.localdate()
     tab = (request.GET.get('tab') or 'mes').lower()
-    if tab not in {'dia','mes','semestre','ano'}:
+    if tab not in graficos.ABAS:
         tab = 'mes'
-    if tab == 'dia':
-        default_de, default_ate = hoje, hoje
-    elif tab == 'mes':
-        default_de, default_ate = hoje.replace(day=1), hoje
-    elif tab == 'semestre':
-        if hoje.month <= 6:
-            default_de, default_ate = date(hoje.year,1,1), date(hoje.year,6,30)
-        else:
-            default_de, default_ate = date(hoje.year,7,1), date(hoje.year,12,31)
-            if hoje < default_ate:
-                default_ate = hoje
-    else:
-        default_de, default_ate = date(hoje.year,1,1), hoje
+    default_de, default_ate = graficos.periodo_aba(tab, hoje)
     try:
         from datetime import datetime
         de = datetime.strptime((request.GET.get('de') or f"{default_de:%Y-%m-%d}"), '%Y-%m-%d').date()
@@ -2689,20 +2516,8 @@ def estatisticas_remocoes_graficos(request):
             if p.user_id == uid:
                 user_nome = nome
 
-    base = VeiculoEnvolvido.objects.select_related('bo','bo__encarregado').filter(bo__emissao__date__range=(de, ate))
-    removidos = base.filter(Q(apreensao_ait__gt='') | Q(apreensao_crr__gt='') | Q(apreensao_destino__gt='') | Q(apreensao_responsavel_guincho__gt=''))
-    if uid:
-        from django.db.models import Q
-        removidos = removidos.filter(
-            Q(bo__encarregado_id=uid) | 
-            Q(bo__motorista_id=uid) | 
-            Q(bo__auxiliar1_id=uid) | 
-            Q(bo__auxiliar2_id=uid) | 
-            Q(bo__cecom_id=uid)
-        )
-    total = removidos.count()
-    serie = list(removidos.annotate(dia=TruncDate('bo__emissao')).values('dia').annotate(qtd=Count('id')).order_by('dia'))
-    serie_js = [ {'dia': (r.get('dia').strftime('%Y-%m-%d') if r.get('dia') else ''), 'qtd': int(r.get('qtd') or 0)} for r in serie ]
+    d = graficos.dados('remocoes', de, ate, uid=uid)
+    total, serie_js = d['total'], d['serie']
     abas = [('dia','Dia'),('mes','Mês'),('semestre','Semestre'),('ano','Ano')]
     ctx = {
         'tab': tab,
@@ -3036,6 +2851,15 @@ def dispensas_excluir(request, dispensa_id: int):
     messages.success(request, 'Solicitação excluída.')
     return redirect('core:dispensas')
 
+@login_required
+async def badges_json(request):
+    """Contadores do topo (core.badges) para o base.html buscar após carregar a página."""
+    user = await request.auser()
+    resp = JsonResponse(await sync_to_async(badges.contadores)(user))
+    resp['Cache-Control'] = 'private, no-cache'
+    return resp
+
+
 @login_required
 def notificacoes_usuario(request):
     """
@@ -3526,24 +3350,7 @@ def fiscalizacao_notificacao_excluir(request, pk: int):
 
 # ---- Documento Notificação (visualizar/baixar PDF) ----
 def _find_wkhtmltopdf_path_core():
-    path_cfg = getattr(settings, 'WKHTMLTOPDF_CMD', '') or ''
-    if path_cfg and os.path.exists(path_cfg):
-        return path_cfg
-    candidates = [
-        r"C:\\Program Files\\wkhtmltopdf\\bin\\wkhtmltopdf.exe",
-        r"C:\\Program Files (x86)\\wkhtmltopdf\\bin\\wkhtmltopdf.exe",
-    ]
-    for p in candidates:
-        if os.path.exists(p):
-            return p
-    try:
-        import shutil
-        found = shutil.which('wkhtmltopdf')
-        if found:
-            return found
-    except Exception:
-        pass
-    return None
+    return pdf_pool.caminho_wkhtmltopdf()
 
 def _pdf_from_html_core(html: str, request) -> bytes:
     base_url = request.build_absolute_uri('/')
@@ -3588,26 +3395,9 @@ def _pdf_from_html_core(html: str, request) -> bytes:
     if '<head' in body.lower() and '<base ' not in body.lower():
         body = re.sub(r'<head(.*?)>', lambda m: f"<head{m.group(1)}><base href='{base_url}'>", body, count=1, flags=re.I)
 
-    wk = _find_wkhtmltopdf_path_core()
-    if wk:
-        try:
-            with tempfile.TemporaryDirectory() as td:
-                html_f = os.path.join(td, 'doc.html'); pdf_f = os.path.join(td, 'out.pdf')
-                with open(html_f,'w',encoding='utf-8') as f: f.write(body)
-                cmd = [wk,'--enable-local-file-access','--encoding','utf-8','--page-size','A4','--margin-top','14mm','--margin-bottom','16mm','--margin-left','12mm','--margin-right','12mm','--print-media-type','--disable-smart-shrinking','--zoom','1.0','--dpi','96',html_f,pdf_f]
-                proc = subprocess.run(cmd, capture_output=True, text=True, timeout=90)
-                if proc.returncode == 0 and os.path.exists(pdf_f):
-                    return open(pdf_f,'rb').read()
-        except Exception:
-            pass
-    # Fallback simples (xhtml2pdf)
+    # Conversão no pool persistente (wkhtmltopdf -> WeasyPrint -> xhtml2pdf)
     try:
-        from xhtml2pdf import pisa  # type: ignore
-        from io import BytesIO
-        out = BytesIO()
-        status = pisa.CreatePDF(body, dest=out, encoding='utf-8')
-        if not status.err:
-            return out.getvalue()
+        return pdf_pool.renderizar_html(body, base_url=base_url, perfil='documento', timeout=90)
     except Exception:
         pass
     return body.encode('utf-8', errors='ignore')
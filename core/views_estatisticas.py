@@ -5,12 +5,12 @@ from django.shortcuts import render
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.safestring import mark_safe
-from django.db.models import Count
-from django.db.models.functions import TruncDate
-from datetime import date
-import csv
 import json
 
+from common import csv_export
+
+from . import estatisticas_taloes, graficos, resumos
+
 
 # ======================
 #   ESTATÍSTICAS ABORDADOS
@@ -24,7 +24,6 @@ def estatisticas_abordados(request):
     Filtros: ?de=YYYY-MM-DD&ate=YYYY-MM-DD.
     """
     from taloes.models import Abordado
-    from collections import Counter
     from django.contrib.auth import get_user_model
     User = get_user_model()
     
@@ -61,7 +60,7 @@ def estatisticas_abordados(request):
         uid = 0
 
     # Query base por período
-    qs = Abordado.objects.select_related('talao', 'talao__criado_por', 'talao__encarregado', 'talao__motorista', 'talao__auxiliar1', 'talao__auxiliar2').filter(criado_em__date__range=(de, ate))
+    qs = Abordado.objects.select_related('talao', 'talao__criado_por', 'talao__encarregado', 'talao__motorista', 'talao__auxiliar1', 'talao__auxiliar2').filter(estatisticas_taloes.periodo('criado_em', de, ate))
     
     # Filtro por GCM (considera TODOS os campos: criado_por, encarregado, motorista, auxiliar1, auxiliar2)
     if uid:
@@ -76,48 +75,32 @@ def estatisticas_abordados(request):
     
     # Exportação CSV
     if (request.GET.get('export') or '').lower() == 'csv':
-        resp = HttpResponse(content_type='text/csv; charset=utf-8')
-        resp['Content-Disposition'] = f"attachment; filename=abordados_{de:%Y%m%d}_{ate:%Y%m%d}{('_user_'+str(uid)) if uid else ''}.csv"
-        w = csv.writer(resp)
-        w.writerow(['ID','Criado em','Talao ID','GCM ID','GCM','Matrícula','Tipo','Nome/Placa'])
-        for r in qs.select_related('talao__criado_por__perfil').order_by('criado_em'):
-            u = r.talao.criado_por if r.talao else None
-            nome = (u.get_full_name() or u.username).strip() if u else ''
-            perf = getattr(u,'perfil',None) if u else None
-            mat = getattr(perf,'matricula','') if perf else ''
-            criado = timezone.localtime(r.criado_em).strftime('%Y-%m-%d %H:%M:%S') if r.criado_em else ''
-            tipo = r.tipo
-            nome_placa = r.nome if tipo == 'PESSOA' else r.placa
-            w.writerow([r.id, criado, r.talao_id, u.id if u else '', nome, mat, tipo, nome_placa])
-        return resp
-    
-    total = qs.count()
-    total_veiculos = qs.filter(tipo='VEICULO').count()
-    total_pessoas = qs.filter(tipo='PESSOA').count()
-    
-    # Top 5 por GCM (considera TODOS os integrantes do talão)
-    contador_integrantes = Counter()
-    for abordado in qs:
-        talao = abordado.talao
-        if not talao:
-            continue
-        # Coletar todos os integrantes do talão
-        integrantes_ids = set()
-        if talao.criado_por_id:
-            integrantes_ids.add(talao.criado_por_id)
-        if talao.encarregado_id:
-            integrantes_ids.add(talao.encarregado_id)
-        if talao.motorista_id:
-            integrantes_ids.add(talao.motorista_id)
-        if talao.auxiliar1_id:
-            integrantes_ids.add(talao.auxiliar1_id)
-        if talao.auxiliar2_id:
-            integrantes_ids.add(talao.auxiliar2_id)
-        
-        # Incrementar contador para cada integrante
-        for user_id in integrantes_ids:
-            contador_integrantes[user_id] += 1
+        nomes = csv_export.usuarios()
+        linhas = (
+            [pk, csv_export.local(criado_em), talao_id, gcm_id or '', *nomes.get(gcm_id, ('', '')),
+             tipo, nome if tipo == 'PESSOA' else placa]
+            for pk, criado_em, talao_id, gcm_id, tipo, nome, placa in qs.order_by('criado_em').values_list(
+                'id', 'criado_em', 'talao_id', 'talao__criado_por_id', 'tipo', 'nome', 'placa'
+            ).iterator(chunk_size=csv_export.LOTE)
+        )
+        return csv_export.resposta_csv(
+            request, f"abordados_{de:%Y%m%d}_{ate:%Y%m%d}{('_user_'+str(uid)) if uid else ''}",
+            ['ID','Criado em','Talao ID','GCM ID','GCM','Matrícula','Tipo','Nome/Placa'], linhas,
+        )
     
+    # Visão geral (sem filtro de GCM) pelos resumos diários/mensais (core/resumos.py)
+    resumo = resumos.ler('abordados', de, ate) if (not uid and resumos.ativo()) else None
+    if resumo is not None:
+        total = resumo.total()
+        total_veiculos = resumo.qtd['tipo']['VEICULO']
+        total_pessoas = resumo.qtd['tipo']['PESSOA']
+        contador_integrantes = resumo.qtd['usuario']  # todos os integrantes do talão
+        top_dias = resumo.top_dias(10)
+    else:
+        m = estatisticas_taloes.abordados(qs)
+        total, total_veiculos, total_pessoas = m['total'], m['total_veiculos'], m['total_pessoas']
+        contador_integrantes, top_dias = m['integrantes'], m['top_dias']
+
     # Montar top 5 com dados dos usuários
     top_integrantes = []
     for user_id, qtd in contador_integrantes.most_common(5):
@@ -133,14 +116,6 @@ def estatisticas_abordados(request):
         except User.DoesNotExist:
             pass
     
-    # Top 10 por dia do período
-    top_dias = (
-        qs.extra(select={'dia': "DATE(criado_em)"})
-        .values('dia')
-        .annotate(qtd=Count('id'))
-        .order_by('-qtd')[:10]
-    )
-
     # Exportação PDF
     if (request.GET.get('export') or '').lower() == 'pdf':
         # Top 10 para PDF (mesma lógica do top 5)
@@ -164,10 +139,7 @@ def estatisticas_abordados(request):
             'total_veiculos': total_veiculos,
             'total_pessoas': total_pessoas,
             'top_integrantes': top_10_pdf,
-            'top_dias': list(
-                qs.extra(select={'dia': "DATE(criado_em)"})
-                  .values('dia').annotate(qtd=Count('id')).order_by('-qtd')[:10]
-            ),
+            'top_dias': list(top_dias),
             'uid': uid,
         })
         try:
@@ -213,7 +185,6 @@ def estatisticas_abordados(request):
 @login_required
 def estatisticas_abordados_graficos(request):
     """Gráfico de linha (série diária) de Abordados por período, com filtro opcional por integrante."""
-    from taloes.models import Abordado
     try:
         from users.models import Perfil
     except Exception:
@@ -221,22 +192,9 @@ def estatisticas_abordados_graficos(request):
     
     hoje = timezone.localdate()
     tab = (request.GET.get('tab') or 'mes').lower()
-    if tab not in {'dia','mes','semestre','ano'}:
+    if tab not in graficos.ABAS:
         tab = 'mes'
-    
-    if tab == 'dia':
-        default_de, default_ate = hoje, hoje
-    elif tab == 'mes':
-        default_de, default_ate = hoje.replace(day=1), hoje
-    elif tab == 'semestre':
-        if hoje.month <= 6:
-            default_de, default_ate = date(hoje.year,1,1), date(hoje.year,6,30)
-        else:
-            default_de, default_ate = date(hoje.year,7,1), date(hoje.year,12,31)
-            if hoje < default_ate:
-                default_ate = hoje
-    else:
-        default_de, default_ate = date(hoje.year,1,1), hoje
+    default_de, default_ate = graficos.periodo_aba(tab, hoje)
     
     try:
         from datetime import datetime
@@ -266,26 +224,8 @@ def estatisticas_abordados_graficos(request):
             if p.user_id == uid:
                 user_nome = nome
     
-    # Query base
-    qs = Abordado.objects.filter(criado_em__date__range=(de, ate))
-    if uid:
-        from django.db.models import Q
-        qs = qs.filter(
-            Q(talao__criado_por_id=uid) | 
-            Q(talao__encarregado_id=uid) | 
-            Q(talao__motorista_id=uid) | 
-            Q(talao__auxiliar1_id=uid) | 
-            Q(talao__auxiliar2_id=uid)
-        )
-    
-    total = qs.count()
-    serie = list(
-        qs.annotate(dia=TruncDate('criado_em')).values('dia').annotate(qtd=Count('id')).order_by('dia')
-    )
-    serie_js = [
-        {'dia': (row.get('dia').strftime('%Y-%m-%d') if row.get('dia') else ''), 'qtd': int(row.get('qtd') or 0)}
-        for row in serie
-    ]
+    d = graficos.dados('abordados', de, ate, uid=uid)
+    total, serie_js = d['total'], d['serie']
     
     abas = [('dia','Dia'), ('mes','Mês'), ('semestre','Semestre'), ('ano','Ano')]
     ctx = {
@@ -314,7 +254,6 @@ def estatisticas_policiamentos(request):
     Filtros: ?de=YYYY-MM-DD&ate=YYYY-MM-DD.
     """
     from taloes.models import Talao
-    from collections import Counter
     from django.contrib.auth import get_user_model
     User = get_user_model()
     
@@ -359,8 +298,8 @@ def estatisticas_policiamentos(request):
         'auxiliar1', 
         'auxiliar2'
     ).filter(
+        estatisticas_taloes.periodo('iniciado_em', de, ate),
         status='FECHADO',
-        iniciado_em__date__range=(de, ate),
         codigo_ocorrencia__descricao__icontains='Policiamento'
     )
     
@@ -377,44 +316,35 @@ def estatisticas_policiamentos(request):
     
     # Exportação CSV
     if (request.GET.get('export') or '').lower() == 'csv':
-        resp = HttpResponse(content_type='text/csv; charset=utf-8')
-        resp['Content-Disposition'] = f"attachment; filename=policiamentos_{de:%Y%m%d}_{ate:%Y%m%d}{('_user_'+str(uid)) if uid else ''}.csv"
-        w = csv.writer(resp)
-        w.writerow(['ID','Iniciado em','Encerrado em','Criado por','Matrícula','Ocorrência','Local'])
-        for r in qs.select_related('criado_por__perfil', 'codigo_ocorrencia').order_by('iniciado_em'):
-            u = getattr(r,'criado_por',None)
-            nome = (u.get_full_name() or u.username).strip() if u else ''
-            perf = getattr(u,'perfil',None) if u else None
-            mat = getattr(perf,'matricula','') if perf else ''
-            iniciado = timezone.localtime(getattr(r,'iniciado_em', None)).strftime('%Y-%m-%d %H:%M:%S') if getattr(r,'iniciado_em', None) else ''
-            encerrado = timezone.localtime(getattr(r,'encerrado_em', None)).strftime('%Y-%m-%d %H:%M:%S') if getattr(r,'encerrado_em', None) else ''
-            ocorrencia = str(getattr(r.codigo_ocorrencia,'descricao','')) if r.codigo_ocorrencia else ''
-            local = f"{getattr(r,'local_bairro','')} - {getattr(r,'local_rua','')}"
-            w.writerow([r.id, iniciado, encerrado, nome, mat, ocorrencia, local])
-        return resp
-    
-    total = qs.count()
-    
-    # Top 5 por GCM (considera TODOS os integrantes do talão)
-    contador_integrantes = Counter()
-    for talao in qs:
-        # Coletar todos os integrantes do talão
-        integrantes_ids = set()
-        if talao.criado_por_id:
-            integrantes_ids.add(talao.criado_por_id)
-        if talao.encarregado_id:
-            integrantes_ids.add(talao.encarregado_id)
-        if talao.motorista_id:
-            integrantes_ids.add(talao.motorista_id)
-        if talao.auxiliar1_id:
-            integrantes_ids.add(talao.auxiliar1_id)
-        if talao.auxiliar2_id:
-            integrantes_ids.add(talao.auxiliar2_id)
-        
-        # Incrementar contador para cada integrante
-        for user_id in integrantes_ids:
-            contador_integrantes[user_id] += 1
+        nomes = csv_export.usuarios()
+        linhas = (
+            [pk, csv_export.local(iniciado_em), csv_export.local(encerrado_em), *nomes.get(criado_por_id, ('', '')),
+             ocorrencia or '', f"{bairro} - {rua}"]
+            for pk, iniciado_em, encerrado_em, criado_por_id, ocorrencia, bairro, rua in qs.order_by('iniciado_em').values_list(
+                'id', 'iniciado_em', 'encerrado_em', 'criado_por_id', 'codigo_ocorrencia__descricao', 'local_bairro', 'local_rua'
+            ).iterator(chunk_size=csv_export.LOTE)
+        )
+        return csv_export.resposta_csv(
+            request, f"policiamentos_{de:%Y%m%d}_{ate:%Y%m%d}{('_user_'+str(uid)) if uid else ''}",
+            ['ID','Iniciado em','Encerrado em','Criado por','Matrícula','Ocorrência','Local'], linhas,
+        )
     
+    # Visão geral (sem filtro de GCM) pelos resumos diários/mensais (core/resumos.py)
+    resumo = resumos.ler('policiamentos', de, ate) if (not uid and resumos.ativo()) else None
+    if resumo is not None:
+        total = resumo.total()
+        contador_integrantes = resumo.qtd['usuario']  # todos os integrantes do talão
+        top_dias = resumo.top_dias(10)
+        top_tipos = [{'codigo_ocorrencia__descricao': t, 'qtd': q} for t, q in resumo.qtd['tipo'].most_common(10)]
+        top_locais = [
+            {'local': resumo.rotulo['local'].get(local, local.title()), 'qtd': q}
+            for local, q in resumo.qtd['local'].most_common(10)
+        ]
+    else:
+        m = estatisticas_taloes.policiamentos(qs)
+        total, contador_integrantes, top_dias = m['total'], m['integrantes'], m['top_dias']
+        top_tipos, top_locais = m['top_tipos'], m['top_locais']
+
     # Montar top 5 com dados dos usuários
     top_integrantes = []
     for user_id, qtd in contador_integrantes.most_common(5):
@@ -430,73 +360,6 @@ def estatisticas_policiamentos(request):
         except User.DoesNotExist:
             pass
     
-    # Top 10 por dia do período
-    top_dias = (
-        qs.extra(select={'dia': "DATE(iniciado_em)"})
-        .values('dia')
-        .annotate(qtd=Count('id'))
-        .order_by('-qtd')[:10]
-    )
-
-    # Top 10 Tipos de Policiamento (código de ocorrência)
-    top_tipos = (
-        qs.values('codigo_ocorrencia__descricao')
-        .annotate(qtd=Count('id'))
-        .order_by('-qtd')[:10]
-    )
-    
-    # Top 10 Locais (normalizado - case insensitive)
-    # Normalizar locais: combinar bairro + rua e converter para lowercase
-    from collections import Counter as CollCounter
-    contador_locais = CollCounter()
-    
-    for talao in qs:
-        # Construir local completo
-        bairro = (talao.local_bairro or '').strip()
-        rua = (talao.local_rua or '').strip()
-        
-        if bairro and rua:
-            local = f"{bairro} - {rua}"
-        elif bairro:
-            local = bairro
-        elif rua:
-            local = rua
-        else:
-            local = "Não informado"
-        
-        # Normalizar para lowercase para agrupar variações
-        local_normalizado = local.lower()
-        contador_locais[local_normalizado] += 1
-    
-    # Montar top 10 locais preservando capitalização original
-    # (usar a primeira ocorrência encontrada como display)
-    top_locais_raw = contador_locais.most_common(10)
-    top_locais = []
-    locais_vistos = {}
-    
-    for talao in qs:
-        bairro = (talao.local_bairro or '').strip()
-        rua = (talao.local_rua or '').strip()
-        
-        if bairro and rua:
-            local = f"{bairro} - {rua}"
-        elif bairro:
-            local = bairro
-        elif rua:
-            local = rua
-        else:
-            local = "Não informado"
-        
-        local_norm = local.lower()
-        if local_norm not in locais_vistos:
-            locais_vistos[local_norm] = local
-    
-    for local_norm, qtd in top_locais_raw:
-        top_locais.append({
-            'local': locais_vistos.get(local_norm, local_norm.title()),
-            'qtd': qtd
-        })
-
     # Exportação PDF
     if (request.GET.get('export') or '').lower() == 'pdf':
         # Top 10 para PDF
@@ -518,10 +381,7 @@ def estatisticas_policiamentos(request):
             'ate': ate,
             'total': total,
             'top_integrantes': top_10_pdf,
-            'top_dias': list(
-                qs.extra(select={'dia': "DATE(iniciado_em)"})
-                  .values('dia').annotate(qtd=Count('id')).order_by('-qtd')[:10]
-            ),
+            'top_dias': list(top_dias),
             'top_tipos': list(top_tipos),
             'top_locais': top_locais,
             'uid': uid,
@@ -569,7 +429,6 @@ def estatisticas_policiamentos(request):
 @login_required
 def estatisticas_policiamentos_graficos(request):
     """Gráfico de linha (série diária) de Policiamentos por período, com filtro opcional por integrante."""
-    from taloes.models import Talao
     try:
         from users.models import Perfil
     except Exception:
@@ -577,22 +436,9 @@ def estatisticas_policiamentos_graficos(request):
     
     hoje = timezone.localdate()
     tab = (request.GET.get('tab') or 'mes').lower()
-    if tab not in {'dia','mes','semestre','ano'}:
+    if tab not in graficos.ABAS:
         tab = 'mes'
-    
-    if tab == 'dia':
-        default_de, default_ate = hoje, hoje
-    elif tab == 'mes':
-        default_de, default_ate = hoje.replace(day=1), hoje
-    elif tab == 'semestre':
-        if hoje.month <= 6:
-            default_de, default_ate = date(hoje.year,1,1), date(hoje.year,6,30)
-        else:
-            default_de, default_ate = date(hoje.year,7,1), date(hoje.year,12,31)
-            if hoje < default_ate:
-                default_ate = hoje
-    else:
-        default_de, default_ate = date(hoje.year,1,1), hoje
+    default_de, default_ate = graficos.periodo_aba(tab, hoje)
     
     try:
         from datetime import datetime
@@ -622,30 +468,8 @@ def estatisticas_policiamentos_graficos(request):
             if p.user_id == uid:
                 user_nome = nome
     
-    # Query base
-    qs = Talao.objects.filter(
-        status='FECHADO',
-        iniciado_em__date__range=(de, ate),
-        codigo_ocorrencia__descricao__icontains='Policiamento'
-    )
-    if uid:
-        from django.db.models import Q
-        qs = qs.filter(
-            Q(criado_por_id=uid) | 
-            Q(encarregado_id=uid) | 
-            Q(motorista_id=uid) | 
-            Q(auxiliar1_id=uid) | 
-            Q(auxiliar2_id=uid)
-        )
-    
-    total = qs.count()
-    serie = list(
-        qs.annotate(dia=TruncDate('iniciado_em')).values('dia').annotate(qtd=Count('id')).order_by('dia')
-    )
-    serie_js = [
-        {'dia': (row.get('dia').strftime('%Y-%m-%d') if row.get('dia') else ''), 'qtd': int(row.get('qtd') or 0)}
-        for row in serie
-    ]
+    d = graficos.dados('policiamentos', de, ate, uid=uid)
+    total, serie_js = d['total'], d['serie']
     
     abas = [('dia','Dia'), ('mes','Mês'), ('semestre','Semestre'), ('ano','Ano')]
     ctx = {
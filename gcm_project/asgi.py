@@ -12,9 +12,14 @@ try:
 except Exception:
 	panic_ws = []
 
+try:
+	from cecom.routing import websocket_urlpatterns as cecom_ws
+except Exception:
+	cecom_ws = []
+
 application = ProtocolTypeRouter({
 	"http": django_app,
 	"websocket": AuthMiddlewareStack(
-		URLRouter(panic_ws)
+		URLRouter(panic_ws + cecom_ws)
 	),
 })
@@ -185,19 +185,40 @@ TEMPLATES = [
 WSGI_APPLICATION = "gcm_project.wsgi.application"
 ASGI_APPLICATION = "gcm_project.asgi.application"
 
-# Channels (dev em memória; produção use channels_redis)
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
+# Channels. CHANNEL_LAYER:
+#   memoria      -> InMemoryChannelLayer (dev, um único processo)
+#   redis        -> channels_redis (produção com vários workers daphne/uvicorn)
+#   redis_pubsub -> channels_redis pub/sub (fan-out de grupos por processo, sem fila por canal)
+#   sqlite       -> common.channel_layers.SQLiteChannelLayer (testes locais multi-processo, sem Redis)
+CHANNEL_LAYER = os.getenv("CHANNEL_LAYER", "memoria").strip().lower()
+CHANNEL_REDIS_URL = os.getenv("CHANNEL_REDIS_URL", "redis://127.0.0.1:6379/1")
+if CHANNEL_LAYER == "redis":
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [CHANNEL_REDIS_URL], "capacity": 1500, "expiry": 30, "group_expiry": 86400},
+        }
+    }
+elif CHANNEL_LAYER == "redis_pubsub":
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.pubsub.RedisPubSubChannelLayer",
+            "CONFIG": {"hosts": [CHANNEL_REDIS_URL]},
+        }
+    }
+elif CHANNEL_LAYER == "sqlite":
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "common.channel_layers.SQLiteChannelLayer",
+            "CONFIG": {"path": os.getenv("CHANNEL_SQLITE_PATH", str(BASE_DIR / "cache" / "channels.sqlite3"))},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        }
     }
-}
-# Exemplo produção:
-# CHANNEL_LAYERS = {
-#     "default": {
-#         "BACKEND": "channels_redis.core.RedisChannelLayer",
-#         "CONFIG": {"hosts": [("127.0.0.1", 6379)]},
-#     }
-# }
 
 # --- Database ---
 DATABASES = {
@@ -253,6 +274,12 @@ if not FIREBASE_CREDENTIALS_JSON:
         _cands = glob.glob(str(BASE_DIR / '*firebase-adminsdk-*.json'))
         if _cands:
             FIREBASE_CREDENTIALS_JSON = _cands[0]
+# Envio (common.views.enviar_push): lotes de 500 tokens em paralelo; fallback por token em paralelo.
+PUSH_BACKEND = os.getenv("PUSH_BACKEND", "fcm")  # fcm | fake (common.push_fake, só para benchmark/dev)
+PUSH_ENVIO_WORKERS = int(os.getenv("PUSH_ENVIO_WORKERS", "4"))
+PUSH_FALLBACK_WORKERS = int(os.getenv("PUSH_FALLBACK_WORKERS", "16"))
+PUSH_FAKE_LATENCIA_MS = float(os.getenv("PUSH_FAKE_LATENCIA_MS", "80"))
+PUSH_FAKE_FALHA_LOTE = os.getenv("PUSH_FAKE_FALHA_LOTE", "0") == "1"
 
 # WhiteNoise (Django 5+ usa STORAGES)
 STORAGES = {
@@ -350,6 +377,96 @@ if not WKHTMLTOPDF_CMD:
 # Flag para desabilitar completamente uso do WeasyPrint (evita warnings quando libs nativas faltam)
 PDF_DISABLE_WEASYPRINT = os.getenv("PDF_DISABLE_WEASYPRINT", "1") == "1"
 
+# Pool de renderização HTML→PDF (common.pdf_pool): threads por processo, fila limitada e timeout por job
+PDF_POOL_WORKERS = int(os.getenv("PDF_POOL_WORKERS", "2"))
+PDF_POOL_FILA_MAX = int(os.getenv("PDF_POOL_FILA_MAX", "8"))          # jobs aguardando além dos em execução
+PDF_POOL_TIMEOUT = int(os.getenv("PDF_POOL_TIMEOUT", "60"))           # segundos por job
+PDF_POOL_ESPERA_FILA = int(os.getenv("PDF_POOL_ESPERA_FILA", "5"))    # espera máx. por vaga antes de recusar
+
+# Cache em disco dos PDFs do BO (bogcmi.pdf_cache). Manter fora de MEDIA_ROOT: /media/ é público no nginx.
+BO_PDF_CACHE_DIR = os.getenv("BO_PDF_CACHE_DIR", str(BASE_DIR / "cache" / "bo_pdf"))
+BO_PDF_CACHE_MAX_BYTES = int(os.getenv("BO_PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))  # 512 MB
+
+# Cache do Django. CACHE_BACKEND:
+#   arquivo  -> default LocMem (um por processo) + alias "compartilhado" em disco (padrão)
+#   redis    -> CACHE_REDIS_URL nos dois aliases (vários servidores)
+#   memoria  -> LocMem nos dois (só para dev com um processo)
+# O alias "compartilhado" guarda só o que todos os workers do gunicorn precisam ver (snapshot do
+# painel, versões de invalidação, travas entre processos): poucas escritas. O caminho quente (GPS,
+# badges, trilhas) fica no default: o FileBasedCache varre o diretório a cada set().
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "arquivo").strip().lower()
+if CACHE_BACKEND == "redis":
+    _cache_redis = {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+                    "LOCATION": os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/2")}
+    CACHES = {"default": _cache_redis, "compartilhado": _cache_redis}
+elif CACHE_BACKEND == "memoria":
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+              "compartilhado": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                "LOCATION": "compartilhado"}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+              "compartilhado": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                                "LOCATION": os.getenv("CACHE_DIR", str(BASE_DIR / "cache" / "django")),
+                                "OPTIONS": {"MAX_ENTRIES": 1000}}}
+
+# Snapshot do painel CECOM (cecom.painel_snapshot): invalidado por sinais; TTL cobre a janela de 24h
+PAINEL_SNAPSHOT_TTL = int(os.getenv("PAINEL_SNAPSHOT_TTL", "60"))
+
+# Ingestão de localização das viaturas (cecom.gps_ingest)
+GPS_FLUSH_MS = int(os.getenv("GPS_FLUSH_MS", "1000"))          # intervalo de gravação do buffer
+GPS_BUFFER_MAX = int(os.getenv("GPS_BUFFER_MAX", "2000"))      # pontos no buffer que antecipam a gravação
+GPS_LOTE_MAX = int(os.getenv("GPS_LOTE_MAX", "500"))           # pontos aceitos por envio em lote do app
+GPS_RETENCAO_DIAS = int(os.getenv("GPS_RETENCAO_DIAS", "30"))  # trilha mantida (manage.py gps_retencao)
+GPS_TRILHA_TOLERANCIA_M = float(os.getenv("GPS_TRILHA_TOLERANCIA_M", "5"))  # Douglas-Peucker
+GPS_TRILHA_BLOCO_MIN = int(os.getenv("GPS_TRILHA_BLOCO_MIN", "15"))  # intervalo de cada bloco compactado
+GPS_TRILHA_CACHE_S = int(os.getenv("GPS_TRILHA_CACHE_S", "5"))      # trilhas do mapa em cache
+GPS_TRILHA_RETENCAO_DIAS = int(os.getenv("GPS_TRILHA_RETENCAO_DIAS", "365"))  # blocos (replay do plantão)
+
+# Contadores do topo (core.badges)
+BADGES_TTL = int(os.getenv("BADGES_TTL", "30"))
+BADGES_ASSINCRONO = os.getenv("BADGES_ASSINCRONO", "1") == "1"  # sem cache, o base.html busca core:badges
+
+# Trilha de auditoria (common.audit_buffer). AUDIT_MODO:
+#   buffer   -> lote em memória gravado por thread (bulk_create), transborda para o spool
+#   spool    -> só JSONL em disco, ingerido por `manage.py audit_spool` (ou pela thread)
+#   sincrono -> INSERT por requisição (comportamento antigo)
+AUDIT_MODO = os.getenv("AUDIT_MODO", "buffer").lower()
+AUDIT_FLUSH_MS = int(os.getenv("AUDIT_FLUSH_MS", "1000"))
+AUDIT_BUFFER_MAX = int(os.getenv("AUDIT_BUFFER_MAX", "5000"))  # acima disso, spool em disco
+AUDIT_LOTE = int(os.getenv("AUDIT_LOTE", "500"))
+AUDIT_SPOOL_DIR = os.getenv("AUDIT_SPOOL_DIR", str(BASE_DIR / "cache" / "audit"))
+AUDIT_SPOOL_ORFAO_S = int(os.getenv("AUDIT_SPOOL_ORFAO_S", "600"))  # arquivo em ingestão abandonado é retomado
+
+# Logs antigos (common.log_arquivo, `manage.py arquivar_logs`): meses mantidos no banco e
+# pasta dos arquivos mensais AAAA-MM.jsonl.gz
+LOG_MESES_ONLINE = int(os.getenv("LOG_MESES_ONLINE", "6"))
+LOG_ARQUIVO_DIR = os.getenv("LOG_ARQUIVO_DIR", str(BASE_DIR / "cache" / "logs"))
+
+# Resumos diários/mensais das telas de estatística (core.resumos). Rode `manage.py recalcular_resumos`
+# todas as noites; com ESTATISTICAS_RESUMOS=0 as telas voltam a calcular a partir dos registros.
+ESTATISTICAS_RESUMOS = os.getenv("ESTATISTICAS_RESUMOS", "1") == "1"
+
+# Cache das telas de gráficos e do PDF de gráficos por usuário (core.graficos). Manter fora de MEDIA_ROOT.
+# `manage.py aquecer_graficos` (cron após recalcular_resumos) deixa prontas as abas Mês e Ano.
+GRAFICOS_CACHE_DIR = os.getenv("GRAFICOS_CACHE_DIR", str(BASE_DIR / "cache" / "graficos"))
+GRAFICOS_CACHE_MAX_BYTES = int(os.getenv("GRAFICOS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # 64 MB
+GRAFICOS_CACHE_TTL = int(os.getenv("GRAFICOS_CACHE_TTL", str(12 * 3600)))  # segundos; 0 desliga o cache
+
+# Assinatura em lote (common.assinatura_lote): processada fora da requisição
+ASSINATURA_LOTE_WORKERS = int(os.getenv("ASSINATURA_LOTE_WORKERS", "2"))
+ASSINATURA_LOTE_EXECUTOR = os.getenv("ASSINATURA_LOTE_EXECUTOR", "threads")  # threads | processos
+ASSINATURA_LOTE_ITEM_TIMEOUT = int(os.getenv("ASSINATURA_LOTE_ITEM_TIMEOUT", "300"))  # item "processando" há mais que isso pode ser reprocessado
+
+# Fila de push FCM (common.push_outbox). Em produção, rode `manage.py push_outbox` como serviço
+# e desligue a drenagem nos processos web com PUSH_OUTBOX_DRENAR_NO_PROCESSO=0.
+PUSH_OUTBOX_DRENAR_NO_PROCESSO = os.getenv("PUSH_OUTBOX_DRENAR_NO_PROCESSO", "1") == "1"
+PUSH_OUTBOX_LOTE = int(os.getenv("PUSH_OUTBOX_LOTE", "100"))                  # itens por rodada
+PUSH_OUTBOX_INTERVALO = float(os.getenv("PUSH_OUTBOX_INTERVALO", "5"))        # s entre rodadas sem aviso (retentativas)
+PUSH_OUTBOX_MAX_TENTATIVAS = int(os.getenv("PUSH_OUTBOX_MAX_TENTATIVAS", "8"))
+PUSH_OUTBOX_BACKOFF_BASE = float(os.getenv("PUSH_OUTBOX_BACKOFF_BASE", "5"))  # 5s, 10s, 20s… até o teto
+PUSH_OUTBOX_BACKOFF_MAX = float(os.getenv("PUSH_OUTBOX_BACKOFF_MAX", "900"))
+PUSH_OUTBOX_ENVIO_TIMEOUT = int(os.getenv("PUSH_OUTBOX_ENVIO_TIMEOUT", "120"))  # item "enviando" há mais que isso volta à fila
+
 # --- E-mail (SMTP) ---
 # Por padrão, em DEBUG usa console (imprime no terminal). Em produção, configure variáveis de ambiente.
 EMAIL_BACKEND = os.getenv(
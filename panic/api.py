@@ -6,8 +6,7 @@ from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from .models import DisparoPanico
 from .models import Assistida
-from common.models import PushDevice
-from common.views import enviar_push
+from common import push_outbox
 from rest_framework.permissions import AllowAny
 
 class DisparoListAPI(APIView):
@@ -49,30 +48,25 @@ class DisparoAssumirAPI(APIView):
             return Response({'detail': 'Disparo não pode ser assumido.'}, status=status.HTTP_400_BAD_REQUEST)
         if d.status == "ABERTA":
             d.marcar_atendimento(request.user)
-            # Push de transição para EM_ATENDIMENTO
+            # Push de transição para EM_ATENDIMENTO (enfileirado; ver common.push_outbox)
             try:
-                # Incluir dispositivos com user ativo OU sem user (apps anônimos como SafeBP)
-                from django.db.models import Q
-                tokens = list(PushDevice.objects.filter(
-                    Q(user__is_active=True) | Q(user__isnull=True),
-                    enabled=True
-                ).values_list('token', flat=True)[:800])
-                if tokens:
-                    push_title = f"Pânico em atendimento - {d.assistida.nome}"
-                    push_body = f"Disparo #{d.id} assumido."
-                    enviar_push(
-                        tokens,
-                        title=push_title,
-                        body=push_body,
-                        data={
-                            'kind': 'panico_status',
-                            'disparo_id': str(d.id),
-                            'status': d.status,
-                            'action': 'assumir',
-                            'title': push_title,  # Adicionar título no data
-                            'body': push_body,
-                        }
-                    )
+                push_title = f"Pânico em atendimento - {d.assistida.nome}"
+                push_body = f"Disparo #{d.id} assumido."
+                push_outbox.enfileirar(
+                    'panico_status',
+                    push_title,
+                    push_body,
+                    {
+                        'kind': 'panico_status',
+                        'disparo_id': str(d.id),
+                        'status': d.status,
+                        'action': 'assumir',
+                        'title': push_title,  # Adicionar título no data
+                        'body': push_body,
+                    },
+                    # Dispositivos com user ativo OU sem user (apps anônimos como SafeBP)
+                    destino='TODOS',
+                )
             except Exception:
                 pass
         return Response({'id': d.id, 'status': d.status, 'em_atendimento_em': d.em_atendimento_em})
@@ -89,48 +83,39 @@ class DisparoEncerrarAPI(APIView):
         if status_final not in {"ENCERRADA","CANCELADA","FALSO_POSITIVO","TESTE"}:
             status_final = "ENCERRADA"
         d.encerrar(relato, status_final=status_final)
-        # Push de encerramento
+        # Push de encerramento (enfileirado; ver common.push_outbox)
         try:
-            # Incluir dispositivos com user ativo OU sem user (apps anônimos como SafeBP)
-            from django.db.models import Q
-            tokens = list(PushDevice.objects.filter(
-                Q(user__is_active=True) | Q(user__isnull=True),
-                enabled=True
-            ).values_list('token', flat=True)[:800])
-            if tokens:
-                action = 'confirm' if d.status=='ENCERRADA' else ('teste' if d.status=='TESTE' else 'recusa')
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.info(f"[PUSH] Enviando para {len(tokens)} dispositivos: status={d.status}, motivo={relato}, action={action}")
-                # Títulos customizados por status
-                push_title = (
-                    "🚨 Equipes à caminho" if d.status == 'ENCERRADA'
-                    else ("Pânico recusado" if d.status == 'CANCELADA'
-                          else ("Pânico marcado como TESTE" if d.status == 'TESTE'
-                                else "Atualização do pânico"))
-                )
-                push_body = relato or ""
-                enviar_push(
-                    tokens,
-                    title=push_title,
-                    body=push_body,
-                    data={
-                        'kind': 'panico_status',
-                        'disparo_id': str(d.id),
-                        'status': d.status,
-                        'motivo': (relato or ''),
-                        'action': action,
-                        'title': push_title,  # Adicionar título no data para apps data-only
-                        'body': push_body,
-                    }
-                )
-                logger.info(f"[PUSH] Envio concluído com sucesso.")
-            else:
-                import logging
-                logging.getLogger(__name__).warning("[PUSH] Nenhum token ativo encontrado no banco.")
+            action = 'confirm' if d.status=='ENCERRADA' else ('teste' if d.status=='TESTE' else 'recusa')
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.info(f"[PUSH] Enfileirando status={d.status}, motivo={relato}, action={action}")
+            # Títulos customizados por status
+            push_title = (
+                "🚨 Equipes à caminho" if d.status == 'ENCERRADA'
+                else ("Pânico recusado" if d.status == 'CANCELADA'
+                      else ("Pânico marcado como TESTE" if d.status == 'TESTE'
+                            else "Atualização do pânico"))
+            )
+            push_body = relato or ""
+            push_outbox.enfileirar(
+                'panico_status',
+                push_title,
+                push_body,
+                {
+                    'kind': 'panico_status',
+                    'disparo_id': str(d.id),
+                    'status': d.status,
+                    'motivo': (relato or ''),
+                    'action': action,
+                    'title': push_title,  # Adicionar título no data para apps data-only
+                    'body': push_body,
+                },
+                # Dispositivos com user ativo OU sem user (apps anônimos como SafeBP)
+                destino='TODOS',
+            )
         except Exception as e:
             import logging
-            logging.getLogger(__name__).error(f"[PUSH] Erro ao enviar: {e}", exc_info=True)
+            logging.getLogger(__name__).error(f"[PUSH] Erro ao enfileirar: {e}", exc_info=True)
         return Response({'id': d.id, 'status': d.status, 'encerrado_em': d.encerrado_em})
 
 
@@ -1,8 +1,22 @@
+import time
+
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.urls import reverse
 
-def broadcast_panico(disparo):
+from . import metricas
+
+GRUPO = "panico_global"
+
+
+def _publicar(layer, tipo: str, data: dict, enviado_em=None):
+    """group_send com carimbo de tempo (latência medida no consumer) e métrica do envio."""
+    t0 = time.perf_counter()
+    async_to_sync(layer.group_send)(GRUPO, {"type": tipo, "data": data, "enviado_em": enviado_em or time.time()})
+    metricas.registrar_publicacao(tipo, time.perf_counter() - t0)
+
+
+def broadcast_panico(disparo, enviado_em=None):
     import logging
     logger = logging.getLogger(__name__)
     logger.info(f"[BROADCAST] Iniciando broadcast para disparo ID: {disparo.id}")
@@ -34,7 +48,7 @@ def broadcast_panico(disparo):
     }
     
     logger.info(f"[BROADCAST] Enviando para grupo 'panico_global': {data}")
-    async_to_sync(layer.group_send)("panico_global", {"type": "panico_disparado", "data": data})
+    _publicar(layer, "panico_disparado", data, enviado_em)
     logger.info(f"[BROADCAST] ✅ Broadcast enviado com sucesso para disparo ID: {disparo.id}")
 
 
@@ -52,7 +66,7 @@ def broadcast_panico_localizacao(disparo):
             "accuracy": disparo.precisao_m,
         },
     }
-    async_to_sync(layer.group_send)("panico_global", {"type": "panico_localizacao", "data": data})
+    _publicar(layer, "panico_localizacao", data)
 
 
 def broadcast_panico_status_mudou(disparo):
@@ -67,4 +81,4 @@ def broadcast_panico_status_mudou(disparo):
         "encerrado_em": disparo.encerrado_em.isoformat() if disparo.encerrado_em else None,
         "motivo": (disparo.relato_final or ""),
     }
-    async_to_sync(layer.group_send)("panico_global", {"type": "panico_status_mudou", "data": data})
+    _publicar(layer, "panico_status_mudou", data)
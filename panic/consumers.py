@@ -1,6 +1,8 @@
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 import logging
 
+from . import metricas
+
 logger = logging.getLogger(__name__)
 
 class PanicoAlertasConsumer(AsyncJsonWebsocketConsumer):
@@ -10,6 +12,7 @@ class PanicoAlertasConsumer(AsyncJsonWebsocketConsumer):
         logger.info(f"[WS] Nova conexão de pânico: {self.channel_name}")
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        metricas.conexao(1)
         logger.info(f"[WS] Conexão aceita: {self.channel_name}")
         
         # Ao conectar, enviar disparos em aberto para exibir imediatamente
@@ -44,15 +47,19 @@ class PanicoAlertasConsumer(AsyncJsonWebsocketConsumer):
     async def disconnect(self, close_code):
         logger.info(f"[WS] Desconexão: {self.channel_name}, code={close_code}")
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        metricas.conexao(-1)
 
     async def panico_disparado(self, event):
         logger.info(f"[WS] Enviando PANICO_DISPARADO: {event.get('data', {}).get('disparo_id')}")
         await self.send_json(event.get("data", {}))
+        metricas.registrar_entrega("PANICO_DISPARADO", event.get("enviado_em"))
 
     async def panico_localizacao(self, event):
         logger.debug(f"[WS] Enviando PANICO_LOCALIZACAO: {event.get('data', {}).get('disparo_id')}")
         await self.send_json(event.get("data", {}))
-    
+        metricas.registrar_entrega("PANICO_LOCALIZACAO", event.get("enviado_em"))
+
     async def panico_status_mudou(self, event):
         logger.info(f"[WS] Enviando PANICO_STATUS_MUDOU: {event.get('data', {}).get('disparo_id')}")
         await self.send_json(event.get("data", {}))
+        metricas.registrar_entrega("PANICO_STATUS_MUDOU", event.get("enviado_em"))
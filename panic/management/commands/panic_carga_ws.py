@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+MARCADOR = "CARGA-WS"
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga do fan-out de alertas de pânico: sobe N consoles WebSocket "
+        "(PanicoAlertasConsumer) distribuídos em vários processos e publica eventos "
+        "PANICO_DISPARADO pelo mesmo caminho do post_save, medindo entrega e latência."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consoles', type=int, default=300, help='Total de consoles conectados.')
+        parser.add_argument('--processos', type=int, default=4, help='Processos (workers) que hospedam os consoles.')
+        parser.add_argument('--eventos', type=int, default=20)
+        parser.add_argument('--intervalo', type=float, default=0.2, help='Segundos entre eventos.')
+        parser.add_argument('--timeout', type=float, default=60)
+        parser.add_argument('--papel', default='coordenador', choices=('coordenador', 'consoles'), help='Uso interno.')
+
+    def handle(self, *args, **opts):
+        if opts['papel'] == 'consoles':
+            return asyncio.run(self._consoles(opts['consoles'], opts['eventos'], opts['timeout']))
+        return self._coordenar(opts)
+
+    # ---------------- processo coordenador ----------------
+
+    def _coordenar(self, opts):
+        backend = settings.CHANNEL_LAYERS.get('default', {}).get('BACKEND', '')
+        if backend.endswith('InMemoryChannelLayer'):
+            raise CommandError('InMemoryChannelLayer não atravessa processos; use CHANNEL_LAYER=redis, redis_pubsub ou sqlite.')
+        from panic import metricas
+        from panic.broadcast import broadcast_panico
+
+        nproc = max(1, opts['processos'])
+        por_proc = [opts['consoles'] // nproc + (1 if i < opts['consoles'] % nproc else 0) for i in range(nproc)]
+        manage_py = os.path.abspath(sys.argv[0])
+        filhos = []
+        t0 = time.monotonic()
+        for n in por_proc:
+            cmd = [sys.executable, manage_py, 'panic_carga_ws', '--papel', 'consoles', '--consoles', str(n),
+                   '--eventos', str(opts['eventos']), '--timeout', str(opts['timeout'])]
+            filhos.append(subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True))
+        for p in filhos:
+            linha = p.stdout.readline().strip()
+            if linha != 'PRONTO':
+                for q in filhos:
+                    q.kill()
+                raise CommandError(f'processo de consoles falhou ao iniciar: {linha!r}')
+        self.stdout.write(f"{opts['consoles']} consoles conectados em {nproc} processo(s) ({backend}) em {time.monotonic() - t0:.1f}s")
+
+        # Mesmo caminho do receiver post_save (broadcast_panico com carimbo enviado_em),
+        # com disparos fictícios: não grava no banco nem dispara push FCM.
+        for i in range(opts['eventos']):
+            disparo = SimpleNamespace(
+                id=900000 + i,
+                assistida=SimpleNamespace(nome=MARCADOR, cpf='000.000.000-00', telefone=''),
+                latitude=-22.0, longitude=-47.0, precisao_m=10, created_at=timezone.now(),
+            )
+            broadcast_panico(disparo, enviado_em=time.time())
+            time.sleep(opts['intervalo'])
+
+        latencias, recebidos, esperados = [], 0, 0
+        for p in filhos:
+            saida, _ = p.communicate(timeout=opts['timeout'] + 30)
+            for linha in saida.splitlines():
+                if linha.startswith('RESULTADO '):
+                    r = json.loads(linha[len('RESULTADO '):])
+                    recebidos += r['recebidos']
+                    esperados += r['esperados']
+                    latencias.extend(r['latencias'])
+        pub = metricas.metricas()['publicacoes'].get('panico_disparado', {})
+        self.stdout.write(f"entregues: {recebidos}/{esperados} ({100.0 * recebidos / esperados if esperados else 0:.1f}%)")
+        self.stdout.write(
+            "latência post_save→send_json: "
+            f"p50={_percentil(latencias, 0.5) * 1000:.1f}ms p95={_percentil(latencias, 0.95) * 1000:.1f}ms "
+            f"p99={_percentil(latencias, 0.99) * 1000:.1f}ms max={max(latencias or [0]) * 1000:.1f}ms"
+        )
+        self.stdout.write(f"group_send p95: {pub.get('group_send_p95_s', 0) * 1000:.1f}ms ({pub.get('total', 0)} publicações)")
+
+    # ---------------- processo com consoles ----------------
+
+    async def _consoles(self, n, eventos, timeout):
+        from channels.testing import WebsocketCommunicator
+        from panic import metricas
+        from panic.consumers import PanicoAlertasConsumer
+
+        app = PanicoAlertasConsumer.as_asgi()
+        consoles = [WebsocketCommunicator(app, '/ws/panico/alertas/') for _ in range(n)]
+        resultados = await asyncio.gather(*(c.connect(timeout=timeout) for c in consoles))
+        if not all(ok for ok, _ in resultados):
+            print('FALHA conexão', flush=True)
+            return
+        # descarta os disparos em aberto enviados no connect
+        await asyncio.sleep(0.5)
+        for c in consoles:
+            while not await c.receive_nothing(timeout=0.01):
+                await c.receive_output()
+        print('PRONTO', flush=True)
+
+        limite = time.monotonic() + timeout
+
+        async def ouvir(c):
+            recebidos = 0
+            while recebidos < eventos:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    msg = await c.receive_json_from(timeout=restante)
+                except asyncio.TimeoutError:
+                    break
+                if (msg.get('assistida') or {}).get('nome') == MARCADOR:
+                    recebidos += 1
+            return recebidos
+
+        contagens = await asyncio.gather(*(ouvir(c) for c in consoles))
+        await asyncio.gather(*(c.disconnect() for c in consoles), return_exceptions=True)
+        print('RESULTADO ' + json.dumps({
+            'recebidos': sum(contagens),
+            'esperados': n * eventos,
+            'latencias': metricas.amostras('PANICO_DISPARADO'),
+        }), flush=True)
@@ -0,0 +1,76 @@
+"""Métricas de entrega dos alertas de pânico via WebSocket (por processo).
+
+A latência medida vai do ``post_save`` do disparo (carimbo ``enviado_em`` no
+evento do grupo) até o ``send_json`` do ``PanicoAlertasConsumer``. Cada worker
+ASGI mantém os próprios números; o processo que publica registra o tempo do
+``group_send``.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+
+_lock = threading.Lock()
+_conexoes = 0
+_entregas: dict[str, deque] = {}
+_contadores: dict[str, int] = {}
+_publicacoes: dict[str, deque] = {}
+
+
+def _percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return round(ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))], 4)
+
+
+def conexao(delta: int):
+    global _conexoes
+    with _lock:
+        _conexoes += delta
+
+
+def registrar_entrega(tipo: str, enviado_em) -> None:
+    if not enviado_em:
+        return
+    latencia = max(0.0, time.time() - float(enviado_em))
+    with _lock:
+        _entregas.setdefault(tipo, deque(maxlen=2000)).append(latencia)
+        _contadores[tipo] = _contadores.get(tipo, 0) + 1
+
+
+def registrar_publicacao(tipo: str, segundos: float) -> None:
+    with _lock:
+        _publicacoes.setdefault(tipo, deque(maxlen=500)).append(segundos)
+
+
+def metricas() -> dict:
+    with _lock:
+        entregas = {
+            tipo: {
+                'total': _contadores.get(tipo, 0),
+                'latencia_p50_s': _percentil(lat, 0.5),
+                'latencia_p95_s': _percentil(lat, 0.95),
+                'latencia_max_s': round(max(lat), 4) if lat else 0.0,
+            }
+            for tipo, lat in _entregas.items()
+        }
+        publicacoes = {
+            tipo: {'total': len(v), 'group_send_p95_s': _percentil(v, 0.95)}
+            for tipo, v in _publicacoes.items()
+        }
+        return {'conexoes': _conexoes, 'entregas': entregas, 'publicacoes': publicacoes}
+
+
+def resetar():
+    with _lock:
+        _entregas.clear()
+        _contadores.clear()
+        _publicacoes.clear()
+
+
+def amostras(tipo: str) -> list:
+    """Latências (s) registradas para o tipo — usado pelo teste de carga para agregar entre processos."""
+    with _lock:
+        return list(_entregas.get(tipo, ()))
@@ -6,6 +6,7 @@ app_name = 'panic'
 urlpatterns = [
 	path('', views.index, name='index'),
 	path('_dev/trigger/', views._dev_trigger, name='dev_trigger_panico'),
+	path('metricas/ws/', views.metricas_ws, name='metricas_ws'),
 	# Gestão de assistidas (admin)
 	path('assistidas/', admin_views.assistidas_list, name='assistidas_list'),
 	path('assistidas/pendentes/', admin_views.assistidas_pendentes_list, name='assistidas_pendentes_list'),
@@ -1,3 +1,5 @@
+import os
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
@@ -150,3 +152,16 @@ def cecom_panico_detalhe(request, pk: int):
         'has_coords': bool(d.latitude and d.longitude),
     }
     return render(request, 'cecom/panico_detalhe.html', ctx)
+
+
+@login_required
+def metricas_ws(request):
+    """Métricas de fan-out dos alertas (deste worker): conexões, latência post_save→send_json."""
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({'detail': 'Acesso negado'}, status=403)
+    from django.conf import settings
+    from . import metricas
+    dados = metricas.metricas()
+    dados['channel_layer'] = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {}).get('BACKEND', '')
+    dados['pid'] = os.getpid()
+    return JsonResponse(dados)
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taloes', '0014_avariaanexo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='abordado',
+            name='criado_em',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Criado em'),
+        ),
+        migrations.AlterField(
+            model_name='aitregistro',
+            name='criado_em',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Criado em'),
+        ),
+    ]
@@ -236,7 +236,7 @@ class Abordado(models.Model):
     observacoes = models.TextField("Observações", blank=True, default="")
     
     # Timestamp
-    criado_em = models.DateTimeField("Criado em", default=timezone.now)
+    criado_em = models.DateTimeField("Criado em", default=timezone.now, db_index=True)
     
     class Meta:
         verbose_name = "Abordado"
@@ -511,7 +511,7 @@ class AitRegistro(models.Model):
         verbose_name="Integrante",
     )
     numero = models.CharField("Número da AIT", max_length=50)
-    criado_em = models.DateTimeField("Criado em", default=timezone.now)
+    criado_em = models.DateTimeField("Criado em", default=timezone.now, db_index=True)
 
     class Meta:
         verbose_name = "AIT do Talão"